@@ -0,0 +1,92 @@
+# Bus thông báo thay đổi dữ liệu theo bảng (trong tiến trình, không phụ thuộc Qt)
+# Tất cả comment, docstring đều bằng tiếng Việt
+
+import threading
+import traceback
+from collections import namedtuple
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            from datetime import datetime
+
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+from core.table_versions import TableVersions
+
+
+OP_INSERT = "insert"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+
+# table: tên bảng, op: insert / update / delete,
+# ids: tuple id các dòng bị ảnh hưởng, None = không rõ (coi như cả bảng thay đổi)
+ChangeEvent = namedtuple("ChangeEvent", ["table", "op", "ids"])
+
+
+class ChangeBus:
+    """
+    Mô tả:
+        Bus dùng chung toàn tiến trình: repository phát sự kiện ChangeEvent sau mỗi lần
+        ghi thành công, model / cache đăng ký nhận để vá đúng các dòng bị ảnh hưởng
+        thay vì truy vấn lại cả bảng.
+        Subscriber được gọi đồng bộ trên thread đã ghi dữ liệu (có thể là thread nền);
+        phía giao diện dùng ui.common.change_relay để nhận trên GUI thread.
+    """
+
+    _lock = threading.Lock()
+    _subscribers = []
+
+    @staticmethod
+    def subscribe(callback, tables=None):
+        """
+        Mô tả:
+            Đăng ký nhận sự kiện thay đổi.
+        Args:
+            callback: Hàm callback(event: ChangeEvent)
+            tables: Chỉ nhận sự kiện của các bảng này (None = mọi bảng)
+        Returns:
+            None
+        """
+        tables = frozenset(tables) if tables is not None else None
+        with ChangeBus._lock:
+            ChangeBus._subscribers = ChangeBus._subscribers + [(callback, tables)]
+
+    @staticmethod
+    def unsubscribe(callback):
+        """Hủy đăng ký callback"""
+        with ChangeBus._lock:
+            ChangeBus._subscribers = [
+                (cb, tables) for cb, tables in ChangeBus._subscribers if cb != callback
+            ]
+
+    @staticmethod
+    def publish(table, op, ids=None):
+        """
+        Mô tả:
+            Phát sự kiện thay đổi của một bảng (gọi SAU khi transaction đã commit).
+            Đồng thời tăng phiên bản bảng trong TableVersions.
+        Args:
+            table: Tên bảng
+            op: OP_INSERT / OP_UPDATE / OP_DELETE
+            ids: Danh sách id các dòng bị ảnh hưởng (None = không rõ)
+        Returns:
+            None
+        """
+        TableVersions.bump(table)
+        event = ChangeEvent(table, op, tuple(ids) if ids is not None else None)
+        # Danh sách subscriber được thay nguyên khối khi đăng ký nên đọc không cần khóa
+        for callback, tables in ChangeBus._subscribers:
+            if tables is not None and table not in tables:
+                continue
+            try:
+                callback(event)
+            except Exception as e:
+                log_to_debug(
+                    f"ChangeBus: subscriber error on {event}: {e}\n{traceback.format_exc()}"
+                )
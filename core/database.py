@@ -3,6 +3,8 @@
 
 import duckdb
 import os
+import threading
+from contextlib import contextmanager
 from core.resource import resource_path, DB_PATH
 
 
@@ -10,9 +12,19 @@ class Database:
     """
     Mô tả:
         Quản lý kết nối tới cơ sở dữ liệu DuckDB.
-        Không giữ connection lâu, mỗi lần gọi sẽ tạo kết nối mới.
+        Mỗi tiến trình giữ MỘT kết nối đọc-ghi dùng lâu dài (mở lần đầu khi cần).
+        Mỗi thread (GUI thread, QThread worker) nhận một cursor riêng sinh ra từ
+        kết nối gốc, được tái sử dụng cho mọi truy vấn trong thread đó.
     """
 
+    # Ký tự ngăn cách của list_param() (chr(31) trong SQL)
+    LIST_SEP = "\x1f"
+
+    _connection = None
+    _lock = threading.RLock()
+    _local = threading.local()
+    _cursors = []
+
     @staticmethod
     def get_db_path() -> str:
         """
@@ -26,7 +38,9 @@ class Database:
     def connect(read_only=False):
         """
         Mô tả:
-            Tạo và trả về kết nối DuckDB.
+            Tạo và trả về một kết nối DuckDB ĐỘC LẬP (mở file mới).
+            Chỉ dùng cho công cụ chạy riêng lẻ; trong ứng dụng hãy dùng
+            Database.cursor() / Database.get_cursor() / Database.transaction().
         Args:
             read_only: Nếu True, mở ở chế độ chỉ đọc (cho phép nhiều kết nối đồng thời)
         """
@@ -38,3 +52,154 @@ class Database:
             os.makedirs(parent_dir, exist_ok=True)
 
         return duckdb.connect(db_path, read_only=read_only)
+
+    @staticmethod
+    def get_connection():
+        """
+        Mô tả:
+            Trả về kết nối gốc đọc-ghi của tiến trình, mở lần đầu nếu chưa có.
+        Returns:
+            duckdb.DuckDBPyConnection: Kết nối gốc
+        """
+        with Database._lock:
+            if Database._connection is None:
+                Database._connection = Database.connect(read_only=False)
+            return Database._connection
+
+    @staticmethod
+    def cursor():
+        """
+        Mô tả:
+            Trả về cursor của thread hiện tại (tạo mới nếu thread chưa có).
+            Cursor dùng chung database với kết nối gốc nên không tốn chi phí mở file.
+        Returns:
+            duckdb.DuckDBPyConnection: Cursor riêng cho thread hiện tại
+        """
+        local = Database._local
+        cur = getattr(local, "cursor", None)
+        if cur is not None and getattr(local, "generation", None) is Database._connection:
+            return cur
+
+        with Database._lock:
+            conn = Database.get_connection()
+            cur = conn.cursor()
+            Database._cursors.append(cur)
+            local.cursor = cur
+            local.generation = conn
+            local.tx_depth = 0
+            return cur
+
+    @staticmethod
+    def release_cursor():
+        """
+        Mô tả:
+            Đóng cursor của thread hiện tại (gọi khi thread nền sắp kết thúc,
+            tránh giữ cursor của các thread đã chết).
+        Returns:
+            None
+        """
+        local = Database._local
+        cur = getattr(local, "cursor", None)
+        if cur is None:
+            return
+        with Database._lock:
+            if cur in Database._cursors:
+                Database._cursors.remove(cur)
+            try:
+                cur.close()
+            except Exception:
+                pass
+            local.cursor = None
+            local.generation = None
+
+    @staticmethod
+    @contextmanager
+    def get_cursor():
+        """
+        Mô tả:
+            Context manager trả về cursor của thread hiện tại.
+            Không đóng cursor khi thoát để các truy vấn sau tái sử dụng.
+        Returns:
+            duckdb.DuckDBPyConnection: Cursor riêng cho thread hiện tại
+        """
+        yield Database.cursor()
+
+    @staticmethod
+    @contextmanager
+    def transaction():
+        """
+        Mô tả:
+            Context manager chạy một khối lệnh trong MỘT transaction trên cursor của thread.
+            Commit khi khối lệnh kết thúc bình thường, rollback khi có exception.
+            Gọi lồng nhau trong cùng thread sẽ dùng chung transaction ngoài cùng.
+        Returns:
+            duckdb.DuckDBPyConnection: Cursor đang mở transaction
+        """
+        cur = Database.cursor()
+        local = Database._local
+        if local.tx_depth > 0:
+            local.tx_depth += 1
+            try:
+                yield cur
+            finally:
+                local.tx_depth -= 1
+            return
+
+        cur.begin()
+        local.tx_depth = 1
+        try:
+            yield cur
+            cur.commit()
+        except Exception:
+            cur.rollback()
+            raise
+        finally:
+            local.tx_depth = 0
+
+    @staticmethod
+    def list_param(values):
+        """
+        Mô tả:
+            Ghép danh sách giá trị thành MỘT tham số chuỗi (ngăn cách bởi chr(31)) để
+            tách lại trong SQL: unnest(string_split($p, chr(31))). Bind list Python lớn
+            vào DuckDB chậm (chuyển từng phần tử, hàng giây cho vài chục nghìn giá trị)
+            còn một chuỗi thì gần như tức thì. None được ghi thành chuỗi rỗng.
+        Args:
+            values: Danh sách giá trị (không chứa chr(31))
+        Returns:
+            str: Chuỗi tham số
+        """
+        return Database.LIST_SEP.join("" if v is None else str(v) for v in values)
+
+    @staticmethod
+    def checkpoint():
+        """
+        Mô tả:
+            Ghi toàn bộ WAL vào file database (dùng trước khi sao lưu file).
+        Returns:
+            None
+        """
+        Database.cursor().execute("CHECKPOINT")
+
+    @staticmethod
+    def close():
+        """
+        Mô tả:
+            Đóng toàn bộ cursor và kết nối gốc (khi thoát ứng dụng hoặc trước khi
+            ghi đè file database lúc khôi phục). Lần gọi cursor() tiếp theo sẽ mở lại.
+        Returns:
+            None
+        """
+        with Database._lock:
+            for cur in Database._cursors:
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+            Database._cursors = []
+            if Database._connection is not None:
+                try:
+                    Database._connection.close()
+                except Exception:
+                    pass
+            Database._connection = None
@@ -0,0 +1,219 @@
+# Quản lý phiên kết nối pyzk tới máy chấm công (dùng lại kết nối, không phụ thuộc Qt)
+# Tất cả comment, docstring đều bằng tiếng Việt
+
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            from datetime import datetime
+
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+# Phiên không dùng quá thời gian này (giây) sẽ bị đóng
+IDLE_TIMEOUT = 120
+
+# Chu kỳ (giây) thread nền gửi lệnh giữ kết nối cho các phiên đang rảnh
+KEEPALIVE_INTERVAL = 20
+
+# Phiên rảnh lâu hơn mức này được kiểm tra (ping) trước khi cho mượn
+PING_AFTER = 5
+
+# Thời gian chờ tối đa (giây) khi máy đang được thao tác khác dùng
+LOCK_TIMEOUT = 120
+
+
+class DeviceBusyError(TimeoutError):
+    """Máy đang được thao tác khác giữ quá thời gian chờ"""
+
+
+class _Session:
+    """Một phiên đã xác thực tới một máy"""
+
+    def __init__(self, key):
+        self.key = key
+        self.lock = threading.RLock()
+        self.conn = None
+        self.address = None  # (ip, port, password) đã dùng để mở kết nối
+        self.last_used = 0.0
+        self.depth = 0  # số lần mượn lồng nhau trên cùng thread
+
+    def close(self):
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            try:
+                conn.disconnect()
+            except Exception:
+                pass
+
+
+class DeviceSessionManager:
+    """
+    Mô tả:
+        Giữ kết nối pyzk tới từng máy (theo device_id) để các thao tác liên tiếp (test
+        kết nối, tải chấm công, tải nhân viên lên...) không phải bắt tay lại mỗi lần.
+        - Mỗi máy một khóa: các thao tác trên cùng một máy chạy tuần tự.
+        - Thread nền gửi lệnh giữ kết nối cho phiên rảnh và đóng phiên rảnh quá IDLE_TIMEOUT.
+        - Lỗi xảy ra trong lúc mượn phiên -> phiên bị đóng, lần mượn sau kết nối lại.
+        Dùng: with DeviceSessionManager.session(device) as conn: ...
+    """
+
+    _lock = threading.Lock()
+    _sessions = {}
+    _keeper = None
+    _stop = threading.Event()
+
+    @staticmethod
+    @contextmanager
+    def session(device, timeout=10, lock_timeout=LOCK_TIMEOUT):
+        """
+        Mô tả:
+            Mượn phiên kết nối tới máy (mở mới nếu chưa có / đã đóng / đổi địa chỉ).
+        Args:
+            device: Dict thiết bị (id, ip_address, port, password); id None -> khóa theo ip:port
+            timeout: Timeout socket (giây) khi phải mở kết nối mới
+            lock_timeout: Thời gian chờ tối đa (giây) khi máy đang được thao tác khác dùng
+        Yields:
+            Kết nối pyzk đã connect (không tự disconnect khi trả)
+        Raises:
+            ImportError: Chưa cài pyzk
+            DeviceBusyError: Máy đang bận quá lock_timeout giây (lớp con của TimeoutError)
+            Exception: Lỗi kết nối / lỗi của thao tác
+        """
+        address = (device["ip_address"], device.get("port") or 4370, device.get("password") or "")
+        key = device.get("id")
+        if key is None:
+            key = f"{address[0]}:{address[1]}"
+
+        with DeviceSessionManager._lock:
+            sess = DeviceSessionManager._sessions.get(key)
+            if sess is None:
+                sess = DeviceSessionManager._sessions[key] = _Session(key)
+
+        if not sess.lock.acquire(timeout=lock_timeout):
+            raise DeviceBusyError("Máy chấm công đang được thao tác khác sử dụng")
+        try:
+            if sess.depth == 0:
+                DeviceSessionManager._ensure_connected(sess, address, timeout)
+            sess.depth += 1
+            try:
+                yield sess.conn
+            except BaseException:
+                # Không chắc trạng thái phiên sau lỗi (có thể đứt giữa chừng) -> đóng
+                if sess.depth == 1:
+                    sess.close()
+                raise
+            finally:
+                sess.depth -= 1
+                sess.last_used = time.monotonic()
+        finally:
+            sess.lock.release()
+        DeviceSessionManager._start_keeper()
+
+    @staticmethod
+    def _ensure_connected(sess, address, timeout):
+        """Đảm bảo phiên có kết nối còn sống tới đúng địa chỉ (gọi khi đã giữ khóa phiên)"""
+        if sess.conn is not None and sess.address != address:
+            log_to_debug(f"DeviceSessionManager: {sess.key} address changed, reconnecting")
+            sess.close()
+        if sess.conn is not None and not getattr(sess.conn, "is_connect", True):
+            sess.close()
+        if sess.conn is not None and time.monotonic() - sess.last_used > PING_AFTER:
+            if not DeviceSessionManager._ping(sess):
+                sess.close()
+        if sess.conn is None:
+            from zk import ZK
+
+            ip, port, password = address
+            sess.conn = ZK(ip, port=port, timeout=timeout, password=password if password else 0).connect()
+            sess.address = address
+            log_to_debug(f"DeviceSessionManager: opened session {sess.key} ({ip}:{port})")
+
+    @staticmethod
+    def _ping(sess):
+        """Gửi lệnh nhẹ (đọc giờ máy) để giữ / kiểm tra kết nối"""
+        try:
+            sess.conn.get_time()
+            return True
+        except Exception as e:
+            log_to_debug(f"DeviceSessionManager: session {sess.key} lost: {e}")
+            return False
+
+    @staticmethod
+    def close(device_id):
+        """Đóng phiên của một máy (chờ thao tác đang chạy trên máy đó xong)"""
+        with DeviceSessionManager._lock:
+            sess = DeviceSessionManager._sessions.pop(device_id, None)
+        if sess is not None:
+            with sess.lock:
+                sess.close()
+
+    @staticmethod
+    def close_all():
+        """Đóng mọi phiên và dừng thread giữ kết nối (gọi khi thoát ứng dụng)"""
+        DeviceSessionManager._stop.set()
+        with DeviceSessionManager._lock:
+            sessions = list(DeviceSessionManager._sessions.values())
+            DeviceSessionManager._sessions = {}
+        for sess in sessions:
+            if sess.lock.acquire(timeout=5):
+                try:
+                    sess.close()
+                finally:
+                    sess.lock.release()
+        log_to_debug(f"DeviceSessionManager: closed {len(sessions)} sessions")
+
+    @staticmethod
+    def _start_keeper():
+        """Khởi động thread giữ kết nối nếu chưa chạy"""
+        with DeviceSessionManager._lock:
+            keeper = DeviceSessionManager._keeper
+            if keeper is not None and keeper.is_alive():
+                return
+            DeviceSessionManager._stop.clear()
+            DeviceSessionManager._keeper = threading.Thread(
+                target=DeviceSessionManager._keep_alive, name="DeviceSessionKeeper", daemon=True
+            )
+            DeviceSessionManager._keeper.start()
+
+    @staticmethod
+    def _keep_alive():
+        """Thread nền: ping phiên rảnh, đóng phiên rảnh quá lâu; dừng khi không còn phiên"""
+        while not DeviceSessionManager._stop.wait(KEEPALIVE_INTERVAL):
+            try:
+                with DeviceSessionManager._lock:
+                    sessions = list(DeviceSessionManager._sessions.values())
+                alive = 0
+                for sess in sessions:
+                    # Phiên đang được dùng thì bỏ qua lượt này
+                    if not sess.lock.acquire(blocking=False):
+                        alive += 1
+                        continue
+                    try:
+                        if sess.conn is None:
+                            continue
+                        if time.monotonic() - sess.last_used > IDLE_TIMEOUT:
+                            log_to_debug(f"DeviceSessionManager: closing idle session {sess.key}")
+                            sess.close()
+                        elif DeviceSessionManager._ping(sess):
+                            alive += 1
+                        else:
+                            sess.close()
+                    finally:
+                        sess.lock.release()
+                if not alive:
+                    with DeviceSessionManager._lock:
+                        # Kiểm tra lại dưới khóa: có thể vừa có phiên mới được mở
+                        if not any(s.conn is not None for s in DeviceSessionManager._sessions.values()):
+                            DeviceSessionManager._keeper = None
+                            return
+            except Exception as e:
+                log_to_debug(f"DeviceSessionManager: keepalive error: {e}\n{traceback.format_exc()}")
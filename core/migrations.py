@@ -0,0 +1,673 @@
+# Quản lý phiên bản schema DuckDB (migration)
+# Tất cả comment, docstring đều bằng tiếng Việt
+
+import logging
+from core.database import Database
+
+
+# Migration 3: tính attendance_daily từ dữ liệu chấm công thô đã có.
+# Bản sao cố định của truy vấn ghép cặp + tổng hợp theo ngày tại thời điểm phát hành
+# migration (tham số thay bằng hằng số), KHÔNG import repository: code hiện hành có thể
+# đổi mà schema của migration thì không.
+_BACKFILL_ATTENDANCE_DAILY_SQL = """
+INSERT INTO attendance_daily (
+    user_id, work_date, user_name, shift_id, shift_code, shift_start, shift_end,
+    lunch_start, lunch_end, first_in, last_out, in_1, out_1, in_2, out_2, in_3, out_3,
+    punch_count, punch, uid, record_ids, is_weekend, is_holiday, worked_minutes,
+    late_minutes, early_minutes, overtime_minutes, work_day_count, status
+)
+WITH pairs AS (
+    WITH shift_src AS (
+        SELECT id AS shift_id, shift_code,
+               hour(start_time) * 60 + minute(start_time) AS start_min,
+               hour(end_time) * 60 + minute(end_time) AS end_min,
+               hour(lunch_start) * 60 + minute(lunch_start) AS lunch_start_min,
+               hour(lunch_end) * 60 + minute(lunch_end) AS lunch_end_min
+        FROM declare_work_shift
+        UNION ALL
+        SELECT NULL, NULL, 480, 1020, 720, 780
+        WHERE NOT EXISTS (SELECT 1 FROM declare_work_shift)
+    ),
+    shifts AS (
+        SELECT shift_id, shift_code, start_min,
+               CASE WHEN end_min > start_min THEN end_min - start_min
+                    ELSE end_min - start_min + 1440 END AS duration_min,
+               lunch_start_min IS NOT NULL AND lunch_end_min IS NOT NULL
+                   AND lunch_start_min <> lunch_end_min AS has_lunch,
+               (lunch_start_min - start_min + 1440) % 1440 AS lunch_start_off,
+               (lunch_start_min - start_min + 1440) % 1440
+                   + (lunch_end_min - lunch_start_min + 1440) % 1440 AS lunch_end_off
+        FROM shift_src
+    ),
+    raw AS (
+        SELECT id, user_id, user_name, timestamp AS ts, punch, uid,
+               CAST(timestamp AS DATE) AS punch_date,
+               CAST(epoch(timestamp) - epoch(CAST(timestamp AS DATE)) AS BIGINT) AS second_of_day,
+               COALESCE(
+                   epoch(timestamp) - epoch(LAG(timestamp) OVER (PARTITION BY user_id ORDER BY timestamp, id)),
+                   1e9
+               ) < 60 AS is_duplicate
+        FROM attendance_raw
+    ),
+    punch_day AS (
+        SELECT id, any_value(user_id) AS user_id,
+               arg_min(punch_date + k, {'dist': dist, 'k': abs(k), 'shift': shift_key}) AS work_date
+        FROM (
+            SELECT r.id, r.user_id, r.punch_date, off.k, COALESCE(s.shift_id, 0) AS shift_key,
+                   least(
+                       abs(r.second_of_day - (off.k * 86400 + s.start_min * 60)),
+                       abs(r.second_of_day - (off.k * 86400 + (s.start_min + s.duration_min) * 60))
+                   ) AS dist
+            FROM raw r
+            CROSS JOIN shifts s
+            CROSS JOIN (VALUES (-1), (0), (1)) AS off(k)
+        )
+        GROUP BY id
+    ),
+    day_shift AS (
+        SELECT user_id, work_date, arg_min(shift_id, {'cost': cost, 'shift': shift_key}) AS shift_id
+        FROM (
+            SELECT pd.user_id, pd.work_date, s.shift_id, COALESCE(s.shift_id, 0) AS shift_key,
+                   sum(least(
+                       abs(r.second_of_day - ((pd.work_date - r.punch_date) * 86400 + s.start_min * 60)),
+                       abs(r.second_of_day - ((pd.work_date - r.punch_date) * 86400 + (s.start_min + s.duration_min) * 60))
+                   )) AS cost
+            FROM raw r
+            JOIN punch_day pd ON pd.id = r.id
+            CROSS JOIN shifts s
+            GROUP BY ALL
+        )
+        GROUP BY user_id, work_date
+    ),
+    punch_shift AS MATERIALIZED (
+        SELECT pd.id, pd.work_date, COALESCE(ds.shift_id, 0) AS shift_key
+        FROM punch_day pd
+        JOIN day_shift ds ON ds.user_id = pd.user_id AND ds.work_date = pd.work_date
+    ),
+    placed AS (
+        SELECT r.id, r.user_id, r.user_name, r.ts, r.punch, r.uid, r.is_duplicate,
+               ps.work_date, s.shift_id, s.shift_code, s.has_lunch,
+               ps.work_date + to_minutes(s.start_min) AS shift_start,
+               ps.work_date + to_minutes(s.start_min + s.duration_min) AS shift_end,
+               ps.work_date + to_minutes(s.start_min + s.lunch_start_off) AS lunch_start,
+               ps.work_date + to_minutes(s.start_min + s.lunch_end_off) AS lunch_end
+        FROM raw r
+        JOIN punch_shift ps ON ps.id = r.id
+        JOIN shifts s ON COALESCE(s.shift_id, 0) = ps.shift_key
+    ),
+    segmented AS (
+        SELECT *,
+               CASE
+                   WHEN overtime_count >= 2 AND ts > shift_end + to_minutes(30) THEN 3
+                   WHEN has_lunch AND ts >= lunch_start + (lunch_end - lunch_start) / 2 THEN 2
+                   ELSE 1
+               END AS segment
+        FROM (
+            SELECT *,
+                   count(*) FILTER (WHERE ts > shift_end + to_minutes(30))
+                       OVER (PARTITION BY user_id, work_date) AS overtime_count
+            FROM placed
+            WHERE NOT is_duplicate
+        )
+    ),
+    segments AS (
+        SELECT user_id, work_date, segment, n, first_ts, last_ts,
+               CASE WHEN n >= 2
+                      OR abs(epoch(first_ts) - epoch(seg_start)) <= abs(epoch(first_ts) - epoch(seg_end))
+                    THEN first_ts END AS in_ts,
+               CASE WHEN n >= 2 THEN last_ts
+                    WHEN abs(epoch(first_ts) - epoch(seg_start)) > abs(epoch(first_ts) - epoch(seg_end))
+                    THEN first_ts END AS out_ts
+        FROM (
+            SELECT user_id, work_date, segment,
+                   count(*) AS n, min(ts) AS first_ts, max(ts) AS last_ts,
+                   any_value(CASE segment WHEN 2 THEN lunch_end ELSE shift_start END) AS seg_start,
+                   any_value(CASE WHEN segment = 1 AND has_lunch THEN lunch_start ELSE shift_end END) AS seg_end
+            FROM segmented
+            GROUP BY user_id, work_date, segment
+        )
+    ),
+    days AS (
+        SELECT user_id, work_date,
+               any_value(shift_id) AS shift_id, any_value(shift_code) AS shift_code,
+               any_value(shift_start) AS shift_start, any_value(shift_end) AS shift_end,
+               any_value(CASE WHEN has_lunch THEN lunch_start END) AS lunch_start,
+               any_value(CASE WHEN has_lunch THEN lunch_end END) AS lunch_end,
+               max(user_name) AS user_name,
+               arg_max(punch, ts) AS punch, arg_max(uid, ts) AS uid,
+               count(*) FILTER (WHERE NOT is_duplicate) AS punch_count,
+               list(id) AS record_ids
+        FROM placed
+        GROUP BY user_id, work_date
+    )
+    SELECT d.user_id, d.user_name, d.work_date, d.shift_id, d.shift_code,
+           d.shift_start, d.shift_end, d.lunch_start, d.lunch_end,
+           max(sg.in_ts) FILTER (WHERE sg.segment = 1) AS in_1,
+           max(sg.out_ts) FILTER (WHERE sg.segment = 1) AS out_1,
+           max(sg.in_ts) FILTER (WHERE sg.segment = 2) AS in_2,
+           max(sg.out_ts) FILTER (WHERE sg.segment = 2) AS out_2,
+           max(sg.in_ts) FILTER (WHERE sg.segment = 3) AS in_3,
+           max(sg.out_ts) FILTER (WHERE sg.segment = 3) AS out_3,
+           d.punch, d.uid, d.punch_count, d.record_ids
+    FROM days d
+    LEFT JOIN segments sg ON sg.user_id = d.user_id AND sg.work_date = d.work_date
+    GROUP BY ALL
+),
+metrics AS (
+    SELECT p.*,
+           COALESCE(
+               [w.monday, w.tuesday, w.wednesday, w.thursday, w.friday, w.saturday, w.sunday][isodow(p.work_date)],
+               FALSE
+           ) AS is_weekend,
+           EXISTS (SELECT 1 FROM holiday h WHERE h.holiday_date = p.work_date) AS is_holiday,
+           COALESCE(p.in_1, p.in_2) AS first_in,
+           COALESCE(p.out_2, p.out_1) AS last_out,
+           (
+               (CASE WHEN p.in_1 IS NULL OR p.out_1 IS NULL THEN 0 ELSE
+        greatest(0, epoch(least(p.out_1, p.shift_end)) - epoch(greatest(p.in_1, p.shift_start)))
+        - CASE WHEN p.lunch_start IS NULL THEN 0 ELSE
+            greatest(0, epoch(least(p.out_1, p.lunch_end)) - epoch(greatest(p.in_1, p.lunch_start)))
+          END
+    END) + (CASE WHEN p.in_2 IS NULL OR p.out_2 IS NULL THEN 0 ELSE
+        greatest(0, epoch(least(p.out_2, p.shift_end)) - epoch(greatest(p.in_2, p.shift_start)))
+        - CASE WHEN p.lunch_start IS NULL THEN 0 ELSE
+            greatest(0, epoch(least(p.out_2, p.lunch_end)) - epoch(greatest(p.in_2, p.lunch_start)))
+          END
+    END)
+               + CASE WHEN p.out_1 IS NULL AND p.in_2 IS NULL THEN (CASE WHEN p.in_1 IS NULL OR p.out_2 IS NULL THEN 0 ELSE
+        greatest(0, epoch(least(p.out_2, p.shift_end)) - epoch(greatest(p.in_1, p.shift_start)))
+        - CASE WHEN p.lunch_start IS NULL THEN 0 ELSE
+            greatest(0, epoch(least(p.out_2, p.lunch_end)) - epoch(greatest(p.in_1, p.lunch_start)))
+          END
+    END) ELSE 0 END
+           ) / 60 AS regular_minutes,
+           (
+               CASE WHEN p.in_3 IS NOT NULL AND p.out_3 IS NOT NULL
+                    THEN epoch(p.out_3) - epoch(p.in_3) ELSE 0 END
+               + CASE WHEN COALESCE(p.out_2, p.out_1) > p.shift_end + to_minutes(30)
+                      THEN epoch(COALESCE(p.out_2, p.out_1)) - epoch(p.shift_end) ELSE 0 END
+           ) / 60 AS extra_minutes,
+           greatest(0, epoch(COALESCE(p.in_1, p.in_2)) - epoch(p.shift_start)) / 60 AS late_raw,
+           greatest(0, epoch(p.shift_end) - epoch(COALESCE(p.out_2, p.out_1))) / 60 AS early_raw,
+           COALESCE(
+               NULLIF(ws.total_minutes, 0),
+               (epoch(p.shift_end) - epoch(p.shift_start)
+                - COALESCE(epoch(p.lunch_end) - epoch(p.lunch_start), 0)) / 60
+           ) AS nominal_minutes,
+           COALESCE(NULLIF(ws.work_day_count, 0), 1) AS shift_work_days
+    FROM pairs p
+    LEFT JOIN weekend w ON w.id = 1
+    LEFT JOIN declare_work_shift ws ON ws.id = p.shift_id
+),
+statuses AS (
+    SELECT *,
+           NOT is_weekend AND NOT is_holiday AS is_scheduled,
+           CASE
+               WHEN first_in IS NULL THEN 'missing_checkin'
+               WHEN last_out IS NULL THEN 'missing_checkout'
+               WHEN is_weekend OR is_holiday THEN 'overtime'
+               WHEN late_raw > 0 THEN 'late'
+               WHEN early_raw > 0 THEN 'early_leave'
+               WHEN extra_minutes > 0 THEN 'overtime'
+               WHEN CAST(shift_end AS DATE) > work_date THEN 'on_time_overnight'
+               ELSE 'on_time'
+           END AS status
+    FROM metrics
+)
+SELECT user_id, work_date, user_name, shift_id, shift_code,
+       shift_start, shift_end, lunch_start, lunch_end, first_in, last_out,
+       in_1, out_1, in_2, out_2, in_3, out_3, punch_count, punch, uid, record_ids,
+       is_weekend, is_holiday,
+       CAST(CASE WHEN is_scheduled THEN regular_minutes ELSE 0 END AS INTEGER) AS worked_minutes,
+       CAST(CASE WHEN is_scheduled THEN late_raw ELSE 0 END AS INTEGER) AS late_minutes,
+       CAST(CASE WHEN is_scheduled THEN early_raw ELSE 0 END AS INTEGER) AS early_minutes,
+       CAST(CASE WHEN is_scheduled THEN extra_minutes ELSE regular_minutes + extra_minutes END AS INTEGER)
+           AS overtime_minutes,
+       CASE WHEN is_scheduled AND status NOT IN ('missing_checkin', 'missing_checkout')
+            THEN round(shift_work_days * least(1, regular_minutes / nullif(nominal_minutes, 0)), 2)
+            ELSE 0 END AS work_day_count,
+       status
+FROM statuses s
+
+"""
+
+
+# Danh sách migration theo thứ tự: (version, mô tả, [câu lệnh SQL hoặc hàm nhận cursor])
+# Chỉ được THÊM migration mới ở cuối, không sửa migration đã phát hành.
+MIGRATIONS = [
+    (
+        1,
+        "Schema khởi tạo: danh mục, nhân viên, thiết bị, chấm công",
+        [
+            # --- Sequence ---
+            "CREATE SEQUENCE IF NOT EXISTS seq_job_title START 1",
+            "CREATE SEQUENCE IF NOT EXISTS seq_department START 1",
+            "CREATE SEQUENCE IF NOT EXISTS seq_employee START 1",
+            "CREATE SEQUENCE IF NOT EXISTS seq_holiday START 1",
+            "CREATE SEQUENCE IF NOT EXISTS seq_absence_symbol START 1",
+            "CREATE SEQUENCE IF NOT EXISTS seq_declare_work_shift START 1",
+            "CREATE SEQUENCE IF NOT EXISTS seq_device START 1",
+            "CREATE SEQUENCE IF NOT EXISTS seq_attendance_raw START 1",
+            "CREATE SEQUENCE IF NOT EXISTS seq_shift_upload START 1",
+            # --- Công ty ---
+            """
+            CREATE TABLE IF NOT EXISTS company (
+                id INTEGER PRIMARY KEY,
+                name VARCHAR NOT NULL,
+                phone VARCHAR,
+                address VARCHAR,
+                icon_path VARCHAR
+            )
+            """,
+            # --- Chức danh ---
+            """
+            CREATE TABLE IF NOT EXISTS job_title (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_job_title'),
+                name VARCHAR UNIQUE NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            # --- Phòng ban ---
+            """
+            CREATE TABLE IF NOT EXISTS department (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_department'),
+                name VARCHAR UNIQUE NOT NULL,
+                parent_id INTEGER NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            # --- Nhân viên ---
+            """
+            CREATE TABLE IF NOT EXISTS employee (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_employee'),
+                employee_code VARCHAR UNIQUE,
+                name VARCHAR NOT NULL,
+                department_id INTEGER,
+                job_title_id INTEGER,
+                gender VARCHAR,
+                hire_date DATE,
+                attendance_code VARCHAR,
+                attendance_name VARCHAR,
+                date_of_birth DATE,
+                birthplace VARCHAR,
+                hometown VARCHAR,
+                id_number VARCHAR,
+                id_place_issued VARCHAR,
+                ethnicity VARCHAR,
+                nationality VARCHAR,
+                current_address VARCHAR,
+                phone_number VARCHAR,
+                emergency_contact VARCHAR,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (department_id) REFERENCES department(id),
+                FOREIGN KEY (job_title_id) REFERENCES job_title(id)
+            )
+            """,
+            # --- Ngày lễ ---
+            """
+            CREATE TABLE IF NOT EXISTS holiday (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_holiday'),
+                holiday_date DATE NOT NULL,
+                name VARCHAR NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            # --- Ký hiệu chấm công ---
+            """
+            CREATE TABLE IF NOT EXISTS attendance_symbol (
+                id INTEGER PRIMARY KEY DEFAULT 1,
+                late_symbol VARCHAR DEFAULT 'Tr',
+                early_leave_symbol VARCHAR DEFAULT 'Sm',
+                on_time_symbol VARCHAR DEFAULT 'X',
+                overtime_symbol VARCHAR DEFAULT '+',
+                missing_checkout_symbol VARCHAR DEFAULT 'KR',
+                missing_checkin_symbol VARCHAR DEFAULT 'KV',
+                absent_symbol VARCHAR DEFAULT 'V',
+                on_time_overnight_symbol VARCHAR DEFAULT 'D',
+                no_schedule_symbol VARCHAR DEFAULT 'Off',
+                show_late BOOLEAN DEFAULT TRUE,
+                show_early_leave BOOLEAN DEFAULT TRUE,
+                show_on_time BOOLEAN DEFAULT TRUE,
+                show_overtime BOOLEAN DEFAULT TRUE,
+                show_missing_checkout BOOLEAN DEFAULT TRUE,
+                show_missing_checkin BOOLEAN DEFAULT TRUE,
+                show_absent BOOLEAN DEFAULT TRUE,
+                show_on_time_overnight BOOLEAN DEFAULT TRUE,
+                show_no_schedule BOOLEAN DEFAULT TRUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            INSERT INTO attendance_symbol (
+                id, late_symbol, early_leave_symbol, on_time_symbol,
+                overtime_symbol, missing_checkout_symbol, missing_checkin_symbol,
+                absent_symbol, on_time_overnight_symbol, no_schedule_symbol,
+                show_late, show_early_leave, show_on_time, show_overtime,
+                show_missing_checkout, show_missing_checkin, show_absent,
+                show_on_time_overnight, show_no_schedule
+            )
+            SELECT 1, 'Tr', 'Sm', 'X', '+', 'KR', 'KV', 'V', 'D', 'Off',
+                   TRUE, TRUE, TRUE, TRUE, TRUE, TRUE, TRUE, TRUE, TRUE
+            WHERE NOT EXISTS (SELECT 1 FROM attendance_symbol)
+            """,
+            # --- Ngày cuối tuần ---
+            """
+            CREATE TABLE IF NOT EXISTS weekend (
+                id INTEGER PRIMARY KEY DEFAULT 1,
+                monday BOOLEAN DEFAULT FALSE,
+                tuesday BOOLEAN DEFAULT FALSE,
+                wednesday BOOLEAN DEFAULT FALSE,
+                thursday BOOLEAN DEFAULT FALSE,
+                friday BOOLEAN DEFAULT FALSE,
+                saturday BOOLEAN DEFAULT TRUE,
+                sunday BOOLEAN DEFAULT TRUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            INSERT INTO weekend (
+                id, monday, tuesday, wednesday, thursday, friday, saturday, sunday
+            )
+            SELECT 1, FALSE, FALSE, FALSE, FALSE, FALSE, TRUE, TRUE
+            WHERE NOT EXISTS (SELECT 1 FROM weekend)
+            """,
+            # --- Ký hiệu loại vắng ---
+            """
+            CREATE TABLE IF NOT EXISTS absence_symbol (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_absence_symbol'),
+                code VARCHAR(10) UNIQUE NOT NULL,
+                description VARCHAR(100) NOT NULL,
+                symbol VARCHAR(10) NOT NULL,
+                is_used BOOLEAN DEFAULT TRUE,
+                is_paid BOOLEAN DEFAULT FALSE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            INSERT INTO absence_symbol (code, description, symbol, is_used, is_paid)
+            SELECT * FROM (VALUES
+                ('A01', 'Nghỉ ốm', 'OM', TRUE, FALSE),
+                ('A02', 'Nghỉ Thai Sản', 'TS', TRUE, FALSE),
+                ('A03', 'Việc riêng có lương', 'R', TRUE, TRUE),
+                ('A04', 'Việc riêng không lương', 'Ro', TRUE, FALSE),
+                ('A05', 'Nghỉ phép', 'P', TRUE, FALSE),
+                ('A06', 'Nghỉ phép năm', 'F', TRUE, FALSE),
+                ('A07', 'Còn ốm', 'CO', TRUE, FALSE),
+                ('A08', 'Cấp điền', 'CD', TRUE, FALSE),
+                ('A09', 'Nghỉ hội họp, học tập', 'H', TRUE, FALSE),
+                ('A10', 'Nghỉ công tác', 'CT', TRUE, FALSE),
+                ('A11', 'Nghỉ lễ', 'Le', TRUE, FALSE)
+            )
+            WHERE NOT EXISTS (SELECT 1 FROM absence_symbol)
+            """,
+            # --- Khai báo ca làm việc ---
+            """
+            CREATE TABLE IF NOT EXISTS declare_work_shift (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_declare_work_shift'),
+                shift_code VARCHAR NOT NULL,
+                start_time TIME NOT NULL,
+                end_time TIME NOT NULL,
+                lunch_start TIME,
+                lunch_end TIME,
+                total_minutes INTEGER DEFAULT 0,
+                work_day_count DECIMAL(10, 2) DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            # --- Thiết bị chấm công ---
+            """
+            CREATE TABLE IF NOT EXISTS device (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_device'),
+                device_number VARCHAR UNIQUE NOT NULL,
+                device_name VARCHAR NOT NULL,
+                ip_address VARCHAR NOT NULL,
+                password VARCHAR,
+                port INTEGER DEFAULT 4370,
+                status VARCHAR DEFAULT 'Chưa kết nối',
+                note VARCHAR,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            # --- Dữ liệu chấm công thô ---
+            """
+            CREATE TABLE IF NOT EXISTS attendance_raw (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_attendance_raw'),
+                user_id VARCHAR NOT NULL,
+                user_name VARCHAR,
+                timestamp TIMESTAMP NOT NULL,
+                status INTEGER,
+                punch INTEGER,
+                uid BIGINT,
+                device_sn VARCHAR,
+                device_id INTEGER,
+                note VARCHAR,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_id, timestamp, device_sn)
+            )
+            """,
+            # --- Nhân viên đã tải lên máy chấm công ---
+            """
+            CREATE TABLE IF NOT EXISTS shift_upload (
+                id INTEGER PRIMARY KEY DEFAULT nextval('seq_shift_upload'),
+                employee_id INTEGER NOT NULL,
+                device_id INTEGER NOT NULL,
+                user_id VARCHAR NOT NULL,
+                attendance_code VARCHAR,
+                attendance_name VARCHAR,
+                card_number VARCHAR,
+                password VARCHAR,
+                privilege INTEGER DEFAULT 0,
+                enabled BOOLEAN DEFAULT TRUE,
+                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(employee_id, device_id),
+                FOREIGN KEY (employee_id) REFERENCES employee(id),
+                FOREIGN KEY (device_id) REFERENCES device(id)
+            )
+            """,
+        ],
+    ),
+    (
+        2,
+        "Trạng thái đồng bộ chấm công theo thiết bị",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS device_sync_state (
+                device_id INTEGER PRIMARY KEY,
+                device_sn VARCHAR,
+                last_timestamp TIMESTAMP,
+                record_count INTEGER,
+                synced_from DATE,
+                last_sync_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    ),
+    (
+        3,
+        "Bảng tổng hợp chấm công theo ngày",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS attendance_daily (
+                user_id VARCHAR NOT NULL,
+                work_date DATE NOT NULL,
+                user_name VARCHAR,
+                shift_id INTEGER,
+                shift_code VARCHAR,
+                shift_start TIMESTAMP,
+                shift_end TIMESTAMP,
+                lunch_start TIMESTAMP,
+                lunch_end TIMESTAMP,
+                first_in TIMESTAMP,
+                last_out TIMESTAMP,
+                in_1 TIMESTAMP,
+                out_1 TIMESTAMP,
+                in_2 TIMESTAMP,
+                out_2 TIMESTAMP,
+                in_3 TIMESTAMP,
+                out_3 TIMESTAMP,
+                punch_count INTEGER,
+                punch INTEGER,
+                uid BIGINT,
+                record_ids INTEGER[],
+                is_weekend BOOLEAN,
+                is_holiday BOOLEAN,
+                worked_minutes INTEGER,
+                late_minutes INTEGER,
+                early_minutes INTEGER,
+                overtime_minutes INTEGER,
+                work_day_count DECIMAL(10, 2),
+                status VARCHAR,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, work_date)
+            )
+            """,
+            _BACKFILL_ATTENDANCE_DAILY_SQL,
+        ],
+    ),
+    (
+        4,
+        "Bảng bao đóng cây phòng ban",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS department_closure (
+                ancestor_id INTEGER NOT NULL,
+                descendant_id INTEGER NOT NULL,
+                depth INTEGER NOT NULL,
+                PRIMARY KEY (ancestor_id, descendant_id)
+            )
+            """,
+            # Mỗi phòng ban là tổ tiên của chính nó (depth 0) và của mọi phòng ban con cháu
+            """
+            INSERT INTO department_closure (ancestor_id, descendant_id, depth)
+            WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS (
+                SELECT id, id, 0 FROM department
+                UNION ALL
+                SELECT t.ancestor_id, d.id, t.depth + 1
+                FROM tree t
+                JOIN department d ON d.parent_id = t.descendant_id
+                WHERE t.depth < 64
+            )
+            SELECT ancestor_id, descendant_id, min(depth)
+            FROM tree
+            GROUP BY ancestor_id, descendant_id
+            """,
+        ],
+    ),
+    (
+        5,
+        "Kho sao lưu user và vân tay của máy chấm công",
+        [
+            # User trên máy (theo máy nguồn + mã chấm công), đủ thông tin để tạo lại trên
+            # máy thay thế. Hai máy có thể dùng cùng mã cho hai người khác nhau nên khóa
+            # gồm cả device_id.
+            """
+            CREATE TABLE IF NOT EXISTS fingerprint_user (
+                device_id INTEGER NOT NULL,
+                user_id VARCHAR NOT NULL,
+                employee_id INTEGER,
+                name VARCHAR,
+                privilege INTEGER DEFAULT 0,
+                password VARCHAR,
+                group_id VARCHAR,
+                card BIGINT DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (device_id, user_id)
+            )
+            """,
+            # Template vân tay nén zlib; chỉ giữ bản mới nhất của mỗi (device_id, user_id, finger)
+            """
+            CREATE TABLE IF NOT EXISTS fingerprint_template (
+                device_id INTEGER NOT NULL,
+                user_id VARCHAR NOT NULL,
+                finger INTEGER NOT NULL,
+                template_hash VARCHAR NOT NULL,
+                employee_id INTEGER,
+                valid INTEGER DEFAULT 1,
+                size INTEGER,
+                template BLOB NOT NULL,
+                backed_up_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (device_id, user_id, finger, template_hash)
+            )
+            """,
+        ],
+    ),
+]
+
+
+def latest_version() -> int:
+    """
+    Mô tả:
+        Trả về phiên bản schema mới nhất mà code hiện tại yêu cầu.
+    Returns:
+        int: Số phiên bản lớn nhất trong MIGRATIONS
+    """
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version() -> int:
+    """
+    Mô tả:
+        Đọc phiên bản schema đang có trong database (0 nếu chưa có bảng schema_version).
+        Chỉ đọc catalog, không chạy DDL.
+    Returns:
+        int: Phiên bản schema hiện tại
+    """
+    with Database.get_cursor() as con:
+        exists = con.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'schema_version'"
+        ).fetchone()[0]
+        if not exists:
+            return 0
+        row = con.execute("SELECT MAX(version) FROM schema_version").fetchone()
+        return row[0] if row and row[0] is not None else 0
+
+
+def run_migrations() -> int:
+    """
+    Mô tả:
+        Áp dụng các migration còn thiếu theo thứ tự, tất cả trong MỘT transaction.
+        Nếu schema đã ở phiên bản mới nhất thì bỏ qua hoàn toàn, không chạy DDL nào.
+        Gọi một lần khi khởi động ứng dụng (hoặc tiến trình nền).
+    Returns:
+        int: Phiên bản schema sau khi chạy
+    """
+    version = current_version()
+    target = latest_version()
+    if version >= target:
+        logging.debug(f"Schema đã ở phiên bản {version}, bỏ qua migration")
+        return version
+
+    pending = [m for m in MIGRATIONS if m[0] > version]
+    with Database.transaction() as con:
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description VARCHAR,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        for number, description, statements in pending:
+            logging.info(f"Áp dụng migration {number}: {description}")
+            for sql in statements:
+                if callable(sql):
+                    sql(con)
+                else:
+                    con.execute(sql)
+            con.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                [number, description],
+            )
+
+    logging.info(f"Schema đã nâng từ phiên bản {version} lên {target}")
+    return target
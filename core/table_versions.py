@@ -0,0 +1,59 @@
+# Bộ đếm phiên bản dữ liệu theo bảng (trong tiến trình)
+# Tất cả comment, docstring đều bằng tiếng Việt
+
+import threading
+
+
+class TableVersions:
+    """
+    Mô tả:
+        Mỗi bảng có một số phiên bản tăng dần, repository tăng số này sau mỗi lần ghi
+        thành công. Màn hình đã dựng chỉ cần so ảnh chụp phiên bản các bảng nó hiển thị
+        để biết có phải nạp lại hay không, không cần truy vấn database.
+        An toàn khi gọi từ nhiều thread (job nạp / đồng bộ chạy nền cũng ghi dữ liệu).
+    """
+
+    _lock = threading.Lock()
+    _versions = {}
+    # Tăng khi toàn bộ database bị thay thế (khôi phục bản sao lưu)
+    _epoch = 0
+
+    @staticmethod
+    def bump(*tables):
+        """
+        Mô tả:
+            Đánh dấu các bảng vừa thay đổi dữ liệu.
+        Args:
+            *tables: Tên các bảng đã ghi
+        Returns:
+            None
+        """
+        with TableVersions._lock:
+            for table in tables:
+                TableVersions._versions[table] = TableVersions._versions.get(table, 0) + 1
+
+    @staticmethod
+    def bump_all():
+        """
+        Mô tả:
+            Đánh dấu mọi bảng đã thay đổi (file database được thay thế).
+        Returns:
+            None
+        """
+        with TableVersions._lock:
+            TableVersions._epoch += 1
+
+    @staticmethod
+    def snapshot(tables):
+        """
+        Mô tả:
+            Chụp phiên bản hiện tại của một nhóm bảng để so sánh về sau.
+        Args:
+            tables: Danh sách tên bảng
+        Returns:
+            tuple: Ảnh chụp phiên bản, khác nhau khi có bảng bất kỳ đã thay đổi
+        """
+        with TableVersions._lock:
+            return (TableVersions._epoch,) + tuple(
+                TableVersions._versions.get(table, 0) for table in tables
+            )
@@ -1,6 +1,11 @@
 # QThread / Worker cho tác vụ nền
 # Tất cả comment, docstring đều bằng tiếng Việt
-from PySide6.QtCore import QThread, Signal
+import threading
+from functools import partial
+
+from PySide6.QtCore import QCoreApplication, QObject, QThread, Signal
+
+from core.database import Database
 
 
 class BaseWorker(QThread):
@@ -42,3 +47,200 @@ class BaseWorker(QThread):
                 object: Kết quả trả về sau khi xử lý
         """
         pass
+
+
+class LoadCancelled(Exception):
+    """Job nạp dữ liệu đã bị hủy (request mới hơn thay thế hoặc widget đóng)"""
+
+
+_current_job = threading.local()
+
+
+def raise_if_cancelled():
+    """
+    Mô tả:
+        Điểm kiểm tra hủy cho hàm nạp dữ liệu nhiều bước: gọi giữa các truy vấn,
+        nếu job của thread hiện tại đã bị hủy thì dừng bằng LoadCancelled.
+    Returns:
+        None
+    """
+    job = getattr(_current_job, "job", None)
+    if job is not None and job.is_cancelled():
+        raise LoadCancelled()
+
+
+class LoadJob(BaseWorker):
+    """
+    Mô tả:
+        Worker nạp dữ liệu cho widget: chạy fn(*args) trên thread nền với cursor
+        DuckDB riêng. Hủy hợp tác: đặt cờ hủy (raise_if_cancelled) và ngắt truy vấn
+        DuckDB đang chạy trên cursor của job.
+    Args:
+        request_id: Số thứ tự request (do LoadJobRunner cấp)
+        fn: Hàm nạp dữ liệu (chỉ đọc, không động vào widget)
+        args: Tham số truyền cho fn
+    """
+
+    def __init__(self, request_id, fn, *args):
+        super().__init__()
+        self.request_id = request_id
+        self._fn = fn
+        self._args = args
+        self._cancelled = threading.Event()
+        self._cursor = None
+
+    def run(self):
+        _current_job.job = self
+        try:
+            super().run()
+        finally:
+            _current_job.job = None
+            self._cursor = None
+            Database.release_cursor()
+
+    def do_work(self):
+        if self._cancelled.is_set():
+            raise LoadCancelled()
+        self._cursor = Database.cursor()
+        result = self._fn(*self._args)
+        # Repository nuốt lỗi khi truy vấn bị ngắt -> kết quả không đáng tin
+        if self._cancelled.is_set():
+            raise LoadCancelled()
+        return result
+
+    def cancel(self):
+        """Yêu cầu hủy job; truy vấn DuckDB đang chạy (nếu có) bị ngắt ngay"""
+        self._cancelled.set()
+        cur = self._cursor
+        if cur is not None:
+            try:
+                cur.interrupt()
+            except Exception:
+                pass
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+
+# Giữ tham chiếu tới các job đang chạy đến khi thread kết thúc
+# (QThread bị hủy khi đang chạy sẽ làm sập ứng dụng)
+_running_jobs = set()
+
+
+def _release_job(job):
+    job.wait()
+    _running_jobs.discard(job)
+    job.deleteLater()
+
+
+def _cancel_jobs(jobs):
+    for job in list(jobs.values()):
+        job.cancel()
+    jobs.clear()
+
+
+def _shutdown_jobs():
+    for job in list(_running_jobs):
+        job.cancel()
+    for job in list(_running_jobs):
+        job.wait()
+    _running_jobs.clear()
+
+
+class LoadJobRunner(QObject):
+    """
+    Mô tả:
+        Điều phối job nạp dữ liệu của một widget. Mỗi khóa (vd "employees") chỉ có
+        MỘT request hiệu lực: submit() mới hủy job cũ cùng khóa, kết quả của request
+        cũ (nếu vẫn về) bị bỏ qua. Phát busy_changed để hiện / ẩn lớp phủ đang tải.
+    Args:
+        parent: Widget sở hữu (runner bị hủy cùng widget, job đang chạy bị hủy theo)
+    """
+
+    busy_changed = Signal(bool)
+
+    _next_request_id = 0
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._jobs = {}
+        self._callbacks = {}
+        # Không dùng self trong slot: khi runner bị hủy chỉ còn dict job
+        self.destroyed.connect(partial(_cancel_jobs, self._jobs))
+        app = QCoreApplication.instance()
+        if app is not None and not app.property("load_jobs_shutdown_connected"):
+            app.aboutToQuit.connect(_shutdown_jobs)
+            app.setProperty("load_jobs_shutdown_connected", True)
+
+    def submit(self, key, fn, on_loaded, *args, on_error=None):
+        """
+        Mô tả:
+            Chạy fn(*args) trên thread nền; khi xong gọi on_loaded(kết quả) trên GUI thread
+            nếu request vẫn là request mới nhất của khóa key.
+        Args:
+            key: Khóa nhóm request (request mới thay thế request cũ cùng khóa)
+            fn: Hàm nạp dữ liệu
+            on_loaded: Hàm nhận kết quả (chạy trên GUI thread)
+            args: Tham số truyền cho fn
+            on_error: Hàm nhận exception (optional)
+        Returns:
+            int: request id
+        """
+        was_busy = self.is_busy()
+        old = self._jobs.pop(key, None)
+        if old is not None:
+            old.cancel()
+
+        LoadJobRunner._next_request_id += 1
+        request_id = LoadJobRunner._next_request_id
+
+        job = LoadJob(request_id, fn, *args)
+        job.finished.connect(self._on_job_finished)
+        job.error.connect(self._on_job_error)
+        job.finished.connect(lambda _result, job=job: _release_job(job))
+        job.error.connect(lambda _error, job=job: _release_job(job))
+
+        self._jobs[key] = job
+        self._callbacks[request_id] = (key, on_loaded, on_error)
+        _running_jobs.add(job)
+        job.start()
+        if not was_busy:
+            self.busy_changed.emit(True)
+        return request_id
+
+    def cancel(self, key=None):
+        """Hủy job của khóa key (hoặc mọi job nếu key=None)"""
+        was_busy = self.is_busy()
+        keys = list(self._jobs) if key is None else [key]
+        for k in keys:
+            job = self._jobs.pop(k, None)
+            if job is not None:
+                job.cancel()
+        if was_busy and not self.is_busy():
+            self.busy_changed.emit(False)
+
+    def is_busy(self):
+        return bool(self._jobs)
+
+    def _take(self, job):
+        """Lấy callback của job nếu job còn là request mới nhất của khóa"""
+        key, on_loaded, on_error = self._callbacks.pop(job.request_id, (None, None, None))
+        if key is None or self._jobs.get(key) is not job:
+            return None, None
+        del self._jobs[key]
+        if not self.is_busy():
+            self.busy_changed.emit(False)
+        return on_loaded, on_error
+
+    def _on_job_finished(self, result):
+        on_loaded, _ = self._take(self.sender())
+        if on_loaded is not None:
+            on_loaded(result)
+
+    def _on_job_error(self, error):
+        job = self.sender()
+        on_loaded, on_error = self._take(job)
+        if isinstance(error, LoadCancelled) or on_loaded is None:
+            return
+        if on_error is not None:
+            on_error(error)
@@ -1,8 +1,11 @@
 # Điểm khởi đầu ứng dụng
 # Tuân thủ Clean Architecture, PySide6, resource_path, logging
 import sys
+import time
 import logging
-from PySide6.QtWidgets import QApplication
+import duckdb
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QApplication, QMessageBox
 from PySide6.QtGui import QIcon
 from core.resource import (
     APP_ICO_PATH,
@@ -10,8 +13,16 @@ from core.resource import (
     MIN_MAINWINDOW_HEIGHT,
     resource_path,
 )
+from core.database import Database
+from core.device_session import DeviceSessionManager
+from core.migrations import run_migrations
+from services.attendance_daily_services import AttendanceDailyRefresher
+from services.device_polling_services import EmbeddedPoller
 from ui.main_window import MainWindow
 
+# Thời gian chờ tối đa (giây) khi file database đang bị tiến trình khác (sync_daemon) giữ
+DB_LOCK_WAIT = 60
+
 
 def setup_logging():
     """
@@ -32,9 +43,60 @@ def setup_logging():
     )
 
 
+def open_database(wait=DB_LOCK_WAIT):
+    """
+    Mô tả:
+            Mở database và chạy migration. Nếu file đang bị tiến trình khác giữ (thường là
+            sync_daemon.py đang tải một lượt) thì thử lại cho tới khi hết thời gian chờ.
+    Args:
+            wait: Số giây chờ tối đa
+    Returns:
+            bool: True nếu đã mở được database
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            # Chạy migration schema một lần duy nhất trước khi dựng giao diện
+            run_migrations()
+            return True
+        except duckdb.IOException as e:
+            if "lock" not in str(e).lower():
+                raise
+            Database.close()
+            if time.monotonic() >= deadline:
+                logging.error(f"Database đang bị tiến trình khác giữ: {e}")
+                return False
+            logging.info("Database đang bị tiến trình khác giữ, chờ để mở lại...")
+            time.sleep(1)
+
+
 def main():
     setup_logging()
     app = QApplication(sys.argv)
+    QApplication.setOverrideCursor(Qt.WaitCursor)
+    try:
+        opened = open_database()
+    finally:
+        QApplication.restoreOverrideCursor()
+    if not opened:
+        QMessageBox.critical(
+            None,
+            "Không mở được dữ liệu",
+            "File dữ liệu đang được tiến trình khác sử dụng (tiến trình đồng bộ chấm công "
+            "sync_daemon.py hoặc một cửa sổ ứng dụng khác).\n"
+            "Vui lòng thử lại sau ít phút.",
+        )
+        sys.exit(1)
+    # Tiến trình nền không ghi được database khi giao diện đang mở -> giao diện tải thay
+    poller = EmbeddedPoller()
+    poller.start()
+    app.aboutToQuit.connect(poller.stop)
+    # Chờ bảng tổng hợp theo ngày tính lại xong trước khi đóng database
+    app.aboutToQuit.connect(AttendanceDailyRefresher.wait)
+    # Đóng kết nối DuckDB dùng chung khi thoát ứng dụng
+    app.aboutToQuit.connect(Database.close)
+    # Đóng các phiên kết nối máy chấm công đang giữ
+    app.aboutToQuit.connect(DeviceSessionManager.close_all)
     window = MainWindow()
     window.setWindowIcon(QIcon(APP_ICO_PATH))
     window.setMinimumWidth(MIN_MAINWINDOW_WIDTH)
@@ -12,7 +12,6 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
-import duckdb
 from core.database import Database
 
 
@@ -24,15 +23,14 @@ class AbsenceSymbolRepository:
         """Lấy tất cả ký hiệu loại vắng"""
         try:
             log_to_debug("AbsenceSymbolRepository: get_all() called")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                """
-                SELECT id, code, description, symbol, is_used, is_paid
-                FROM absence_symbol
-                ORDER BY code
-                """
-            ).fetchall()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    """
+                    SELECT id, code, description, symbol, is_used, is_paid
+                    FROM absence_symbol
+                    ORDER BY code
+                    """
+                ).fetchall()
 
             symbols = []
             for row in result:
@@ -61,22 +59,20 @@ class AbsenceSymbolRepository:
         """Cập nhật ký hiệu loại vắng"""
         try:
             log_to_debug(f"AbsenceSymbolRepository: update() called for id={symbol_id}")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                """
-                UPDATE absence_symbol
-                SET code = ?,
-                    description = ?,
-                    symbol = ?,
-                    is_used = ?,
-                    is_paid = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-                """,
-                [code, description, symbol, is_used, is_paid, symbol_id],
-            )
-            con.commit()
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute(
+                    """
+                    UPDATE absence_symbol
+                    SET code = ?,
+                        description = ?,
+                        symbol = ?,
+                        is_used = ?,
+                        is_paid = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                    """,
+                    [code, description, symbol, is_used, is_paid, symbol_id],
+                )
             log_to_debug(
                 f"AbsenceSymbolRepository: update() success for id={symbol_id}"
             )
@@ -91,16 +87,14 @@ class AbsenceSymbolRepository:
         """Thêm ký hiệu loại vắng mới"""
         try:
             log_to_debug("AbsenceSymbolRepository: add() called")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                """
-                INSERT INTO absence_symbol (code, description, symbol, is_used, is_paid)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                [code, description, symbol, is_used, is_paid],
-            )
-            con.commit()
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute(
+                    """
+                    INSERT INTO absence_symbol (code, description, symbol, is_used, is_paid)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    [code, description, symbol, is_used, is_paid],
+                )
             log_to_debug("AbsenceSymbolRepository: add() success")
             return True
         except Exception as e:
@@ -113,10 +107,8 @@ class AbsenceSymbolRepository:
         """Xóa ký hiệu loại vắng"""
         try:
             log_to_debug(f"AbsenceSymbolRepository: delete() called for id={symbol_id}")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("DELETE FROM absence_symbol WHERE id = ?", [symbol_id])
-            con.commit()
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute("DELETE FROM absence_symbol WHERE id = ?", [symbol_id])
             log_to_debug(
                 f"AbsenceSymbolRepository: delete() success for id={symbol_id}"
             )
@@ -0,0 +1,378 @@
+import traceback
+from datetime import date
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            from datetime import datetime
+
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+from core.database import Database
+from core.change_bus import ChangeBus, OP_DELETE, OP_UPDATE
+from repository.attendance_pairing_repository import build_pair_query, build_search_filter
+
+
+# Các cột của bảng attendance_daily (mỗi dòng = một mã chấm công trong một ngày công có chấm)
+DAILY_COLUMNS = (
+    "user_id",
+    "work_date",
+    "user_name",
+    "shift_id",
+    "shift_code",
+    "shift_start",
+    "shift_end",
+    "lunch_start",
+    "lunch_end",
+    "first_in",
+    "last_out",
+    "in_1",
+    "out_1",
+    "in_2",
+    "out_2",
+    "in_3",
+    "out_3",
+    "punch_count",
+    "punch",
+    "uid",
+    "record_ids",
+    "is_weekend",
+    "is_holiday",
+    "worked_minutes",
+    "late_minutes",
+    "early_minutes",
+    "overtime_minutes",
+    "work_day_count",
+    "status",
+)
+
+# Bảng tạm (theo từng cursor) chứa các khóa (user_id, work_date) cần tính lại
+_KEYS_TABLE = "daily_refresh_keys"
+
+
+def _clipped_seconds(start, end):
+    """
+    Biểu thức SQL: số giây của đoạn [start, end] nằm trong ca, trừ phần trùng giờ nghỉ trưa.
+    Trả về 0 nếu thiếu một trong hai đầu.
+    """
+    return f"""(CASE WHEN {start} IS NULL OR {end} IS NULL THEN 0 ELSE
+        greatest(0, epoch(least({end}, p.shift_end)) - epoch(greatest({start}, p.shift_start)))
+        - CASE WHEN p.lunch_start IS NULL THEN 0 ELSE
+            greatest(0, epoch(least({end}, p.lunch_end)) - epoch(greatest({start}, p.lunch_start)))
+          END
+    END)"""
+
+
+# Tính một dòng attendance_daily cho mỗi (mã chấm công, ngày công) có chấm công:
+#   1. pairs: giờ vào/ra đã ghép theo ca (truy vấn con của AttendancePairingRepository)
+#   2. metrics: cuối tuần / ngày lễ, phút làm, đi trễ, về sớm, tăng ca
+#   3. status: trạng thái theo thứ tự ưu tiên (tên trùng cột <trạng thái>_symbol
+#      của attendance_symbol); ngày vắng / không lịch do bảng công tự sinh
+_DAILY_SQL = """
+WITH pairs AS (
+    {pair_sql}
+),
+metrics AS (
+    SELECT p.*,
+           COALESCE(
+               [w.monday, w.tuesday, w.wednesday, w.thursday, w.friday, w.saturday, w.sunday][isodow(p.work_date)],
+               FALSE
+           ) AS is_weekend,
+           EXISTS (SELECT 1 FROM holiday h WHERE h.holiday_date = p.work_date) AS is_holiday,
+           COALESCE(p.in_1, p.in_2) AS first_in,
+           COALESCE(p.out_2, p.out_1) AS last_out,
+           (
+               {seg_1} + {seg_2}
+               + CASE WHEN p.out_1 IS NULL AND p.in_2 IS NULL THEN {seg_span} ELSE 0 END
+           ) / 60 AS regular_minutes,
+           (
+               CASE WHEN p.in_3 IS NOT NULL AND p.out_3 IS NOT NULL
+                    THEN epoch(p.out_3) - epoch(p.in_3) ELSE 0 END
+               + CASE WHEN COALESCE(p.out_2, p.out_1) > p.shift_end + to_minutes($overtime_gap)
+                      THEN epoch(COALESCE(p.out_2, p.out_1)) - epoch(p.shift_end) ELSE 0 END
+           ) / 60 AS extra_minutes,
+           greatest(0, epoch(COALESCE(p.in_1, p.in_2)) - epoch(p.shift_start)) / 60 AS late_raw,
+           greatest(0, epoch(p.shift_end) - epoch(COALESCE(p.out_2, p.out_1))) / 60 AS early_raw,
+           COALESCE(
+               NULLIF(ws.total_minutes, 0),
+               (epoch(p.shift_end) - epoch(p.shift_start)
+                - COALESCE(epoch(p.lunch_end) - epoch(p.lunch_start), 0)) / 60
+           ) AS nominal_minutes,
+           COALESCE(NULLIF(ws.work_day_count, 0), 1) AS shift_work_days
+    FROM pairs p
+    LEFT JOIN weekend w ON w.id = 1
+    LEFT JOIN declare_work_shift ws ON ws.id = p.shift_id
+),
+statuses AS (
+    SELECT *,
+           NOT is_weekend AND NOT is_holiday AS is_scheduled,
+           CASE
+               WHEN first_in IS NULL THEN 'missing_checkin'
+               WHEN last_out IS NULL THEN 'missing_checkout'
+               WHEN is_weekend OR is_holiday THEN 'overtime'
+               WHEN late_raw > 0 THEN 'late'
+               WHEN early_raw > 0 THEN 'early_leave'
+               WHEN extra_minutes > 0 THEN 'overtime'
+               WHEN CAST(shift_end AS DATE) > work_date THEN 'on_time_overnight'
+               ELSE 'on_time'
+           END AS status
+    FROM metrics
+)
+SELECT user_id, work_date, user_name, shift_id, shift_code,
+       shift_start, shift_end, lunch_start, lunch_end, first_in, last_out,
+       in_1, out_1, in_2, out_2, in_3, out_3, punch_count, punch, uid, record_ids,
+       is_weekend, is_holiday,
+       CAST(CASE WHEN is_scheduled THEN regular_minutes ELSE 0 END AS INTEGER) AS worked_minutes,
+       CAST(CASE WHEN is_scheduled THEN late_raw ELSE 0 END AS INTEGER) AS late_minutes,
+       CAST(CASE WHEN is_scheduled THEN early_raw ELSE 0 END AS INTEGER) AS early_minutes,
+       CAST(CASE WHEN is_scheduled THEN extra_minutes ELSE regular_minutes + extra_minutes END AS INTEGER)
+           AS overtime_minutes,
+       CASE WHEN is_scheduled AND status NOT IN ('missing_checkin', 'missing_checkout')
+            THEN round(shift_work_days * least(1, regular_minutes / nullif(nominal_minutes, 0)), 2)
+            ELSE 0 END AS work_day_count,
+       status
+FROM statuses s
+WHERE EXISTS (
+    SELECT 1 FROM {keys_table} k WHERE k.user_id = s.user_id AND k.work_date = s.work_date
+)
+""".format(
+    pair_sql="{pair_sql}",
+    keys_table=_KEYS_TABLE,
+    seg_1=_clipped_seconds("p.in_1", "p.out_1"),
+    seg_2=_clipped_seconds("p.in_2", "p.out_2"),
+    seg_span=_clipped_seconds("p.in_1", "p.out_2"),
+)
+
+
+class AttendanceDailyRepository:
+    """
+    Repository bảng tổng hợp chấm công theo ngày (attendance_daily).
+    Bảng được cập nhật tăng dần: chỉ các khóa (user_id, work_date) bị ảnh hưởng
+    bởi lô chấm công mới / bản ghi bị xóa / thay đổi lịch nghỉ, ca làm việc.
+    """
+
+    def __init__(self):
+        self.db_path = Database.get_db_path()
+
+    @staticmethod
+    def stage_keys(con, source_sql, params=None):
+        """
+        Mô tả:
+            Ghi nhận các khóa cần tính lại vào bảng tạm của cursor. Một lần chấm ở ngày D
+            có thể thuộc ngày công D-1 (ca đêm), D hoặc D+1 nên mỗi ngày được mở rộng ±1.
+            Gọi nhiều lần sẽ cộng dồn khóa cho tới khi refresh_staged().
+        Args:
+            con: Cursor DuckDB (thường đang trong transaction của bên gọi)
+            source_sql: Câu SELECT trả về 2 cột (user_id, punch_date)
+            params: Tham số cho source_sql (optional)
+        Returns:
+            None
+        """
+        con.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {_KEYS_TABLE} (user_id VARCHAR, work_date DATE)"
+        )
+        con.execute(
+            f"""
+            INSERT INTO {_KEYS_TABLE}
+            SELECT DISTINCT src.user_id, CAST(src.punch_date AS DATE) + off.k
+            FROM ({source_sql}) AS src(user_id, punch_date)
+            CROSS JOIN (VALUES (-1), (0), (1)) AS off(k)
+            """,
+            params or [],
+        )
+
+    @staticmethod
+    def refresh_staged(con):
+        """
+        Mô tả:
+            Tính lại attendance_daily cho các khóa đã ghi nhận bằng stage_keys():
+            xóa dòng cũ rồi chèn kết quả ghép cặp + trạng thái mới (set-based).
+        Args:
+            con: Cursor DuckDB (thường đang trong transaction của bên gọi)
+        Returns:
+            int: Số dòng attendance_daily được ghi lại
+        """
+        con.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {_KEYS_TABLE} (user_id VARCHAR, work_date DATE)"
+        )
+        try:
+            bounds = con.execute(
+                f"SELECT min(work_date), max(work_date), count(*) FROM {_KEYS_TABLE}"
+            ).fetchone()
+            if not bounds or not bounds[2]:
+                return 0
+
+            con.execute(
+                f"""
+                DELETE FROM attendance_daily d
+                WHERE EXISTS (
+                    SELECT 1 FROM {_KEYS_TABLE} k
+                    WHERE k.user_id = d.user_id AND k.work_date = d.work_date
+                )
+                """
+            )
+            pair_sql, params = build_pair_query(
+                bounds[0],
+                bounds[1],
+                raw_filter=f"AND user_id IN (SELECT user_id FROM {_KEYS_TABLE})",
+            )
+            columns = ", ".join(DAILY_COLUMNS)
+            row = con.execute(
+                f"INSERT INTO attendance_daily ({columns}) "
+                + _DAILY_SQL.replace("{pair_sql}", pair_sql),
+                params,
+            ).fetchone()
+            return row[0] if row else 0
+        finally:
+            con.execute(f"DELETE FROM {_KEYS_TABLE}")
+
+    @staticmethod
+    def refresh_keys(con, source_sql, params=None):
+        """
+        Mô tả:
+            stage_keys() + refresh_staged() trong một lần gọi.
+        Args:
+            con: Cursor DuckDB
+            source_sql: Câu SELECT trả về 2 cột (user_id, punch_date)
+            params: Tham số cho source_sql (optional)
+        Returns:
+            int: Số dòng attendance_daily được ghi lại
+        """
+        AttendanceDailyRepository.stage_keys(con, source_sql, params)
+        return AttendanceDailyRepository.refresh_staged(con)
+
+    @staticmethod
+    def rebuild_with(con):
+        """
+        Mô tả:
+            Tính lại toàn bộ attendance_daily từ attendance_raw trên cursor cho trước
+            (dùng trong migration và khi đổi cấu hình ca / ngày cuối tuần).
+        Args:
+            con: Cursor DuckDB
+        Returns:
+            int: Số dòng attendance_daily sau khi tính lại
+        """
+        con.execute("DELETE FROM attendance_daily")
+        return AttendanceDailyRepository.refresh_keys(
+            con, "SELECT DISTINCT user_id, CAST(timestamp AS DATE) FROM attendance_raw"
+        )
+
+    def rebuild(self):
+        """
+        Mô tả:
+            Tính lại toàn bộ attendance_daily (khi đổi ca làm việc / ngày cuối tuần).
+        Returns:
+            bool: True nếu thành công
+        """
+        try:
+            log_to_debug("AttendanceDailyRepository: rebuild() called")
+            with Database.transaction() as con:
+                count = self.rebuild_with(con)
+            log_to_debug(f"AttendanceDailyRepository: rebuild() wrote {count} rows")
+            ChangeBus.publish("attendance_daily", OP_UPDATE)
+            return True
+        except Exception as e:
+            log_to_debug(
+                f"AttendanceDailyRepository: rebuild() error: {e}\n{traceback.format_exc()}"
+            )
+            return False
+
+    def refresh_dates(self, dates):
+        """
+        Mô tả:
+            Tính lại attendance_daily của mọi nhân viên cho các ngày cho trước
+            (khi thêm / sửa / xóa ngày lễ).
+        Args:
+            dates: Danh sách ngày (datetime.date hoặc chuỗi "yyyy-MM-dd")
+        Returns:
+            bool: True nếu thành công
+        """
+        dates = sorted(
+            {date.fromisoformat(str(d)[:10]) if not isinstance(d, date) else d for d in dates if d}
+        )
+        if not dates:
+            return True
+        try:
+            log_to_debug(f"AttendanceDailyRepository: refresh_dates() - {dates}")
+            with Database.transaction() as con:
+                count = self.refresh_keys(
+                    con,
+                    """
+                    SELECT DISTINCT user_id, CAST(timestamp AS DATE)
+                    FROM attendance_raw
+                    WHERE CAST(timestamp AS DATE) IN (SELECT unnest(?::DATE[]))
+                    """,
+                    [dates],
+                )
+            log_to_debug(f"AttendanceDailyRepository: refresh_dates() wrote {count} rows")
+            ChangeBus.publish("attendance_daily", OP_UPDATE)
+            return True
+        except Exception as e:
+            log_to_debug(
+                f"AttendanceDailyRepository: refresh_dates() error: {e}\n{traceback.format_exc()}"
+            )
+            return False
+
+    def delete_all(self):
+        """
+        Xóa toàn bộ bảng tổng hợp theo ngày
+        Returns:
+            bool: True nếu thành công
+        """
+        try:
+            log_to_debug("AttendanceDailyRepository: delete_all() called")
+            with Database.get_cursor() as con:
+                con.execute("DELETE FROM attendance_daily")
+            ChangeBus.publish("attendance_daily", OP_DELETE)
+            return True
+        except Exception as e:
+            log_to_debug(
+                f"AttendanceDailyRepository: delete_all() error: {e}\n{traceback.format_exc()}"
+            )
+            return False
+
+    def get_daily(self, from_date, to_date, search=""):
+        """
+        Mô tả:
+            Đọc bảng tổng hợp theo ngày trong khoảng ngày, sắp theo mã chấm công và ngày.
+        Args:
+            from_date: Từ ngày (datetime.date)
+            to_date: Đến ngày (datetime.date)
+            search: Chỉ lấy nhân viên khớp mã / tên (optional, xem build_search_filter)
+        Returns:
+            dict: {tên cột trong DAILY_COLUMNS: list giá trị}
+        """
+        try:
+            log_to_debug(
+                f"AttendanceDailyRepository: get_daily() - from={from_date}, to={to_date}, "
+                f"search={search!r}"
+            )
+            search_sql, params = build_search_filter(search)
+            params.update({"from_date": from_date, "to_date": to_date})
+            with Database.get_cursor() as con:
+                rows = con.execute(
+                    f"""
+                    SELECT {", ".join(DAILY_COLUMNS)}
+                    FROM attendance_daily
+                    WHERE work_date BETWEEN $from_date AND $to_date {search_sql}
+                    ORDER BY user_id, work_date
+                    """,
+                    params,
+                ).fetchall()
+
+            if rows:
+                columns = dict(zip(DAILY_COLUMNS, map(list, zip(*rows))))
+            else:
+                columns = {name: [] for name in DAILY_COLUMNS}
+            log_to_debug(f"AttendanceDailyRepository: get_daily() returned {len(rows)} rows")
+            return columns
+        except Exception as e:
+            log_to_debug(
+                f"AttendanceDailyRepository: get_daily() error: {e}\n{traceback.format_exc()}"
+            )
+            return {name: [] for name in DAILY_COLUMNS}
@@ -0,0 +1,307 @@
+import traceback
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            from datetime import datetime
+
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+from core.database import Database
+
+
+# Các cột trả về của get_punch_pairs() (mỗi dòng = một nhân viên trong một ngày công)
+PAIR_COLUMNS = (
+    "user_id",
+    "user_name",
+    "work_date",
+    "shift_id",
+    "shift_code",
+    "shift_start",
+    "shift_end",
+    "lunch_start",
+    "lunch_end",
+    "in_1",
+    "out_1",
+    "in_2",
+    "out_2",
+    "in_3",
+    "out_3",
+    "punch",
+    "uid",
+    "punch_count",
+    "record_ids",
+)
+
+# Hai lần chấm cách nhau dưới số giây này được coi là chấm trùng (bấm 2 lần)
+DUPLICATE_PUNCH_SECONDS = 60
+
+# Chấm công sau giờ ra ca quá số phút này (và có từ 2 lần trở lên) được ghép thành cặp tăng ca
+OVERTIME_GAP_MINUTES = 30
+
+# Ca mặc định khi chưa khai báo ca làm việc nào: 08:00-17:00, nghỉ trưa 12:00-13:00
+DEFAULT_SHIFT = {"start_min": 8 * 60, "end_min": 17 * 60, "lunch_start_min": 12 * 60, "lunch_end_min": 13 * 60}
+
+
+# Truy vấn ghép cặp giờ vào/ra theo ca. Các bước (toàn bộ chạy trong DuckDB):
+#   1. shifts: quy ca về phút trong ngày; ca qua đêm khi end_time <= start_time
+#   2. punch_day: xét mỗi lần chấm x mỗi ca x ngày công (hôm trước/hôm đó/hôm sau),
+#      lần chấm thuộc ngày công có khoảng cách tới giờ vào/ra ca nhỏ nhất
+#      (tính bằng số giây nguyên để chạy nhanh trên khoảng ngày lớn)
+#   3. day_shift: mỗi (nhân viên, ngày công) chọn ca có tổng khoảng cách nhỏ nhất
+#   4. placed: gắn giờ vào/ra ca và giờ nghỉ trưa thực tế của ngày công vào từng lần chấm
+#   5. segmented: chia lần chấm thành đoạn 1 (trước giữa giờ nghỉ trưa), đoạn 2 (sau đó)
+#      và đoạn 3 (tăng ca, khi có >= 2 lần chấm sau giờ ra ca + OVERTIME_GAP_MINUTES)
+#   6. segments: mỗi đoạn lấy lần chấm đầu làm giờ vào, cuối làm giờ ra; đoạn chỉ có
+#      một lần chấm thì xét gần đầu đoạn (vào) hay cuối đoạn (ra) hơn
+PAIR_DAYS_SQL = """
+WITH shift_src AS (
+    SELECT id AS shift_id, shift_code,
+           hour(start_time) * 60 + minute(start_time) AS start_min,
+           hour(end_time) * 60 + minute(end_time) AS end_min,
+           hour(lunch_start) * 60 + minute(lunch_start) AS lunch_start_min,
+           hour(lunch_end) * 60 + minute(lunch_end) AS lunch_end_min
+    FROM declare_work_shift
+    UNION ALL
+    SELECT NULL, NULL, $default_start, $default_end, $default_lunch_start, $default_lunch_end
+    WHERE NOT EXISTS (SELECT 1 FROM declare_work_shift)
+),
+shifts AS (
+    SELECT shift_id, shift_code, start_min,
+           CASE WHEN end_min > start_min THEN end_min - start_min
+                ELSE end_min - start_min + 1440 END AS duration_min,
+           lunch_start_min IS NOT NULL AND lunch_end_min IS NOT NULL
+               AND lunch_start_min <> lunch_end_min AS has_lunch,
+           (lunch_start_min - start_min + 1440) % 1440 AS lunch_start_off,
+           (lunch_start_min - start_min + 1440) % 1440
+               + (lunch_end_min - lunch_start_min + 1440) % 1440 AS lunch_end_off
+    FROM shift_src
+),
+raw AS (
+    SELECT id, user_id, user_name, timestamp AS ts, punch, uid,
+           CAST(timestamp AS DATE) AS punch_date,
+           CAST(epoch(timestamp) - epoch(CAST(timestamp AS DATE)) AS BIGINT) AS second_of_day,
+           COALESCE(
+               epoch(timestamp) - epoch(LAG(timestamp) OVER (PARTITION BY user_id ORDER BY timestamp, id)),
+               1e9
+           ) < $duplicate_seconds AS is_duplicate
+    FROM attendance_raw
+    WHERE timestamp >= CAST($from_date AS DATE) - INTERVAL 1 DAY
+      AND timestamp < CAST($to_date AS DATE) + INTERVAL 2 DAY
+      {raw_filter}
+),
+punch_day AS (
+    SELECT id, any_value(user_id) AS user_id,
+           arg_min(punch_date + k, {{'dist': dist, 'k': abs(k), 'shift': shift_key}}) AS work_date
+    FROM (
+        SELECT r.id, r.user_id, r.punch_date, off.k, COALESCE(s.shift_id, 0) AS shift_key,
+               least(
+                   abs(r.second_of_day - (off.k * 86400 + s.start_min * 60)),
+                   abs(r.second_of_day - (off.k * 86400 + (s.start_min + s.duration_min) * 60))
+               ) AS dist
+        FROM raw r
+        CROSS JOIN shifts s
+        CROSS JOIN (VALUES (-1), (0), (1)) AS off(k)
+    )
+    GROUP BY id
+),
+day_shift AS (
+    SELECT user_id, work_date, arg_min(shift_id, {{'cost': cost, 'shift': shift_key}}) AS shift_id
+    FROM (
+        SELECT pd.user_id, pd.work_date, s.shift_id, COALESCE(s.shift_id, 0) AS shift_key,
+               sum(least(
+                   abs(r.second_of_day - ((pd.work_date - r.punch_date) * 86400 + s.start_min * 60)),
+                   abs(r.second_of_day - ((pd.work_date - r.punch_date) * 86400 + (s.start_min + s.duration_min) * 60))
+               )) AS cost
+        FROM raw r
+        JOIN punch_day pd ON pd.id = r.id
+        CROSS JOIN shifts s
+        GROUP BY ALL
+    )
+    GROUP BY user_id, work_date
+),
+punch_shift AS MATERIALIZED (
+    SELECT pd.id, pd.work_date, COALESCE(ds.shift_id, 0) AS shift_key
+    FROM punch_day pd
+    JOIN day_shift ds ON ds.user_id = pd.user_id AND ds.work_date = pd.work_date
+),
+placed AS (
+    SELECT r.id, r.user_id, r.user_name, r.ts, r.punch, r.uid, r.is_duplicate,
+           ps.work_date, s.shift_id, s.shift_code, s.has_lunch,
+           ps.work_date + to_minutes(s.start_min) AS shift_start,
+           ps.work_date + to_minutes(s.start_min + s.duration_min) AS shift_end,
+           ps.work_date + to_minutes(s.start_min + s.lunch_start_off) AS lunch_start,
+           ps.work_date + to_minutes(s.start_min + s.lunch_end_off) AS lunch_end
+    FROM raw r
+    JOIN punch_shift ps ON ps.id = r.id
+    JOIN shifts s ON COALESCE(s.shift_id, 0) = ps.shift_key
+),
+segmented AS (
+    SELECT *,
+           CASE
+               WHEN overtime_count >= 2 AND ts > shift_end + to_minutes($overtime_gap) THEN 3
+               WHEN has_lunch AND ts >= lunch_start + (lunch_end - lunch_start) / 2 THEN 2
+               ELSE 1
+           END AS segment
+    FROM (
+        SELECT *,
+               count(*) FILTER (WHERE ts > shift_end + to_minutes($overtime_gap))
+                   OVER (PARTITION BY user_id, work_date) AS overtime_count
+        FROM placed
+        WHERE NOT is_duplicate
+    )
+),
+segments AS (
+    SELECT user_id, work_date, segment, n, first_ts, last_ts,
+           CASE WHEN n >= 2
+                  OR abs(epoch(first_ts) - epoch(seg_start)) <= abs(epoch(first_ts) - epoch(seg_end))
+                THEN first_ts END AS in_ts,
+           CASE WHEN n >= 2 THEN last_ts
+                WHEN abs(epoch(first_ts) - epoch(seg_start)) > abs(epoch(first_ts) - epoch(seg_end))
+                THEN first_ts END AS out_ts
+    FROM (
+        SELECT user_id, work_date, segment,
+               count(*) AS n, min(ts) AS first_ts, max(ts) AS last_ts,
+               any_value(CASE segment WHEN 2 THEN lunch_end ELSE shift_start END) AS seg_start,
+               any_value(CASE WHEN segment = 1 AND has_lunch THEN lunch_start ELSE shift_end END) AS seg_end
+        FROM segmented
+        GROUP BY user_id, work_date, segment
+    )
+),
+days AS (
+    SELECT user_id, work_date,
+           any_value(shift_id) AS shift_id, any_value(shift_code) AS shift_code,
+           any_value(shift_start) AS shift_start, any_value(shift_end) AS shift_end,
+           any_value(CASE WHEN has_lunch THEN lunch_start END) AS lunch_start,
+           any_value(CASE WHEN has_lunch THEN lunch_end END) AS lunch_end,
+           max(user_name) AS user_name,
+           arg_max(punch, ts) AS punch, arg_max(uid, ts) AS uid,
+           count(*) FILTER (WHERE NOT is_duplicate) AS punch_count,
+           list(id) AS record_ids
+    FROM placed
+    GROUP BY user_id, work_date
+)
+SELECT d.user_id, d.user_name, d.work_date, d.shift_id, d.shift_code,
+       d.shift_start, d.shift_end, d.lunch_start, d.lunch_end,
+       max(sg.in_ts) FILTER (WHERE sg.segment = 1) AS in_1,
+       max(sg.out_ts) FILTER (WHERE sg.segment = 1) AS out_1,
+       max(sg.in_ts) FILTER (WHERE sg.segment = 2) AS in_2,
+       max(sg.out_ts) FILTER (WHERE sg.segment = 2) AS out_2,
+       max(sg.in_ts) FILTER (WHERE sg.segment = 3) AS in_3,
+       max(sg.out_ts) FILTER (WHERE sg.segment = 3) AS out_3,
+       d.punch, d.uid, d.punch_count, d.record_ids
+FROM days d
+LEFT JOIN segments sg ON sg.user_id = d.user_id AND sg.work_date = d.work_date
+WHERE d.work_date BETWEEN CAST($from_date AS DATE) AND CAST($to_date AS DATE)
+GROUP BY ALL
+"""
+
+
+def build_search_filter(search, prefix=""):
+    """
+    Mô tả:
+        Điều kiện tìm theo mã chấm công / tên nhân viên, chạy ngay trong SQL để chỉ
+        đọc các dòng của nhân viên khớp. Chuỗi toàn số được so với mã đã đệm đủ
+        5 chữ số như trên bảng ("12" -> "00012").
+    Args:
+        search: Chuỗi người dùng nhập (rỗng = không lọc)
+        prefix: Bí danh bảng kèm dấu chấm, vd "a." (optional)
+    Returns:
+        tuple: (sql, params) - sql bắt đầu bằng AND (rỗng nếu không lọc),
+               params là dict tham số có tên
+    """
+    search = (search or "").strip()
+    if not search:
+        return "", {}
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    code = escaped.zfill(5) if search.isdigit() else escaped
+    sql = (
+        f" AND (lpad({prefix}user_id, CAST(greatest(length({prefix}user_id), 5) AS INTEGER), '0')"
+        f" ILIKE $search_code ESCAPE '\\'"
+        f" OR {prefix}user_name ILIKE $search_name ESCAPE '\\')"
+    )
+    return sql, {"search_code": f"%{code}%", "search_name": f"%{escaped}%"}
+
+
+def build_pair_query(from_date, to_date, device_id=None, raw_filter="", search=""):
+    """
+    Mô tả:
+        Dựng truy vấn ghép cặp (PAIR_DAYS_SQL) kèm tham số, để dùng trực tiếp
+        hoặc làm truy vấn con cho các báo cáo khác (bảng công).
+    Args:
+        from_date: Từ ngày (datetime.date)
+        to_date: Đến ngày (datetime.date)
+        device_id: ID thiết bị (optional)
+        raw_filter: Điều kiện SQL bổ sung cho attendance_raw, bắt đầu bằng AND (optional)
+        search: Chỉ ghép cặp cho nhân viên khớp mã / tên (optional, xem build_search_filter)
+    Returns:
+        tuple: (sql, params) - params là dict tham số có tên ($from_date, ...)
+    """
+    params = {
+        "from_date": from_date,
+        "to_date": to_date,
+        "duplicate_seconds": DUPLICATE_PUNCH_SECONDS,
+        "overtime_gap": OVERTIME_GAP_MINUTES,
+        "default_start": DEFAULT_SHIFT["start_min"],
+        "default_end": DEFAULT_SHIFT["end_min"],
+        "default_lunch_start": DEFAULT_SHIFT["lunch_start_min"],
+        "default_lunch_end": DEFAULT_SHIFT["lunch_end_min"],
+    }
+    if device_id:
+        raw_filter = f"{raw_filter} AND device_id = $device_id"
+        params["device_id"] = device_id
+    # Ghép cặp chạy riêng theo từng user_id nên lọc trước nhân viên không đổi kết quả
+    search_sql, search_params = build_search_filter(search)
+    raw_filter += search_sql
+    params.update(search_params)
+    return PAIR_DAYS_SQL.format(raw_filter=raw_filter), params
+
+
+class AttendancePairingRepository:
+    """Repository ghép cặp giờ vào/ra từ dữ liệu chấm công thô theo ca làm việc"""
+
+    def __init__(self):
+        self.db_path = Database.get_db_path()
+
+    def get_punch_pairs(self, from_date, to_date, device_id=None, search=""):
+        """
+        Mô tả:
+            Ghép cặp giờ vào/ra cho mọi nhân viên, mọi ngày công trong khoảng ngày
+            bằng MỘT truy vấn theo tập hợp. Mỗi ngày công được gán ca khớp nhất trong
+            declare_work_shift (kể cả ca qua đêm); lần chấm sau nửa đêm của ca đêm
+            thuộc ngày công hôm trước.
+        Args:
+            from_date: Từ ngày (datetime.date)
+            to_date: Đến ngày (datetime.date)
+            device_id: ID thiết bị (optional)
+            search: Chuỗi tìm theo mã / tên nhân viên (optional)
+        Returns:
+            dict: {tên cột trong PAIR_COLUMNS: list giá trị}, các list cùng độ dài;
+                  giờ vào/ra là datetime hoặc None
+        """
+        try:
+            log_to_debug(
+                f"AttendancePairingRepository: get_punch_pairs() - from={from_date}, "
+                f"to={to_date}, device_id={device_id}, search={search!r}"
+            )
+            sql, params = build_pair_query(from_date, to_date, device_id, search=search)
+            with Database.get_cursor() as con:
+                rows = con.execute(f"{sql} ORDER BY d.user_id, d.work_date", params).fetchall()
+
+            columns = {name: [] for name in PAIR_COLUMNS}
+            for row in rows:
+                for name, value in zip(PAIR_COLUMNS, row):
+                    columns[name].append(value)
+
+            log_to_debug(f"AttendancePairingRepository: get_punch_pairs() returned {len(rows)} days")
+            return columns
+        except Exception as e:
+            log_to_debug(
+                f"AttendancePairingRepository: get_punch_pairs() error: {e}\n{traceback.format_exc()}"
+            )
+            return {name: [] for name in PAIR_COLUMNS}
@@ -1,4 +1,7 @@
 import traceback
+from contextlib import contextmanager
+
+import numpy as np
 
 
 def log_to_debug(message):
@@ -12,8 +15,100 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
-import duckdb
 from core.database import Database
+from core.change_bus import ChangeBus, OP_DELETE, OP_INSERT, OP_UPDATE
+from repository.attendance_daily_repository import AttendanceDailyRepository
+
+
+# Thứ tự cột của một lô chấm công (khớp với bảng attendance_raw)
+BATCH_COLUMNS = (
+    "user_id",
+    "user_name",
+    "timestamp",
+    "status",
+    "punch",
+    "uid",
+    "device_sn",
+    "device_id",
+    "note",
+)
+
+# Các cột trả về khi đọc chấm công thô (get_all)
+RAW_COLUMNS = (
+    "id",
+    "user_id",
+    "user_name",
+    "timestamp",
+    "status",
+    "punch",
+    "uid",
+    "device_sn",
+    "device_id",
+    "note",
+    "created_at",
+)
+
+# Kiểu DuckDB của từng cột khi đọc lô đã đăng ký trong bộ nhớ
+_BATCH_TYPES = {
+    "user_id": "VARCHAR",
+    "user_name": "VARCHAR",
+    "timestamp": "TIMESTAMP",
+    "status": "INTEGER",
+    "punch": "INTEGER",
+    "uid": "BIGINT",
+    "device_sn": "VARCHAR",
+    "device_id": "INTEGER",
+    "note": "VARCHAR",
+}
+
+
+class AttendanceRawBatch:
+    """
+    Mô tả:
+        Bộ đệm dạng cột cho một lô bản ghi chấm công.
+        Mỗi cột là một list Python, được đưa vào DuckDB một lần duy nhất khi ingest.
+    """
+
+    def __init__(self):
+        self.columns = {name: [] for name in BATCH_COLUMNS}
+
+    def append(self, user_id, user_name, timestamp, status, punch, uid, device_sn, device_id, note=""):
+        """
+        Mô tả:
+            Thêm một bản ghi vào cuối lô.
+        Args:
+            user_id .. note: Giá trị các cột như AttendanceRawRepository.insert()
+        Returns:
+            None
+        """
+        cols = self.columns
+        cols["user_id"].append(user_id)
+        cols["user_name"].append(user_name)
+        cols["timestamp"].append(timestamp)
+        cols["status"].append(status)
+        cols["punch"].append(punch)
+        cols["uid"].append(uid)
+        cols["device_sn"].append(device_sn)
+        cols["device_id"].append(device_id)
+        cols["note"].append(note)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Mô tả:
+            Tạo lô từ danh sách tuple theo thứ tự BATCH_COLUMNS.
+        Args:
+            records: List of tuples (user_id, user_name, timestamp, status, punch, uid, device_sn, device_id, note)
+        Returns:
+            AttendanceRawBatch: Lô dạng cột
+        """
+        batch = cls()
+        for record in records:
+            batch.append(*record)
+        return batch
+
+    def __len__(self):
+        return len(self.columns["user_id"])
 
 
 class AttendanceRawRepository:
@@ -21,45 +116,6 @@ class AttendanceRawRepository:
 
     def __init__(self):
         self.db_path = Database.get_db_path()
-        self._init_table()
-
-    def _init_table(self):
-        """Khởi tạo bảng attendance_raw nếu chưa tồn tại"""
-        try:
-            log_to_debug("AttendanceRawRepository: _init_table() called")
-            con = duckdb.connect(self.db_path, read_only=False)
-
-            # Tạo sequence trước
-            try:
-                con.execute("CREATE SEQUENCE seq_attendance_raw START 1")
-            except Exception:
-                pass  # Sequence đã tồn tại
-
-            con.execute(
-                """
-                CREATE TABLE IF NOT EXISTS attendance_raw (
-                    id INTEGER PRIMARY KEY DEFAULT nextval('seq_attendance_raw'),
-                    user_id VARCHAR NOT NULL,
-                    user_name VARCHAR,
-                    timestamp TIMESTAMP NOT NULL,
-                    status INTEGER,
-                    punch INTEGER,
-                    uid BIGINT,
-                    device_sn VARCHAR,
-                    device_id INTEGER,
-                    note VARCHAR,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, timestamp, device_sn)
-                )
-                """
-            )
-            con.commit()
-            con.close()
-            log_to_debug("AttendanceRawRepository: Table attendance_raw initialized successfully")
-        except Exception as e:
-            log_to_debug(
-                f"AttendanceRawRepository: _init_table() error: {e}\n{traceback.format_exc()}"
-            )
 
     def insert(self, user_id, user_name, timestamp, status, punch, uid, device_sn, device_id, note=""):
         """
@@ -81,21 +137,23 @@ class AttendanceRawRepository:
             log_to_debug(
                 f"AttendanceRawRepository: insert() - user_id={user_id}, timestamp={timestamp}"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            
-            # Insert hoặc ignore nếu đã tồn tại (dựa vào UNIQUE constraint)
-            con.execute(
-                """
-                INSERT INTO attendance_raw 
-                (user_id, user_name, timestamp, status, punch, uid, device_sn, device_id, note)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT DO NOTHING
-                """,
-                [user_id, user_name, timestamp, status, punch, uid, device_sn, device_id, note],
-            )
-            con.commit()
-            con.close()
+            with Database.transaction() as con:
+                # Insert hoặc ignore nếu đã tồn tại (dựa vào UNIQUE constraint)
+                con.execute(
+                    """
+                    INSERT INTO attendance_raw 
+                    (user_id, user_name, timestamp, status, punch, uid, device_sn, device_id, note)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT DO NOTHING
+                    """,
+                    [user_id, user_name, timestamp, status, punch, uid, device_sn, device_id, note],
+                )
+                AttendanceDailyRepository.refresh_keys(
+                    con, "SELECT ?::VARCHAR, ?::TIMESTAMP", [user_id, timestamp]
+                )
             log_to_debug("AttendanceRawRepository: insert() success")
+            ChangeBus.publish("attendance_raw", OP_INSERT)
+            ChangeBus.publish("attendance_daily", OP_UPDATE)
             return True
         except Exception as e:
             log_to_debug(
@@ -109,37 +167,70 @@ class AttendanceRawRepository:
         Args:
             records: List of tuples (user_id, user_name, timestamp, status, punch, uid, device_sn, device_id, note)
         Returns:
-            tuple: (success_count, total_count)
+            tuple: (inserted_count, total_count) - số bản ghi thực sự được thêm mới
         """
+        result = self.ingest_batch(AttendanceRawBatch.from_records(records))
+        if result is None:
+            return 0, len(records)
+        return result[0], len(records)
+
+    def ingest_batch(self, batch):
+        """
+        Mô tả:
+            Nạp một lô chấm công dạng cột bằng MỘT câu INSERT ... SELECT.
+            Bản ghi trùng khóa (user_id, timestamp, device_sn) - trong lô hoặc đã có
+            trong bảng - bị bỏ qua bằng anti-join thay vì ON CONFLICT từng dòng.
+            Khóa so sánh bằng IS NOT DISTINCT FROM: NULL trùng NULL (ràng buộc UNIQUE
+            của bảng coi các NULL là khác nhau nên không chặn được các dòng này).
+            Cùng transaction, attendance_daily được tính lại cho các (user_id, ngày) của lô.
+        Args:
+            batch: AttendanceRawBatch
+        Returns:
+            tuple: (inserted_count, skipped_count); None nếu lỗi
+        """
+        total = len(batch)
+        if total == 0:
+            return 0, 0
+
         try:
-            log_to_debug(f"AttendanceRawRepository: bulk_insert() - {len(records)} records")
-            con = duckdb.connect(self.db_path, read_only=False)
-            
-            success_count = 0
-            for record in records:
-                try:
-                    con.execute(
-                        """
-                        INSERT INTO attendance_raw 
+            log_to_debug(f"AttendanceRawRepository: ingest_batch() - {total} records")
+            with Database.transaction() as con:
+                with _staged_batch(con, batch) as stage:
+                    row = con.execute(
+                        f"""
+                        INSERT INTO attendance_raw
                         (user_id, user_name, timestamp, status, punch, uid, device_sn, device_id, note)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ON CONFLICT DO NOTHING
-                        """,
-                        record,
-                    )
-                    success_count += 1
-                except Exception:
-                    pass  # Skip duplicates
-            
-            con.commit()
-            con.close()
-            log_to_debug(f"AttendanceRawRepository: bulk_insert() - inserted {success_count}/{len(records)}")
-            return success_count, len(records)
+                        SELECT s.user_id, s.user_name, s.timestamp, s.status, s.punch,
+                               s.uid, s.device_sn, s.device_id, s.note
+                        FROM (
+                            SELECT DISTINCT ON (user_id, timestamp, device_sn) *
+                            FROM {stage}
+                        ) s
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM attendance_raw a
+                            WHERE a.user_id IS NOT DISTINCT FROM s.user_id
+                              AND a.timestamp IS NOT DISTINCT FROM s.timestamp
+                              AND a.device_sn IS NOT DISTINCT FROM s.device_sn
+                        )
+                        """
+                    ).fetchone()
+                    if row and row[0]:
+                        AttendanceDailyRepository.refresh_keys(
+                            con, f"SELECT DISTINCT user_id, CAST(timestamp AS DATE) FROM {stage}"
+                        )
+            inserted = row[0] if row else 0
+            log_to_debug(
+                f"AttendanceRawRepository: ingest_batch() - inserted {inserted}, skipped {total - inserted}"
+            )
+            if inserted:
+                ChangeBus.publish("attendance_raw", OP_INSERT)
+                ChangeBus.publish("attendance_daily", OP_UPDATE)
+            return inserted, total - inserted
         except Exception as e:
             log_to_debug(
-                f"AttendanceRawRepository: bulk_insert() error: {e}\n{traceback.format_exc()}"
+                f"AttendanceRawRepository: ingest_batch() error: {e}\n{traceback.format_exc()}"
             )
-            return 0, len(records) if records else 0
+            return None
 
     def get_all(self, from_date=None, to_date=None, device_id=None):
         """
@@ -153,53 +244,19 @@ class AttendanceRawRepository:
         """
         try:
             log_to_debug(f"AttendanceRawRepository: get_all() - from_date={from_date}, to_date={to_date}, device_id={device_id}")
-            con = duckdb.connect(self.db_path, read_only=True)
-            
-            query = """
-                SELECT id, user_id, user_name, timestamp, status, punch, 
-                       uid, device_sn, device_id, note, created_at
-                FROM attendance_raw
-                WHERE 1=1
-            """
-            params = []
-            
-            if from_date:
-                query += " AND DATE(timestamp) >= ?"
-                params.append(from_date)
-            
-            if to_date:
-                query += " AND DATE(timestamp) <= ?"
-                params.append(to_date)
-            
-            if device_id:
-                query += " AND device_id = ?"
-                params.append(device_id)
-            
-            query += " ORDER BY timestamp ASC"  # Đổi từ DESC sang ASC để dễ đọc theo thời gian
-            
-            log_to_debug(f"AttendanceRawRepository: Query={query}, Params={params}")
-            result = con.execute(query, params).fetchall()
-            con.close()
-            log_to_debug(f"AttendanceRawRepository: Found {len(result)} records")
-
-            records = []
-            for row in result:
-                records.append(
-                    {
-                        "id": row[0],
-                        "user_id": row[1],
-                        "user_name": row[2],
-                        "timestamp": row[3],
-                        "status": row[4],
-                        "punch": row[5],
-                        "uid": row[6],
-                        "device_sn": row[7],
-                        "device_id": row[8],
-                        "note": row[9],
-                        "created_at": row[10],
-                    }
-                )
+            where, params = _raw_filter(from_date, to_date, device_id)
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    f"""
+                    SELECT {", ".join(RAW_COLUMNS)}
+                    FROM attendance_raw
+                    WHERE 1=1 {where}
+                    ORDER BY timestamp ASC, id ASC
+                    """,
+                    params,
+                ).fetchall()
 
+            records = [dict(zip(RAW_COLUMNS, row)) for row in result]
             log_to_debug(f"AttendanceRawRepository: get_all() returned {len(records)} records")
             return records
         except Exception as e:
@@ -212,21 +269,22 @@ class AttendanceRawRepository:
         """
         Xóa toàn bộ dữ liệu chấm công
         Returns:
-            bool: True nếu thành công
+            int: Số bản ghi đã xóa; None nếu lỗi
         """
         try:
             log_to_debug("AttendanceRawRepository: delete_all() called")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("DELETE FROM attendance_raw")
-            con.commit()
-            con.close()
-            log_to_debug("AttendanceRawRepository: delete_all() success")
-            return True
+            with Database.transaction() as con:
+                deleted = con.execute("DELETE FROM attendance_raw").fetchone()[0]
+                con.execute("DELETE FROM attendance_daily")
+            log_to_debug(f"AttendanceRawRepository: delete_all() - deleted {deleted} records")
+            ChangeBus.publish("attendance_raw", OP_DELETE)
+            ChangeBus.publish("attendance_daily", OP_DELETE)
+            return deleted
         except Exception as e:
             log_to_debug(
                 f"AttendanceRawRepository: delete_all() error: {e}\n{traceback.format_exc()}"
             )
-            return False
+            return None
 
     def delete_by_id(self, record_id):
         """
@@ -236,19 +294,158 @@ class AttendanceRawRepository:
         Returns:
             bool: True nếu thành công
         """
+        return self.delete_by_ids([record_id]) is not None
+
+    def delete_by_ids(self, record_ids):
+        """
+        Mô tả:
+            Xóa nhiều bản ghi theo danh sách ID bằng MỘT câu DELETE trong một transaction
+            (attendance_daily được tính lại cho các (user_id, ngày) bị ảnh hưởng).
+        Args:
+            record_ids: Danh sách ID bản ghi
+        Returns:
+            tuple: (deleted_count, device_ids) - device_ids: các thiết bị có bản ghi bị xóa;
+                   None nếu lỗi
+        """
+        record_ids = [int(i) for i in record_ids if i is not None]
+        if not record_ids:
+            return 0, []
+        return self._delete_where(
+            " AND id IN (SELECT CAST(unnest(string_split($ids, chr(31))) AS BIGINT))",
+            {"ids": Database.list_param(record_ids)},
+            "delete_by_ids",
+            event_ids=record_ids,
+        )
+
+    def delete_by_user_dates(self, pairs):
+        """
+        Mô tả:
+            Xóa mọi bản ghi của các cặp (user_id, ngày) trong một transaction.
+            Các cặp được join (hash join) với attendance_raw thay vì so từng dòng; khoảng
+            ngày min..max so trực tiếp trên cột timestamp để bỏ qua row group ngoài khoảng.
+        Args:
+            pairs: Danh sách (user_id, ngày) - ngày là date / datetime / chuỗi 'YYYY-MM-DD'
+        Returns:
+            tuple: (deleted_count, device_ids); None nếu lỗi
+        """
+        keys = {(str(user_id), str(day)[:10]) for user_id, day in pairs if user_id is not None and day}
+        if not keys:
+            return 0, []
+        users, days = map(list, zip(*keys))
+        return self._delete_where(
+            """
+            AND timestamp >= CAST($min_date AS DATE)
+            AND timestamp < CAST($max_date AS DATE) + INTERVAL 1 DAY
+            AND id IN (
+                SELECT r.id
+                FROM attendance_raw r
+                JOIN (SELECT unnest(string_split($users, chr(31))) AS user_id,
+                             CAST(unnest(string_split($days, chr(31))) AS DATE) AS work_date) k
+                  ON k.user_id = r.user_id AND k.work_date = CAST(r.timestamp AS DATE)
+                WHERE r.timestamp >= CAST($min_date AS DATE)
+                  AND r.timestamp < CAST($max_date AS DATE) + INTERVAL 1 DAY
+            )
+            """,
+            {
+                "users": Database.list_param(users),
+                "days": Database.list_param(days),
+                "min_date": min(days),
+                "max_date": max(days),
+            },
+            "delete_by_user_dates",
+        )
+
+    def delete_where(self, from_date=None, to_date=None, device_id=None, user_ids=None):
+        """
+        Mô tả:
+            Xóa các bản ghi thỏa điều kiện (thiết bị, khoảng ngày, danh sách mã chấm công)
+            bằng một câu DELETE trong một transaction. Không truyền điều kiện nào = xóa hết.
+        Args:
+            from_date: Từ ngày (optional)
+            to_date: Đến ngày (optional)
+            device_id: ID thiết bị (optional)
+            user_ids: Chỉ xóa bản ghi của các mã chấm công này (optional)
+        Returns:
+            tuple: (deleted_count, device_ids); None nếu lỗi
+        """
+        where, params = _raw_filter(from_date, to_date, device_id)
+        if user_ids is not None:
+            user_ids = [str(u) for u in user_ids if u is not None]
+            if not user_ids:
+                return 0, []
+            where += " AND user_id IN (SELECT unnest(string_split($user_ids, chr(31))))"
+            params["user_ids"] = Database.list_param(user_ids)
+        return self._delete_where(where, params, "delete_where")
+
+    def _delete_where(self, where, params, label, event_ids=None):
+        """
+        Mô tả:
+            Phần chung của các hàm xóa hàng loạt: ghi nhận khóa (user_id, ngày) cần tính
+            lại, lấy các thiết bị bị ảnh hưởng, DELETE rồi tính lại attendance_daily -
+            tất cả trong một transaction.
+        Args:
+            where: Điều kiện bắt đầu bằng AND (tham số có tên)
+            params: dict tham số của where
+            label: Tên hàm gọi (ghi log)
+            event_ids: ID gửi kèm sự kiện ChangeBus (None = không rõ)
+        Returns:
+            tuple: (deleted_count, device_ids); None nếu lỗi
+        """
         try:
-            log_to_debug(f"AttendanceRawRepository: delete_by_id() - id={record_id}")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("DELETE FROM attendance_raw WHERE id = ?", [record_id])
-            con.commit()
-            con.close()
-            log_to_debug("AttendanceRawRepository: delete_by_id() success")
-            return True
+            with Database.transaction() as con:
+                AttendanceDailyRepository.stage_keys(
+                    con,
+                    f"""
+                    SELECT DISTINCT user_id, CAST(timestamp AS DATE)
+                    FROM attendance_raw WHERE 1=1 {where}
+                    """,
+                    params,
+                )
+                device_ids = [
+                    r[0]
+                    for r in con.execute(
+                        f"SELECT DISTINCT device_id FROM attendance_raw WHERE 1=1 {where}",
+                        params,
+                    ).fetchall()
+                    if r[0] is not None
+                ]
+                row = con.execute(
+                    f"DELETE FROM attendance_raw WHERE 1=1 {where}", params
+                ).fetchone()
+                AttendanceDailyRepository.refresh_staged(con)
+            deleted = row[0] if row else 0
+            log_to_debug(
+                f"AttendanceRawRepository: {label}() - deleted {deleted}, devices={device_ids}"
+            )
+            if deleted:
+                ChangeBus.publish("attendance_raw", OP_DELETE, event_ids)
+                ChangeBus.publish("attendance_daily", OP_UPDATE)
+            return deleted, device_ids
         except Exception as e:
             log_to_debug(
-                f"AttendanceRawRepository: delete_by_id() error: {e}\n{traceback.format_exc()}"
+                f"AttendanceRawRepository: {label}() error: {e}\n{traceback.format_exc()}"
             )
-            return False
+            return None
+
+    def get_device_id(self, record_id):
+        """
+        Lấy ID thiết bị của một bản ghi chấm công
+        Args:
+            record_id: ID của bản ghi
+        Returns:
+            int: ID thiết bị, hoặc None nếu không tìm thấy
+        """
+        try:
+            with Database.get_cursor() as con:
+                row = con.execute(
+                    "SELECT device_id FROM attendance_raw WHERE id = ?", [record_id]
+                ).fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            log_to_debug(
+                f"AttendanceRawRepository: get_device_id() error: {e}\n{traceback.format_exc()}"
+            )
+            return None
 
     def delete_by_device(self, device_id):
         """
@@ -258,19 +455,9 @@ class AttendanceRawRepository:
         Returns:
             bool: True nếu thành công
         """
-        try:
-            log_to_debug(f"AttendanceRawRepository: delete_by_device() - device_id={device_id}")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("DELETE FROM attendance_raw WHERE device_id = ?", [device_id])
-            con.commit()
-            con.close()
-            log_to_debug("AttendanceRawRepository: delete_by_device() success")
+        if device_id is None:
             return True
-        except Exception as e:
-            log_to_debug(
-                f"AttendanceRawRepository: delete_by_device() error: {e}\n{traceback.format_exc()}"
-            )
-            return False
+        return self.delete_where(device_id=device_id) is not None
 
     def get_count(self):
         """
@@ -279,12 +466,79 @@ class AttendanceRawRepository:
             int: Số lượng bản ghi
         """
         try:
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute("SELECT COUNT(*) FROM attendance_raw").fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute("SELECT COUNT(*) FROM attendance_raw").fetchone()
             return result[0] if result else 0
         except Exception as e:
             log_to_debug(
                 f"AttendanceRawRepository: get_count() error: {e}\n{traceback.format_exc()}"
             )
             return 0
+
+
+def _raw_filter(from_date=None, to_date=None, device_id=None):
+    """
+    Mô tả:
+        Điều kiện WHERE dùng chung khi đọc attendance_raw. Khoảng ngày được so trực
+        tiếp trên cột timestamp (không bọc DATE()) để DuckDB bỏ qua các row group
+        nằm ngoài khoảng nhờ min/max của cột.
+    Returns:
+        tuple: (sql, params) - sql gồm các điều kiện bắt đầu bằng AND, params dict tham số có tên
+    """
+    sql, params = "", {}
+    if from_date:
+        sql += " AND timestamp >= CAST($from_date AS DATE)"
+        params["from_date"] = from_date
+    if to_date:
+        sql += " AND timestamp < CAST($to_date AS DATE) + INTERVAL 1 DAY"
+        params["to_date"] = to_date
+    if device_id:
+        sql += " AND device_id = $device_id"
+        params["device_id"] = device_id
+    return sql, params
+
+
+# Tên bảng ảo của lô đang nạp (đăng ký trên cursor của thread, gỡ ngay khi xong)
+_STAGE_NAME = "attendance_raw_stage"
+
+
+def _stage_array(values, sql_type):
+    """
+    Một cột của lô -> numpy array có kiểu để DuckDB quét thẳng (không suy kiểu từng ô):
+    chuỗi là object array của str, thời gian là datetime64 (None -> NaT), số nguyên là
+    float64 (None -> NaN). NaT / NaN được DuckDB đọc thành NULL.
+    """
+    if sql_type == "VARCHAR":
+        return np.array([None if v is None else str(v) for v in values], dtype=object)
+    if sql_type == "TIMESTAMP":
+        return np.array(values, dtype="datetime64[us]")
+    return np.array(values, dtype=np.float64)
+
+
+@contextmanager
+def _staged_batch(con, batch):
+    """
+    Mô tả:
+        Đăng ký lô chấm công (các cột numpy) làm bảng ảo trên cursor con và trả về
+        biểu thức FROM ép đúng kiểu từng cột, để DuckDB đọc cả lô như một bảng trong câu
+        INSERT ... SELECT mà không ghi ra đĩa. Bảng ảo được gỡ khi thoát context.
+    Args:
+        con: Cursor DuckDB sẽ chạy câu SQL (bảng ảo chỉ thấy được trên cursor này)
+        batch: AttendanceRawBatch
+    Returns:
+        str: Biểu thức FROM dùng được trong câu SQL
+    """
+    # Cột chuỗi chỉ chứa str / None: bỏ bước lấy mẫu suy kiểu object (chậm hơn cả lần nạp)
+    con.execute("SET pandas_analyze_sample = 0")
+    try:
+        con.register(
+            _STAGE_NAME,
+            {name: _stage_array(batch.columns[name], _BATCH_TYPES[name]) for name in BATCH_COLUMNS},
+        )
+        casts = ", ".join(
+            f"CAST({name} AS {_BATCH_TYPES[name]}) AS {name}" for name in BATCH_COLUMNS
+        )
+        yield f"(SELECT {casts} FROM {_STAGE_NAME})"
+    finally:
+        con.unregister(_STAGE_NAME)
+        con.execute("RESET pandas_analyze_sample")
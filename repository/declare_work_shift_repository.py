@@ -12,66 +12,27 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
-import duckdb
 from core.database import Database
+from core.change_bus import ChangeBus, OP_DELETE, OP_INSERT, OP_UPDATE
 
 
 class DeclareWorkShiftRepository:
     def __init__(self):
         self.db_path = Database.get_db_path()
-        self._init_table()
-
-    def _init_table(self):
-        """Khởi tạo bảng declare_work_shift nếu chưa tồn tại"""
-        try:
-            log_to_debug("DeclareWorkShiftRepository: _init_table() called")
-            con = duckdb.connect(self.db_path, read_only=False)
-
-            # Tạo sequence trước
-            try:
-                con.execute("CREATE SEQUENCE seq_declare_work_shift START 1")
-            except Exception:
-                # Sequence đã tồn tại, bỏ qua im lặng
-                pass
-
-            con.execute(
-                """
-                CREATE TABLE IF NOT EXISTS declare_work_shift (
-                    id INTEGER PRIMARY KEY DEFAULT nextval('seq_declare_work_shift'),
-                    shift_code VARCHAR NOT NULL,
-                    start_time TIME NOT NULL,
-                    end_time TIME NOT NULL,
-                    lunch_start TIME,
-                    lunch_end TIME,
-                    total_minutes INTEGER DEFAULT 0,
-                    work_day_count DECIMAL(10, 2) DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-
-            con.close()
-            log_to_debug("DeclareWorkShiftRepository: Table initialized successfully")
-        except Exception as e:
-            log_to_debug(
-                f"DeclareWorkShiftRepository: _init_table() error: {e}\n{traceback.format_exc()}"
-            )
 
     def get_all_work_shifts(self):
         """Lấy tất cả ca làm việc"""
         try:
             log_to_debug("DeclareWorkShiftRepository: get_all_work_shifts() called")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                """
-                SELECT id, shift_code, start_time, end_time, lunch_start, lunch_end, 
-                       total_minutes, work_day_count
-                FROM declare_work_shift 
-                ORDER BY id ASC
-                """
-            ).fetchall()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    """
+                    SELECT id, shift_code, start_time, end_time, lunch_start, lunch_end, 
+                           total_minutes, work_day_count
+                    FROM declare_work_shift 
+                    ORDER BY id ASC
+                    """
+                ).fetchall()
 
             work_shifts = [
                 {
@@ -102,17 +63,16 @@ class DeclareWorkShiftRepository:
             log_to_debug(
                 f"DeclareWorkShiftRepository: get_work_shift_by_id({work_shift_id}) called"
             )
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                """
-                SELECT id, shift_code, start_time, end_time, lunch_start, lunch_end, 
-                       total_minutes, work_day_count
-                FROM declare_work_shift 
-                WHERE id=?
-                """,
-                [work_shift_id],
-            ).fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    """
+                    SELECT id, shift_code, start_time, end_time, lunch_start, lunch_end, 
+                           total_minutes, work_day_count
+                    FROM declare_work_shift 
+                    WHERE id=?
+                    """,
+                    [work_shift_id],
+                ).fetchone()
 
             if result:
                 work_shift = {
@@ -155,25 +115,26 @@ class DeclareWorkShiftRepository:
             log_to_debug(
                 f"DeclareWorkShiftRepository: add_work_shift(shift_code={shift_code}) called"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                """
-                INSERT INTO declare_work_shift 
-                (shift_code, start_time, end_time, lunch_start, lunch_end, total_minutes, work_day_count)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                [
-                    shift_code,
-                    start_time,
-                    end_time,
-                    lunch_start,
-                    lunch_end,
-                    total_minutes,
-                    work_day_count,
-                ],
-            )
-            con.close()
+            with Database.get_cursor() as con:
+                row = con.execute(
+                    """
+                    INSERT INTO declare_work_shift 
+                    (shift_code, start_time, end_time, lunch_start, lunch_end, total_minutes, work_day_count)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    RETURNING id
+                    """,
+                    [
+                        shift_code,
+                        start_time,
+                        end_time,
+                        lunch_start,
+                        lunch_end,
+                        total_minutes,
+                        work_day_count,
+                    ],
+                ).fetchone()
             log_to_debug("DeclareWorkShiftRepository: add_work_shift() success")
+            ChangeBus.publish("declare_work_shift", OP_INSERT, [row[0]] if row else None)
             return True
         except Exception as e:
             log_to_debug(
@@ -197,27 +158,27 @@ class DeclareWorkShiftRepository:
             log_to_debug(
                 f"DeclareWorkShiftRepository: update_work_shift(id={work_shift_id}) called"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                """
-                UPDATE declare_work_shift 
-                SET shift_code=?, start_time=?, end_time=?, lunch_start=?, lunch_end=?, 
-                    total_minutes=?, work_day_count=?, updated_at=CURRENT_TIMESTAMP
-                WHERE id=?
-                """,
-                [
-                    shift_code,
-                    start_time,
-                    end_time,
-                    lunch_start,
-                    lunch_end,
-                    total_minutes,
-                    work_day_count,
-                    work_shift_id,
-                ],
-            )
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute(
+                    """
+                    UPDATE declare_work_shift 
+                    SET shift_code=?, start_time=?, end_time=?, lunch_start=?, lunch_end=?, 
+                        total_minutes=?, work_day_count=?, updated_at=CURRENT_TIMESTAMP
+                    WHERE id=?
+                    """,
+                    [
+                        shift_code,
+                        start_time,
+                        end_time,
+                        lunch_start,
+                        lunch_end,
+                        total_minutes,
+                        work_day_count,
+                        work_shift_id,
+                    ],
+                )
             log_to_debug("DeclareWorkShiftRepository: update_work_shift() success")
+            ChangeBus.publish("declare_work_shift", OP_UPDATE, [work_shift_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -231,10 +192,10 @@ class DeclareWorkShiftRepository:
             log_to_debug(
                 f"DeclareWorkShiftRepository: delete_work_shift(id={work_shift_id}) called"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("DELETE FROM declare_work_shift WHERE id=?", [work_shift_id])
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute("DELETE FROM declare_work_shift WHERE id=?", [work_shift_id])
             log_to_debug("DeclareWorkShiftRepository: delete_work_shift() success")
+            ChangeBus.publish("declare_work_shift", OP_DELETE, [work_shift_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -246,9 +207,8 @@ class DeclareWorkShiftRepository:
         """Lấy tổng số ca làm việc"""
         try:
             log_to_debug("DeclareWorkShiftRepository: get_total_count() called")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute("SELECT COUNT(*) FROM declare_work_shift").fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute("SELECT COUNT(*) FROM declare_work_shift").fetchone()
             count = result[0] if result else 0
             log_to_debug(
                 f"DeclareWorkShiftRepository: get_total_count() result: {count}"
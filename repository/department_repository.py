@@ -12,54 +12,21 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
-import duckdb
 from core.database import Database
+from core.change_bus import ChangeBus, OP_DELETE, OP_INSERT, OP_UPDATE
 
 
 class DepartmentRepository:
     def __init__(self):
         self.db_path = Database.get_db_path()
-        self._init_table()
-
-    def _init_table(self):
-        """Khởi tạo bảng department nếu chưa tồn tại"""
-        try:
-            log_to_debug("DepartmentRepository: _init_table() called")
-            con = duckdb.connect(self.db_path, read_only=False)
-
-            # Tạo sequence trước
-            try:
-                con.execute("CREATE SEQUENCE seq_department START 1")
-            except Exception:
-                pass  # Sequence đã tồn tại
-
-            con.execute(
-                """
-                CREATE TABLE IF NOT EXISTS department (
-                    id INTEGER PRIMARY KEY DEFAULT nextval('seq_department'),
-                    name VARCHAR UNIQUE NOT NULL,
-                    parent_id INTEGER NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-
-            con.close()
-            log_to_debug("DepartmentRepository: Table initialized successfully")
-        except Exception as e:
-            log_to_debug(
-                f"DepartmentRepository: _init_table() error: {e}\n{traceback.format_exc()}"
-            )
 
     def get_all(self):
         """Lấy tất cả phòng ban (id, name, parent_id)"""
         try:
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                "SELECT id, name, parent_id FROM department ORDER BY id ASC"
-            ).fetchall()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    "SELECT id, name, parent_id FROM department ORDER BY id ASC"
+                ).fetchall()
             return [{"id": r[0], "name": r[1], "parent_id": r[2]} for r in result]
         except Exception as e:
             log_to_debug(
@@ -69,11 +36,10 @@ class DepartmentRepository:
 
     def get_by_id(self, dep_id):
         try:
-            con = duckdb.connect(self.db_path, read_only=True)
-            r = con.execute(
-                "SELECT id, name, parent_id FROM department WHERE id=?", [dep_id]
-            ).fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                r = con.execute(
+                    "SELECT id, name, parent_id FROM department WHERE id=?", [dep_id]
+                ).fetchone()
             if r:
                 return {"id": r[0], "name": r[1], "parent_id": r[2]}
             return None
@@ -84,13 +50,25 @@ class DepartmentRepository:
             return None
 
     def add(self, name, parent_id=None):
+        """Thêm phòng ban và các cặp (tổ tiên, con cháu) của nó vào department_closure"""
         try:
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                "INSERT INTO department (name, parent_id) VALUES (?, ?)",
-                [name, parent_id],
-            )
-            con.close()
+            with Database.transaction() as con:
+                row = con.execute(
+                    "INSERT INTO department (name, parent_id) VALUES (?, ?) RETURNING id",
+                    [name, parent_id],
+                ).fetchone()
+                dep_id = row[0]
+                con.execute(
+                    """
+                    INSERT INTO department_closure (ancestor_id, descendant_id, depth)
+                    SELECT ?, ?, 0
+                    UNION ALL
+                    SELECT ancestor_id, ?, depth + 1
+                    FROM department_closure WHERE descendant_id = ?
+                    """,
+                    [dep_id, dep_id, dep_id, parent_id],
+                )
+            ChangeBus.publish("department", OP_INSERT, [dep_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -99,13 +77,35 @@ class DepartmentRepository:
             return False
 
     def update(self, dep_id, name, parent_id=None):
+        """
+        Cập nhật phòng ban. Khi đổi phòng ban cha, cả nhánh con được chuyển theo
+        trong department_closure; không cho phép chuyển vào chính nhánh con của nó.
+        """
         try:
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                "UPDATE department SET name=?, parent_id=?, updated_at=now() WHERE id=?",
-                [name, parent_id, dep_id],
-            )
-            con.close()
+            with Database.transaction() as con:
+                old = con.execute(
+                    "SELECT parent_id FROM department WHERE id = ?", [dep_id]
+                ).fetchone()
+                if parent_id is not None and con.execute(
+                    """
+                    SELECT 1 FROM department_closure
+                    WHERE ancestor_id = ? AND descendant_id = ?
+                    """,
+                    [dep_id, parent_id],
+                ).fetchone():
+                    log_to_debug(
+                        f"DepartmentRepository: update() - phòng ban cha {parent_id} "
+                        f"nằm trong nhánh của {dep_id}"
+                    )
+                    return False
+
+                con.execute(
+                    "UPDATE department SET name=?, parent_id=?, updated_at=now() WHERE id=?",
+                    [name, parent_id, dep_id],
+                )
+                if old and old[0] != parent_id:
+                    self._move_subtree(con, dep_id, parent_id)
+            ChangeBus.publish("department", OP_UPDATE, [dep_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -113,27 +113,58 @@ class DepartmentRepository:
             )
             return False
 
+    @staticmethod
+    def _move_subtree(con, dep_id, parent_id):
+        """Gỡ nhánh dep_id khỏi tổ tiên cũ và gắn vào các tổ tiên của parent_id"""
+        con.execute(
+            """
+            DELETE FROM department_closure
+            WHERE descendant_id IN (
+                SELECT descendant_id FROM department_closure WHERE ancestor_id = $id
+            )
+            AND ancestor_id NOT IN (
+                SELECT descendant_id FROM department_closure WHERE ancestor_id = $id
+            )
+            """,
+            {"id": dep_id},
+        )
+        if parent_id is None:
+            return
+        con.execute(
+            """
+            INSERT INTO department_closure (ancestor_id, descendant_id, depth)
+            SELECT a.ancestor_id, d.descendant_id, a.depth + d.depth + 1
+            FROM department_closure a
+            CROSS JOIN department_closure d
+            WHERE a.descendant_id = $parent_id AND d.ancestor_id = $id
+            """,
+            {"id": dep_id, "parent_id": parent_id},
+        )
+
     def delete(self, dep_id):
         try:
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("DELETE FROM department WHERE id=?", [dep_id])
-
-            # Kiểm tra xem còn bản ghi nào không
-            count_result = con.execute("SELECT COUNT(*) FROM department").fetchone()
-            record_count = count_result[0] if count_result else 0
-
-            # Nếu không còn bản ghi nào, reset sequence bằng cách drop và tạo lại
-            if record_count == 0:
-                try:
-                    con.execute("DROP SEQUENCE seq_department")
-                    con.execute("CREATE SEQUENCE seq_department START 1")
-                    log_to_debug("DepartmentRepository: Sequence dropped and recreated")
-                except Exception as seq_error:
-                    log_to_debug(
-                        f"DepartmentRepository: Error resetting sequence: {seq_error}"
-                    )
-
-            con.close()
+            with Database.transaction() as con:
+                con.execute(
+                    "DELETE FROM department_closure WHERE descendant_id = ? OR ancestor_id = ?",
+                    [dep_id, dep_id],
+                )
+                con.execute("DELETE FROM department WHERE id=?", [dep_id])
+
+                # Kiểm tra xem còn bản ghi nào không
+                count_result = con.execute("SELECT COUNT(*) FROM department").fetchone()
+                record_count = count_result[0] if count_result else 0
+
+                # Nếu không còn bản ghi nào, reset sequence bằng cách drop và tạo lại
+                if record_count == 0:
+                    try:
+                        con.execute("DROP SEQUENCE seq_department")
+                        con.execute("CREATE SEQUENCE seq_department START 1")
+                        log_to_debug("DepartmentRepository: Sequence dropped and recreated")
+                    except Exception as seq_error:
+                        log_to_debug(
+                            f"DepartmentRepository: Error resetting sequence: {seq_error}"
+                        )
+            ChangeBus.publish("department", OP_DELETE, [dep_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -141,11 +172,27 @@ class DepartmentRepository:
             )
             return False
 
+    def get_closure(self):
+        """
+        Lấy toàn bộ bảng department_closure
+        Returns:
+            list: Danh sách tuple (ancestor_id, descendant_id, depth)
+        """
+        try:
+            with Database.get_cursor() as con:
+                return con.execute(
+                    "SELECT ancestor_id, descendant_id, depth FROM department_closure"
+                ).fetchall()
+        except Exception as e:
+            log_to_debug(
+                f"DepartmentRepository: get_closure() error: {e}\n{traceback.format_exc()}"
+            )
+            return []
+
     def count(self):
         try:
-            con = duckdb.connect(self.db_path, read_only=True)
-            r = con.execute("SELECT COUNT(*) FROM department").fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                r = con.execute("SELECT COUNT(*) FROM department").fetchone()
             return r[0] if r else 0
         except Exception as e:
             log_to_debug(
@@ -156,57 +203,14 @@ class DepartmentRepository:
     def has_children(self, dep_id):
         """Kiểm tra phòng ban có phòng ban con không"""
         try:
-            con = duckdb.connect(self.db_path, read_only=True)
-            r = con.execute(
-                "SELECT COUNT(*) FROM department WHERE parent_id = ?",
-                [dep_id],
-            ).fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                r = con.execute(
+                    "SELECT COUNT(*) FROM department WHERE parent_id = ?",
+                    [dep_id],
+                ).fetchone()
             return (r[0] if r else 0) > 0
         except Exception as e:
             log_to_debug(
                 f"DepartmentRepository: has_children() error: {e}\n{traceback.format_exc()}"
             )
             return False
-
-    def get_hierarchy_flat(self):
-        """Trả về danh sách phòng ban theo thứ tự cây, có prefix '├─' hoặc '└─' theo cấp"""
-        nodes = self.get_all()
-        by_parent = {}
-        for n in nodes:
-            by_parent.setdefault(n["parent_id"], []).append(n)
-
-        result = []
-
-        def dfs(parent_id, level, is_last=False, prefix=""):
-            children = sorted(
-                by_parent.get(parent_id, []), key=lambda x: x["name"].lower()
-            )
-            for idx, n in enumerate(children):
-                is_last_child = idx == len(children) - 1
-
-                if level == 0:
-                    current_prefix = ""
-                else:
-                    branch = "└─ " if is_last_child else "├─ "
-                    current_prefix = prefix + branch
-
-                result.append(
-                    {
-                        "id": n["id"],
-                        "name": n["name"],
-                        "display_name": f"{current_prefix}{n['name']}",
-                        "parent_id": n["parent_id"],
-                        "level": level,
-                    }
-                )
-
-                if level == 0:
-                    next_prefix = ""
-                else:
-                    next_prefix = prefix + ("    " if is_last_child else "│   ")
-
-                dfs(n["id"], level + 1, is_last_child, next_prefix)
-
-        dfs(None, 0)
-        return result
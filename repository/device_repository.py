@@ -12,8 +12,8 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
-import duckdb
 from core.database import Database
+from core.change_bus import ChangeBus, OP_DELETE, OP_INSERT, OP_UPDATE
 
 
 class DeviceRepository:
@@ -21,43 +21,6 @@ class DeviceRepository:
 
     def __init__(self):
         self.db_path = Database.get_db_path()
-        self._init_table()
-
-    def _init_table(self):
-        """Khởi tạo bảng device nếu chưa tồn tại"""
-        try:
-            log_to_debug("DeviceRepository: _init_table() called")
-            con = duckdb.connect(self.db_path, read_only=False)
-
-            # Tạo sequence trước
-            try:
-                con.execute("CREATE SEQUENCE seq_device START 1")
-            except Exception:
-                pass  # Sequence đã tồn tại
-
-            con.execute(
-                """
-                CREATE TABLE IF NOT EXISTS device (
-                    id INTEGER PRIMARY KEY DEFAULT nextval('seq_device'),
-                    device_number VARCHAR UNIQUE NOT NULL,
-                    device_name VARCHAR NOT NULL,
-                    ip_address VARCHAR NOT NULL,
-                    password VARCHAR,
-                    port INTEGER DEFAULT 4370,
-                    status VARCHAR DEFAULT 'Chưa kết nối',
-                    note VARCHAR,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-            con.commit()
-            con.close()
-            log_to_debug("DeviceRepository: Table device initialized successfully")
-        except Exception as e:
-            log_to_debug(
-                f"DeviceRepository: _init_table() error: {e}\n{traceback.format_exc()}"
-            )
 
     def insert(self, device_number, device_name, ip_address, password="", port=4370, note=""):
         """
@@ -76,17 +39,17 @@ class DeviceRepository:
             log_to_debug(
                 f"DeviceRepository: insert() - device_number={device_number}, device_name={device_name}, ip={ip_address}"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                """
-                INSERT INTO device (device_number, device_name, ip_address, password, port, note, status)
-                VALUES (?, ?, ?, ?, ?, ?, 'Chưa kết nối')
-                """,
-                [device_number, device_name, ip_address, password, port, note],
-            )
-            con.commit()
-            con.close()
+            with Database.get_cursor() as con:
+                row = con.execute(
+                    """
+                    INSERT INTO device (device_number, device_name, ip_address, password, port, note, status)
+                    VALUES (?, ?, ?, ?, ?, ?, 'Chưa kết nối')
+                    RETURNING id
+                    """,
+                    [device_number, device_name, ip_address, password, port, note],
+                ).fetchone()
             log_to_debug("DeviceRepository: insert() success")
+            ChangeBus.publish("device", OP_INSERT, [row[0]] if row else None)
             return True
         except Exception as e:
             log_to_debug(
@@ -112,19 +75,18 @@ class DeviceRepository:
             log_to_debug(
                 f"DeviceRepository: update() - id={device_id}, device_number={device_number}"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                """
-                UPDATE device
-                SET device_number = ?, device_name = ?, ip_address = ?, 
-                    password = ?, port = ?, note = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-                """,
-                [device_number, device_name, ip_address, password, port, note, device_id],
-            )
-            con.commit()
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute(
+                    """
+                    UPDATE device
+                    SET device_number = ?, device_name = ?, ip_address = ?, 
+                        password = ?, port = ?, note = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                    """,
+                    [device_number, device_name, ip_address, password, port, note, device_id],
+                )
             log_to_debug("DeviceRepository: update() success")
+            ChangeBus.publish("device", OP_UPDATE, [device_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -143,18 +105,17 @@ class DeviceRepository:
         """
         try:
             log_to_debug(f"DeviceRepository: update_status() - id={device_id}, status={status}")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                """
-                UPDATE device
-                SET status = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-                """,
-                [status, device_id],
-            )
-            con.commit()
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute(
+                    """
+                    UPDATE device
+                    SET status = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                    """,
+                    [status, device_id],
+                )
             log_to_debug("DeviceRepository: update_status() success")
+            ChangeBus.publish("device", OP_UPDATE, [device_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -172,11 +133,10 @@ class DeviceRepository:
         """
         try:
             log_to_debug(f"DeviceRepository: delete() - id={device_id}")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("DELETE FROM device WHERE id = ?", [device_id])
-            con.commit()
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute("DELETE FROM device WHERE id = ?", [device_id])
             log_to_debug("DeviceRepository: delete() success")
+            ChangeBus.publish("device", OP_DELETE, [device_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -192,16 +152,15 @@ class DeviceRepository:
         """
         try:
             log_to_debug("DeviceRepository: get_all() called")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                """
-                SELECT id, device_number, device_name, ip_address, password, 
-                       port, status, note, created_at, updated_at
-                FROM device
-                ORDER BY device_number
-                """
-            ).fetchall()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    """
+                    SELECT id, device_number, device_name, ip_address, password, 
+                           port, status, note, created_at, updated_at
+                    FROM device
+                    ORDER BY device_number
+                    """
+                ).fetchall()
 
             devices = []
             for row in result:
@@ -238,17 +197,16 @@ class DeviceRepository:
         """
         try:
             log_to_debug(f"DeviceRepository: get_by_id() - id={device_id}")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                """
-                SELECT id, device_number, device_name, ip_address, password, 
-                       port, status, note, created_at, updated_at
-                FROM device
-                WHERE id = ?
-                """,
-                [device_id],
-            ).fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    """
+                    SELECT id, device_number, device_name, ip_address, password, 
+                           port, status, note, created_at, updated_at
+                    FROM device
+                    WHERE id = ?
+                    """,
+                    [device_id],
+                ).fetchone()
 
             if result:
                 device = {
@@ -284,17 +242,16 @@ class DeviceRepository:
         """
         try:
             log_to_debug(f"DeviceRepository: get_by_device_number() - device_number={device_number}")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                """
-                SELECT id, device_number, device_name, ip_address, password, 
-                       port, status, note, created_at, updated_at
-                FROM device
-                WHERE device_number = ?
-                """,
-                [device_number],
-            ).fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    """
+                    SELECT id, device_number, device_name, ip_address, password, 
+                           port, status, note, created_at, updated_at
+                    FROM device
+                    WHERE device_number = ?
+                    """,
+                    [device_number],
+                ).fetchone()
 
             if result:
                 device = {
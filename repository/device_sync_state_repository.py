@@ -0,0 +1,134 @@
+import traceback
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            from datetime import datetime
+
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+from core.database import Database
+
+
+class DeviceSyncStateRepository:
+    """Repository lưu mốc đồng bộ chấm công (high-water mark) của từng thiết bị"""
+
+    def __init__(self):
+        self.db_path = Database.get_db_path()
+
+    def get(self, device_id):
+        """
+        Lấy trạng thái đồng bộ của thiết bị
+        Args:
+            device_id: ID thiết bị
+        Returns:
+            dict: {device_id, device_sn, last_timestamp, record_count, synced_from, last_sync_at}
+                  hoặc None nếu thiết bị chưa đồng bộ lần nào
+        """
+        try:
+            with Database.get_cursor() as con:
+                row = con.execute(
+                    """
+                    SELECT device_id, device_sn, last_timestamp, record_count, synced_from, last_sync_at
+                    FROM device_sync_state
+                    WHERE device_id = ?
+                    """,
+                    [device_id],
+                ).fetchone()
+            if not row:
+                return None
+            return {
+                "device_id": row[0],
+                "device_sn": row[1],
+                "last_timestamp": row[2],
+                "record_count": row[3],
+                "synced_from": row[4],
+                "last_sync_at": row[5],
+            }
+        except Exception as e:
+            log_to_debug(
+                f"DeviceSyncStateRepository: get() error: {e}\n{traceback.format_exc()}"
+            )
+            return None
+
+    def save(self, device_id, device_sn, last_timestamp, record_count, synced_from):
+        """
+        Ghi (thêm hoặc cập nhật) trạng thái đồng bộ của thiết bị.
+        Mọi bản ghi trên thiết bị có ngày >= synced_from và thời điểm <= last_timestamp
+        được coi là đã nạp vào attendance_raw.
+        Args:
+            device_id: ID thiết bị
+            device_sn: Serial number đọc được từ thiết bị
+            last_timestamp: Thời điểm chấm công mới nhất đã nạp (mốc)
+            record_count: Số bản ghi trên thiết bị khi mốc phủ hết log (None nếu chưa phủ hết)
+            synced_from: Ngày bắt đầu của vùng đã nạp (None = toàn bộ log)
+        Returns:
+            bool: True nếu thành công
+        """
+        try:
+            log_to_debug(
+                f"DeviceSyncStateRepository: save() - device_id={device_id}, sn={device_sn}, "
+                f"last_timestamp={last_timestamp}, record_count={record_count}, synced_from={synced_from}"
+            )
+            with Database.get_cursor() as con:
+                con.execute(
+                    """
+                    INSERT INTO device_sync_state
+                    (device_id, device_sn, last_timestamp, record_count, synced_from, last_sync_at)
+                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (device_id) DO UPDATE SET
+                        device_sn = excluded.device_sn,
+                        last_timestamp = excluded.last_timestamp,
+                        record_count = excluded.record_count,
+                        synced_from = excluded.synced_from,
+                        last_sync_at = excluded.last_sync_at
+                    """,
+                    [device_id, device_sn, last_timestamp, record_count, synced_from],
+                )
+            return True
+        except Exception as e:
+            log_to_debug(
+                f"DeviceSyncStateRepository: save() error: {e}\n{traceback.format_exc()}"
+            )
+            return False
+
+    def delete(self, device_id):
+        """
+        Xóa trạng thái đồng bộ (lần tải sau sẽ đồng bộ lại toàn bộ)
+        Args:
+            device_id: ID thiết bị
+        Returns:
+            bool: True nếu thành công
+        """
+        try:
+            log_to_debug(f"DeviceSyncStateRepository: delete() - device_id={device_id}")
+            with Database.get_cursor() as con:
+                con.execute("DELETE FROM device_sync_state WHERE device_id = ?", [device_id])
+            return True
+        except Exception as e:
+            log_to_debug(
+                f"DeviceSyncStateRepository: delete() error: {e}\n{traceback.format_exc()}"
+            )
+            return False
+
+    def delete_all(self):
+        """
+        Xóa toàn bộ trạng thái đồng bộ
+        Returns:
+            bool: True nếu thành công
+        """
+        try:
+            log_to_debug("DeviceSyncStateRepository: delete_all() called")
+            with Database.get_cursor() as con:
+                con.execute("DELETE FROM device_sync_state")
+            return True
+        except Exception as e:
+            log_to_debug(
+                f"DeviceSyncStateRepository: delete_all() error: {e}\n{traceback.format_exc()}"
+            )
+            return False
@@ -12,115 +12,175 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
-import duckdb
 from core.database import Database
+from core.change_bus import ChangeBus, OP_DELETE, OP_INSERT, OP_UPDATE
+
+
+# Các cột trả về của get_all_columns() (bảng nhân viên trên màn hình khai báo)
+EMPLOYEE_GRID_COLUMNS = (
+    "id",
+    "employee_code",
+    "name",
+    "department_id",
+    "department_name",
+    "job_title_id",
+    "job_title_name",
+    "gender",
+    "hire_date",
+    "attendance_code",
+    "attendance_name",
+    "date_of_birth",
+    "birthplace",
+    "hometown",
+    "id_number",
+    "id_place_issued",
+    "ethnicity",
+    "nationality",
+    "current_address",
+    "phone_number",
+    "emergency_contact",
+)
+
+# Các trường của một nhân viên (get_all / get_by_id), đúng thứ tự cột SELECT
+EMPLOYEE_FIELDS = (
+    "id",
+    "employee_code",
+    "name",
+    "department_id",
+    "job_title_id",
+    "gender",
+    "hire_date",
+    "attendance_code",
+    "attendance_name",
+    "date_of_birth",
+    "birthplace",
+    "hometown",
+    "id_number",
+    "id_place_issued",
+    "ethnicity",
+    "nationality",
+    "current_address",
+    "phone_number",
+    "emergency_contact",
+)
+EMPLOYEE_FIELDS_SQL = ", ".join(EMPLOYEE_FIELDS)
+
+# Mã user của nhân viên trên máy chấm công: mã chấm công, không có thì mã nhân viên / id
+# (bảng employee phải có bí danh e)
+DEVICE_USER_ID_SQL = (
+    "COALESCE(NULLIF(e.attendance_code, ''), NULLIF(e.employee_code, ''), CAST(e.id AS VARCHAR))"
+)
+
+
+def _employee_from_row(r):
+    """Dòng SELECT EMPLOYEE_FIELDS -> dict nhân viên"""
+    return dict(zip(EMPLOYEE_FIELDS, r))
 
 
 class EmployeeRepository:
     def __init__(self):
         self.db_path = Database.get_db_path()
-        self._init_table()
 
-    def _init_table(self):
-        """Khởi tạo bảng employee nếu chưa tồn tại"""
+    def get_all(self):
+        """Lấy tất cả nhân viên với đầy đủ thông tin"""
         try:
-            log_to_debug("EmployeeRepository: _init_table() called")
-            con = duckdb.connect(self.db_path, read_only=False)
-
-            # Tạo sequence trước
-            try:
-                con.execute("CREATE SEQUENCE seq_employee START 1")
-            except Exception:
-                pass  # Sequence đã tồn tại
-
-            con.execute(
-                """
-                CREATE TABLE IF NOT EXISTS employee (
-                    id INTEGER PRIMARY KEY DEFAULT nextval('seq_employee'),
-                    employee_code VARCHAR UNIQUE,
-                    name VARCHAR NOT NULL,
-                    department_id INTEGER,
-                    job_title_id INTEGER,
-                    gender VARCHAR,
-                    hire_date DATE,
-                    attendance_code VARCHAR,
-                    attendance_name VARCHAR,
-                    date_of_birth DATE,
-                    birthplace VARCHAR,
-                    hometown VARCHAR,
-                    id_number VARCHAR,
-                    id_place_issued VARCHAR,
-                    ethnicity VARCHAR,
-                    nationality VARCHAR,
-                    current_address VARCHAR,
-                    phone_number VARCHAR,
-                    emergency_contact VARCHAR,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (department_id) REFERENCES department(id),
-                    FOREIGN KEY (job_title_id) REFERENCES job_title(id)
-                )
-                """
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    f"SELECT {EMPLOYEE_FIELDS_SQL} FROM employee ORDER BY id ASC"
+                ).fetchall()
+            return [_employee_from_row(r) for r in result]
+        except Exception as e:
+            log_to_debug(
+                f"EmployeeRepository: get_all() error: {e}\n{traceback.format_exc()}"
             )
+            return []
 
-            con.close()
-            log_to_debug("EmployeeRepository: Table initialized successfully")
+    def get_all_columns(self, ids=None, department_id=None):
+        """
+        Mô tả:
+            Lấy nhân viên dạng cột (kèm tên phòng ban, chức vụ) bằng một truy vấn,
+            không tạo dict cho từng nhân viên.
+        Args:
+            ids: Chỉ lấy các nhân viên có id trong danh sách (optional, mặc định tất cả)
+            department_id: Chỉ lấy nhân viên thuộc phòng ban này và mọi phòng ban con
+                cháu (một phép join với department_closure) (optional)
+        Returns:
+            dict: {tên cột trong EMPLOYEE_GRID_COLUMNS: list giá trị}, sắp theo id
+        """
+        try:
+            joins, where, params = "", "", []
+            if department_id is not None:
+                joins = (
+                    "JOIN department_closure c ON c.descendant_id = e.department_id "
+                    "AND c.ancestor_id = ?"
+                )
+                params.append(department_id)
+            if ids is not None:
+                ids = list(ids)
+                if not ids:
+                    return {name: [] for name in EMPLOYEE_GRID_COLUMNS}
+                where = "WHERE e.id IN (SELECT CAST(unnest(string_split(?, chr(31))) AS INTEGER))"
+                params.append(Database.list_param(ids))
+            with Database.get_cursor() as con:
+                rows = con.execute(
+                    f"""SELECT e.id, e.employee_code, e.name, e.department_id, d.name,
+                       e.job_title_id, j.name, e.gender, e.hire_date, e.attendance_code,
+                       e.attendance_name, e.date_of_birth, e.birthplace, e.hometown,
+                       e.id_number, e.id_place_issued, e.ethnicity, e.nationality,
+                       e.current_address, e.phone_number, e.emergency_contact
+                       FROM employee e
+                       LEFT JOIN department d ON d.id = e.department_id
+                       LEFT JOIN job_title j ON j.id = e.job_title_id
+                       {joins}
+                       {where}
+                       ORDER BY e.id ASC""",
+                    params,
+                ).fetchall()
+            if rows:
+                return dict(zip(EMPLOYEE_GRID_COLUMNS, map(list, zip(*rows))))
+            return {name: [] for name in EMPLOYEE_GRID_COLUMNS}
         except Exception as e:
             log_to_debug(
-                f"EmployeeRepository: _init_table() error: {e}\n{traceback.format_exc()}"
+                f"EmployeeRepository: get_all_columns() error: {e}\n{traceback.format_exc()}"
             )
+            return {name: [] for name in EMPLOYEE_GRID_COLUMNS}
 
-    def get_all(self):
-        """Lấy tất cả nhân viên với đầy đủ thông tin"""
+    def get_ids_by_device_user(self, user_ids):
+        """
+        Mô tả:
+            Tra nhân viên theo mã user trên máy chấm công (DEVICE_USER_ID_SQL).
+        Args:
+            user_ids: Danh sách mã user trên máy
+        Returns:
+            dict: {user_id: (employee_id, attendance_code)}
+        """
         try:
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                """SELECT id, employee_code, name, department_id, job_title_id, gender, 
-                   hire_date, attendance_code, attendance_name, date_of_birth, birthplace, 
-                   hometown, id_number, id_place_issued, ethnicity, nationality, 
-                   current_address, phone_number, emergency_contact 
-                   FROM employee ORDER BY id ASC"""
-            ).fetchall()
-            con.close()
-            return [
-                {
-                    "id": r[0],
-                    "employee_code": r[1],
-                    "name": r[2],
-                    "department_id": r[3],
-                    "job_title_id": r[4],
-                    "gender": r[5],
-                    "hire_date": r[6],
-                    "attendance_code": r[7],
-                    "attendance_name": r[8],
-                    "date_of_birth": r[9],
-                    "birthplace": r[10],
-                    "hometown": r[11],
-                    "id_number": r[12],
-                    "id_place_issued": r[13],
-                    "ethnicity": r[14],
-                    "nationality": r[15],
-                    "current_address": r[16],
-                    "phone_number": r[17],
-                    "emergency_contact": r[18],
-                }
-                for r in result
-            ]
+            with Database.get_cursor() as con:
+                rows = con.execute(
+                    f"""
+                    SELECT {DEVICE_USER_ID_SQL} AS user_id, e.id, e.attendance_code
+                    FROM employee e
+                    WHERE {DEVICE_USER_ID_SQL} IN (SELECT unnest(string_split(?, chr(31))))
+                    ORDER BY e.id DESC
+                    """,
+                    [Database.list_param(user_ids)],
+                ).fetchall()
+            # Trùng mã: giữ nhân viên có id nhỏ nhất
+            return {r[0]: (r[1], r[2]) for r in rows}
         except Exception as e:
             log_to_debug(
-                f"EmployeeRepository: get_all() error: {e}\n{traceback.format_exc()}"
+                f"EmployeeRepository: get_ids_by_device_user() error: {e}\n{traceback.format_exc()}"
             )
-            return []
+            return {}
 
     def get_by_department(self, department_id):
         """Lấy nhân viên theo phòng ban"""
         try:
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                "SELECT id, name, department_id, job_title_id, email, phone FROM employee WHERE department_id = ? ORDER BY name ASC",
-                [department_id],
-            ).fetchall()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    "SELECT id, name, department_id, job_title_id, email, phone FROM employee WHERE department_id = ? ORDER BY name ASC",
+                    [department_id],
+                ).fetchall()
             return [
                 {
                     "id": r[0],
@@ -139,24 +199,14 @@ class EmployeeRepository:
             return []
 
     def get_by_id(self, emp_id):
+        """Lấy đầy đủ thông tin một nhân viên (None nếu không có)"""
         try:
-            con = duckdb.connect(self.db_path, read_only=True)
-            r = con.execute(
-                "SELECT id, name, department_id, job_title_id, email, phone, address FROM employee WHERE id=?",
-                [emp_id],
-            ).fetchone()
-            con.close()
-            if r:
-                return {
-                    "id": r[0],
-                    "name": r[1],
-                    "department_id": r[2],
-                    "job_title_id": r[3],
-                    "email": r[4],
-                    "phone": r[5],
-                    "address": r[6],
-                }
-            return None
+            with Database.get_cursor() as con:
+                r = con.execute(
+                    f"SELECT {EMPLOYEE_FIELDS_SQL} FROM employee WHERE id=?",
+                    [emp_id],
+                ).fetchone()
+            return _employee_from_row(r) if r else None
         except Exception as e:
             log_to_debug(
                 f"EmployeeRepository: get_by_id() error: {e}\n{traceback.format_exc()}"
@@ -184,37 +234,39 @@ class EmployeeRepository:
         phone_number=None,
         emergency_contact=None,
     ):
+        """Thêm nhân viên, trả về id mới (False nếu lỗi)"""
         try:
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                """INSERT INTO employee (name, department_id, job_title_id, employee_code, 
-                   gender, hire_date, attendance_code, attendance_name, date_of_birth, 
-                   birthplace, hometown, id_number, id_place_issued, ethnicity, nationality, 
-                   current_address, phone_number, emergency_contact) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                [
-                    name,
-                    department_id,
-                    job_title_id,
-                    employee_code,
-                    gender,
-                    hire_date,
-                    attendance_code,
-                    attendance_name,
-                    date_of_birth,
-                    birthplace,
-                    hometown,
-                    id_number,
-                    id_place_issued,
-                    ethnicity,
-                    nationality,
-                    current_address,
-                    phone_number,
-                    emergency_contact,
-                ],
-            )
-            con.close()
-            return True
+            with Database.get_cursor() as con:
+                row = con.execute(
+                    """INSERT INTO employee (name, department_id, job_title_id, employee_code, 
+                       gender, hire_date, attendance_code, attendance_name, date_of_birth, 
+                       birthplace, hometown, id_number, id_place_issued, ethnicity, nationality, 
+                       current_address, phone_number, emergency_contact) 
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       RETURNING id""",
+                    [
+                        name,
+                        department_id,
+                        job_title_id,
+                        employee_code,
+                        gender,
+                        hire_date,
+                        attendance_code,
+                        attendance_name,
+                        date_of_birth,
+                        birthplace,
+                        hometown,
+                        id_number,
+                        id_place_issued,
+                        ethnicity,
+                        nationality,
+                        current_address,
+                        phone_number,
+                        emergency_contact,
+                    ],
+                ).fetchone()
+            ChangeBus.publish("employee", OP_INSERT, [row[0]] if row else None)
+            return row[0] if row else False
         except Exception as e:
             log_to_debug(
                 f"EmployeeRepository: add() error: {e}\n{traceback.format_exc()}"
@@ -244,35 +296,35 @@ class EmployeeRepository:
         emergency_contact=None,
     ):
         try:
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                """UPDATE employee SET name=?, department_id=?, job_title_id=?, employee_code=?,
-                   gender=?, hire_date=?, attendance_code=?, attendance_name=?, date_of_birth=?,
-                   birthplace=?, hometown=?, id_number=?, id_place_issued=?, ethnicity=?, nationality=?,
-                   current_address=?, phone_number=?, emergency_contact=?, updated_at=now() WHERE id=?""",
-                [
-                    name,
-                    department_id,
-                    job_title_id,
-                    employee_code,
-                    gender,
-                    hire_date,
-                    attendance_code,
-                    attendance_name,
-                    date_of_birth,
-                    birthplace,
-                    hometown,
-                    id_number,
-                    id_place_issued,
-                    ethnicity,
-                    nationality,
-                    current_address,
-                    phone_number,
-                    emergency_contact,
-                    emp_id,
-                ],
-            )
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute(
+                    """UPDATE employee SET name=?, department_id=?, job_title_id=?, employee_code=?,
+                       gender=?, hire_date=?, attendance_code=?, attendance_name=?, date_of_birth=?,
+                       birthplace=?, hometown=?, id_number=?, id_place_issued=?, ethnicity=?, nationality=?,
+                       current_address=?, phone_number=?, emergency_contact=?, updated_at=now() WHERE id=?""",
+                    [
+                        name,
+                        department_id,
+                        job_title_id,
+                        employee_code,
+                        gender,
+                        hire_date,
+                        attendance_code,
+                        attendance_name,
+                        date_of_birth,
+                        birthplace,
+                        hometown,
+                        id_number,
+                        id_place_issued,
+                        ethnicity,
+                        nationality,
+                        current_address,
+                        phone_number,
+                        emergency_contact,
+                        emp_id,
+                    ],
+                )
+            ChangeBus.publish("employee", OP_UPDATE, [emp_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -282,25 +334,24 @@ class EmployeeRepository:
 
     def delete(self, emp_id):
         try:
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("DELETE FROM employee WHERE id=?", [emp_id])
+            with Database.get_cursor() as con:
+                con.execute("DELETE FROM employee WHERE id=?", [emp_id])
 
-            # Kiểm tra xem còn bản ghi nào không
-            count_result = con.execute("SELECT COUNT(*) FROM employee").fetchone()
-            record_count = count_result[0] if count_result else 0
+                # Kiểm tra xem còn bản ghi nào không
+                count_result = con.execute("SELECT COUNT(*) FROM employee").fetchone()
+                record_count = count_result[0] if count_result else 0
 
-            # Nếu không còn bản ghi nào, reset sequence bằng cách drop và tạo lại
-            if record_count == 0:
-                try:
-                    con.execute("DROP SEQUENCE seq_employee")
-                    con.execute("CREATE SEQUENCE seq_employee START 1")
-                    log_to_debug("EmployeeRepository: Sequence dropped and recreated")
-                except Exception as seq_error:
-                    log_to_debug(
-                        f"EmployeeRepository: Error resetting sequence: {seq_error}"
-                    )
-
-            con.close()
+                # Nếu không còn bản ghi nào, reset sequence bằng cách drop và tạo lại
+                if record_count == 0:
+                    try:
+                        con.execute("DROP SEQUENCE seq_employee")
+                        con.execute("CREATE SEQUENCE seq_employee START 1")
+                        log_to_debug("EmployeeRepository: Sequence dropped and recreated")
+                    except Exception as seq_error:
+                        log_to_debug(
+                            f"EmployeeRepository: Error resetting sequence: {seq_error}"
+                        )
+            ChangeBus.publish("employee", OP_DELETE, [emp_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -310,9 +361,8 @@ class EmployeeRepository:
 
     def count(self):
         try:
-            con = duckdb.connect(self.db_path, read_only=True)
-            r = con.execute("SELECT COUNT(*) FROM employee").fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                r = con.execute("SELECT COUNT(*) FROM employee").fetchone()
             return r[0] if r else 0
         except Exception as e:
             log_to_debug(
@@ -325,20 +375,19 @@ class EmployeeRepository:
         try:
             if not employee_code:
                 return False
-            con = duckdb.connect(self.db_path, read_only=True)
-            if exclude_emp_id:
-                # Khi sửa, loại trừ nhân viên hiện tại
-                r = con.execute(
-                    "SELECT COUNT(*) FROM employee WHERE employee_code = ? AND id != ?",
-                    [employee_code, exclude_emp_id],
-                ).fetchone()
-            else:
-                # Khi thêm mới
-                r = con.execute(
-                    "SELECT COUNT(*) FROM employee WHERE employee_code = ?",
-                    [employee_code],
-                ).fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                if exclude_emp_id:
+                    # Khi sửa, loại trừ nhân viên hiện tại
+                    r = con.execute(
+                        "SELECT COUNT(*) FROM employee WHERE employee_code = ? AND id != ?",
+                        [employee_code, exclude_emp_id],
+                    ).fetchone()
+                else:
+                    # Khi thêm mới
+                    r = con.execute(
+                        "SELECT COUNT(*) FROM employee WHERE employee_code = ?",
+                        [employee_code],
+                    ).fetchone()
             return (r[0] if r else 0) > 0
         except Exception as e:
             log_to_debug(
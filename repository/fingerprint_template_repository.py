@@ -0,0 +1,245 @@
+# fingerprint_template_repository.py
+# Repository cho kho sao lưu user và vân tay của máy chấm công
+
+import base64
+import traceback
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            from datetime import datetime
+
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+from core.database import Database
+from core.change_bus import ChangeBus, OP_INSERT, OP_UPDATE
+from repository.employee_repository import DEVICE_USER_ID_SQL
+
+
+# Các trường user lưu trong fingerprint_user (đúng thứ tự cột SELECT)
+VAULT_USER_FIELDS = ("user_id", "employee_id", "name", "privilege", "password", "group_id", "card")
+
+# Nhân viên ứng với mã user trên máy (cùng quy tắc khi tải nhân viên lên máy)
+_EMPLOYEE_OF_USER_SQL = f"""
+    (SELECT e.id FROM employee e WHERE {DEVICE_USER_ID_SQL} = {{user_id}} ORDER BY e.id LIMIT 1)
+"""
+
+
+class FingerprintTemplateRepository:
+    """Repository quản lý bảng fingerprint_user và fingerprint_template"""
+
+    def __init__(self):
+        self.db_path = Database.get_db_path()
+
+    def get_hashes(self, device_id):
+        """
+        Mô tả:
+            Lấy hash template đang lưu của mỗi (user_id, finger) của một máy để chỉ nén /
+            ghi những template đã thay đổi.
+        Args:
+            device_id: ID thiết bị nguồn
+        Returns:
+            dict: {(user_id, finger): template_hash}
+        """
+        try:
+            with Database.get_cursor() as con:
+                rows = con.execute(
+                    "SELECT user_id, finger, template_hash FROM fingerprint_template WHERE device_id = ?",
+                    [device_id],
+                ).fetchall()
+            return {(r[0], r[1]): r[2] for r in rows}
+        except Exception as e:
+            log_to_debug(
+                f"FingerprintTemplateRepository: get_hashes() error: {e}\n{traceback.format_exc()}"
+            )
+            return {}
+
+    def save_backup(self, device_id, users, templates):
+        """
+        Mô tả:
+            Lưu một lần sao lưu trong MỘT transaction: upsert toàn bộ user của máy, thay
+            template cũ của các (user_id, finger) có template mới rồi chèn template mới.
+            Mọi dòng đều gắn với máy nguồn, bản sao lưu của máy khác không bị ghi đè.
+            Các cột được truyền thành tham số chuỗi (Database.list_param), template nén
+            được truyền dạng base64 và giải mã trong SQL.
+        Args:
+            device_id: ID thiết bị nguồn
+            users: List dict {user_id, name, privilege, password, group_id, card}
+            templates: List dict {user_id, finger, template_hash, valid, size, template}
+                       (template: bytes đã nén; chỉ các template mới / đã đổi)
+        Returns:
+            bool: True nếu thành công
+        """
+        try:
+            log_to_debug(
+                f"FingerprintTemplateRepository: save_backup() - device_id={device_id}, "
+                f"{len(users)} users, {len(templates)} templates"
+            )
+            with Database.transaction() as con:
+                if users:
+                    con.execute(
+                        f"""
+                        INSERT INTO fingerprint_user
+                        (device_id, user_id, employee_id, name, privilege, password, group_id, card)
+                        SELECT $device_id, s.user_id, {_EMPLOYEE_OF_USER_SQL.format(user_id="s.user_id")},
+                               s.name, s.privilege, s.password, s.group_id, s.card
+                        FROM (
+                            SELECT unnest(string_split($user_id, chr(31))) AS user_id,
+                                   unnest(string_split($name, chr(31))) AS name,
+                                   CAST(unnest(string_split($privilege, chr(31))) AS INTEGER) AS privilege,
+                                   unnest(string_split($password, chr(31))) AS password,
+                                   unnest(string_split($group_id, chr(31))) AS group_id,
+                                   CAST(unnest(string_split($card, chr(31))) AS BIGINT) AS card
+                        ) s
+                        ON CONFLICT (device_id, user_id) DO UPDATE SET
+                            employee_id = EXCLUDED.employee_id,
+                            name = EXCLUDED.name,
+                            privilege = EXCLUDED.privilege,
+                            password = EXCLUDED.password,
+                            group_id = EXCLUDED.group_id,
+                            card = EXCLUDED.card,
+                            updated_at = now()
+                        """,
+                        {
+                            "device_id": device_id,
+                            **{
+                                name: Database.list_param(u[name] for u in users)
+                                for name in ("user_id", "name", "privilege", "password", "group_id", "card")
+                            },
+                        },
+                    )
+
+                if templates:
+                    params = {
+                        "user_id": Database.list_param(t["user_id"] for t in templates),
+                        "finger": Database.list_param(t["finger"] for t in templates),
+                        "template_hash": Database.list_param(t["template_hash"] for t in templates),
+                        "device_id": device_id,
+                    }
+                    staged = """
+                        SELECT unnest(string_split($user_id, chr(31))) AS user_id,
+                               CAST(unnest(string_split($finger, chr(31))) AS INTEGER) AS finger,
+                               unnest(string_split($template_hash, chr(31))) AS template_hash
+                    """
+                    # Bản cũ của các ngón vừa có template mới
+                    con.execute(
+                        f"""
+                        DELETE FROM fingerprint_template WHERE rowid IN (
+                            SELECT t.rowid
+                            FROM fingerprint_template t
+                            JOIN ({staged}) n
+                              ON n.user_id = t.user_id AND n.finger = t.finger
+                            WHERE t.device_id = $device_id AND n.template_hash <> t.template_hash
+                        )
+                        """,
+                        params,
+                    )
+                    params.update(
+                        valid=Database.list_param(t["valid"] for t in templates),
+                        size=Database.list_param(t["size"] for t in templates),
+                        template=Database.list_param(
+                            base64.b64encode(t["template"]).decode("ascii") for t in templates
+                        ),
+                    )
+                    con.execute(
+                        f"""
+                        INSERT INTO fingerprint_template
+                        (device_id, user_id, finger, template_hash, employee_id, valid, size, template)
+                        SELECT $device_id, s.user_id, s.finger, s.template_hash,
+                               {_EMPLOYEE_OF_USER_SQL.format(user_id="s.user_id")},
+                               s.valid, s.size, from_base64(s.template)
+                        FROM (
+                            SELECT unnest(string_split($user_id, chr(31))) AS user_id,
+                                   CAST(unnest(string_split($finger, chr(31))) AS INTEGER) AS finger,
+                                   unnest(string_split($template_hash, chr(31))) AS template_hash,
+                                   CAST(unnest(string_split($valid, chr(31))) AS INTEGER) AS valid,
+                                   CAST(unnest(string_split($size, chr(31))) AS INTEGER) AS size,
+                                   unnest(string_split($template, chr(31))) AS template
+                        ) s
+                        ON CONFLICT DO NOTHING
+                        """,
+                        params,
+                    )
+            if users:
+                ChangeBus.publish("fingerprint_user", OP_UPDATE)
+            if templates:
+                ChangeBus.publish("fingerprint_template", OP_INSERT)
+            log_to_debug("FingerprintTemplateRepository: save_backup() success")
+            return True
+        except Exception as e:
+            log_to_debug(
+                f"FingerprintTemplateRepository: save_backup() error: {e}\n{traceback.format_exc()}"
+            )
+            return False
+
+    def get_restore_set(self, source_device_id, user_ids=None):
+        """
+        Mô tả:
+            Đọc user và template (đã nén) trong bản sao lưu của một máy để khôi phục lên máy.
+        Args:
+            source_device_id: ID máy nguồn của bản sao lưu
+            user_ids: Chỉ lấy các mã chấm công này (optional, mặc định tất cả)
+        Returns:
+            tuple: (users, templates) - users: list dict VAULT_USER_FIELDS;
+                   templates: {user_id: [(finger, valid, template nén), ...]}
+        """
+        try:
+            where, params = "WHERE device_id = ?", [source_device_id]
+            if user_ids is not None:
+                where += " AND user_id IN (SELECT unnest(string_split(?, chr(31))))"
+                params.append(Database.list_param(user_ids))
+            with Database.get_cursor() as con:
+                users = [
+                    dict(zip(VAULT_USER_FIELDS, r))
+                    for r in con.execute(
+                        f"""
+                        SELECT {", ".join(VAULT_USER_FIELDS)}
+                        FROM fingerprint_user {where}
+                        ORDER BY user_id
+                        """,
+                        params,
+                    ).fetchall()
+                ]
+                rows = con.execute(
+                    f"""
+                    SELECT user_id, finger, valid, template
+                    FROM fingerprint_template {where}
+                    ORDER BY user_id, finger
+                    """,
+                    params,
+                ).fetchall()
+            templates = {}
+            for user_id, finger, valid, template in rows:
+                templates.setdefault(user_id, []).append((finger, valid, template))
+            return users, templates
+        except Exception as e:
+            log_to_debug(
+                f"FingerprintTemplateRepository: get_restore_set() error: {e}\n{traceback.format_exc()}"
+            )
+            return [], {}
+
+    def count(self):
+        """
+        Đếm số user và số template trong kho
+        Returns:
+            tuple: (user_count, template_count)
+        """
+        try:
+            with Database.get_cursor() as con:
+                row = con.execute(
+                    """
+                    SELECT (SELECT COUNT(*) FROM fingerprint_user),
+                           (SELECT COUNT(*) FROM fingerprint_template)
+                    """
+                ).fetchone()
+            return (row[0], row[1]) if row else (0, 0)
+        except Exception as e:
+            log_to_debug(
+                f"FingerprintTemplateRepository: count() error: {e}\n{traceback.format_exc()}"
+            )
+            return 0, 0
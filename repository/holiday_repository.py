@@ -12,56 +12,22 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
-import duckdb
 from core.database import Database
+from core.change_bus import ChangeBus, OP_DELETE, OP_INSERT, OP_UPDATE
 
 
 class HolidayRepository:
     def __init__(self):
         self.db_path = Database.get_db_path()
-        self._init_table()
-
-    def _init_table(self):
-        """Khởi tạo bảng holiday nếu chưa tồn tại"""
-        try:
-            log_to_debug("HolidayRepository: _init_table() called")
-            con = duckdb.connect(self.db_path, read_only=False)
-
-            # Tạo sequence trước
-            try:
-                con.execute("CREATE SEQUENCE seq_holiday START 1")
-            except Exception:
-                # Sequence đã tồn tại, bỏ qua im lặng
-                pass
-
-            con.execute(
-                """
-                CREATE TABLE IF NOT EXISTS holiday (
-                    id INTEGER PRIMARY KEY DEFAULT nextval('seq_holiday'),
-                    holiday_date DATE NOT NULL,
-                    name VARCHAR NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-
-            con.close()
-            log_to_debug("HolidayRepository: Table initialized successfully")
-        except Exception as e:
-            log_to_debug(
-                f"HolidayRepository: _init_table() error: {e}\n{traceback.format_exc()}"
-            )
 
     def get_all_holidays(self):
         """Lấy tất cả ngày nghỉ"""
         try:
             log_to_debug("HolidayRepository: get_all_holidays() called")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                "SELECT id, holiday_date, name FROM holiday ORDER BY holiday_date ASC"
-            ).fetchall()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    "SELECT id, holiday_date, name FROM holiday ORDER BY holiday_date ASC"
+                ).fetchall()
 
             holidays = [
                 {"id": row[0], "holiday_date": row[1], "name": row[2]} for row in result
@@ -80,11 +46,10 @@ class HolidayRepository:
         """Lấy ngày nghỉ theo ID"""
         try:
             log_to_debug(f"HolidayRepository: get_holiday_by_id({holiday_id}) called")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                "SELECT id, holiday_date, name FROM holiday WHERE id=?", [holiday_id]
-            ).fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    "SELECT id, holiday_date, name FROM holiday WHERE id=?", [holiday_id]
+                ).fetchone()
 
             if result:
                 holiday = {
@@ -109,13 +74,13 @@ class HolidayRepository:
             log_to_debug(
                 f"HolidayRepository: add_holiday(date={holiday_date}, name={name}) called"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                "INSERT INTO holiday (holiday_date, name) VALUES (?, ?)",
-                [holiday_date, name],
-            )
-            con.close()
+            with Database.get_cursor() as con:
+                row = con.execute(
+                    "INSERT INTO holiday (holiday_date, name) VALUES (?, ?) RETURNING id",
+                    [holiday_date, name],
+                ).fetchone()
             log_to_debug(f"HolidayRepository: add_holiday() inserted successfully")
+            ChangeBus.publish("holiday", OP_INSERT, [row[0]] if row else None)
             return True
         except Exception as e:
             log_to_debug(
@@ -129,13 +94,13 @@ class HolidayRepository:
             log_to_debug(
                 f"HolidayRepository: update_holiday(id={holiday_id}, date={holiday_date}, name={name}) called"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                "UPDATE holiday SET holiday_date=?, name=?, updated_at=now() WHERE id=?",
-                [holiday_date, name, holiday_id],
-            )
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute(
+                    "UPDATE holiday SET holiday_date=?, name=?, updated_at=now() WHERE id=?",
+                    [holiday_date, name, holiday_id],
+                )
             log_to_debug(f"HolidayRepository: update_holiday() updated successfully")
+            ChangeBus.publish("holiday", OP_UPDATE, [holiday_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -147,26 +112,25 @@ class HolidayRepository:
         """Xóa ngày nghỉ"""
         try:
             log_to_debug(f"HolidayRepository: delete_holiday(id={holiday_id}) called")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("DELETE FROM holiday WHERE id=?", [holiday_id])
-
-            # Kiểm tra xem còn bản ghi nào không
-            count_result = con.execute("SELECT COUNT(*) FROM holiday").fetchone()
-            record_count = count_result[0] if count_result else 0
-
-            # Nếu không còn bản ghi nào, reset sequence bằng cách drop và tạo lại
-            if record_count == 0:
-                try:
-                    con.execute("DROP SEQUENCE seq_holiday")
-                    con.execute("CREATE SEQUENCE seq_holiday START 1")
-                    log_to_debug("HolidayRepository: Sequence dropped and recreated")
-                except Exception as seq_error:
-                    log_to_debug(
-                        f"HolidayRepository: Error resetting sequence: {seq_error}"
-                    )
-
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute("DELETE FROM holiday WHERE id=?", [holiday_id])
+
+                # Kiểm tra xem còn bản ghi nào không
+                count_result = con.execute("SELECT COUNT(*) FROM holiday").fetchone()
+                record_count = count_result[0] if count_result else 0
+
+                # Nếu không còn bản ghi nào, reset sequence bằng cách drop và tạo lại
+                if record_count == 0:
+                    try:
+                        con.execute("DROP SEQUENCE seq_holiday")
+                        con.execute("CREATE SEQUENCE seq_holiday START 1")
+                        log_to_debug("HolidayRepository: Sequence dropped and recreated")
+                    except Exception as seq_error:
+                        log_to_debug(
+                            f"HolidayRepository: Error resetting sequence: {seq_error}"
+                        )
             log_to_debug(f"HolidayRepository: delete_holiday() deleted successfully")
+            ChangeBus.publish("holiday", OP_DELETE, [holiday_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -178,9 +142,8 @@ class HolidayRepository:
         """Lấy tổng số ngày nghỉ"""
         try:
             log_to_debug("HolidayRepository: get_total_count() called")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute("SELECT COUNT(*) FROM holiday").fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute("SELECT COUNT(*) FROM holiday").fetchone()
 
             total = result[0] if result else 0
             log_to_debug(f"HolidayRepository: get_total_count() returned {total}")
@@ -12,55 +12,22 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
-import duckdb
 from core.database import Database
+from core.change_bus import ChangeBus, OP_DELETE, OP_INSERT, OP_UPDATE
 
 
 class JobTitleRepository:
     def __init__(self):
         self.db_path = Database.get_db_path()
-        self._init_table()
-
-    def _init_table(self):
-        """Khởi tạo bảng job_title nếu chưa tồn tại"""
-        try:
-            log_to_debug("JobTitleRepository: _init_table() called")
-            con = duckdb.connect(self.db_path, read_only=False)
-
-            # Tạo sequence trước
-            try:
-                con.execute("CREATE SEQUENCE seq_job_title START 1")
-            except Exception:
-                # Sequence đã tồn tại, bỏ qua im lặng
-                pass
-
-            con.execute(
-                """
-                CREATE TABLE IF NOT EXISTS job_title (
-                    id INTEGER PRIMARY KEY DEFAULT nextval('seq_job_title'),
-                    name VARCHAR UNIQUE NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-
-            con.close()
-            log_to_debug("JobTitleRepository: Table initialized successfully")
-        except Exception as e:
-            log_to_debug(
-                f"JobTitleRepository: _init_table() error: {e}\n{traceback.format_exc()}"
-            )
 
     def get_all_job_titles(self):
         """Lấy tất cả chức danh"""
         try:
             log_to_debug("JobTitleRepository: get_all_job_titles() called")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                "SELECT id, name FROM job_title ORDER BY id ASC"
-            ).fetchall()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    "SELECT id, name FROM job_title ORDER BY id ASC"
+                ).fetchall()
 
             job_titles = [{"id": row[0], "name": row[1]} for row in result]
             log_to_debug(
@@ -79,11 +46,10 @@ class JobTitleRepository:
             log_to_debug(
                 f"JobTitleRepository: get_job_title_by_id({job_title_id}) called"
             )
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                "SELECT id, name FROM job_title WHERE id=?", [job_title_id]
-            ).fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    "SELECT id, name FROM job_title WHERE id=?", [job_title_id]
+                ).fetchone()
 
             if result:
                 job_title = {"id": result[0], "name": result[1]}
@@ -104,10 +70,12 @@ class JobTitleRepository:
         """Thêm chức danh mới"""
         try:
             log_to_debug(f"JobTitleRepository: add_job_title(name={name}) called")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("INSERT INTO job_title (name) VALUES (?)", [name])
-            con.close()
+            with Database.get_cursor() as con:
+                row = con.execute(
+                    "INSERT INTO job_title (name) VALUES (?) RETURNING id", [name]
+                ).fetchone()
             log_to_debug(f"JobTitleRepository: add_job_title() inserted successfully")
+            ChangeBus.publish("job_title", OP_INSERT, [row[0]] if row else None)
             return True
         except Exception as e:
             log_to_debug(
@@ -121,13 +89,13 @@ class JobTitleRepository:
             log_to_debug(
                 f"JobTitleRepository: update_job_title(id={job_title_id}, name={name}) called"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                "UPDATE job_title SET name=?, updated_at=now() WHERE id=?",
-                [name, job_title_id],
-            )
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute(
+                    "UPDATE job_title SET name=?, updated_at=now() WHERE id=?",
+                    [name, job_title_id],
+                )
             log_to_debug(f"JobTitleRepository: update_job_title() updated successfully")
+            ChangeBus.publish("job_title", OP_UPDATE, [job_title_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -141,26 +109,25 @@ class JobTitleRepository:
             log_to_debug(
                 f"JobTitleRepository: delete_job_title(id={job_title_id}) called"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("DELETE FROM job_title WHERE id=?", [job_title_id])
-
-            # Kiểm tra xem còn bản ghi nào không
-            count_result = con.execute("SELECT COUNT(*) FROM job_title").fetchone()
-            record_count = count_result[0] if count_result else 0
-
-            # Nếu không còn bản ghi nào, reset sequence bằng cách drop và tạo lại
-            if record_count == 0:
-                try:
-                    con.execute("DROP SEQUENCE seq_job_title")
-                    con.execute("CREATE SEQUENCE seq_job_title START 1")
-                    log_to_debug("JobTitleRepository: Sequence dropped and recreated")
-                except Exception as seq_error:
-                    log_to_debug(
-                        f"JobTitleRepository: Error resetting sequence: {seq_error}"
-                    )
-
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute("DELETE FROM job_title WHERE id=?", [job_title_id])
+
+                # Kiểm tra xem còn bản ghi nào không
+                count_result = con.execute("SELECT COUNT(*) FROM job_title").fetchone()
+                record_count = count_result[0] if count_result else 0
+
+                # Nếu không còn bản ghi nào, reset sequence bằng cách drop và tạo lại
+                if record_count == 0:
+                    try:
+                        con.execute("DROP SEQUENCE seq_job_title")
+                        con.execute("CREATE SEQUENCE seq_job_title START 1")
+                        log_to_debug("JobTitleRepository: Sequence dropped and recreated")
+                    except Exception as seq_error:
+                        log_to_debug(
+                            f"JobTitleRepository: Error resetting sequence: {seq_error}"
+                        )
             log_to_debug(f"JobTitleRepository: delete_job_title() deleted successfully")
+            ChangeBus.publish("job_title", OP_DELETE, [job_title_id])
             return True
         except Exception as e:
             log_to_debug(
@@ -172,9 +139,8 @@ class JobTitleRepository:
         """Lấy tổng số chức danh"""
         try:
             log_to_debug("JobTitleRepository: get_total_count() called")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute("SELECT COUNT(*) FROM job_title").fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute("SELECT COUNT(*) FROM job_title").fetchone()
 
             total = result[0] if result else 0
             log_to_debug(f"JobTitleRepository: get_total_count() returned {total}")
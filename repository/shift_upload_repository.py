@@ -15,56 +15,27 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
-import duckdb
 from core.database import Database
 
 
+# Các cột của một bản ghi bulk_insert() và giá trị mặc định
+_UPLOAD_COLUMNS = (
+    ("employee_id", None),
+    ("device_id", None),
+    ("user_id", ""),
+    ("attendance_code", ""),
+    ("attendance_name", ""),
+    ("card_number", ""),
+    ("password", ""),
+    ("privilege", 0),
+    ("enabled", True),
+)
+
 class ShiftUploadRepository:
     """Repository để quản lý dữ liệu nhân viên đã tải lên máy chấm công"""
 
     def __init__(self):
         self.db_path = Database.get_db_path()
-        self._init_table()
-
-    def _init_table(self):
-        """Khởi tạo bảng shift_upload nếu chưa tồn tại"""
-        try:
-            log_to_debug("ShiftUploadRepository: _init_table() called")
-            con = duckdb.connect(self.db_path, read_only=False)
-
-            # Tạo sequence trước
-            try:
-                con.execute("CREATE SEQUENCE seq_shift_upload START 1")
-            except Exception:
-                pass  # Sequence đã tồn tại
-
-            con.execute(
-                """
-                CREATE TABLE IF NOT EXISTS shift_upload (
-                    id INTEGER PRIMARY KEY DEFAULT nextval('seq_shift_upload'),
-                    employee_id INTEGER NOT NULL,
-                    device_id INTEGER NOT NULL,
-                    user_id VARCHAR NOT NULL,
-                    attendance_code VARCHAR,
-                    attendance_name VARCHAR,
-                    card_number VARCHAR,
-                    password VARCHAR,
-                    privilege INTEGER DEFAULT 0,
-                    enabled BOOLEAN DEFAULT TRUE,
-                    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(employee_id, device_id),
-                    FOREIGN KEY (employee_id) REFERENCES employee(id),
-                    FOREIGN KEY (device_id) REFERENCES device(id)
-                )
-                """
-            )
-
-            con.close()
-            log_to_debug("ShiftUploadRepository: Table initialized successfully")
-        except Exception as e:
-            log_to_debug(
-                f"ShiftUploadRepository: _init_table() error: {e}\n{traceback.format_exc()}"
-            )
 
     def insert(self, employee_id, device_id, user_id, attendance_code, attendance_name, 
                card_number="", password="", privilege=0, enabled=True):
@@ -87,29 +58,26 @@ class ShiftUploadRepository:
             log_to_debug(
                 f"ShiftUploadRepository: insert() - employee_id={employee_id}, device_id={device_id}"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            
-            con.execute(
-                """
-                INSERT INTO shift_upload 
-                (employee_id, device_id, user_id, attendance_code, attendance_name, 
-                 card_number, password, privilege, enabled)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT (employee_id, device_id) DO UPDATE SET
-                    user_id = EXCLUDED.user_id,
-                    attendance_code = EXCLUDED.attendance_code,
-                    attendance_name = EXCLUDED.attendance_name,
-                    card_number = EXCLUDED.card_number,
-                    password = EXCLUDED.password,
-                    privilege = EXCLUDED.privilege,
-                    enabled = EXCLUDED.enabled,
-                    uploaded_at = CURRENT_TIMESTAMP
-                """,
-                [employee_id, device_id, user_id, attendance_code, attendance_name, 
-                 card_number, password, privilege, enabled],
-            )
-            con.commit()
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute(
+                    """
+                    INSERT INTO shift_upload 
+                    (employee_id, device_id, user_id, attendance_code, attendance_name, 
+                     card_number, password, privilege, enabled)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (employee_id, device_id) DO UPDATE SET
+                        user_id = EXCLUDED.user_id,
+                        attendance_code = EXCLUDED.attendance_code,
+                        attendance_name = EXCLUDED.attendance_name,
+                        card_number = EXCLUDED.card_number,
+                        password = EXCLUDED.password,
+                        privilege = EXCLUDED.privilege,
+                        enabled = EXCLUDED.enabled,
+                        uploaded_at = CURRENT_TIMESTAMP
+                    """,
+                    [employee_id, device_id, user_id, attendance_code, attendance_name, 
+                     card_number, password, privilege, enabled],
+                )
             log_to_debug("ShiftUploadRepository: insert() success")
             return True
         except Exception as e:
@@ -120,60 +88,59 @@ class ShiftUploadRepository:
 
     def bulk_insert(self, records):
         """
-        Thêm nhiều bản ghi
+        Mô tả:
+            Thêm / cập nhật nhiều bản ghi bằng MỘT câu INSERT ... ON CONFLICT.
+            Mỗi cột được truyền thành một tham số chuỗi (Database.list_param) và tách lại
+            trong SQL; bản ghi trùng (employee_id, device_id) trong lô lấy bản sau cùng.
         Args:
             records: List of dicts với keys: employee_id, device_id, user_id, attendance_code, attendance_name, card_number, password, privilege, enabled
         Returns:
             tuple: (success_count, total_count)
         """
+        total = len(records) if records else 0
+        if not total:
+            return 0, 0
         try:
-            log_to_debug(f"ShiftUploadRepository: bulk_insert() - {len(records)} records")
-            con = duckdb.connect(self.db_path, read_only=False)
-            
-            success_count = 0
-            for record in records:
-                try:
-                    con.execute(
-                        """
-                        INSERT INTO shift_upload 
-                        (employee_id, device_id, user_id, attendance_code, attendance_name, 
-                         card_number, password, privilege, enabled)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ON CONFLICT (employee_id, device_id) DO UPDATE SET
-                            user_id = EXCLUDED.user_id,
-                            attendance_code = EXCLUDED.attendance_code,
-                            attendance_name = EXCLUDED.attendance_name,
-                            card_number = EXCLUDED.card_number,
-                            password = EXCLUDED.password,
-                            privilege = EXCLUDED.privilege,
-                            enabled = EXCLUDED.enabled,
-                            uploaded_at = CURRENT_TIMESTAMP
-                        """,
-                        [
-                            record["employee_id"],
-                            record["device_id"],
-                            record["user_id"],
-                            record.get("attendance_code", ""),
-                            record.get("attendance_name", ""),
-                            record.get("card_number", ""),
-                            record.get("password", ""),
-                            record.get("privilege", 0),
-                            record.get("enabled", True),
-                        ],
-                    )
-                    success_count += 1
-                except Exception as e:
-                    log_to_debug(f"ShiftUploadRepository: bulk_insert() - record error: {e}")
-            
-            con.commit()
-            con.close()
-            log_to_debug(f"ShiftUploadRepository: bulk_insert() - inserted {success_count}/{len(records)}")
-            return success_count, len(records)
+            log_to_debug(f"ShiftUploadRepository: bulk_insert() - {total} records")
+            rows = {(r["employee_id"], r["device_id"]): r for r in records}.values()
+            params = {
+                name: Database.list_param(r.get(name, default) for r in rows)
+                for name, default in _UPLOAD_COLUMNS
+            }
+            with Database.transaction() as con:
+                con.execute(
+                    """
+                    INSERT INTO shift_upload
+                    (employee_id, device_id, user_id, attendance_code, attendance_name,
+                     card_number, password, privilege, enabled)
+                    SELECT CAST(unnest(string_split($employee_id, chr(31))) AS INTEGER),
+                           CAST(unnest(string_split($device_id, chr(31))) AS INTEGER),
+                           unnest(string_split($user_id, chr(31))),
+                           unnest(string_split($attendance_code, chr(31))),
+                           unnest(string_split($attendance_name, chr(31))),
+                           unnest(string_split($card_number, chr(31))),
+                           unnest(string_split($password, chr(31))),
+                           CAST(unnest(string_split($privilege, chr(31))) AS INTEGER),
+                           CAST(unnest(string_split($enabled, chr(31))) AS BOOLEAN)
+                    ON CONFLICT (employee_id, device_id) DO UPDATE SET
+                        user_id = EXCLUDED.user_id,
+                        attendance_code = EXCLUDED.attendance_code,
+                        attendance_name = EXCLUDED.attendance_name,
+                        card_number = EXCLUDED.card_number,
+                        password = EXCLUDED.password,
+                        privilege = EXCLUDED.privilege,
+                        enabled = EXCLUDED.enabled,
+                        uploaded_at = now()
+                    """,
+                    params,
+                )
+            log_to_debug(f"ShiftUploadRepository: bulk_insert() - upserted {len(rows)}/{total}")
+            return total, total
         except Exception as e:
             log_to_debug(
                 f"ShiftUploadRepository: bulk_insert() error: {e}\n{traceback.format_exc()}"
             )
-            return 0, len(records) if records else 0
+            return 0, total
 
     def get_by_device(self, device_id):
         """
@@ -185,22 +152,20 @@ class ShiftUploadRepository:
         """
         try:
             log_to_debug(f"ShiftUploadRepository: get_by_device() - device_id={device_id}")
-            con = duckdb.connect(self.db_path, read_only=True)
-            
-            result = con.execute(
-                """
-                SELECT su.id, su.employee_id, su.device_id, su.user_id, 
-                       su.attendance_code, su.attendance_name, su.card_number, 
-                       su.password, su.privilege, su.enabled, su.uploaded_at,
-                       e.employee_code, e.name
-                FROM shift_upload su
-                LEFT JOIN employee e ON su.employee_id = e.id
-                WHERE su.device_id = ?
-                ORDER BY su.uploaded_at DESC
-                """,
-                [device_id]
-            ).fetchall()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    """
+                    SELECT su.id, su.employee_id, su.device_id, su.user_id, 
+                           su.attendance_code, su.attendance_name, su.card_number, 
+                           su.password, su.privilege, su.enabled, su.uploaded_at,
+                           e.employee_code, e.name
+                    FROM shift_upload su
+                    LEFT JOIN employee e ON su.employee_id = e.id
+                    WHERE su.device_id = ?
+                    ORDER BY su.uploaded_at DESC
+                    """,
+                    [device_id]
+                ).fetchall()
             
             records = []
             for row in result:
@@ -238,10 +203,8 @@ class ShiftUploadRepository:
         """
         try:
             log_to_debug(f"ShiftUploadRepository: delete_by_id() - id={record_id}")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute("DELETE FROM shift_upload WHERE id = ?", [record_id])
-            con.commit()
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute("DELETE FROM shift_upload WHERE id = ?", [record_id])
             log_to_debug("ShiftUploadRepository: delete_by_id() success")
             return True
         except Exception as e:
@@ -263,13 +226,11 @@ class ShiftUploadRepository:
             log_to_debug(
                 f"ShiftUploadRepository: delete_by_employee_device() - employee_id={employee_id}, device_id={device_id}"
             )
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                "DELETE FROM shift_upload WHERE employee_id = ? AND device_id = ?",
-                [employee_id, device_id]
-            )
-            con.commit()
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute(
+                    "DELETE FROM shift_upload WHERE employee_id = ? AND device_id = ?",
+                    [employee_id, device_id]
+                )
             log_to_debug("ShiftUploadRepository: delete_by_employee_device() success")
             return True
         except Exception as e:
@@ -286,21 +247,19 @@ class ShiftUploadRepository:
         """
         try:
             log_to_debug("ShiftUploadRepository: get_all() called")
-            con = duckdb.connect(self.db_path, read_only=True)
-            
-            result = con.execute(
-                """
-                SELECT su.id, su.employee_id, su.device_id, su.user_id, 
-                       su.attendance_code, su.attendance_name, su.card_number, 
-                       su.password, su.privilege, su.enabled, su.uploaded_at,
-                       e.employee_code, e.name, d.device_name
-                FROM shift_upload su
-                LEFT JOIN employee e ON su.employee_id = e.id
-                LEFT JOIN device d ON su.device_id = d.id
-                ORDER BY su.uploaded_at DESC
-                """
-            ).fetchall()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    """
+                    SELECT su.id, su.employee_id, su.device_id, su.user_id, 
+                           su.attendance_code, su.attendance_name, su.card_number, 
+                           su.password, su.privilege, su.enabled, su.uploaded_at,
+                           e.employee_code, e.name, d.device_name
+                    FROM shift_upload su
+                    LEFT JOIN employee e ON su.employee_id = e.id
+                    LEFT JOIN device d ON su.device_id = d.id
+                    ORDER BY su.uploaded_at DESC
+                    """
+                ).fetchall()
             
             records = []
             for row in result:
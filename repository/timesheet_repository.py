@@ -0,0 +1,158 @@
+import traceback
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            from datetime import datetime
+
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+from core.database import Database
+
+
+# Các cột trả về của get_timesheet() (mỗi dòng = một nhân viên trong một ngày)
+TIMESHEET_COLUMNS = (
+    "employee_id",
+    "user_id",
+    "employee_name",
+    "work_date",
+    "is_weekend",
+    "is_holiday",
+    "shift_id",
+    "shift_code",
+    "check_in",
+    "check_out",
+    "worked_minutes",
+    "late_minutes",
+    "early_minutes",
+    "overtime_minutes",
+    "work_day_count",
+    "status",
+    "symbol",
+)
+
+# Trạng thái ngày công, trùng tên cột <trạng thái>_symbol / show_<trạng thái>
+# trong bảng attendance_symbol
+TIMESHEET_STATUSES = (
+    "on_time",
+    "late",
+    "early_leave",
+    "overtime",
+    "missing_checkout",
+    "missing_checkin",
+    "absent",
+    "on_time_overnight",
+    "no_schedule",
+)
+
+
+_SYMBOL_CASE = "CASE status\n" + "\n".join(
+    f"        WHEN '{key}' THEN CASE WHEN sym.show_{key} THEN sym.{key}_symbol END"
+    for key in TIMESHEET_STATUSES
+) + "\n    END"
+
+
+# Truy vấn bảng công. Các bước (toàn bộ chạy trong DuckDB, không lặp theo nhân viên):
+#   1. daily: ngày công có chấm đã tính sẵn trong attendance_daily
+#   2. roster: nhân viên (mã chấm công = attendance_code / employee_code / id) và các
+#      mã chấm công có dữ liệu nhưng chưa khai báo nhân viên
+#   3. calendar_flags: mọi ngày trong kỳ, đánh dấu cuối tuần / ngày lễ
+#   4. roster x lịch (từ ngày vào làm): ngày không có chấm là vắng / không có lịch;
+#      ký hiệu lấy từ attendance_symbol
+_TIMESHEET_SQL = """
+WITH daily AS (
+    SELECT * FROM attendance_daily WHERE work_date BETWEEN $from_date AND $to_date
+),
+employee_codes AS (
+    SELECT id AS employee_id,
+           COALESCE(NULLIF(trim(attendance_code), ''), NULLIF(trim(employee_code), ''),
+                    CAST(id AS VARCHAR)) AS user_id,
+           name AS employee_name, hire_date
+    FROM employee
+),
+roster AS (
+    SELECT * FROM employee_codes
+    UNION ALL
+    SELECT NULL, d.user_id, max(d.user_name), NULL
+    FROM daily d
+    WHERE NOT EXISTS (SELECT 1 FROM employee_codes ec WHERE ec.user_id = d.user_id)
+    GROUP BY d.user_id
+),
+calendar_flags AS (
+    SELECT CAST(t.d AS DATE) AS work_date,
+           COALESCE(
+               [w.monday, w.tuesday, w.wednesday, w.thursday, w.friday, w.saturday, w.sunday][isodow(t.d)],
+               FALSE
+           ) AS is_weekend,
+           EXISTS (SELECT 1 FROM holiday h WHERE h.holiday_date = CAST(t.d AS DATE)) AS is_holiday
+    FROM range(CAST($from_date AS TIMESTAMP), CAST($to_date AS TIMESTAMP) + INTERVAL 1 DAY, INTERVAL 1 DAY) t(d)
+    LEFT JOIN weekend w ON w.id = 1
+),
+grid AS (
+    SELECT r.employee_id, r.user_id, COALESCE(r.employee_name, d.user_name) AS employee_name,
+           c.work_date, c.is_weekend, c.is_holiday,
+           d.shift_id, d.shift_code, d.first_in AS check_in, d.last_out AS check_out,
+           COALESCE(d.worked_minutes, 0) AS worked_minutes,
+           COALESCE(d.late_minutes, 0) AS late_minutes,
+           COALESCE(d.early_minutes, 0) AS early_minutes,
+           COALESCE(d.overtime_minutes, 0) AS overtime_minutes,
+           COALESCE(d.work_day_count, 0) AS work_day_count,
+           COALESCE(
+               d.status,
+               CASE WHEN c.is_weekend OR c.is_holiday THEN 'no_schedule' ELSE 'absent' END
+           ) AS status
+    FROM roster r
+    CROSS JOIN calendar_flags c
+    LEFT JOIN daily d ON d.user_id = r.user_id AND d.work_date = c.work_date
+    WHERE r.hire_date IS NULL OR c.work_date >= r.hire_date
+)
+SELECT grid.*, COALESCE({symbol_case}, '') AS symbol
+FROM grid
+LEFT JOIN attendance_symbol sym ON sym.id = 1
+""".replace("{symbol_case}", _SYMBOL_CASE)
+
+
+class TimesheetRepository:
+    """Repository tính bảng công từ dữ liệu chấm công, ca làm việc, lịch nghỉ"""
+
+    def __init__(self):
+        self.db_path = Database.get_db_path()
+
+    def get_timesheet(self, from_date, to_date):
+        """
+        Mô tả:
+            Tính bảng công cho mọi nhân viên, mọi ngày trong kỳ bằng MỘT truy vấn
+            trên bảng tổng hợp attendance_daily.
+        Args:
+            from_date: Từ ngày (datetime.date)
+            to_date: Đến ngày (datetime.date)
+        Returns:
+            dict: {tên cột trong TIMESHEET_COLUMNS: list giá trị}, sắp theo mã chấm công, ngày
+        """
+        try:
+            log_to_debug(
+                f"TimesheetRepository: get_timesheet() - from={from_date}, to={to_date}"
+            )
+            params = {"from_date": from_date, "to_date": to_date}
+            with Database.get_cursor() as con:
+                rows = con.execute(
+                    f"{_TIMESHEET_SQL} ORDER BY user_id, work_date", params
+                ).fetchall()
+
+            if rows:
+                columns = dict(zip(TIMESHEET_COLUMNS, map(list, zip(*rows))))
+            else:
+                columns = {name: [] for name in TIMESHEET_COLUMNS}
+
+            log_to_debug(f"TimesheetRepository: get_timesheet() returned {len(rows)} rows")
+            return columns
+        except Exception as e:
+            log_to_debug(
+                f"TimesheetRepository: get_timesheet() error: {e}\n{traceback.format_exc()}"
+            )
+            return {name: [] for name in TIMESHEET_COLUMNS}
@@ -12,7 +12,6 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
-import duckdb
 from core.database import Database
 
 
@@ -24,15 +23,14 @@ class WeekendRepository:
         """Lấy cấu hình ngày cuối tuần"""
         try:
             log_to_debug("WeekendRepository: get_weekend_config() called")
-            con = duckdb.connect(self.db_path, read_only=True)
-            result = con.execute(
-                """
-                SELECT monday, tuesday, wednesday, thursday, friday, saturday, sunday
-                FROM weekend 
-                WHERE id = 1
-                """
-            ).fetchone()
-            con.close()
+            with Database.get_cursor() as con:
+                result = con.execute(
+                    """
+                    SELECT monday, tuesday, wednesday, thursday, friday, saturday, sunday
+                    FROM weekend 
+                    WHERE id = 1
+                    """
+                ).fetchone()
 
             if result:
                 config = {
@@ -59,24 +57,22 @@ class WeekendRepository:
         """Cập nhật cấu hình ngày cuối tuần"""
         try:
             log_to_debug("WeekendRepository: update_weekend_config() called")
-            con = duckdb.connect(self.db_path, read_only=False)
-            con.execute(
-                """
-                UPDATE weekend 
-                SET monday = ?,
-                    tuesday = ?,
-                    wednesday = ?,
-                    thursday = ?,
-                    friday = ?,
-                    saturday = ?,
-                    sunday = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = 1
-                """,
-                [monday, tuesday, wednesday, thursday, friday, saturday, sunday],
-            )
-            con.commit()
-            con.close()
+            with Database.get_cursor() as con:
+                con.execute(
+                    """
+                    UPDATE weekend 
+                    SET monday = ?,
+                        tuesday = ?,
+                        wednesday = ?,
+                        thursday = ?,
+                        friday = ?,
+                        saturday = ?,
+                        sunday = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = 1
+                    """,
+                    [monday, tuesday, wednesday, thursday, friday, saturday, sunday],
+                )
             log_to_debug("WeekendRepository: update_weekend_config() success")
             return True
         except Exception as e:
@@ -0,0 +1,136 @@
+# attendance_daily_services.py
+# Tính lại bảng tổng hợp theo ngày (attendance_daily) trên thread nền, không phụ thuộc Qt
+
+import threading
+import time
+import traceback
+from datetime import datetime
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+from core.database import Database
+from repository.attendance_daily_repository import AttendanceDailyRepository
+
+
+# Số lần thử lại khi tính lại thất bại (vd. xung đột transaction với lô chấm công đang ghi)
+RETRY_COUNT = 3
+RETRY_DELAY = 1
+
+
+class AttendanceDailyRefresher:
+    """
+    Mô tả:
+        Hàng đợi tính lại attendance_daily chạy trên MỘT thread nền, để việc sửa ca làm việc,
+        ngày cuối tuần, ngày lễ không chặn GUI thread (tính lại toàn bộ có thể mất vài giây).
+        - Các yêu cầu dồn lại: nhiều lần sửa liên tiếp chỉ tính lại một lần;
+          yêu cầu tính lại toàn bộ bao trùm các yêu cầu theo ngày.
+        - Xong mỗi lượt, repository phát ChangeBus "attendance_daily" để màn hình tự nạp lại.
+        - Thread tự dừng khi hết việc.
+        Dùng: AttendanceDailyRefresher.request_rebuild() / request_dates([...])
+    """
+
+    _lock = threading.Lock()
+    _idle = threading.Event()
+    _idle.set()
+    _worker = None
+    _rebuild = False
+    _dates = set()
+
+    @staticmethod
+    def request_rebuild():
+        """Yêu cầu tính lại toàn bộ bảng (khi đổi ca làm việc / ngày cuối tuần)"""
+        with AttendanceDailyRefresher._lock:
+            AttendanceDailyRefresher._rebuild = True
+            AttendanceDailyRefresher._dates.clear()
+            AttendanceDailyRefresher._start()
+
+    @staticmethod
+    def request_dates(dates):
+        """
+        Mô tả:
+            Yêu cầu tính lại các ngày cho trước cho mọi nhân viên (khi sửa ngày lễ).
+        Args:
+            dates: Danh sách ngày (datetime.date hoặc chuỗi "yyyy-MM-dd"; None bị bỏ qua)
+        Returns:
+            None
+        """
+        dates = {d for d in dates if d}
+        if not dates:
+            return
+        with AttendanceDailyRefresher._lock:
+            if not AttendanceDailyRefresher._rebuild:
+                AttendanceDailyRefresher._dates.update(dates)
+            AttendanceDailyRefresher._start()
+
+    @staticmethod
+    def wait(timeout=30):
+        """
+        Mô tả:
+            Chờ các yêu cầu đang xếp hàng chạy xong (gọi trước khi đóng database).
+        Args:
+            timeout: Số giây chờ tối đa
+        Returns:
+            bool: True nếu không còn việc
+        """
+        return AttendanceDailyRefresher._idle.wait(timeout)
+
+    @staticmethod
+    def _start():
+        """Khởi động thread nền nếu chưa chạy (gọi khi đã giữ _lock)"""
+        AttendanceDailyRefresher._idle.clear()
+        worker = AttendanceDailyRefresher._worker
+        if worker is not None and worker.is_alive():
+            return
+        AttendanceDailyRefresher._worker = threading.Thread(
+            target=AttendanceDailyRefresher._run, name="AttendanceDailyRefresher", daemon=True
+        )
+        AttendanceDailyRefresher._worker.start()
+
+    @staticmethod
+    def _take():
+        """Lấy việc kế tiếp: (rebuild, dates); None nếu hết việc (đánh dấu rảnh)"""
+        with AttendanceDailyRefresher._lock:
+            rebuild = AttendanceDailyRefresher._rebuild
+            dates = AttendanceDailyRefresher._dates
+            if not rebuild and not dates:
+                AttendanceDailyRefresher._worker = None
+                AttendanceDailyRefresher._idle.set()
+                return None
+            AttendanceDailyRefresher._rebuild = False
+            AttendanceDailyRefresher._dates = set()
+            return rebuild, dates
+
+    @staticmethod
+    def _run():
+        repo = AttendanceDailyRepository()
+        try:
+            while True:
+                job = AttendanceDailyRefresher._take()
+                if job is None:
+                    return
+                rebuild, dates = job
+                for attempt in range(RETRY_COUNT + 1):
+                    if attempt:
+                        time.sleep(RETRY_DELAY * attempt)
+                    ok = repo.rebuild() if rebuild else repo.refresh_dates(dates)
+                    if ok:
+                        break
+                else:
+                    log_to_debug(
+                        f"AttendanceDailyRefresher: giving up (rebuild={rebuild}, dates={dates})"
+                    )
+        except Exception as e:
+            log_to_debug(f"AttendanceDailyRefresher: error: {e}\n{traceback.format_exc()}")
+            with AttendanceDailyRefresher._lock:
+                AttendanceDailyRefresher._worker = None
+                AttendanceDailyRefresher._idle.set()
+        finally:
+            Database.release_cursor()
@@ -0,0 +1,66 @@
+import traceback
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            from datetime import datetime
+
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+# attendance_pairing_services.py
+# Service layer ghép cặp giờ vào/ra theo ca làm việc
+from repository.attendance_pairing_repository import (
+    AttendancePairingRepository,
+    PAIR_COLUMNS,
+)
+from repository.attendance_daily_repository import AttendanceDailyRepository
+
+
+class AttendancePairingService:
+    """Service ghép cặp giờ vào/ra cho từng nhân viên, từng ngày công"""
+
+    def __init__(self):
+        self.repo = AttendancePairingRepository()
+        self.daily_repo = AttendanceDailyRepository()
+
+    def get_punch_pairs(self, from_date, to_date, device_id=None, search=""):
+        """
+        Mô tả:
+            Ghép cặp giờ chấm công theo ca (declare_work_shift) cho toàn bộ khoảng ngày.
+            Tất cả thiết bị: đọc bảng tổng hợp attendance_daily (đã ghép sẵn khi nạp);
+            lọc theo một thiết bị: ghép trực tiếp từ attendance_raw của thiết bị đó.
+            Kết quả dạng cột: mỗi chỉ số i của các list là một (nhân viên, ngày công).
+        Args:
+            from_date: Từ ngày (datetime.date)
+            to_date: Đến ngày (datetime.date)
+            device_id: ID thiết bị, None = tất cả thiết bị
+            search: Chỉ lấy nhân viên khớp mã / tên (lọc trong SQL, optional)
+        Returns:
+            dict: {user_id, user_name, work_date, shift_id, shift_code,
+                   shift_start, shift_end, lunch_start, lunch_end,
+                   in_1, out_1, in_2, out_2, in_3, out_3, punch, uid,
+                   punch_count, record_ids: list}
+        """
+        try:
+            if from_date and to_date and from_date > to_date:
+                from_date, to_date = to_date, from_date
+            if device_id:
+                result = self.repo.get_punch_pairs(from_date, to_date, device_id, search)
+            else:
+                daily = self.daily_repo.get_daily(from_date, to_date, search)
+                result = {name: daily[name] for name in PAIR_COLUMNS}
+            log_to_debug(
+                f"AttendancePairingService: get_punch_pairs() returned "
+                f"{len(result['user_id'])} days"
+            )
+            return result
+        except Exception as e:
+            log_to_debug(
+                f"AttendancePairingService: get_punch_pairs() error: {e}\n{traceback.format_exc()}"
+            )
+            return {name: [] for name in PAIR_COLUMNS}
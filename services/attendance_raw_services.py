@@ -1,4 +1,8 @@
+import queue
+import struct
+import threading
 import traceback
+from contextlib import closing
 from datetime import datetime
 
 
@@ -11,8 +15,327 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
-from repository.attendance_raw_repository import AttendanceRawRepository
+from core.database import Database
+from core.device_session import DeviceSessionManager
+from repository.attendance_raw_repository import (
+    AttendanceRawRepository,
+    AttendanceRawBatch,
+)
 from repository.device_repository import DeviceRepository
+from repository.device_sync_state_repository import DeviceSyncStateRepository
+from repository.employee_repository import EmployeeRepository
+
+
+# Số bản ghi mỗi lô khi đọc - lọc - ghi dữ liệu chấm công theo luồng
+CHUNK_SIZE = 20000
+
+# Tiến độ (%) khi bắt đầu ghi dữ liệu; phần còn lại chạy theo số bản ghi đã xử lý
+PROGRESS_STORE_START = 20
+
+# Thời gian chờ (giây) mỗi lần đưa lô vào hàng đợi trước khi kiểm tra lại hủy / dừng
+QUEUE_PUT_TIMEOUT = 0.5
+
+# Thông báo khi người dùng hủy tải
+CANCELLED_MESSAGE = "Đã hủy tải dữ liệu"
+
+
+def _decode_zk_time(value):
+    """
+    Giải mã thời gian dạng số nguyên của máy chấm công ZK (theo zkemsdk DecodeTime).
+    Args:
+        value: Số giây đã mã hóa
+    Returns:
+        datetime: Thời điểm chấm công
+    """
+    second = value % 60
+    value //= 60
+    minute = value % 60
+    value //= 60
+    hour = value % 24
+    value //= 24
+    day = value % 31 + 1
+    value //= 31
+    month = value % 12 + 1
+    value //= 12
+    return datetime(value + 2000, month, day, hour, minute, second)
+
+
+def _iter_device_attendance(conn, users):
+    """
+    Đọc log chấm công của thiết bị và trả về lần lượt từng bản ghi (generator).
+    Log được đọc thô một lần rồi giải mã tuần tự bằng struct.iter_unpack, thay vì
+    conn.get_attendance() vốn dựng toàn bộ list đối tượng và cắt lại bytes sau mỗi bản ghi.
+    Args:
+        conn: Kết nối pyzk đang mở
+        users: Danh sách user của thiết bị (để đổi uid <-> user_id)
+    Yields:
+        tuple: (user_id: str, timestamp, status, punch, uid)
+    """
+    try:
+        from zk import const
+
+        if not getattr(conn, "records", None):
+            conn.read_sizes()
+        raw, size = conn.read_with_buffer(const.CMD_ATTLOG_RRQ)
+    except (ImportError, AttributeError):
+        # Thư viện không hỗ trợ đọc buffer thô: dùng API chuẩn
+        for att in conn.get_attendance():
+            yield str(att.user_id), att.timestamp, att.status, att.punch, getattr(att, "uid", 0)
+        return
+
+    if size < 4 or not conn.records:
+        return
+
+    total_size = struct.unpack("<I", raw[:4])[0]
+    record_size = total_size / conn.records
+    data = memoryview(raw)[4:]
+
+    if record_size == 8:
+        users_by_uid = {user.uid: user.user_id for user in users}
+        usable = len(data) - len(data) % 8
+        for uid, status, ts, punch in struct.iter_unpack("<HBIB", data[:usable]):
+            yield users_by_uid.get(uid, str(uid)), _decode_zk_time(ts), status, punch, uid
+    elif record_size == 16:
+        uids_by_user_id = {user.user_id: user.uid for user in users}
+        usable = len(data) - len(data) % 16
+        for user_id, ts, status, punch, _reserved, _workcode in struct.iter_unpack("<IIBB2sI", data[:usable]):
+            user_id = str(user_id)
+            yield user_id, _decode_zk_time(ts), status, punch, uids_by_user_id.get(user_id, user_id)
+    else:
+        usable = len(data) - len(data) % 40
+        for uid, user_id, status, ts, punch, _space in struct.iter_unpack("<H24sBIB8s", data[:usable]):
+            user_id = user_id.split(b"\x00")[0].decode(errors="ignore")
+            yield user_id, _decode_zk_time(ts), status, punch, uid
+
+
+def _check_incremental(state, device_sn, device_count, from_date):
+    """
+    Kiểm tra có thể đồng bộ tăng dần từ mốc đã lưu hay không.
+    Args:
+        state: Trạng thái đồng bộ từ DeviceSyncStateRepository.get() (hoặc None)
+        device_sn: Serial number hiện tại của thiết bị
+        device_count: Số bản ghi hiện tại trên thiết bị (hoặc None)
+        from_date: Từ ngày của lần tải này
+    Returns:
+        tuple: (incremental: bool, reason: str)
+    """
+    if not state:
+        return False, "chưa có mốc đồng bộ"
+    if state["device_sn"] != device_sn:
+        return False, f"serial number thay đổi ({state['device_sn']} -> {device_sn})"
+    if (
+        device_count is not None
+        and state["record_count"] is not None
+        and device_count < state["record_count"]
+    ):
+        return False, "log trên thiết bị đã bị xóa"
+    if state["synced_from"] is not None and (from_date is None or from_date < state["synced_from"]):
+        return False, "khoảng ngày rộng hơn vùng đã đồng bộ"
+    return True, "từ mốc đã lưu"
+
+
+class DeviceAttendanceFetch:
+    """
+    Mô tả:
+        Một lần đọc log chấm công từ MỘT thiết bị theo luồng.
+        chunks() kết nối thiết bị, đọc - lọc - chuẩn hóa từng lô CHUNK_SIZE bản ghi
+        và trả về lần lượt; không truy cập database nên chạy được trên worker thread.
+        Các thuộc tính còn lại ghi nhận kết quả để cập nhật mốc đồng bộ sau khi ghi xong.
+        Hủy hợp tác qua cancel_event (threading.Event): chunks() dừng ở điểm kiểm tra kế
+        tiếp và thoát phiên kết nối bình thường (khóa thiết bị luôn được trả).
+    """
+
+    def __init__(
+        self,
+        device,
+        state,
+        from_date=None,
+        to_date=None,
+        progress_callback=None,
+        chunk_size=CHUNK_SIZE,
+        cancel_event=None,
+    ):
+        self.device = device
+        self.device_id = device["id"]
+        self.from_date = from_date
+        self.to_date = to_date
+        self.progress_callback = progress_callback
+        self.chunk_size = chunk_size
+        self.cancel_event = cancel_event
+
+        self.state = state              # Mốc đã lưu; None nếu đồng bộ toàn bộ
+        self.success = True
+        self.message = ""
+        self.device_sn = None
+        self.incremental = False
+        self.unchanged = False          # Số bản ghi trên máy không đổi -> không đọc log
+        self.device_count = None        # Số bản ghi trên thiết bị
+        self.device_max = None          # Thời điểm lớn nhất trong log thiết bị
+        self.included_max = None        # Thời điểm lớn nhất đã đưa vào lô
+        self.excluded_before = False    # Có bản ghi mới nhưng trước from_date
+        self.excluded_after = False     # Có bản ghi mới nhưng sau to_date
+        self.reset_state = False        # Mốc cũ sai, cần xóa thay vì cập nhật
+
+        # Kết quả ghi (do thread ghi database cập nhật)
+        self.selected = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.write_failed = False
+
+    def is_cancelled(self):
+        """True nếu người dùng đã yêu cầu hủy"""
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def mark_cancelled(self):
+        """Ghi nhận lần tải bị hủy (mốc đồng bộ sẽ không được cập nhật)"""
+        if self.message != CANCELLED_MESSAGE:
+            log_to_debug(f"AttendanceRawService: device_id={self.device_id} download cancelled")
+        self.success = False
+        self.message = CANCELLED_MESSAGE
+
+    def report(self, value, message):
+        """Gửi tiến độ (0-100) của thiết bị này"""
+        if self.progress_callback:
+            self.progress_callback(value, message)
+
+    def chunks(self):
+        """
+        Mô tả:
+            Generator đọc log thiết bị theo lô.
+            Lỗi kết nối không ném ra ngoài mà ghi vào success/message.
+        Yields:
+            tuple: (batch: AttendanceRawBatch, processed: int) - processed là số bản ghi
+                   trong log đã duyệt tới thời điểm lô được trả về
+        """
+        try:
+            # Import thư viện pyzk
+            try:
+                import zk  # noqa: F401
+            except ImportError:
+                self.success = False
+                self.message = "Chưa cài đặt thư viện pyzk. Vui lòng chạy: pip install pyzk"
+                return
+            if self.is_cancelled():
+                self.mark_cancelled()
+                return
+
+            # Kết nối với thiết bị (dùng lại phiên đang mở nếu có); giữ phiên tới khi đọc xong
+            ip = self.device["ip_address"]
+            log_to_debug(f"AttendanceRawService: Connecting to {ip}:{self.device.get('port', 4370)}")
+            self.report(2, f"Đang kết nối với {ip}...")
+            with DeviceSessionManager.session(self.device, timeout=10) as conn:
+                self.report(5, "Đang lấy thông tin thiết bị...")
+                self.device_sn = conn.get_serialnumber()
+                log_to_debug(f"AttendanceRawService: Connected to device SN={self.device_sn}")
+
+                # Xác định đồng bộ tăng dần hay toàn bộ
+                self.device_count = self._read_record_count(conn)
+                self.incremental, reason = _check_incremental(
+                    self.state, self.device_sn, self.device_count, self.from_date
+                )
+                if not self.incremental:
+                    self.state = None
+                log_to_debug(
+                    f"AttendanceRawService: device_id={self.device_id}, device_count={self.device_count}, "
+                    f"incremental={self.incremental} ({reason})"
+                )
+
+                # Số bản ghi trên máy không đổi kể từ lần đồng bộ trước -> không có gì mới
+                if self.incremental and self.device_count is not None and self.device_count == self.state["record_count"]:
+                    self.unchanged = True
+                    return
+
+                if self.is_cancelled():
+                    self.mark_cancelled()
+                    return
+
+                self.report(10, "Đang tải danh sách nhân viên...")
+                users = conn.get_users()
+                names = {user.user_id: user.name for user in users}
+                log_to_debug(f"AttendanceRawService: Loaded {len(users)} users")
+
+                self.report(15, "Đang tải dữ liệu chấm công...")
+                mark = self.state["last_timestamp"] if self.incremental else None
+                batch = AttendanceRawBatch()
+                processed = 0
+                for user_id, ts, status, punch, uid in _iter_device_attendance(conn, users):
+                    if self.is_cancelled():
+                        self.mark_cancelled()
+                        return
+                    processed += 1
+                    if self.device_max is None or ts > self.device_max:
+                        self.device_max = ts
+
+                    # Bản ghi trước mốc đã được nạp ở lần đồng bộ trước
+                    # (giữ lại bản ghi đúng bằng mốc, trùng lặp sẽ bị bỏ qua khi nạp)
+                    if mark is not None and ts < mark:
+                        continue
+
+                    att_date = ts.date()
+                    if self.from_date and att_date < self.from_date:
+                        self.excluded_before = True
+                        continue
+                    if self.to_date and att_date > self.to_date:
+                        self.excluded_after = True
+                        continue
+
+                    if self.included_max is None or ts > self.included_max:
+                        self.included_max = ts
+                    batch.append(
+                        user_id,                                # user_id
+                        names.get(user_id, ""),                 # user_name
+                        ts,                                     # timestamp
+                        status,                                 # status
+                        punch,                                  # punch
+                        uid,                                    # uid
+                        self.device_sn,                         # device_sn
+                        self.device_id,                         # device_id
+                        "",                                     # note
+                    )
+                    if len(batch) >= self.chunk_size:
+                        self.selected += len(batch)
+                        yield batch, processed
+                        batch = AttendanceRawBatch()
+
+                if self.device_count is None or processed < self.device_count:
+                    self.device_count = processed
+                if (
+                    self.incremental
+                    and self.state["record_count"] is not None
+                    and processed < self.state["record_count"]
+                ):
+                    # Log trên máy ít hơn lần trước (đã bị xóa) nhưng chỉ phát hiện sau khi đọc:
+                    # các bản ghi trước mốc cũ đã bị bỏ qua nên lần sau phải đồng bộ lại toàn bộ
+                    self.reset_state = True
+                    log_to_debug("AttendanceRawService: Device log was cleared, sync state will be reset")
+
+                self.selected += len(batch)
+                log_to_debug(
+                    f"AttendanceRawService: device_id={self.device_id} scanned {processed} records, "
+                    f"selected {self.selected} (mark={mark})"
+                )
+                if len(batch):
+                    yield batch, processed
+
+        except Exception as conn_error:
+            log_to_debug(f"AttendanceRawService: Connection error: {conn_error}")
+            self.success = False
+            self.message = f"Lỗi kết nối: {str(conn_error)}"
+
+    def _read_record_count(self, conn):
+        """
+        Đọc số bản ghi chấm công đang lưu trên thiết bị mà không tải log.
+        Args:
+            conn: Kết nối pyzk đang mở
+        Returns:
+            int: Số bản ghi, hoặc None nếu thiết bị không hỗ trợ
+        """
+        try:
+            conn.read_sizes()
+            return conn.records
+        except Exception as e:
+            log_to_debug(f"AttendanceRawService: read_sizes() not available: {e}")
+            return None
 
 
 class AttendanceRawService:
@@ -21,22 +344,37 @@ class AttendanceRawService:
     def __init__(self):
         self.repo = AttendanceRawRepository()
         self.device_repo = DeviceRepository()
+        self.sync_state_repo = DeviceSyncStateRepository()
 
-    def download_from_device(self, device_id, from_date=None, to_date=None, progress_callback=None):
+    def download_from_device(
+        self,
+        device_id,
+        from_date=None,
+        to_date=None,
+        progress_callback=None,
+        full_resync=False,
+        cancel_event=None,
+    ):
         """
-        Tải dữ liệu chấm công từ thiết bị
+        Tải dữ liệu chấm công từ thiết bị.
+        Log được đọc, lọc và ghi theo từng lô CHUNK_SIZE bản ghi nên bộ nhớ không tăng
+        theo kích thước log. Mặc định đồng bộ tăng dần: chỉ xử lý các bản ghi sau mốc
+        đã lưu trong device_sync_state; tự chuyển sang đồng bộ toàn bộ khi thiết bị chưa
+        có mốc, serial number thay đổi, log trên máy bị xóa hoặc khoảng ngày rộng hơn lần trước.
         Args:
             device_id: ID thiết bị
             from_date: Từ ngày (datetime.date, optional)
             to_date: Đến ngày (datetime.date, optional)
-            progress_callback: Callback function(current, total, message) để cập nhật tiến trình
+            progress_callback: Callback function(value, message) để cập nhật tiến trình (0-100)
+            full_resync: True để bỏ qua mốc và đồng bộ lại toàn bộ log
+            cancel_event: threading.Event để hủy giữa chừng (optional)
         Returns:
             tuple: (success: bool, message: str, count: int)
         """
         try:
             log_to_debug(
                 f"AttendanceRawService: download_from_device() - device_id={device_id}, "
-                f"from={from_date}, to={to_date}"
+                f"from={from_date}, to={to_date}, full_resync={full_resync}"
             )
 
             # Lấy thông tin thiết bị
@@ -44,140 +382,290 @@ class AttendanceRawService:
             if not device:
                 return False, "Thiết bị không tồn tại", 0
 
-            # Import thư viện pyzk
-            try:
-                from zk import ZK
-            except ImportError:
-                return False, "Chưa cài đặt thư viện pyzk. Vui lòng chạy: pip install pyzk", 0
+            state = None if full_resync else self.sync_state_repo.get(device_id)
+            fetch = DeviceAttendanceFetch(
+                device, state, from_date, to_date, progress_callback, cancel_event=cancel_event
+            )
+            # closing(): generator luôn được đóng trên thread này (trả khóa phiên thiết bị)
+            with closing(fetch.chunks()) as chunks:
+                for batch, processed in chunks:
+                    self._store_chunk(fetch, batch, processed)
+            return self._finish_fetch(fetch, from_date)
 
-            # Kết nối với thiết bị
-            ip = device["ip_address"]
-            port = device.get("port", 4370)
-            password = device.get("password", "")
+        except Exception as e:
+            log_to_debug(
+                f"AttendanceRawService: download_from_device() error: {e}\n{traceback.format_exc()}"
+            )
+            return False, f"Lỗi: {str(e)}", 0
 
-            zk = ZK(ip, port=port, timeout=10, password=password if password else 0)
+    def download_from_devices(
+        self,
+        device_ids=None,
+        from_date=None,
+        to_date=None,
+        progress_callback=None,
+        max_workers=4,
+        full_resync=False,
+        cancel_event=None,
+    ):
+        """
+        Tải dữ liệu chấm công từ nhiều thiết bị song song.
+        Việc kết nối và đọc log từng máy chạy trên một pool tối đa max_workers thread;
+        lỗi của một máy không ảnh hưởng các máy khác. Các lô đọc được đi qua một hàng đợi
+        có giới hạn tới thread gọi hàm - nơi DUY NHẤT ghi vào database.
+        Args:
+            device_ids: Danh sách ID thiết bị (None = tất cả thiết bị trong bảng device)
+            from_date: Từ ngày (datetime.date, optional)
+            to_date: Đến ngày (datetime.date, optional)
+            progress_callback: Callback function(device_id, value, message) cho từng thiết bị
+            max_workers: Số thiết bị được tải đồng thời tối đa
+            full_resync: True để bỏ qua mốc và đồng bộ lại toàn bộ log
+            cancel_event: threading.Event để hủy giữa chừng (optional)
+        Returns:
+            tuple: (success: bool, message: str, count: int, results: dict)
+                   results = {device_id: (success, message, count)}
+        """
+        from concurrent.futures import ThreadPoolExecutor
 
-            try:
-                log_to_debug(f"AttendanceRawService: Connecting to {ip}:{port}")
-                # Kết nối 1-10%
-                for i in range(1, 11):
-                    if progress_callback:
-                        progress_callback(i, f"Đang kết nối với {ip}...")
-                
-                conn = zk.connect()
-
-                # Lấy thông tin thiết bị 11-20%
-                for i in range(11, 21):
-                    if progress_callback:
-                        progress_callback(i, "Đang lấy thông tin thiết bị...")
-                
-                device_sn = conn.get_serialnumber()
-                log_to_debug(f"AttendanceRawService: Connected to device SN={device_sn}")
-
-                # Lấy dữ liệu chấm công 21-50%
-                log_to_debug("AttendanceRawService: Fetching attendance records...")
-                for i in range(21, 41):
-                    if progress_callback:
-                        progress_callback(i, "Đang tải dữ liệu chấm công...")
-                
-                attendances = conn.get_attendance()
-                log_to_debug(f"AttendanceRawService: Fetched {len(attendances)} records")
-                
-                for i in range(41, 51):
-                    if progress_callback:
-                        progress_callback(i, "Đã tải xong dữ liệu chấm công...")
-
-                # Lấy danh sách users 51-65%
-                for i in range(51, 61):
-                    if progress_callback:
-                        progress_callback(i, "Đang tải danh sách nhân viên...")
-                
-                users = conn.get_users()
-                user_dict = {user.user_id: user.name for user in users}
-                log_to_debug(f"AttendanceRawService: Loaded {len(users)} users")
+        try:
+            if device_ids is None:
+                devices = self.device_repo.get_all()
+            else:
+                devices = [self.device_repo.get_by_id(device_id) for device_id in device_ids]
+                devices = [device for device in devices if device]
 
-                # Ngắt kết nối
-                for i in range(61, 66):
-                    if progress_callback:
-                        progress_callback(i, "Đang ngắt kết nối...")
-                        
-                conn.disconnect()
-                log_to_debug("AttendanceRawService: Disconnected from device")
-                
-                # Lọc dữ liệu 66-75%
-                for i in range(66, 76):
-                    if progress_callback:
-                        progress_callback(i, "Đang lọc dữ liệu...")
-
-                # Lọc theo khoảng ngày nếu có
-                filtered_records = []
-                for att in attendances:
-                    att_date = att.timestamp.date()
-                    
-                    # Kiểm tra khoảng ngày
-                    if from_date and att_date < from_date:
-                        continue
-                    if to_date and att_date > to_date:
-                        continue
-                    
-                    filtered_records.append(att)
+            if not devices:
+                return False, "Chưa có thiết bị nào", 0, {}
 
-                log_to_debug(
-                    f"AttendanceRawService: Filtered to {len(filtered_records)} records "
-                    f"(from {len(attendances)} total)"
+            log_to_debug(
+                f"AttendanceRawService: download_from_devices() - {len(devices)} devices, "
+                f"max_workers={max_workers}, from={from_date}, to={to_date}"
+            )
+
+            def device_progress(device_id):
+                if not progress_callback:
+                    return None
+                return lambda value, message: progress_callback(device_id, value, message)
+
+            # Đọc mốc đồng bộ trước khi chia việc: worker chỉ làm việc với thiết bị, không chạm database
+            fetches = [
+                DeviceAttendanceFetch(
+                    device,
+                    None if full_resync else self.sync_state_repo.get(device["id"]),
+                    from_date,
+                    to_date,
+                    device_progress(device["id"]),
+                    cancel_event=cancel_event,
                 )
-                
-                # Chuẩn bị dữ liệu 76-85%
-                for i in range(76, 86):
-                    if progress_callback:
-                        progress_callback(i, "Đang chuẩn bị dữ liệu...")
-
-                # Chuẩn bị dữ liệu để insert
-                records_to_insert = []
-                for att in filtered_records:
-                    user_name = user_dict.get(att.user_id, "")
-                    
-                    record = (
-                        str(att.user_id),           # user_id
-                        user_name,                  # user_name
-                        att.timestamp,              # timestamp
-                        att.status,                 # status
-                        att.punch,                  # punch
-                        att.uid if hasattr(att, 'uid') else 0,  # uid
-                        device_sn,                  # device_sn
-                        device_id,                  # device_id
-                        "",                         # note
-                    )
-                    records_to_insert.append(record)
-
-                # Bulk insert vào database 86-100%
-                if records_to_insert:
-                    for i in range(86, 96):
-                        if progress_callback:
-                            progress_callback(i, "Đang lưu vào cơ sở dữ liệu...")
-                    
-                    success_count, total = self.repo.bulk_insert(records_to_insert)
+                for device in devices
+            ]
+
+            workers = max(1, min(max_workers, len(fetches)))
+            # Hàng đợi có giới hạn: worker đọc nhanh hơn tốc độ ghi sẽ phải chờ
+            chunk_queue = queue.Queue(maxsize=workers * 2)
+
+            # Đặt khi thread ghi rời vòng rút hàng đợi (kể cả do lỗi): worker không chờ mãi
+            consumer_stopped = threading.Event()
+
+            def put(fetch, item):
+                """Đưa lô / dấu kết thúc (item None) vào hàng đợi; False nếu phải bỏ"""
+                while True:
+                    try:
+                        chunk_queue.put((fetch, item), timeout=QUEUE_PUT_TIMEOUT)
+                        return True
+                    except queue.Full:
+                        if consumer_stopped.is_set():
+                            return False
+                        # Lô của máy đã hủy sẽ không được ghi: bỏ luôn, không chờ chỗ trống
+                        if item is not None and fetch.is_cancelled():
+                            fetch.mark_cancelled()
+                            return False
+
+            def produce(fetch):
+                try:
+                    # closing(): generator được đóng trên chính worker đã mượn phiên thiết bị
+                    with closing(fetch.chunks()) as chunks:
+                        for item in chunks:
+                            if fetch.is_cancelled():
+                                fetch.mark_cancelled()
+                                break
+                            if not put(fetch, item):
+                                break
+                except Exception as e:
                     log_to_debug(
-                        f"AttendanceRawService: Inserted {success_count}/{total} records into database"
+                        f"AttendanceRawService: device {fetch.device_id} read error: {e}\n{traceback.format_exc()}"
                     )
-                    
-                    for i in range(96, 101):
-                        if progress_callback:
-                            progress_callback(i, "Hoàn tất lưu dữ liệu...")
-                    
-                    return True, f"Tải thành công {success_count} bản ghi mới (tổng {total} bản ghi)", success_count
-                else:
-                    return True, "Không có dữ liệu trong khoảng thời gian đã chọn", 0
-
-            except Exception as conn_error:
-                log_to_debug(f"AttendanceRawService: Connection error: {conn_error}")
-                return False, f"Lỗi kết nối: {str(conn_error)}", 0
+                    fetch.success = False
+                    fetch.message = f"Lỗi: {str(e)}"
+                finally:
+                    put(fetch, None)
+                    # Thread của pool sống tới khi pool đóng: trả cursor DuckDB ngay
+                    Database.release_cursor()
+
+            results = {}
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for fetch in fetches:
+                    pool.submit(produce, fetch)
+
+                # Rút hàng đợi tới khi MỌI worker đã gửi dấu kết thúc, kể cả khi ghi lỗi
+                try:
+                    remaining = len(fetches)
+                    while remaining:
+                        fetch, item = chunk_queue.get()
+                        if item is not None:
+                            # Đã hủy: chỉ rút hàng đợi, không ghi thêm (mốc đồng bộ giữ nguyên)
+                            if fetch.is_cancelled():
+                                fetch.mark_cancelled()
+                                continue
+                            try:
+                                self._store_chunk(fetch, *item)
+                            except Exception as e:
+                                log_to_debug(
+                                    f"AttendanceRawService: device {fetch.device_id} store error: {e}\n{traceback.format_exc()}"
+                                )
+                                fetch.write_failed = True
+                            continue
+
+                        remaining -= 1
+                        try:
+                            result = self._finish_fetch(fetch, from_date)
+                        except Exception as e:
+                            log_to_debug(
+                                f"AttendanceRawService: device {fetch.device_id} error: {e}\n{traceback.format_exc()}"
+                            )
+                            result = (False, f"Lỗi: {str(e)}", 0)
+                        results[fetch.device_id] = result
+                        try:
+                            fetch.report(100, result[1])
+                        except Exception as e:
+                            log_to_debug(f"AttendanceRawService: progress callback error: {e}")
+                finally:
+                    consumer_stopped.set()
+
+            failed = [device for device in devices if not results[device["id"]][0]]
+            total_count = sum(result[2] for result in results.values())
+            message = (
+                f"Đã tải {len(devices) - len(failed)}/{len(devices)} thiết bị, "
+                f"{total_count} bản ghi mới"
+            )
+            if failed:
+                lines = [f"- {device['device_name']}: {results[device['id']][1]}" for device in failed]
+                message += "\nThiết bị lỗi:\n" + "\n".join(lines)
+
+            log_to_debug(f"AttendanceRawService: download_from_devices() - {message}")
+            return not failed, message, total_count, results
 
         except Exception as e:
             log_to_debug(
-                f"AttendanceRawService: download_from_device() error: {e}\n{traceback.format_exc()}"
+                f"AttendanceRawService: download_from_devices() error: {e}\n{traceback.format_exc()}"
             )
-            return False, f"Lỗi: {str(e)}", 0
+            return False, f"Lỗi: {str(e)}", 0, {}
+
+    def _store_chunk(self, fetch, batch, processed):
+        """
+        Ghi một lô đọc được từ thiết bị vào database và báo tiến độ thật
+        theo số bản ghi của log đã xử lý.
+        Args:
+            fetch: DeviceAttendanceFetch đang đọc
+            batch: AttendanceRawBatch của lô
+            processed: Số bản ghi trong log đã duyệt tới lô này
+        Returns:
+            None
+        """
+        if fetch.write_failed:
+            return
+
+        result = self.repo.ingest_batch(batch)
+        if result is None:
+            fetch.write_failed = True
+            return
+
+        fetch.inserted += result[0]
+        fetch.skipped += result[1]
+
+        total = max(fetch.device_count or 0, processed, 1)
+        value = PROGRESS_STORE_START + (99 - PROGRESS_STORE_START) * processed // total
+        fetch.report(
+            value,
+            f"Đã xử lý {processed}/{total} bản ghi, lưu {fetch.inserted} bản ghi mới",
+        )
+
+    def _finish_fetch(self, fetch, from_date):
+        """
+        Kết thúc một lần tải: cập nhật mốc đồng bộ (nếu mọi lô đã ghi thành công)
+        và tạo thông báo kết quả.
+        Args:
+            fetch: DeviceAttendanceFetch đã đọc xong
+            from_date: Từ ngày của lần tải này
+        Returns:
+            tuple: (success: bool, message: str, count: int)
+        """
+        if not fetch.success:
+            return False, fetch.message, fetch.inserted
+
+        if fetch.unchanged:
+            fetch.report(100, "Không có dữ liệu mới")
+            return True, "Không có bản ghi chấm công mới trên thiết bị", 0
+
+        if fetch.write_failed:
+            return False, "Lỗi khi lưu dữ liệu chấm công vào cơ sở dữ liệu", fetch.inserted
+
+        log_to_debug(
+            f"AttendanceRawService: device_id={fetch.device_id} ingested {fetch.inserted} new, "
+            f"{fetch.skipped} skipped (total {fetch.selected})"
+        )
+
+        # Cập nhật mốc đồng bộ sau khi đã nạp thành công
+        if fetch.reset_state:
+            self.sync_state_repo.delete(fetch.device_id)
+        else:
+            self._save_sync_state(fetch, from_date)
+
+        fetch.report(100, "Hoàn tất lưu dữ liệu")
+
+        if not fetch.selected:
+            if fetch.incremental:
+                return True, "Không có bản ghi chấm công mới trên thiết bị", 0
+            return True, "Không có dữ liệu trong khoảng thời gian đã chọn", 0
+
+        mode_text = "Đồng bộ tăng dần" if fetch.incremental else "Đồng bộ toàn bộ"
+        return (
+            True,
+            f"{mode_text}: tải thành công {fetch.inserted} bản ghi mới, bỏ qua {fetch.skipped} bản ghi trùng "
+            f"(tổng {fetch.selected} bản ghi)",
+            fetch.inserted,
+        )
+
+    def _save_sync_state(self, fetch, from_date):
+        """
+        Tính và lưu mốc đồng bộ mới sau một lần tải thành công.
+        Args:
+            fetch: DeviceAttendanceFetch đã đọc xong (state = None nếu đồng bộ toàn bộ)
+            from_date: Từ ngày của lần tải này
+        Returns:
+            bool: True nếu lưu thành công
+        """
+        state = fetch.state
+        old_mark = state["last_timestamp"] if state else None
+
+        if fetch.excluded_after:
+            # Bản ghi sau to_date chưa được nạp: mốc chỉ tiến tới bản ghi mới nhất đã nạp
+            candidates = [ts for ts in (fetch.included_max, old_mark) if ts is not None]
+            last_timestamp = max(candidates) if candidates else None
+            record_count = None
+        else:
+            candidates = [ts for ts in (fetch.device_max, old_mark) if ts is not None]
+            last_timestamp = max(candidates) if candidates else None
+            record_count = fetch.device_count
+
+        if state is None or fetch.excluded_before:
+            synced_from = from_date
+        else:
+            synced_from = state["synced_from"]
+
+        return self.sync_state_repo.save(
+            fetch.device_id, fetch.device_sn, last_timestamp, record_count, synced_from
+        )
 
     def get_all_records(self, from_date=None, to_date=None, device_id=None):
         """
@@ -202,21 +690,23 @@ class AttendanceRawService:
         """
         Xóa toàn bộ dữ liệu chấm công
         Returns:
-            tuple: (success: bool, message: str)
+            tuple: (success: bool, message: str, deleted_count: int)
         """
         try:
             log_to_debug("AttendanceRawService: delete_all_records() called")
-            success = self.repo.delete_all()
+            deleted = self.repo.delete_all()
             
-            if success:
-                return True, "Đã xóa toàn bộ dữ liệu chấm công"
+            if deleted is not None:
+                # Dữ liệu đã xóa -> lần tải sau phải đồng bộ lại toàn bộ
+                self.sync_state_repo.delete_all()
+                return True, f"Đã xóa toàn bộ dữ liệu chấm công ({deleted} bản ghi)", deleted
             else:
-                return False, "Lỗi khi xóa dữ liệu"
+                return False, "Lỗi khi xóa dữ liệu", 0
         except Exception as e:
             log_to_debug(
                 f"AttendanceRawService: delete_all_records() error: {e}\n{traceback.format_exc()}"
             )
-            return False, f"Lỗi: {str(e)}"
+            return False, f"Lỗi: {str(e)}", 0
 
     def delete_record_by_id(self, record_id):
         """
@@ -226,14 +716,78 @@ class AttendanceRawService:
         Returns:
             bool: True nếu thành công
         """
-        try:
-            log_to_debug(f"AttendanceRawService: delete_record_by_id() - id={record_id}")
-            return self.repo.delete_by_id(record_id)
-        except Exception as e:
-            log_to_debug(
-                f"AttendanceRawService: delete_record_by_id() error: {e}\n{traceback.format_exc()}"
+        success, _message, _count = self.delete_records_by_ids([record_id])
+        return success
+
+    def delete_records_by_ids(self, record_ids):
+        """
+        Mô tả:
+            Xóa nhiều bản ghi theo danh sách ID trong một transaction.
+            Chạy được trên thread nền (không đụng tới giao diện).
+        Args:
+            record_ids: Danh sách ID bản ghi
+        Returns:
+            tuple: (success: bool, message: str, deleted_count: int)
+        """
+        log_to_debug(f"AttendanceRawService: delete_records_by_ids() - {len(record_ids)} ids")
+        return self._finish_delete(self.repo.delete_by_ids(record_ids))
+
+    def delete_records_by_user_dates(self, pairs):
+        """
+        Mô tả:
+            Xóa mọi bản ghi của các cặp (mã chấm công, ngày) trong một transaction.
+        Args:
+            pairs: Danh sách (user_id, ngày)
+        Returns:
+            tuple: (success: bool, message: str, deleted_count: int)
+        """
+        log_to_debug(f"AttendanceRawService: delete_records_by_user_dates() - {len(pairs)} pairs")
+        return self._finish_delete(self.repo.delete_by_user_dates(pairs))
+
+    def delete_records_where(self, from_date=None, to_date=None, device_id=None, department_id=None):
+        """
+        Mô tả:
+            Xóa chấm công theo điều kiện trong một transaction, ví dụ cả tháng của một
+            phòng ban (gồm phòng ban con): from_date / to_date là đầu / cuối tháng.
+        Args:
+            from_date: Từ ngày (optional)
+            to_date: Đến ngày (optional)
+            device_id: ID thiết bị (optional)
+            department_id: Chỉ xóa chấm công của nhân viên thuộc phòng ban này (optional)
+        Returns:
+            tuple: (success: bool, message: str, deleted_count: int)
+        """
+        log_to_debug(
+            f"AttendanceRawService: delete_records_where() - from_date={from_date}, "
+            f"to_date={to_date}, device_id={device_id}, department_id={department_id}"
+        )
+        user_ids = None
+        if department_id is not None:
+            user_ids = self._department_user_ids(department_id)
+        return self._finish_delete(
+            self.repo.delete_where(from_date, to_date, device_id, user_ids)
+        )
+
+    @staticmethod
+    def _department_user_ids(department_id):
+        """Mã chấm công trên máy của nhân viên thuộc phòng ban (như khi tải ca lên máy)"""
+        cols = EmployeeRepository().get_all_columns(department_id=department_id)
+        return [
+            attendance_code or employee_code or str(emp_id)
+            for emp_id, employee_code, attendance_code in zip(
+                cols["id"], cols["employee_code"], cols["attendance_code"]
             )
-            return False
+        ]
+
+    def _finish_delete(self, result):
+        """Kết quả xóa của repository -> (success, message, count); đặt lại mốc đồng bộ"""
+        if result is None:
+            return False, "Lỗi khi xóa dữ liệu", 0
+        deleted, device_ids = result
+        # Bản ghi đã xóa nằm trước mốc -> lần tải sau phải đồng bộ lại toàn bộ
+        for device_id in device_ids:
+            self.sync_state_repo.delete(device_id)
+        return True, f"Đã xóa {deleted} bản ghi chấm công", deleted
 
     def get_record_count(self):
         """
@@ -5,6 +5,7 @@ import shutil
 import os
 from datetime import datetime
 from core.database import Database
+from core.table_versions import TableVersions
 
 
 class BackupService:
@@ -30,6 +31,9 @@ class BackupService:
             if not os.path.exists(source_path):
                 return False, "Database không tồn tại"
 
+            # Ghi WAL vào file chính để bản sao lưu đầy đủ dữ liệu
+            Database.checkpoint()
+
             # Đảm bảo thư mục đích tồn tại
             dest_dir = os.path.dirname(destination_path)
             if dest_dir and not os.path.exists(dest_dir):
@@ -71,6 +75,9 @@ class BackupService:
 
             dest_path = Database.get_db_path()
 
+            # Đóng kết nối dùng chung trước khi ghi đè file database
+            Database.close()
+
             # Backup file hiện tại trước khi restore (phòng ngừa)
             if os.path.exists(dest_path):
                 # Tạo tên file backup: YYYYMMDD_backup_app.duckdb
@@ -81,6 +88,8 @@ class BackupService:
 
             # Copy file backup vào vị trí database
             shutil.copy2(source_path, dest_path)
+            # Mọi màn hình đã dựng phải nạp lại từ file vừa khôi phục
+            TableVersions.bump_all()
 
             # Kiểm tra restore thành công
             if os.path.exists(dest_path):
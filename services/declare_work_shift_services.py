@@ -15,6 +15,7 @@ def log_to_debug(message):
 # declare_work_shift_services.py
 # Service layer cho khai báo ca làm việc
 from repository.declare_work_shift_repository import DeclareWorkShiftRepository
+from services.attendance_daily_services import AttendanceDailyRefresher
 
 
 class DeclareWorkShiftService:
@@ -65,6 +66,9 @@ class DeclareWorkShiftService:
             work_day_count,
         )
         log_to_debug(f"DeclareWorkShiftService: add_work_shift() result: {result}")
+        if result:
+            # Ca làm việc quyết định cách ghép cặp -> tính lại bảng tổng hợp theo ngày (nền)
+            AttendanceDailyRefresher.request_rebuild()
         return result
 
     def update_work_shift(
@@ -93,6 +97,9 @@ class DeclareWorkShiftService:
             work_day_count,
         )
         log_to_debug(f"DeclareWorkShiftService: update_work_shift() result: {result}")
+        if result:
+            # Ca làm việc quyết định cách ghép cặp -> tính lại bảng tổng hợp theo ngày (nền)
+            AttendanceDailyRefresher.request_rebuild()
         return result
 
     def delete_work_shift(self, work_shift_id):
@@ -102,6 +109,9 @@ class DeclareWorkShiftService:
         )
         result = self.repo.delete_work_shift(work_shift_id)
         log_to_debug(f"DeclareWorkShiftService: delete_work_shift() result: {result}")
+        if result:
+            # Ca làm việc quyết định cách ghép cặp -> tính lại bảng tổng hợp theo ngày (nền)
+            AttendanceDailyRefresher.request_rebuild()
         return result
 
     def get_total_count(self):
@@ -12,18 +12,101 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
+from core.database import Database
+from core.change_bus import ChangeBus
 from repository.department_repository import DepartmentRepository
 
 
+class DepartmentTree:
+    """
+    Mô tả:
+        Cây phòng ban trong bộ nhớ, dựng một lần từ bảng department và department_closure.
+        - nodes: {id: phòng ban}
+        - children: {parent_id: [id con đã sắp theo tên]} (None = cấp gốc)
+        - subtree_ids(id): tập phòng ban trong nhánh (kể cả chính nó), lấy từ closure
+    Args:
+        nodes: List dict {id, name, parent_id}
+        closure: List tuple (ancestor_id, descendant_id, depth)
+    """
+
+    def __init__(self, nodes, closure):
+        self.nodes = {n["id"]: n for n in nodes}
+        self.children = {}
+        for n in sorted(nodes, key=lambda x: x["name"].lower()):
+            self.children.setdefault(n["parent_id"], []).append(n["id"])
+        descendants = {}
+        for ancestor_id, descendant_id, _depth in closure:
+            descendants.setdefault(ancestor_id, set()).add(descendant_id)
+        self._descendants = {k: frozenset(v) for k, v in descendants.items()}
+
+    def subtree_ids(self, dep_id):
+        """Id của phòng ban dep_id và mọi phòng ban con cháu"""
+        return self._descendants.get(dep_id, frozenset((dep_id,)))
+
+    def flat(self):
+        """
+        Mô tả:
+            Danh sách phòng ban theo thứ tự cây, có prefix '├─' hoặc '└─' theo cấp.
+        Returns:
+            list: Dict {id, name, display_name, parent_id, level}
+        """
+        result = []
+        # Duyệt theo chỉ mục con bằng stack: (id, level, is_last, prefix)
+        stack = [
+            (dep_id, 0, False, "") for dep_id in reversed(self.children.get(None, []))
+        ]
+        while stack:
+            dep_id, level, is_last, prefix = stack.pop()
+            n = self.nodes[dep_id]
+            if level == 0:
+                current_prefix, next_prefix = "", ""
+            else:
+                current_prefix = prefix + ("└─ " if is_last else "├─ ")
+                next_prefix = prefix + ("    " if is_last else "│   ")
+            result.append(
+                {
+                    "id": n["id"],
+                    "name": n["name"],
+                    "display_name": f"{current_prefix}{n['name']}",
+                    "parent_id": n["parent_id"],
+                    "level": level,
+                }
+            )
+            children = self.children.get(dep_id, [])
+            last = len(children) - 1
+            for idx in range(last, -1, -1):
+                stack.append((children[idx], level + 1, idx == last, next_prefix))
+        return result
+
+
 class DepartmentService:
+    # Cây phòng ban dùng chung giữa các màn hình: (kết nối database, DepartmentTree).
+    # Bỏ cache khi bảng department thay đổi (ChangeBus) hoặc khi database được mở lại.
+    _tree_cache = None
+
     def __init__(self):
         self.repo = DepartmentRepository()
 
     def get_all_departments(self):
         return self.repo.get_all()
 
+    def get_tree(self):
+        """Cây phòng ban (DepartmentTree) đã cache"""
+        connection = Database.get_connection()
+        cached = DepartmentService._tree_cache
+        if cached is not None and cached[0] is connection:
+            return cached[1]
+        tree = DepartmentTree(self.repo.get_all(), self.repo.get_closure())
+        DepartmentService._tree_cache = (connection, tree)
+        return tree
+
+    @staticmethod
+    def invalidate_tree(event=None):
+        """Bỏ cây phòng ban đã cache (lần get_tree() sau sẽ đọc lại)"""
+        DepartmentService._tree_cache = None
+
     def get_hierarchy(self):
-        return self.repo.get_hierarchy_flat()
+        return self.get_tree().flat()
 
     def get_department_by_id(self, dep_id):
         return self.repo.get_by_id(dep_id)
@@ -66,3 +149,7 @@ class DepartmentService:
 
     def count(self):
         return self.repo.count()
+
+
+# Repository phát sự kiện sau khi commit, cây được bỏ ngay trên thread đã ghi
+ChangeBus.subscribe(DepartmentService.invalidate_tree, tables=("department",))
@@ -0,0 +1,307 @@
+# device_polling_services.py
+# Service lập lịch tải chấm công định kỳ từ mọi thiết bị (dùng cho tiến trình chạy nền)
+
+import json
+import os
+import random
+import threading
+import time
+import traceback
+from datetime import datetime
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+from core.database import Database
+from core.migrations import run_migrations
+from repository.device_repository import DeviceRepository
+from services.attendance_raw_services import AttendanceRawService
+
+
+# Chu kỳ tải mặc định của mỗi thiết bị (giây)
+POLL_INTERVAL = 300
+
+# Thời gian chờ tối đa (giây) giữa hai lần thử với thiết bị không kết nối được
+MAX_BACKOFF = 3600
+
+# Độ lệch ngẫu nhiên (tỷ lệ của khoảng chờ) để các thiết bị không bị gọi cùng lúc
+JITTER = 0.2
+
+# Trạng thái thiết bị ghi vào bảng device (cùng chuỗi với màn hình thiết bị)
+STATUS_CONNECTED = "Đã kết nối"
+STATUS_UNREACHABLE = "Không thể kết nối"
+
+# File tiến trình nền ghi định kỳ (cạnh file database) để ứng dụng giao diện biết lịch tải
+HEARTBEAT_FILE = "sync_daemon.json"
+
+# Heartbeat cũ hơn (2 * interval + HEARTBEAT_GRACE) giây coi như tiến trình nền đã dừng
+HEARTBEAT_GRACE = 60
+
+# Chu kỳ (giây) ứng dụng giao diện kiểm tra lại heartbeat khi tiến trình nền không chạy
+HEARTBEAT_CHECK = 60
+
+
+class _PollState:
+    """Lịch tải của một thiết bị"""
+
+    def __init__(self, next_due, status):
+        self.next_due = next_due
+        self.failures = 0
+        self.status = status
+
+
+class DevicePollingService:
+    """
+    Mô tả:
+        Tải chấm công định kỳ từ mọi thiết bị trong bảng device, không phụ thuộc Qt.
+        Mỗi lượt chỉ tải các thiết bị đến hạn (đồng bộ tăng dần, máy không có bản ghi mới
+        chỉ tốn một lần đọc số lượng). Thiết bị lỗi được thử lại sau khoảng chờ tăng
+        gấp đôi (tối đa max_backoff); mọi khoảng chờ đều có độ lệch ngẫu nhiên.
+        Trạng thái thiết bị chỉ được ghi khi thay đổi.
+
+        Giới hạn: DuckDB chỉ cho MỘT tiến trình mở file database để ghi. Ứng dụng giao diện
+        giữ file suốt lúc mở, nên khi giao diện đang chạy, tiến trình nền (sync_daemon.py)
+        không mở được database và nhường lại: nó chỉ ghi heartbeat (HEARTBEAT_FILE), còn
+        ứng dụng giao diện thấy heartbeat thì tự chạy lịch tải này trong tiến trình của mình
+        (EmbeddedPoller). Khi giao diện đóng, tiến trình nền tải tiếp ở lượt kế tiếp.
+    Args:
+        interval: Chu kỳ tải (giây)
+        max_backoff: Khoảng chờ tối đa với thiết bị lỗi (giây)
+        jitter: Độ lệch ngẫu nhiên (0-1) của khoảng chờ
+        max_workers: Số thiết bị tải đồng thời tối đa
+        device_ids: Chỉ tải các thiết bị này (None = tất cả)
+        stagger: True để rải lần tải đầu tiên của các thiết bị trong interval * jitter giây
+        cancel_event: threading.Event - đặt để hủy lượt tải đang chạy (optional)
+    """
+
+    def __init__(
+        self,
+        interval=POLL_INTERVAL,
+        max_backoff=MAX_BACKOFF,
+        jitter=JITTER,
+        max_workers=4,
+        device_ids=None,
+        stagger=True,
+        cancel_event=None,
+    ):
+        self.interval = interval
+        self.max_backoff = max(max_backoff, interval)
+        self.jitter = min(max(jitter, 0.0), 1.0)
+        self.max_workers = max_workers
+        self.device_ids = set(device_ids) if device_ids else None
+        self.stagger = stagger
+        self.cancel_event = cancel_event
+        self.attendance_service = AttendanceRawService()
+        self.device_repo = DeviceRepository()
+        self._schedule = {}
+        self._migrated = False
+
+    def run_once(self):
+        """
+        Mô tả:
+            Một lượt: tải các thiết bị đến hạn và lên lịch lần tải tiếp theo.
+        Returns:
+            float: Số giây nên chờ trước lượt kế tiếp
+        """
+        try:
+            if not self._open_database():
+                return self.interval
+
+            devices = self.device_repo.get_all()
+            if self.device_ids is not None:
+                devices = [d for d in devices if d["id"] in self.device_ids]
+            now = time.monotonic()
+            self._sync_schedule(devices, now)
+            if not devices:
+                log_to_debug("DevicePollingService: no devices to poll")
+                return self.interval
+
+            due = [d for d in devices if self._schedule[d["id"]].next_due <= now]
+            if due:
+                _success, message, count, results = self.attendance_service.download_from_devices(
+                    [d["id"] for d in due],
+                    max_workers=self.max_workers,
+                    cancel_event=self.cancel_event,
+                )
+                if self.cancel_event is not None and self.cancel_event.is_set():
+                    # Lượt bị hủy (đang thoát): không tính là máy lỗi
+                    return 0.0
+                done_at = time.monotonic()
+                for device in due:
+                    result = results.get(device["id"], (False, message, 0))
+                    self._reschedule(device, result[0], done_at)
+                failed = [d["device_name"] for d in due if not results.get(d["id"], (False,))[0]]
+                log_to_debug(
+                    f"DevicePollingService: polled {len(due)} devices, {count} new records"
+                    + (f", unreachable: {', '.join(failed)}" if failed else "")
+                )
+
+            next_due = min(state.next_due for state in self._schedule.values())
+            return max(0.0, next_due - time.monotonic())
+
+        except Exception as e:
+            log_to_debug(f"DevicePollingService: run_once() error: {e}\n{traceback.format_exc()}")
+            return self.interval
+
+    def _open_database(self):
+        """Mở database (chạy migration lần đầu); False nếu file đang bị tiến trình khác giữ"""
+        try:
+            Database.get_connection()
+            if not self._migrated:
+                run_migrations()
+                self._migrated = True
+            return True
+        except Exception as e:
+            log_to_debug(
+                f"DevicePollingService: database unavailable (GUI open?), skip this round: {e}"
+            )
+            Database.close()
+            return False
+
+    def _sync_schedule(self, devices, now):
+        """Thêm lịch cho thiết bị mới, bỏ lịch của thiết bị đã xóa"""
+        ids = {d["id"] for d in devices}
+        for device_id in list(self._schedule):
+            if device_id not in ids:
+                del self._schedule[device_id]
+        for device in devices:
+            if device["id"] not in self._schedule:
+                offset = random.uniform(0, self.interval * self.jitter) if self.stagger else 0.0
+                self._schedule[device["id"]] = _PollState(now + offset, device.get("status"))
+
+    def _reschedule(self, device, success, now):
+        """Lên lịch lần tải tiếp theo và ghi trạng thái thiết bị nếu thay đổi"""
+        state = self._schedule[device["id"]]
+        if success:
+            state.failures = 0
+            delay = self.interval
+            status = STATUS_CONNECTED
+        else:
+            state.failures += 1
+            delay = min(self.interval * (2 ** state.failures), self.max_backoff)
+            status = STATUS_UNREACHABLE
+        state.next_due = now + delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+        if status != state.status and self.device_repo.update_status(device["id"], status):
+            state.status = status
+
+
+def _heartbeat_path():
+    return os.path.join(os.path.dirname(Database.get_db_path()), HEARTBEAT_FILE)
+
+
+def write_heartbeat(settings):
+    """
+    Mô tả:
+        Tiến trình nền ghi lịch tải của nó kèm thời điểm hiện tại (gọi mỗi vòng lặp,
+        kể cả khi database đang bị ứng dụng giao diện giữ).
+    Args:
+        settings: Dict tham số của DevicePollingService (interval, max_backoff, jitter,
+            max_workers, device_ids)
+    Returns:
+        None
+    """
+    try:
+        data = dict(settings, heartbeat=time.time())
+        path = _heartbeat_path()
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except Exception as e:
+        log_to_debug(f"write_heartbeat() error: {e}")
+
+
+def read_heartbeat():
+    """
+    Mô tả:
+        Đọc lịch tải của tiến trình nền nếu nó còn chạy (heartbeat còn mới).
+    Returns:
+        dict | None: Tham số của DevicePollingService, None nếu không có tiến trình nền
+    """
+    try:
+        with open(_heartbeat_path(), encoding="utf-8") as f:
+            data = json.load(f)
+        heartbeat = data.pop("heartbeat")
+        if time.time() - heartbeat > 2 * data.get("interval", POLL_INTERVAL) + HEARTBEAT_GRACE:
+            return None
+        return data
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log_to_debug(f"read_heartbeat() error: {e}")
+        return None
+
+
+def clear_heartbeat():
+    """Xóa heartbeat khi tiến trình nền dừng"""
+    try:
+        os.remove(_heartbeat_path())
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log_to_debug(f"clear_heartbeat() error: {e}")
+
+
+class EmbeddedPoller:
+    """
+    Mô tả:
+        Chạy lịch tải của tiến trình nền bên trong ứng dụng giao diện (thread riêng)
+        trong lúc giao diện giữ file database. Chỉ tải khi heartbeat còn mới, tự dừng
+        tải khi tiến trình nền không còn chạy. Không phụ thuộc Qt.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Khởi động thread tải nền"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="EmbeddedPoller", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Hủy lượt tải đang chạy và chờ thread kết thúc (gọi trước Database.close())"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        service = None
+        settings = None
+        try:
+            while not self._stop.is_set():
+                current = read_heartbeat()
+                if current is None:
+                    if settings is not None:
+                        log_to_debug("EmbeddedPoller: sync daemon stopped, pause polling")
+                    service = settings = None
+                    self._stop.wait(HEARTBEAT_CHECK)
+                    continue
+                if current != settings:
+                    log_to_debug(f"EmbeddedPoller: sync daemon is waiting, polling with {current}")
+                    settings = current
+                    service = DevicePollingService(
+                        interval=settings.get("interval", POLL_INTERVAL),
+                        max_backoff=settings.get("max_backoff", MAX_BACKOFF),
+                        jitter=settings.get("jitter", JITTER),
+                        max_workers=settings.get("max_workers", 4),
+                        device_ids=settings.get("device_ids"),
+                        cancel_event=self._stop,
+                    )
+                wait = service.run_once()
+                self._stop.wait(min(wait, HEARTBEAT_CHECK))
+        except Exception as e:
+            log_to_debug(f"EmbeddedPoller: error: {e}\n{traceback.format_exc()}")
+        finally:
+            Database.release_cursor()
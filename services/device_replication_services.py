@@ -0,0 +1,299 @@
+# device_replication_services.py
+# Service nhân bản user + vân tay từ một máy chấm công sang nhiều máy
+
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+from core.device_session import DeviceSessionManager
+from repository.device_repository import DeviceRepository
+from repository.employee_repository import EmployeeRepository
+from repository.shift_upload_repository import ShiftUploadRepository
+from services.fingerprint_vault_services import write_user_templates
+from services.shift_upload_services import plan_user_upload
+
+
+# Số máy đích được kết nối đồng thời tối đa
+MAX_PARALLEL_TARGETS = 4
+
+# Số lượt thử lại các máy đích bị lỗi; lượt thứ n chờ n * RETRY_DELAY giây
+RETRY_COUNT = 2
+RETRY_DELAY = 3
+
+# Số user_id bị bỏ qua được liệt kê trong thông báo kết quả của mỗi máy
+MAX_LISTED_SKIPPED = 10
+
+# Các trường user phải giống nhau giữa máy nguồn và máy đích
+_USER_FIELDS = ("name", "privilege", "password", "group_id", "card")
+
+
+class DeviceReplicationService:
+    """
+    Mô tả:
+        Nhân bản user và vân tay: đọc máy nguồn MỘT lần, so với từng máy đích để chỉ ghi
+        user thiếu / khác, các máy đích chạy song song (giới hạn số kết nối), máy lỗi
+        được thử lại; kết quả ghi vào shift_upload bằng một lần upsert.
+    """
+
+    def __init__(self):
+        self.device_repo = DeviceRepository()
+        self.employee_repo = EmployeeRepository()
+        self.upload_repo = ShiftUploadRepository()
+
+    def replicate(
+        self,
+        source_device_id,
+        target_device_ids,
+        user_ids=None,
+        progress_callback=None,
+        max_parallel=MAX_PARALLEL_TARGETS,
+        retries=RETRY_COUNT,
+    ):
+        """
+        Mô tả:
+            Nhân bản user + vân tay từ máy nguồn sang các máy đích.
+        Args:
+            source_device_id: ID máy nguồn
+            target_device_ids: Danh sách ID máy đích (máy nguồn bị bỏ qua nếu có)
+            user_ids: Chỉ nhân bản các mã user này (optional, mặc định tất cả)
+            progress_callback: Callback function(progress_value, message) (optional)
+            max_parallel: Số máy đích kết nối đồng thời tối đa
+            retries: Số lượt thử lại máy đích lỗi
+        Returns:
+            tuple: (success: bool, message: str, count: int) - count: số máy đích thành công
+        """
+        try:
+            log_to_debug(
+                f"DeviceReplicationService: replicate() - source={source_device_id}, "
+                f"targets={target_device_ids}"
+            )
+            source = self.device_repo.get_by_id(source_device_id)
+            if not source:
+                return False, "Máy nguồn không tồn tại", 0
+            targets = {}
+            for device_id in target_device_ids:
+                if device_id == source_device_id or device_id in targets:
+                    continue
+                device = self.device_repo.get_by_id(device_id)
+                if device:
+                    targets[device_id] = device
+            if not targets:
+                return False, "Chưa chọn máy đích", 0
+
+            try:
+                import zk  # noqa: F401
+            except ImportError:
+                return False, "Chưa cài đặt thư viện pyzk", 0
+
+            # Đọc máy nguồn một lần
+            if progress_callback:
+                progress_callback(5, f"Đang đọc máy nguồn {source['device_name']}...")
+            try:
+                snapshot = _read_device(source)
+            except Exception as e:
+                log_to_debug(
+                    f"DeviceReplicationService: read source error: {e}\n{traceback.format_exc()}"
+                )
+                return False, f"Lỗi kết nối máy nguồn: {str(e)}", 0
+            if user_ids is not None:
+                wanted = {str(u) for u in user_ids}
+                snapshot = {k: v for k, v in snapshot.items() if k in wanted}
+            if not snapshot:
+                return False, "Máy nguồn không có user cần nhân bản", 0
+
+            # Ghi song song lên các máy đích, thử lại các máy lỗi
+            results = {}
+            pending = list(targets)
+            total = len(targets)
+            for attempt in range(retries + 1):
+                if attempt:
+                    time.sleep(RETRY_DELAY * attempt)
+                    log_to_debug(
+                        f"DeviceReplicationService: retry {attempt} for devices {pending}"
+                    )
+                failed = []
+                with ThreadPoolExecutor(max_workers=min(max_parallel, len(pending))) as pool:
+                    futures = {
+                        pool.submit(_replicate_to, targets[device_id], snapshot): device_id
+                        for device_id in pending
+                    }
+                    for future in as_completed(futures):
+                        device_id = futures[future]
+                        try:
+                            results[device_id] = (True,) + future.result()
+                        except Exception as e:
+                            log_to_debug(
+                                f"DeviceReplicationService: device {device_id} attempt "
+                                f"{attempt + 1} error: {e}"
+                            )
+                            results[device_id] = (False, 0, 0, (), str(e))
+                            failed.append(device_id)
+                        if progress_callback:
+                            done = sum(1 for r in results.values() if r[0])
+                            progress_callback(
+                                15 + int(done / total * 75),
+                                f"Đã nhân bản {done}/{total} máy...",
+                            )
+                pending = failed
+                if not pending:
+                    break
+
+            # Ghi nhận các nhân viên đã có trên máy đích thành công, một lần upsert
+            if progress_callback:
+                progress_callback(92, "Đang lưu kết quả vào database...")
+            self._save_results(snapshot, {d: r[3] for d, r in results.items() if r[0]})
+
+            ok_count = sum(1 for r in results.values() if r[0])
+            lines = []
+            for device_id, device in targets.items():
+                ok, written, unchanged, skipped, *error = results[device_id]
+                if ok and skipped:
+                    lines.append(
+                        f"⚠ {device['device_name']}: ghi {written} user, {unchanged} không đổi, "
+                        f"{len(skipped)} không ghi được (máy hết uid trống): "
+                        + ", ".join(skipped[:MAX_LISTED_SKIPPED])
+                        + (" ..." if len(skipped) > MAX_LISTED_SKIPPED else "")
+                    )
+                elif ok:
+                    lines.append(
+                        f"✔ {device['device_name']}: ghi {written} user, {unchanged} không đổi"
+                    )
+                else:
+                    lines.append(f"✘ {device['device_name']}: {error[0]}")
+            message = (
+                f"Đã nhân bản {len(snapshot)} user sang {ok_count}/{total} máy\n"
+                + "\n".join(lines)
+            )
+            log_to_debug(f"DeviceReplicationService: {message}")
+            return ok_count > 0, message, ok_count
+
+        except Exception as e:
+            log_to_debug(
+                f"DeviceReplicationService: replicate() error: {e}\n{traceback.format_exc()}"
+            )
+            return False, f"Lỗi: {str(e)}", 0
+
+    def _save_results(self, snapshot, skipped_by_device):
+        """
+        Upsert shift_upload cho các user (ứng với nhân viên) trên các máy thành công,
+        trừ các user bị bỏ qua trên từng máy.
+        skipped_by_device: {device_id: các user_id không ghi được lên máy đó}
+        """
+        if not skipped_by_device:
+            return
+        employees = self.employee_repo.get_ids_by_device_user(list(snapshot))
+        records = []
+        for user_id, (user, _fingers) in snapshot.items():
+            employee = employees.get(user_id)
+            if employee is None:
+                continue
+            for device_id, skipped in skipped_by_device.items():
+                if user_id in skipped:
+                    continue
+                records.append(
+                    {
+                        "employee_id": employee[0],
+                        "device_id": device_id,
+                        "user_id": user_id,
+                        "attendance_code": employee[1] or "",
+                        "attendance_name": user.name,
+                        "card_number": str(user.card) if user.card else "",
+                        "password": user.password or "",
+                        "privilege": user.privilege or 0,
+                        "enabled": True,
+                    }
+                )
+        self.upload_repo.bulk_insert(records)
+
+
+def _read_device(device):
+    """
+    Đọc toàn bộ user + vân tay của máy trong một phiên khóa máy.
+    Returns: {user_id: (User, {finger: Finger})}
+    """
+    with DeviceSessionManager.session(device, timeout=30) as conn:
+        conn.disable_device()
+        try:
+            users = conn.get_users()
+            templates = conn.get_templates()
+        finally:
+            conn.enable_device()
+
+    fingers_by_uid = {}
+    for t in templates:
+        fingers_by_uid.setdefault(t.uid, {})[t.fid] = t
+    return {str(u.user_id): (u, fingers_by_uid.get(u.uid, {})) for u in users}
+
+
+def _replicate_to(device, snapshot):
+    """
+    Chạy trên thread của pool: so máy đích với snapshot máy nguồn và ghi phần khác.
+    User không còn uid trống trên máy đích không được ghi và được trả về riêng.
+    Returns: (written, unchanged, skipped) - skipped: tuple user_id không ghi được
+    """
+    from zk.finger import Finger
+    from zk.user import User
+
+    with DeviceSessionManager.session(device, timeout=30) as conn:
+        current = {}
+        templates = {}
+        for t in conn.get_templates():
+            templates.setdefault(t.uid, {})[t.fid] = t.template
+        device_users = conn.get_users()
+        for u in device_users:
+            current[str(u.user_id)] = (u, templates.get(u.uid, {}))
+
+        # uid trên máy đích: user đã có giữ uid, user mới lấy uid trống
+        plan = plan_user_upload(
+            device_users,
+            [{"employee_id": None, "user_id": k, "name": u.name} for k, (u, _f) in snapshot.items()],
+            getattr(conn, "user_packet_size", 72),
+        )
+        uid_by_user_id = {op.user_id: op.uid for op in plan.creates + plan.updates + plan.unchanged}
+
+        batch = []
+        skipped = []
+        for user_id, (src, src_fingers) in snapshot.items():
+            uid = uid_by_user_id.get(user_id)
+            if uid is None:
+                skipped.append(user_id)
+                continue
+            existing = current.get(user_id)
+            if existing is not None:
+                dst, dst_fingers = existing
+                same_user = all(getattr(src, f) == getattr(dst, f) for f in _USER_FIELDS)
+                same_fingers = all(
+                    dst_fingers.get(fid) == finger.template for fid, finger in src_fingers.items()
+                )
+                if same_user and same_fingers:
+                    continue
+            batch.append(
+                (
+                    User(uid, src.name, src.privilege, src.password, src.group_id, user_id, src.card),
+                    [
+                        Finger(uid, fid, finger.valid, finger.template)
+                        for fid, finger in sorted(src_fingers.items())
+                    ],
+                )
+            )
+
+        written = write_user_templates(conn, batch)
+        if written < len(batch):
+            raise RuntimeError(f"chỉ ghi được {written}/{len(batch)} user")
+        if skipped:
+            log_to_debug(
+                f"DeviceReplicationService: {device['device_name']} has no free uid for "
+                f"{len(skipped)} users: {skipped}"
+            )
+        return written, len(snapshot) - len(batch) - len(skipped), tuple(skipped)
@@ -12,7 +12,16 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
+from core.device_session import DeviceBusyError, DeviceSessionManager
 from repository.device_repository import DeviceRepository
+from repository.device_sync_state_repository import DeviceSyncStateRepository
+
+
+# Thời gian chờ tối đa (giây) khi test kết nối mà máy đang được thao tác khác dùng
+BUSY_LOCK_TIMEOUT = 1
+
+# Thông báo khi máy đang bận (đang tải chấm công, ghi nhân viên...)
+DEVICE_BUSY_MESSAGE = "Máy đang bận (đang tải / ghi dữ liệu), vui lòng thử lại sau"
 
 
 class DeviceService:
@@ -20,6 +29,7 @@ class DeviceService:
 
     def __init__(self):
         self.repo = DeviceRepository()
+        self.sync_state_repo = DeviceSyncStateRepository()
 
     def get_all_devices(self):
         """
@@ -192,6 +202,8 @@ class DeviceService:
             success = self.repo.delete(device_id)
 
             if success:
+                self.sync_state_repo.delete(device_id)
+                DeviceSessionManager.close(device_id)
                 log_to_debug("DeviceService: delete_device() success")
                 return True, "Xóa thiết bị thành công"
             else:
@@ -220,13 +232,15 @@ class DeviceService:
             )
             return None
 
-    def test_connection(self, ip_address, port, password=""):
+    def test_connection(self, ip_address, port, password="", device_id=None):
         """
         Test kết nối với thiết bị chấm công
         Args:
             ip_address: Địa chỉ IP
             port: Cổng kết nối
             password: Mật mã
+            device_id: ID thiết bị đã lưu (optional) - phiên kết nối được giữ lại cho
+                       các thao tác tiếp theo trên máy này
         Returns:
             tuple: (success: bool, message: str)
         """
@@ -235,25 +249,22 @@ class DeviceService:
 
             # Import thư viện pyzk để kết nối với máy chấm công
             try:
-                from zk import ZK
+                import zk  # noqa: F401
             except ImportError:
                 return False, "Chưa cài đặt thư viện pyzk. Vui lòng chạy: pip install pyzk"
 
-            # Tạo kết nối
-            zk = ZK(ip_address, port=port, timeout=5, password=password if password else 0)
+            device = {"id": device_id, "ip_address": ip_address, "port": port, "password": password}
 
             try:
-                # Kết nối với thiết bị
-                conn = zk.connect()
-
-                # Lấy thông tin thiết bị
-                device_name = conn.get_device_name()
-                serial_number = conn.get_serialnumber()
-                firmware_version = conn.get_firmware_version()
-                users_count = len(conn.get_users())
-
-                # Ngắt kết nối
-                conn.disconnect()
+                # Kết nối (hoặc dùng lại phiên đang mở) và lấy thông tin thiết bị
+                # Máy đang tải / ghi dữ liệu thì báo bận ngay, không chờ thao tác đó xong
+                with DeviceSessionManager.session(
+                    device, timeout=5, lock_timeout=BUSY_LOCK_TIMEOUT
+                ) as conn:
+                    device_name = conn.get_device_name()
+                    serial_number = conn.get_serialnumber()
+                    firmware_version = conn.get_firmware_version()
+                    users_count = len(conn.get_users())
 
                 message = (
                     f"Kết nối thành công!\n"
@@ -266,6 +277,9 @@ class DeviceService:
                 log_to_debug(f"DeviceService: test_connection() success - {message}")
                 return True, message
 
+            except DeviceBusyError:
+                log_to_debug(f"DeviceService: test_connection() - device {ip_address} busy")
+                return False, DEVICE_BUSY_MESSAGE
             except Exception as conn_error:
                 log_to_debug(f"DeviceService: Connection error: {conn_error}")
                 return False, f"Không thể kết nối: {str(conn_error)}"
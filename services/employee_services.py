@@ -1,4 +1,5 @@
 import traceback
+import unicodedata
 
 
 def log_to_debug(message):
@@ -15,6 +16,176 @@ def log_to_debug(message):
 from repository.employee_repository import EmployeeRepository
 
 
+# Các trường được đánh chỉ mục tìm kiếm trên bảng nhân viên
+EMPLOYEE_SEARCH_FIELDS = (
+    "employee_code",
+    "name",
+    "department_name",
+    "job_title_name",
+    "attendance_code",
+)
+
+def normalize_search_text(value):
+    """
+    Mô tả:
+        Chuẩn hóa chuỗi để tìm kiếm: bỏ dấu tiếng Việt (kể cả đ/Đ), chữ thường,
+        gộp khoảng trắng. Ví dụ "Nguyễn  Văn Đức" -> "nguyen van duc".
+    Args:
+        value: Giá trị bất kỳ (None -> "")
+    Returns:
+        str: Chuỗi đã chuẩn hóa
+    """
+    if value is None:
+        return ""
+    text = unicodedata.normalize("NFD", str(value).replace("đ", "d").replace("Đ", "D"))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+class EmployeeSearchIndex:
+    """
+    Mô tả:
+        Chỉ mục tìm kiếm nhân viên trong bộ nhớ, không phân biệt dấu / hoa thường.
+        - Mỗi trường lưu các giá trị chuẩn hóa KHÁC NHAU -> tập id nhân viên
+          (phòng ban, chức vụ chỉ có vài trăm giá trị dù hàng chục nghìn nhân viên).
+        - Chuỗi tìm từ 3 ký tự: giao các tập trigram rồi kiểm tra lại bằng "in"
+          (tìm chuỗi con).
+        - Chuỗi 1-2 ký tự: quét "in" trên các giá trị khác nhau của trường (ít hơn nhiều
+          so với số nhân viên, và vẫn khớp giữa chuỗi như "02" trong "nv002").
+        Xây một lần mỗi lần nạp dữ liệu, cập nhật từng nhân viên qua upsert() / remove().
+    Args:
+        fields: Các trường được đánh chỉ mục (mặc định EMPLOYEE_SEARCH_FIELDS)
+    """
+
+    GRAM = 3
+
+    def __init__(self, fields=EMPLOYEE_SEARCH_FIELDS):
+        self.fields = tuple(fields)
+        self._texts = {}  # id -> tuple chuỗi chuẩn hóa theo thứ tự fields
+        self._ids = {f: {} for f in self.fields}  # chuỗi -> list id
+        self._grams = {f: {} for f in self.fields}  # trigram -> set chuỗi
+
+    @classmethod
+    def from_columns(cls, columns, key="id", fields=EMPLOYEE_SEARCH_FIELDS):
+        """
+        Mô tả:
+            Xây chỉ mục từ dữ liệu dạng cột (kết quả get_employee_columns()).
+        Args:
+            columns: Dict {tên cột: list giá trị}
+            key: Cột định danh nhân viên
+            fields: Các trường được đánh chỉ mục
+        Returns:
+            EmployeeSearchIndex
+        """
+        index = cls(fields)
+        ids = columns.get(key, [])
+        values = [columns.get(f, [None] * len(ids)) for f in index.fields]
+        for pos, emp_id in enumerate(ids):
+            index._add(emp_id, [normalize_search_text(v[pos]) for v in values])
+        return index
+
+    def __len__(self):
+        return len(self._texts)
+
+    # ------------------------------------------------------------------
+    # Cập nhật
+    # ------------------------------------------------------------------
+    def upsert(self, emp_id, record):
+        """
+        Mô tả:
+            Thêm mới hoặc cập nhật một nhân viên trong chỉ mục.
+        Args:
+            emp_id: Id nhân viên
+            record: Dict {trường: giá trị gốc} (thiếu trường -> rỗng)
+        """
+        self.remove(emp_id)
+        self._add(emp_id, [normalize_search_text(record.get(f)) for f in self.fields])
+
+    def remove(self, emp_id):
+        """Xóa một nhân viên khỏi chỉ mục (không có thì bỏ qua)"""
+        texts = self._texts.pop(emp_id, None)
+        if texts is None:
+            return
+        for field, text in zip(self.fields, texts):
+            owners = self._ids[field].get(text)
+            if owners is None or emp_id not in owners:
+                continue
+            owners.remove(emp_id)
+            if owners:
+                continue
+            # Không còn nhân viên nào mang giá trị này -> gỡ khỏi trigram
+            del self._ids[field][text]
+            for gram in self._text_grams(text):
+                bucket = self._grams[field].get(gram)
+                if bucket is not None:
+                    bucket.discard(text)
+                    if not bucket:
+                        del self._grams[field][gram]
+
+    def _add(self, emp_id, texts):
+        self._texts[emp_id] = tuple(texts)
+        for field, text in zip(self.fields, texts):
+            if not text:
+                continue
+            owners = self._ids[field].get(text)
+            if owners is not None:
+                owners.append(emp_id)
+                continue
+            self._ids[field][text] = [emp_id]
+            grams = self._grams[field]
+            for gram in self._text_grams(text):
+                bucket = grams.get(gram)
+                if bucket is None:
+                    grams[gram] = {text}
+                else:
+                    bucket.add(text)
+
+    @classmethod
+    def _text_grams(cls, text):
+        return {text[i : i + cls.GRAM] for i in range(len(text) - cls.GRAM + 1)}
+
+    # ------------------------------------------------------------------
+    # Tìm kiếm
+    # ------------------------------------------------------------------
+    def search(self, text, fields=None):
+        """
+        Mô tả:
+            Tìm nhân viên có chuỗi text (đã chuẩn hóa) trong một trong các trường.
+        Args:
+            text: Chuỗi người dùng nhập
+            fields: Các trường cần tìm (optional, mặc định tất cả trường đã đánh chỉ mục)
+        Returns:
+            set | None: Tập id khớp; None nếu chuỗi tìm rỗng (không lọc)
+        """
+        query = normalize_search_text(text)
+        if not query:
+            return None
+        result = set()
+        for field in fields or self.fields:
+            if field not in self._ids:
+                continue
+            owners = self._ids[field]
+            for value in self._matching_values(field, query):
+                result.update(owners[value])
+        return result
+
+    def _matching_values(self, field, query):
+        if len(query) < self.GRAM:
+            # Quá ngắn để có trigram: quét các giá trị khác nhau của trường
+            return [value for value in self._ids[field] if query in value]
+
+        grams = self._grams[field]
+        buckets = []
+        for gram in self._text_grams(query):
+            bucket = grams.get(gram)
+            if bucket is None:
+                return ()
+            buckets.append(bucket)
+        buckets.sort(key=len)
+        candidates = buckets[0].intersection(*buckets[1:])
+        return [value for value in candidates if query in value]
+
+
 class EmployeeService:
     def __init__(self):
         self.repo = EmployeeRepository()
@@ -22,6 +193,13 @@ class EmployeeService:
     def get_all_employees(self):
         return self.repo.get_all()
 
+    def get_employee_columns(self, ids=None, department_id=None):
+        """
+        Nhân viên dạng cột {tên cột: list} cho bảng nhân viên
+        (ids: chỉ lấy các id này; department_id: chỉ lấy nhánh phòng ban này)
+        """
+        return self.repo.get_all_columns(ids, department_id)
+
     def get_employees_by_department(self, department_id):
         return self.repo.get_by_department(department_id)
 
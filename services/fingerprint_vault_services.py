@@ -0,0 +1,323 @@
+# fingerprint_vault_services.py
+# Service sao lưu / khôi phục user và vân tay của máy chấm công
+
+import hashlib
+import struct
+import traceback
+import zlib
+from datetime import datetime
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+from core.device_session import DeviceSessionManager
+from repository.device_repository import DeviceRepository
+from repository.fingerprint_template_repository import FingerprintTemplateRepository
+from services.shift_upload_services import plan_user_upload
+
+
+def template_hash(template):
+    """Hash nội dung template (so sánh để chỉ lưu template đã đổi)"""
+    return hashlib.sha1(template).hexdigest()
+
+
+# Lệnh ghi user + template từ dữ liệu đã gửi vào buffer của máy (pyzk dùng trong save_user_template)
+CMD_SAVE_USERTEMPS = 110
+# Số user trong mỗi gói ghi khối (giữ gói nhỏ hơn buffer của máy, và để báo tiến độ)
+BULK_WRITE_USERS = 200
+
+
+def _pack_user_templates(batch, packet_size):
+    """
+    Mô tả:
+        Đóng gói nhiều (User, [Finger]) thành một gói ghi khối theo đúng định dạng
+        save_user_template của pyzk: header (3 độ dài) + bản ghi user + bảng vị trí
+        template + dữ liệu template.
+    Args:
+        batch: List (User, list Finger)
+        packet_size: Kích thước bản ghi user của máy (28 hoặc 72)
+    Returns:
+        bytes: Gói dữ liệu
+    """
+    users, table, fingers = [], [], []
+    offset = 0
+    for user, user_fingers in batch:
+        users.append(user.repack29() if packet_size == 28 else user.repack73())
+        for finger in user_fingers:
+            data = finger.repack_only()
+            table.append(struct.pack("<bHbI", 2, user.uid, 0x10 + finger.fid, offset))
+            offset += len(data)
+            fingers.append(data)
+    users, table, fingers = b"".join(users), b"".join(table), b"".join(fingers)
+    return struct.pack("III", len(users), len(table), len(fingers)) + users + table + fingers
+
+
+def _save_user_templates_bulk(conn, batch):
+    """
+    Ghi một gói nhiều user + template bằng một lần gửi buffer và một lệnh CMD_SAVE_USERTEMPS.
+    Raises AttributeError nếu thư viện không có các hàm gửi buffer của pyzk.
+    """
+    send_command = conn._ZK__send_command
+    conn._send_with_buffer(_pack_user_templates(batch, getattr(conn, "user_packet_size", 72)))
+    response = send_command(CMD_SAVE_USERTEMPS, struct.pack("<IHH", 12, 0, 8))
+    if not response.get("status"):
+        raise RuntimeError("Máy không nhận gói ghi user / vân tay")
+    conn.refresh_data()
+
+
+def _save_user_templates_each(conn, batch):
+    """Ghi từng user bằng save_user_template (user lỗi được ghi log và bỏ qua); trả về số user đã ghi"""
+    written = 0
+    for user, fingers in batch:
+        try:
+            conn.save_user_template(user, fingers)
+            written += 1
+        except Exception as e:
+            log_to_debug(f"FingerprintVaultService: save user {user.user_id} failed: {e}")
+    return written
+
+
+def write_user_templates(conn, batch, progress_callback=None, progress_range=(30, 95)):
+    """
+    Mô tả:
+        Ghi danh sách (User, [Finger]) lên máy trong một phiên khóa máy. Mỗi BULK_WRITE_USERS
+        user được đóng thành một gói và ghi bằng một lệnh (pyzk 0.9 chỉ có save_user_template
+        ghi từng user, nên gói được dựng ở đây theo cùng định dạng). Gói bị máy từ chối, hoặc
+        thư viện không có hàm gửi buffer, thì ghi lại từng user bằng save_user_template.
+    Args:
+        conn: Kết nối pyzk đã connect
+        batch: List (User, list Finger) - uid của User / Finger là uid trên máy đích
+        progress_callback: Callback function(progress_value, message) (optional)
+        progress_range: Khoảng tiến độ (%) dành cho bước này
+    Returns:
+        int: Số user đã ghi
+    """
+    if not batch:
+        return 0
+    start, end = progress_range
+    bulk = True
+    written = 0
+    conn.disable_device()
+    try:
+        for offset in range(0, len(batch), BULK_WRITE_USERS):
+            chunk = batch[offset:offset + BULK_WRITE_USERS]
+            if progress_callback:
+                progress_callback(
+                    start + int(offset / len(batch) * (end - start)),
+                    f"Đang ghi user {offset + 1}-{offset + len(chunk)}/{len(batch)}...",
+                )
+            if bulk:
+                try:
+                    _save_user_templates_bulk(conn, chunk)
+                    written += len(chunk)
+                    continue
+                except AttributeError:
+                    # Thư viện không hỗ trợ gửi buffer: ghi từng user cho cả phần còn lại
+                    bulk = False
+                except Exception as e:
+                    log_to_debug(f"FingerprintVaultService: bulk write failed, writing one by one: {e}")
+            written += _save_user_templates_each(conn, chunk)
+        return written
+    finally:
+        conn.enable_device()
+
+
+class FingerprintVaultService:
+    """
+    Mô tả:
+        Kho vân tay: sao lưu toàn bộ user + template của một máy vào DuckDB (nén zlib),
+        lần sau chỉ lưu template đã thay đổi; khôi phục lên máy thay thế bằng các gói ghi nhiều user.
+    """
+
+    def __init__(self):
+        self.repo = FingerprintTemplateRepository()
+        self.device_repo = DeviceRepository()
+
+    def backup_device(self, device_id, progress_callback=None):
+        """
+        Mô tả:
+            Đọc toàn bộ user và template của máy (mỗi loại một lần đọc khối) rồi lưu vào
+            kho; template có hash trùng bản đang lưu được bỏ qua, không nén lại.
+        Args:
+            device_id: ID thiết bị
+            progress_callback: Callback function(progress_value, message) (optional)
+        Returns:
+            tuple: (success: bool, message: str, count: int) - count: số template mới / đã đổi
+        """
+        try:
+            log_to_debug(f"FingerprintVaultService: backup_device() - device_id={device_id}")
+            device = self.device_repo.get_by_id(device_id)
+            if not device:
+                return False, "Thiết bị không tồn tại", 0
+
+            try:
+                import zk  # noqa: F401
+            except ImportError:
+                return False, "Chưa cài đặt thư viện pyzk", 0
+
+            ip = device["ip_address"]
+
+            try:
+                if progress_callback:
+                    progress_callback(5, f"Đang kết nối với {ip}...")
+                with DeviceSessionManager.session(device, timeout=30) as conn:
+                    # Khóa máy trong lúc đọc để danh sách user và template khớp nhau
+                    if progress_callback:
+                        progress_callback(15, "Đang đọc user và vân tay từ máy...")
+                    conn.disable_device()
+                    try:
+                        device_users = conn.get_users()
+                        device_templates = conn.get_templates()
+                    finally:
+                        conn.enable_device()
+            except Exception as e:
+                log_to_debug(
+                    f"FingerprintVaultService: backup_device() error: {e}\n{traceback.format_exc()}"
+                )
+                return False, f"Lỗi kết nối máy chấm công: {str(e)}", 0
+
+            if progress_callback:
+                progress_callback(60, "Đang so sánh với bản sao lưu...")
+            users = [
+                {
+                    "user_id": str(u.user_id),
+                    "name": u.name,
+                    "privilege": u.privilege,
+                    "password": u.password,
+                    "group_id": u.group_id,
+                    "card": u.card,
+                }
+                for u in device_users
+            ]
+            user_id_by_uid = {u.uid: str(u.user_id) for u in device_users}
+            stored = self.repo.get_hashes(device_id)
+            changed = []
+            for t in device_templates:
+                user_id = user_id_by_uid.get(t.uid)
+                if user_id is None:
+                    continue
+                digest = template_hash(t.template)
+                if stored.get((user_id, t.fid)) == digest:
+                    continue
+                changed.append(
+                    {
+                        "user_id": user_id,
+                        "finger": t.fid,
+                        "template_hash": digest,
+                        "valid": t.valid,
+                        "size": len(t.template),
+                        "template": zlib.compress(t.template, 9),
+                    }
+                )
+
+            if progress_callback:
+                progress_callback(80, "Đang lưu vào kho vân tay...")
+            if not self.repo.save_backup(device_id, users, changed):
+                return False, "Lỗi khi lưu kho vân tay", 0
+
+            unchanged = len(device_templates) - len(changed)
+            message = (
+                f"Đã sao lưu {len(users)} user, {len(changed)} vân tay mới / thay đổi "
+                f"({unchanged} vân tay không đổi)"
+            )
+            log_to_debug(f"FingerprintVaultService: {message}")
+            return True, message, len(changed)
+
+        except Exception as e:
+            log_to_debug(
+                f"FingerprintVaultService: backup_device() error: {e}\n{traceback.format_exc()}"
+            )
+            return False, f"Lỗi: {str(e)}", 0
+
+    def restore_to_device(self, device_id, source_device_id, user_ids=None, progress_callback=None):
+        """
+        Mô tả:
+            Khôi phục user và vân tay trong bản sao lưu của máy nguồn lên máy đích (thường
+            là máy thay thế). User đã có trên máy (cùng user_id) giữ uid của máy, user mới
+            được cấp uid trống. Ghi bằng write_user_templates (mỗi gói nhiều user một lệnh).
+        Args:
+            device_id: ID thiết bị đích
+            source_device_id: ID máy nguồn của bản sao lưu (có thể trùng máy đích)
+            user_ids: Chỉ khôi phục các mã chấm công này (optional, mặc định tất cả)
+            progress_callback: Callback function(progress_value, message) (optional)
+        Returns:
+            tuple: (success: bool, message: str, count: int) - count: số user đã ghi
+        """
+        try:
+            log_to_debug(
+                f"FingerprintVaultService: restore_to_device() - device_id={device_id}, "
+                f"source_device_id={source_device_id}"
+            )
+            device = self.device_repo.get_by_id(device_id)
+            if not device:
+                return False, "Thiết bị không tồn tại", 0
+
+            try:
+                from zk.finger import Finger
+                from zk.user import User
+            except ImportError:
+                return False, "Chưa cài đặt thư viện pyzk", 0
+
+            if progress_callback:
+                progress_callback(5, "Đang đọc kho vân tay...")
+            users, templates = self.repo.get_restore_set(source_device_id, user_ids)
+            if not users:
+                return False, "Kho vân tay chưa có bản sao lưu của máy nguồn", 0
+
+            ip = device["ip_address"]
+
+            try:
+                if progress_callback:
+                    progress_callback(15, f"Đang kết nối với {ip}...")
+                with DeviceSessionManager.session(device, timeout=30) as conn:
+                    device_users = conn.get_users()
+                    plan = plan_user_upload(
+                        device_users,
+                        [{"employee_id": None, "user_id": u["user_id"], "name": u["name"]} for u in users],
+                        getattr(conn, "user_packet_size", 72),
+                    )
+                    uid_by_user_id = {
+                        op.user_id: op.uid for op in plan.creates + plan.updates + plan.unchanged
+                    }
+
+                    batch = []
+                    for u in users:
+                        uid = uid_by_user_id.get(u["user_id"])
+                        if uid is None:
+                            continue
+                        user = User(
+                            uid, u["name"] or "", u["privilege"] or 0, u["password"] or "",
+                            u["group_id"] or "", u["user_id"], u["card"] or 0,
+                        )
+                        fingers = [
+                            Finger(uid, finger, valid, zlib.decompress(blob))
+                            for finger, valid, blob in templates.get(u["user_id"], ())
+                        ]
+                        batch.append((user, fingers))
+
+                    if progress_callback:
+                        progress_callback(30, f"Đang ghi {len(batch)} user lên máy...")
+                    written = write_user_templates(conn, batch, progress_callback)
+            except Exception as e:
+                log_to_debug(
+                    f"FingerprintVaultService: restore_to_device() error: {e}\n{traceback.format_exc()}"
+                )
+                return False, f"Lỗi kết nối máy chấm công: {str(e)}", 0
+
+            finger_count = sum(len(fingers) for _user, fingers in batch)
+            message = f"Đã khôi phục {written} user ({finger_count} vân tay) lên máy"
+            log_to_debug(f"FingerprintVaultService: {message}")
+            return True, message, written
+
+        except Exception as e:
+            log_to_debug(
+                f"FingerprintVaultService: restore_to_device() error: {e}\n{traceback.format_exc()}"
+            )
+            return False, f"Lỗi: {str(e)}", 0
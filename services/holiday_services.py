@@ -15,6 +15,7 @@ def log_to_debug(message):
 # holiday_services.py
 # Service layer cho ngày nghỉ
 from repository.holiday_repository import HolidayRepository
+from services.attendance_daily_services import AttendanceDailyRefresher
 
 
 class HolidayService:
@@ -44,6 +45,9 @@ class HolidayService:
         )
         result = self.repo.add_holiday(holiday_date, name)
         log_to_debug(f"HolidayService: add_holiday() result: {result}")
+        if result:
+            # Ngày lễ đổi trạng thái ngày công -> tính lại bảng tổng hợp cho ngày đó (nền)
+            AttendanceDailyRefresher.request_dates([holiday_date])
         return result
 
     def update_holiday(self, holiday_id, holiday_date, name):
@@ -51,15 +55,23 @@ class HolidayService:
         log_to_debug(
             f"HolidayService: update_holiday(id={holiday_id}, date={holiday_date}, name={name}) called"
         )
+        old = self.repo.get_holiday_by_id(holiday_id)
         result = self.repo.update_holiday(holiday_id, holiday_date, name)
         log_to_debug(f"HolidayService: update_holiday() result: {result}")
+        if result:
+            AttendanceDailyRefresher.request_dates(
+                [holiday_date, old["holiday_date"] if old else None]
+            )
         return result
 
     def delete_holiday(self, holiday_id):
         """Xóa ngày nghỉ"""
         log_to_debug(f"HolidayService: delete_holiday(id={holiday_id}) called")
+        old = self.repo.get_holiday_by_id(holiday_id)
         result = self.repo.delete_holiday(holiday_id)
         log_to_debug(f"HolidayService: delete_holiday() result: {result}")
+        if result and old:
+            AttendanceDailyRefresher.request_dates([old["holiday_date"]])
         return result
 
     def get_total_count(self):
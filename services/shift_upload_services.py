@@ -2,6 +2,7 @@
 # Service để xử lý business logic tải nhân viên lên máy chấm công
 
 import traceback
+from collections import namedtuple
 from datetime import datetime
 
 
@@ -14,11 +15,159 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
+from core.device_session import DeviceSessionManager
 from repository.shift_upload_repository import ShiftUploadRepository
 from repository.device_repository import DeviceRepository
 from repository.employee_repository import EmployeeRepository
 
 
+# Loại thao tác trên user của máy chấm công
+OP_CREATE = "create"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+
+# Một thao tác trên user của máy: op + dữ liệu truyền cho conn.set_user / delete_user.
+# employee_id: nhân viên tương ứng trong DB (None với thao tác xóa user lạ trên máy)
+UserOp = namedtuple(
+    "UserOp",
+    ["op", "uid", "user_id", "name", "privilege", "password", "group_id", "card", "employee_id"],
+)
+
+# Kết quả so sánh danh sách user trên máy với danh sách nhân viên cần có
+# creates / updates / deletes: list UserOp; unchanged: list UserOp đã đúng trên máy (không ghi)
+UploadPlan = namedtuple("UploadPlan", ["creates", "updates", "deletes", "unchanged"])
+
+# uid trên máy ZK là số 16 bit
+_MAX_UID = 65535
+
+
+def _device_name(name, packet_size):
+    """
+    Tên như máy sẽ lưu: cắt theo số byte của bản ghi user (8 byte với bản ghi 28 byte,
+    24 byte với bản ghi 72 byte) để so sánh không bị lệch vì máy cắt bớt.
+    """
+    limit = 8 if packet_size == 28 else 24
+    return (name or "").encode("utf-8", errors="ignore")[:limit].decode("utf-8", errors="ignore").strip()
+
+
+def plan_user_upload(device_users, desired, packet_size=72, prune=False):
+    """
+    Mô tả:
+        Tính số thao tác tối thiểu để danh sách user trên máy khớp với danh sách mong
+        muốn (so theo user_id): tạo user còn thiếu, cập nhật user sai tên, bỏ qua user
+        đã đúng. User đang có trên máy giữ nguyên uid, quyền, mật mã, thẻ.
+        Hàm thuần (không kết nối máy), đọc danh sách user của máy một lần ở bên gọi.
+    Args:
+        device_users: Danh sách user đọc từ máy (đối tượng có uid, user_id, name, ...)
+        desired: Danh sách dict {employee_id, user_id, name} cần có trên máy
+        packet_size: Kích thước bản ghi user của máy (conn.user_packet_size)
+        prune: True = xóa các user trên máy không có trong desired
+    Returns:
+        UploadPlan: Các thao tác cần thực hiện
+    """
+    by_user_id = {str(u.user_id): u for u in device_users}
+    used_uids = {u.uid for u in device_users}
+    next_uid = 1
+    plan = UploadPlan([], [], [], [])
+    wanted = set()
+
+    for item in desired:
+        user_id = str(item["user_id"])
+        if user_id in wanted:
+            log_to_debug(f"ShiftUploadService: duplicate user_id {user_id} skipped")
+            continue
+        wanted.add(user_id)
+        name = _device_name(item["name"], packet_size)
+        current = by_user_id.get(user_id)
+
+        if current is not None:
+            op = UserOp(
+                OP_UPDATE, current.uid, user_id, name, current.privilege, current.password,
+                current.group_id, current.card, item["employee_id"],
+            )
+            if _device_name(current.name, packet_size) == name:
+                plan.unchanged.append(op)
+            else:
+                plan.updates.append(op)
+            continue
+
+        # User mới: ưu tiên uid = user_id (dạng số) như trước, trùng thì lấy uid trống
+        uid = int(user_id) if user_id.isdigit() else 0
+        if not 0 < uid <= _MAX_UID or uid in used_uids:
+            while next_uid in used_uids:
+                next_uid += 1
+            uid = next_uid
+        if uid > _MAX_UID:
+            log_to_debug(f"ShiftUploadService: no free uid for user_id {user_id}")
+            continue
+        used_uids.add(uid)
+        plan.creates.append(
+            UserOp(OP_CREATE, uid, user_id, name, 0, "", "", 0, item["employee_id"])
+        )
+
+    if prune:
+        for user_id, u in by_user_id.items():
+            if user_id not in wanted:
+                plan.deletes.append(
+                    UserOp(OP_DELETE, u.uid, user_id, u.name, u.privilege, u.password,
+                           u.group_id, u.card, None)
+                )
+    return plan
+
+
+def apply_user_plan(conn, plan, progress_callback=None, progress_range=(0, 100), cancel_event=None):
+    """
+    Mô tả:
+        Thực hiện các thao tác của UploadPlan trong MỘT phiên: khóa máy (disable_device)
+        suốt lô để máy không xử lý chấm công / ghi dữ liệu xen giữa, mở lại khi xong
+        kể cả khi lỗi. Thao tác lỗi được ghi log và bỏ qua.
+    Args:
+        conn: Kết nối pyzk đã connect
+        plan: UploadPlan
+        progress_callback: Callback function(progress_value, message) (optional)
+        progress_range: Khoảng tiến độ (%) dành cho bước này
+        cancel_event: threading.Event để dừng giữa hai thao tác (optional)
+    Returns:
+        list: Các UserOp đã thực hiện thành công
+    """
+    ops = plan.deletes + plan.updates + plan.creates
+    if not ops:
+        return []
+    start, end = progress_range
+    step = max(1, len(ops) // 50)
+    done = []
+    conn.disable_device()
+    try:
+        for idx, op in enumerate(ops):
+            if cancel_event is not None and cancel_event.is_set():
+                log_to_debug(f"ShiftUploadService: upload cancelled after {idx}/{len(ops)} ops")
+                break
+            if progress_callback and idx % step == 0:
+                progress_callback(
+                    start + int(idx / len(ops) * (end - start)),
+                    f"Đang ghi lên máy {idx + 1}/{len(ops)}...",
+                )
+            try:
+                if op.op == OP_DELETE:
+                    conn.delete_user(uid=op.uid)
+                else:
+                    conn.set_user(
+                        uid=op.uid,
+                        name=op.name,
+                        privilege=op.privilege,
+                        password=op.password,
+                        group_id=op.group_id,
+                        user_id=op.user_id,
+                        card=op.card,
+                    )
+                done.append(op)
+            except Exception as e:
+                log_to_debug(f"ShiftUploadService: {op.op} user {op.user_id} failed: {e}")
+    finally:
+        conn.enable_device()
+    return done
+
+
 class ShiftUploadService:
     """Service để xử lý business logic tải nhân viên lên máy chấm công"""
 
@@ -27,20 +176,25 @@ class ShiftUploadService:
         self.device_repo = DeviceRepository()
         self.employee_repo = EmployeeRepository()
 
-    def upload_employees_to_device(self, device_id, employee_ids, progress_callback=None):
+    def upload_employees_to_device(self, device_id, employee_ids, progress_callback=None, cancel_event=None):
         """
-        Tải danh sách nhân viên lên máy chấm công
+        Mô tả:
+            Tải danh sách nhân viên lên máy chấm công: đọc danh sách user của máy MỘT lần,
+            so với nhân viên cần tải (plan_user_upload) rồi chỉ ghi các user thiếu / sai
+            trong một phiên khóa máy; kết quả lưu vào shift_upload bằng một lần upsert.
         Args:
             device_id: ID thiết bị
             employee_ids: List các ID nhân viên cần tải lên
             progress_callback: Callback function(progress_value, message) để cập nhật tiến trình
+            cancel_event: threading.Event để hủy giữa chừng (optional) - các user đã ghi
+                          vẫn được lưu vào shift_upload
         Returns:
-            tuple: (success: bool, message: str, count: int)
+            tuple: (success: bool, message: str, count: int) - count: số nhân viên đã có trên máy
         """
         try:
             log_to_debug(
                 f"ShiftUploadService: upload_employees_to_device() - device_id={device_id}, "
-                f"employee_ids={employee_ids}"
+                f"{len(employee_ids)} employees"
             )
 
             if not employee_ids:
@@ -53,156 +207,69 @@ class ShiftUploadService:
 
             # Import thư viện pyzk
             try:
-                from zk import ZK, const
+                import zk  # noqa: F401
             except ImportError:
                 return False, "Chưa cài đặt thư viện pyzk. Vui lòng chạy: pip install pyzk", 0
 
+            # Chỉ đọc các nhân viên được chọn (một truy vấn dạng cột)
+            if progress_callback:
+                progress_callback(5, "Đang chuẩn bị danh sách nhân viên...")
+            desired = self._desired_users(employee_ids)
+            if not desired:
+                return False, "Không tìm thấy nhân viên nào", 0
+
             # Kết nối với thiết bị
             ip = device["ip_address"]
             port = device.get("port", 4370)
-            password = device.get("password", "")
-
-            zk = ZK(ip, port=port, timeout=10, password=password if password else 0)
 
             try:
-                # Kết nối 1-10%
+                if progress_callback:
+                    progress_callback(10, f"Đang kết nối với {ip}...")
                 log_to_debug(f"ShiftUploadService: Connecting to {ip}:{port}")
-                for i in range(1, 11):
-                    if progress_callback:
-                        progress_callback(i, f"Đang kết nối với {ip}...")
-                
-                conn = zk.connect()
-
-                # Lấy thông tin thiết bị 11-20%
-                for i in range(11, 21):
+                with DeviceSessionManager.session(device, timeout=10) as conn:
                     if progress_callback:
-                        progress_callback(i, "Đang lấy thông tin thiết bị...")
-                
-                device_sn = conn.get_serialnumber()
-                log_to_debug(f"ShiftUploadService: Connected to device SN={device_sn}")
-
-                # Lấy danh sách user hiện tại từ máy 21-30%
-                for i in range(21, 31):
-                    if progress_callback:
-                        progress_callback(i, "Đang lấy danh sách user từ máy...")
-                
-                existing_users = conn.get_users()
-                existing_user_ids = {user.user_id for user in existing_users}
-                log_to_debug(f"ShiftUploadService: Found {len(existing_users)} existing users")
-
-                # Chuẩn bị danh sách nhân viên 31-40%
-                for i in range(31, 41):
-                    if progress_callback:
-                        progress_callback(i, "Đang chuẩn bị danh sách nhân viên...")
-
-                all_employees = self.employee_repo.get_all()
-                employee_dict = {emp["id"]: emp for emp in all_employees}
-
-                upload_records = []
-                users_to_upload = []
-
-                for emp_id in employee_ids:
-                    emp = employee_dict.get(emp_id)
-                    if not emp:
-                        log_to_debug(f"ShiftUploadService: Employee {emp_id} not found")
-                        continue
-
-                    # Sử dụng attendance_code làm user_id trên máy
-                    user_id = emp.get("attendance_code") or emp.get("employee_code") or str(emp_id)
-                    
-                    # Tạo user object để upload
-                    # privilege: 0=User, 1=Enroller, 2=Manager, 6=Admin
-                    # Mặc định là 0 (User thường)
-                    users_to_upload.append({
-                        "user_id": user_id,
-                        "name": emp.get("attendance_name") or emp.get("name"),
-                        "privilege": 0,  # User thường
-                        "password": "",  # Không set password mặc định
-                        "group_id": "",
-                        "user_id_num": int(user_id) if user_id.isdigit() else 0,
-                        "card": 0,
-                    })
-
-                    # Lưu thông tin để insert vào DB
-                    upload_records.append({
-                        "employee_id": emp_id,
-                        "device_id": device_id,
-                        "user_id": user_id,
-                        "attendance_code": emp.get("attendance_code", ""),
-                        "attendance_name": emp.get("attendance_name") or emp.get("name"),
-                        "card_number": "",
-                        "password": "",
-                        "privilege": 0,
-                        "enabled": True,
-                    })
-
-                log_to_debug(f"ShiftUploadService: Prepared {len(users_to_upload)} users to upload")
-
-                # Upload từng nhân viên 41-90%
-                upload_count = 0
-                total_users = len(users_to_upload)
-                
-                for idx, user_data in enumerate(users_to_upload):
-                    try:
-                        progress = 41 + int((idx / total_users) * 49)  # 41-90%
-                        if progress_callback:
-                            progress_callback(
-                                progress, 
-                                f"Đang tải nhân viên {idx + 1}/{total_users}..."
-                            )
-                        
-                        # Set user vào máy
-                        conn.set_user(
-                            uid=user_data["user_id_num"],
-                            name=user_data["name"],
-                            privilege=user_data["privilege"],
-                            password=user_data["password"],
-                            group_id=user_data["group_id"],
-                            user_id=user_data["user_id"],
-                            card=user_data["card"]
-                        )
-                        
-                        upload_count += 1
-                        log_to_debug(
-                            f"ShiftUploadService: Uploaded user {user_data['user_id']} - {user_data['name']}"
-                        )
-                    except Exception as e:
-                        log_to_debug(
-                            f"ShiftUploadService: Failed to upload user {user_data['user_id']}: {e}"
-                        )
-
-                # Lưu vào database 91-95%
-                for i in range(91, 96):
-                    if progress_callback:
-                        progress_callback(i, "Đang lưu thông tin vào database...")
-                
-                success_count, total_count = self.repo.bulk_insert(upload_records)
-                log_to_debug(
-                    f"ShiftUploadService: Saved {success_count}/{total_count} records to DB"
+                        progress_callback(20, "Đang lấy danh sách user từ máy...")
+                    existing_users = conn.get_users()
+                    packet_size = getattr(conn, "user_packet_size", 72)
+                    log_to_debug(f"ShiftUploadService: Found {len(existing_users)} existing users")
+
+                    plan = plan_user_upload(existing_users, desired, packet_size)
+                    log_to_debug(
+                        f"ShiftUploadService: plan create={len(plan.creates)}, "
+                        f"update={len(plan.updates)}, unchanged={len(plan.unchanged)}"
+                    )
+
+                    done = apply_user_plan(conn, plan, progress_callback, (30, 90), cancel_event)
+
+                # Lưu vào database: các nhân viên hiện đã có trên máy, một lần upsert
+                if progress_callback:
+                    progress_callback(92, "Đang lưu thông tin vào database...")
+                on_device = plan.unchanged + done
+                by_employee = {item["employee_id"]: item for item in desired}
+                success_count, _total = self.repo.bulk_insert(
+                    [
+                        self._upload_record(device_id, op, by_employee[op.employee_id])
+                        for op in on_device
+                    ]
                 )
 
-                # Ngắt kết nối 96-100%
-                for i in range(96, 101):
-                    if progress_callback:
-                        progress_callback(i, "Đang ngắt kết nối...")
-                
-                conn.disconnect()
-                log_to_debug("ShiftUploadService: Disconnected from device")
-
-                return (
-                    True,
-                    f"Đã tải {upload_count} nhân viên lên máy chấm công và lưu {success_count} bản ghi vào DB",
-                    upload_count,
+                created = sum(1 for op in done if op.op == OP_CREATE)
+                updated = len(done) - created
+                failed = len(plan.creates) + len(plan.updates) - len(done)
+                cancelled = cancel_event is not None and cancel_event.is_set()
+                message = (
+                    ("Đã hủy. " if cancelled else "")
+                    + f"Đã tải {len(on_device)} nhân viên lên máy chấm công "
+                    f"(thêm {created}, cập nhật {updated}, không đổi {len(plan.unchanged)}"
+                    + (f", {'chưa ghi' if cancelled else 'lỗi'} {failed}" if failed else "")
+                    + f") và lưu {success_count} bản ghi vào DB"
                 )
+                return True, message, len(on_device)
 
             except Exception as e:
                 log_to_debug(
                     f"ShiftUploadService: upload_employees_to_device() error: {e}\n{traceback.format_exc()}"
                 )
-                try:
-                    conn.disconnect()
-                except:
-                    pass
                 return False, f"Lỗi kết nối máy chấm công: {str(e)}", 0
 
         except Exception as e:
@@ -211,6 +278,43 @@ class ShiftUploadService:
             )
             return False, f"Lỗi: {str(e)}", 0
 
+    def _desired_users(self, employee_ids):
+        """
+        Danh sách user cần có trên máy cho các nhân viên: user_id = mã chấm công
+        (hoặc mã nhân viên / id), tên = tên chấm công (hoặc họ tên)
+        """
+        cols = self.employee_repo.get_all_columns(ids=employee_ids)
+        return [
+            {
+                "employee_id": emp_id,
+                "user_id": attendance_code or employee_code or str(emp_id),
+                "name": attendance_name or name or "",
+                "attendance_code": attendance_code or "",
+            }
+            for emp_id, employee_code, attendance_code, attendance_name, name in zip(
+                cols["id"],
+                cols["employee_code"],
+                cols["attendance_code"],
+                cols["attendance_name"],
+                cols["name"],
+            )
+        ]
+
+    @staticmethod
+    def _upload_record(device_id, op, item):
+        """Bản ghi shift_upload cho một user đã có trên máy (item: phần tử của _desired_users)"""
+        return {
+            "employee_id": op.employee_id,
+            "device_id": device_id,
+            "user_id": op.user_id,
+            "attendance_code": item["attendance_code"],
+            "attendance_name": item["name"],
+            "card_number": str(op.card) if op.card else "",
+            "password": op.password or "",
+            "privilege": op.privilege or 0,
+            "enabled": True,
+        }
+
     def delete_employees_from_device(self, device_id, user_ids, progress_callback=None):
         """
         Xóa nhân viên khỏi máy chấm công
@@ -237,16 +341,12 @@ class ShiftUploadService:
 
             # Import thư viện pyzk
             try:
-                from zk import ZK
+                import zk  # noqa: F401
             except ImportError:
                 return False, "Chưa cài đặt thư viện pyzk", 0
 
             # Kết nối với thiết bị
             ip = device["ip_address"]
-            port = device.get("port", 4370)
-            password = device.get("password", "")
-
-            zk = ZK(ip, port=port, timeout=10, password=password if password else 0)
 
             try:
                 # Kết nối 1-20%
@@ -254,42 +354,39 @@ class ShiftUploadService:
                     if progress_callback:
                         progress_callback(i, f"Đang kết nối với {ip}...")
                 
-                conn = zk.connect()
-
-                # Xóa từng user 21-80%
-                delete_count = 0
-                total_users = len(user_ids)
+                with DeviceSessionManager.session(device, timeout=10) as conn:
+                    # Xóa từng user 21-80%
+                    delete_count = 0
+                    total_users = len(user_ids)
                 
-                for idx, user_id in enumerate(user_ids):
-                    try:
-                        progress = 21 + int((idx / total_users) * 59)  # 21-80%
-                        if progress_callback:
-                            progress_callback(
-                                progress, 
-                                f"Đang xóa nhân viên {idx + 1}/{total_users}..."
-                            )
+                    for idx, user_id in enumerate(user_ids):
+                        try:
+                            progress = 21 + int((idx / total_users) * 59)  # 21-80%
+                            if progress_callback:
+                                progress_callback(
+                                    progress, 
+                                    f"Đang xóa nhân viên {idx + 1}/{total_users}..."
+                                )
                         
-                        # Xóa user khỏi máy
-                        conn.delete_user(user_id=user_id)
-                        delete_count += 1
-                        log_to_debug(f"ShiftUploadService: Deleted user {user_id}")
-                    except Exception as e:
-                        log_to_debug(f"ShiftUploadService: Failed to delete user {user_id}: {e}")
-
-                # Cập nhật database 81-95%
-                for i in range(81, 96):
-                    if progress_callback:
-                        progress_callback(i, "Đang cập nhật database...")
+                            # Xóa user khỏi máy
+                            conn.delete_user(user_id=user_id)
+                            delete_count += 1
+                            log_to_debug(f"ShiftUploadService: Deleted user {user_id}")
+                        except Exception as e:
+                            log_to_debug(f"ShiftUploadService: Failed to delete user {user_id}: {e}")
 
-                # Xóa khỏi DB (không có employee_id nên dùng user_id và device_id)
-                # Lưu ý: Cần thêm hàm delete_by_user_device vào repository nếu cần
-                
-                # Ngắt kết nối 96-100%
-                for i in range(96, 101):
-                    if progress_callback:
-                        progress_callback(i, "Đang ngắt kết nối...")
+                    # Cập nhật database 81-95%
+                    for i in range(81, 96):
+                        if progress_callback:
+                            progress_callback(i, "Đang cập nhật database...")
+
+                    # Xóa khỏi DB (không có employee_id nên dùng user_id và device_id)
+                    # Lưu ý: Cần thêm hàm delete_by_user_device vào repository nếu cần
                 
-                conn.disconnect()
+                    # Hoàn tất 96-100%
+                    for i in range(96, 101):
+                        if progress_callback:
+                            progress_callback(i, "Đang hoàn tất...")
 
                 return True, f"Đã xóa {delete_count} nhân viên khỏi máy chấm công", delete_count
 
@@ -297,10 +394,6 @@ class ShiftUploadService:
                 log_to_debug(
                     f"ShiftUploadService: delete_employees_from_device() error: {e}\n{traceback.format_exc()}"
                 )
-                try:
-                    conn.disconnect()
-                except:
-                    pass
                 return False, f"Lỗi kết nối máy chấm công: {str(e)}", 0
 
         except Exception as e:
@@ -309,20 +402,25 @@ class ShiftUploadService:
             )
             return False, f"Lỗi: {str(e)}", 0
 
-    def delete_fingerprints_from_device(self, device_id, user_ids, progress_callback=None):
+    def delete_fingerprints_from_device(self, device_id, user_ids, progress_callback=None, fingers=None):
         """
-        Xóa vân tay của nhân viên khỏi máy chấm công
+        Mô tả:
+            Xóa vân tay của nhân viên khỏi máy chấm công (giữ nguyên user trên máy).
+            Đọc danh sách user và danh sách vân tay MỘT lần, chỉ xóa các template đang
+            có của các user cần xóa trong một phiên khóa máy, rồi kiểm tra lại bằng một
+            lần đọc số lượng vân tay trên máy.
         Args:
             device_id: ID thiết bị
             user_ids: List các user_id cần xóa vân tay
             progress_callback: Callback function(progress_value, message)
+            fingers: Các ngón cần xóa (0-9); None = mọi ngón
         Returns:
-            tuple: (success: bool, message: str, count: int)
+            tuple: (success: bool, message: str, count: int) - count: số nhân viên đã xóa vân tay
         """
         try:
             log_to_debug(
                 f"ShiftUploadService: delete_fingerprints_from_device() - device_id={device_id}, "
-                f"user_ids={user_ids}"
+                f"{len(user_ids)} users, fingers={fingers}"
             )
 
             if not user_ids:
@@ -335,97 +433,91 @@ class ShiftUploadService:
 
             # Import thư viện pyzk
             try:
-                from zk import ZK
+                import zk  # noqa: F401
             except ImportError:
                 return False, "Chưa cài đặt thư viện pyzk", 0
 
             # Kết nối với thiết bị
             ip = device["ip_address"]
-            port = device.get("port", 4370)
-            password = device.get("password", "")
-
-            zk = ZK(ip, port=port, timeout=10, password=password if password else 0)
 
             try:
-                # Kết nối 1-20%
-                for i in range(1, 21):
+                if progress_callback:
+                    progress_callback(5, f"Đang kết nối với {ip}...")
+                with DeviceSessionManager.session(device, timeout=10) as conn:
+                    # Đọc user và vân tay một lần: user_id -> uid, uid -> các ngón đang có
                     if progress_callback:
-                        progress_callback(i, f"Đang kết nối với {ip}...")
-                
-                conn = zk.connect()
-
-                # Xóa vân tay từng user 21-95%
-                delete_count = 0
-                total_users = len(user_ids)
-                
-                for idx, user_id in enumerate(user_ids):
-                    try:
-                        progress = 21 + int((idx / total_users) * 74)  # 21-95%
-                        if progress_callback:
-                            progress_callback(
-                                progress, 
-                                f"Đang xóa vân tay {idx + 1}/{total_users}..."
-                            )
-                        
-                        # Xóa template vân tay của user
-                        # Lưu ý: pyzk có thể không hỗ trợ xóa riêng template
-                        # Cần kiểm tra API của pyzk
-                        # conn.delete_user_template(user_id=user_id)
-                        
-                        # Workaround: Lấy user, xóa user, thêm lại user không có vân tay
-                        users = conn.get_users()
-                        target_user = None
-                        for u in users:
-                            if u.user_id == user_id:
-                                target_user = u
-                                break
-                        
-                        if target_user:
-                            # Xóa user (bao gồm cả vân tay)
-                            conn.delete_user(user_id=user_id)
-                            
-                            # Thêm lại user nhưng không có vân tay
-                            conn.set_user(
-                                uid=target_user.uid,
-                                name=target_user.name,
-                                privilege=target_user.privilege,
-                                password=target_user.password,
-                                group_id=target_user.group_id,
-                                user_id=target_user.user_id,
-                                card=target_user.card
-                            )
-                            
-                            delete_count += 1
-                            log_to_debug(f"ShiftUploadService: Deleted fingerprints for user {user_id}")
-                        else:
+                        progress_callback(15, "Đang đọc danh sách user và vân tay...")
+                    uid_by_user_id = {str(u.user_id): u.uid for u in conn.get_users()}
+                    templates = conn.get_templates()
+                    fingers_before = len(templates)
+                    wanted_fingers = set(fingers) if fingers is not None else None
+                    fids_by_uid = {}
+                    for t in templates:
+                        if wanted_fingers is None or t.fid in wanted_fingers:
+                            fids_by_uid.setdefault(t.uid, []).append(t.fid)
+
+                    targets = []
+                    for user_id in user_ids:
+                        uid = uid_by_user_id.get(str(user_id))
+                        if uid is None:
                             log_to_debug(f"ShiftUploadService: User {user_id} not found")
-                            
-                    except Exception as e:
-                        log_to_debug(
-                            f"ShiftUploadService: Failed to delete fingerprints for user {user_id}: {e}"
-                        )
-
-                # Ngắt kết nối 96-100%
-                for i in range(96, 101):
+                        elif uid in fids_by_uid:
+                            targets.append((user_id, uid, fids_by_uid[uid]))
+                    total_templates = sum(len(fids) for _u, _uid, fids in targets)
+                    log_to_debug(
+                        f"ShiftUploadService: {len(targets)} users, {total_templates} templates to delete"
+                    )
+
+                    delete_count = 0
+                    deleted_templates = 0
+                    if targets:
+                        step = max(1, len(targets) // 50)
+                        conn.disable_device()
+                        try:
+                            for idx, (user_id, uid, fids) in enumerate(targets):
+                                if progress_callback and idx % step == 0:
+                                    progress_callback(
+                                        25 + int(idx / len(targets) * 65),
+                                        f"Đang xóa vân tay {idx + 1}/{len(targets)}...",
+                                    )
+                                removed = 0
+                                for fid in fids:
+                                    try:
+                                        if conn.delete_user_template(uid=uid, temp_id=fid):
+                                            removed += 1
+                                    except Exception as e:
+                                        log_to_debug(
+                                            f"ShiftUploadService: Failed to delete finger {fid} of user {user_id}: {e}"
+                                        )
+                                deleted_templates += removed
+                                if removed:
+                                    delete_count += 1
+                            conn.refresh_data()
+                        finally:
+                            conn.enable_device()
+
+                    # Kiểm tra lại bằng một lần đọc số lượng vân tay
                     if progress_callback:
-                        progress_callback(i, "Đang ngắt kết nối...")
-                
-                conn.disconnect()
+                        progress_callback(95, "Đang kiểm tra kết quả...")
+                    conn.read_sizes()
+                    fingers_after = conn.fingers
 
-                return (
-                    True, 
-                    f"Đã xóa vân tay của {delete_count} nhân viên", 
-                    delete_count
+                expected = fingers_before - deleted_templates
+                log_to_debug(
+                    f"ShiftUploadService: fingerprints {fingers_before} -> {fingers_after} "
+                    f"(expected {expected})"
                 )
+                message = f"Đã xóa {deleted_templates} vân tay của {delete_count} nhân viên"
+                if fingers_after != expected:
+                    message += (
+                        f"\nCảnh báo: máy còn {fingers_after} vân tay, dự kiến {expected}"
+                    )
+                return True, message, delete_count
 
             except Exception as e:
                 log_to_debug(
                     f"ShiftUploadService: delete_fingerprints_from_device() error: {e}\n{traceback.format_exc()}"
                 )
-                try:
-                    conn.disconnect()
-                except:
-                    pass
                 return False, f"Lỗi kết nối máy chấm công: {str(e)}", 0
 
         except Exception as e:
@@ -0,0 +1,58 @@
+import traceback
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            from datetime import datetime
+
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+# timesheet_services.py
+# Service layer tính bảng công
+from repository.timesheet_repository import (
+    TimesheetRepository,
+    TIMESHEET_COLUMNS,
+    TIMESHEET_STATUSES,
+)
+
+
+class TimesheetService:
+    """Service tính bảng công (trạng thái, phút làm, số công) theo nhân viên và ngày"""
+
+    STATUSES = TIMESHEET_STATUSES
+
+    def __init__(self):
+        self.repo = TimesheetRepository()
+
+    def get_timesheet(self, from_date, to_date):
+        """
+        Mô tả:
+            Tính bảng công cho toàn bộ nhân viên trong kỳ. Trạng thái mỗi ngày là một
+            trong STATUSES (đúng giờ, trễ, về sớm, tăng ca, thiếu giờ ra/vào, vắng,
+            ca đêm, không có lịch); ký hiệu hiển thị lấy theo cấu hình attendance_symbol.
+        Args:
+            from_date: Từ ngày (datetime.date)
+            to_date: Đến ngày (datetime.date)
+        Returns:
+            dict: {employee_id, user_id, employee_name, work_date, is_weekend, is_holiday,
+                   shift_id, shift_code, check_in, check_out, worked_minutes, late_minutes,
+                   early_minutes, overtime_minutes, work_day_count, status, symbol: list}
+        """
+        try:
+            if from_date and to_date and from_date > to_date:
+                from_date, to_date = to_date, from_date
+            result = self.repo.get_timesheet(from_date, to_date)
+            log_to_debug(
+                f"TimesheetService: get_timesheet() returned {len(result['user_id'])} rows"
+            )
+            return result
+        except Exception as e:
+            log_to_debug(
+                f"TimesheetService: get_timesheet() error: {e}\n{traceback.format_exc()}"
+            )
+            return {name: [] for name in TIMESHEET_COLUMNS}
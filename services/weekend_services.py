@@ -13,6 +13,7 @@ def log_to_debug(message):
 
 
 from repository.weekend_repository import WeekendRepository
+from services.attendance_daily_services import AttendanceDailyRefresher
 
 
 class WeekendService:
@@ -36,9 +37,13 @@ class WeekendService:
         """Cập nhật cấu hình ngày cuối tuần"""
         try:
             log_to_debug("WeekendService: update_weekend_config() called")
-            return self.repository.update_weekend_config(
+            result = self.repository.update_weekend_config(
                 monday, tuesday, wednesday, thursday, friday, saturday, sunday
             )
+            if result:
+                # Ngày cuối tuần đổi trạng thái mọi ngày công -> tính lại bảng tổng hợp (nền)
+                AttendanceDailyRefresher.request_rebuild()
+            return result
         except Exception as e:
             log_to_debug(
                 f"WeekendService: update_weekend_config() error: {e}\n{traceback.format_exc()}"
@@ -0,0 +1,125 @@
+# Tiến trình đồng bộ chấm công chạy nền, không có giao diện (không import Qt)
+# Chạy: python sync_daemon.py [--interval 300] [--max-backoff 3600] [--jitter 0.2] [--once]
+#
+# Giới hạn: DuckDB chỉ cho MỘT tiến trình ghi file database. Trong lúc ứng dụng giao diện
+# đang mở, tiến trình này không tải mà chỉ ghi heartbeat; ứng dụng giao diện đọc heartbeat
+# và tự tải theo cùng lịch cho tới khi đóng. Ngược lại, giao diện mở đúng lúc tiến trình
+# này đang tải sẽ chờ lượt tải xong rồi mới mở database.
+import argparse
+import logging
+import signal
+import sys
+import threading
+
+from core.resource import resource_path
+from core.database import Database
+from core.device_session import DeviceSessionManager
+from services.device_polling_services import (
+    DevicePollingService,
+    JITTER,
+    MAX_BACKOFF,
+    POLL_INTERVAL,
+    clear_heartbeat,
+    write_heartbeat,
+)
+
+
+def setup_logging():
+    """
+    Mô tả:
+            Thiết lập logging ghi vào log/debug.log (giống ứng dụng chính)
+    Args:
+            None
+    Returns:
+            None
+    """
+    log_path = resource_path("log/debug.log")
+    logging.basicConfig(
+        filename=log_path,
+        filemode="a",
+        format="%(asctime)s %(levelname)s: %(message)s",
+        level=logging.DEBUG,
+        encoding="utf-8",
+    )
+
+
+def parse_args(argv=None):
+    """Đọc tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(
+        description="Tải dữ liệu chấm công định kỳ từ mọi máy chấm công (không cần mở giao diện)",
+        epilog=(
+            "Chỉ một tiến trình được ghi database: khi ứng dụng giao diện đang mở, tiến trình "
+            "này nhường việc tải cho giao diện (cùng lịch) và tải tiếp khi giao diện đóng."
+        ),
+    )
+    parser.add_argument(
+        "--interval", type=float, default=POLL_INTERVAL,
+        help=f"Chu kỳ tải mỗi máy, giây (mặc định {POLL_INTERVAL})",
+    )
+    parser.add_argument(
+        "--max-backoff", type=float, default=MAX_BACKOFF,
+        help=f"Khoảng chờ tối đa với máy không kết nối được, giây (mặc định {MAX_BACKOFF})",
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=JITTER,
+        help=f"Độ lệch ngẫu nhiên của khoảng chờ, 0-1 (mặc định {JITTER})",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Số máy tải đồng thời tối đa (mặc định 4)"
+    )
+    parser.add_argument(
+        "--device", type=int, action="append", dest="device_ids",
+        help="Chỉ tải máy có ID này (lặp lại cho nhiều máy)",
+    )
+    parser.add_argument(
+        "--once", action="store_true",
+        help="Tải tất cả máy một lần rồi thoát (dùng với Task Scheduler / cron)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging()
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    service = DevicePollingService(
+        interval=args.interval,
+        max_backoff=args.max_backoff,
+        jitter=args.jitter,
+        max_workers=args.workers,
+        device_ids=args.device_ids,
+        stagger=not args.once,
+    )
+    settings = {
+        "interval": args.interval,
+        "max_backoff": args.max_backoff,
+        "jitter": args.jitter,
+        "max_workers": args.workers,
+        "device_ids": args.device_ids,
+    }
+    logging.info(f"sync_daemon: started (interval={args.interval}s, once={args.once})")
+    try:
+        while not stop.is_set():
+            # Báo cho ứng dụng giao diện (nếu đang mở) biết lịch tải để tải thay
+            write_heartbeat(settings)
+            wait = service.run_once()
+            # Nhả file database trong lúc chờ để ứng dụng giao diện có thể mở
+            Database.close()
+            if args.once:
+                break
+            stop.wait(wait)
+    finally:
+        if not args.once:
+            clear_heartbeat()
+        DeviceSessionManager.close_all()
+        Database.close()
+        logging.info("sync_daemon: stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+# Chuyển sự kiện ChangeBus sang GUI thread cho widget / model
+# Tất cả comment, docstring đều bằng tiếng Việt
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from core.change_bus import ChangeBus, OP_DELETE
+
+
+class ChangeRelay(QObject):
+    """
+    Mô tả:
+        Cầu nối duy nhất giữa ChangeBus (không phụ thuộc Qt) và giao diện.
+        Sự kiện phát từ thread nền được Qt xếp hàng sang GUI thread qua signal changed.
+        Dùng ChangeRelay.instance() để lấy đối tượng dùng chung.
+    """
+
+    changed = Signal(object)  # ChangeEvent
+
+    _instance = None
+
+    @staticmethod
+    def instance():
+        if ChangeRelay._instance is None:
+            ChangeRelay._instance = ChangeRelay()
+            ChangeBus.subscribe(ChangeRelay._instance.changed.emit)
+        return ChangeRelay._instance
+
+
+class ChangeBatcher(QObject):
+    """
+    Mô tả:
+        Gom các sự kiện thay đổi của một nhóm bảng, xử lý một lần ở nhịp event loop kế
+        tiếp (một thao tác có thể ghi nhiều dòng / nhiều bảng liên tiếp).
+        handler(changes) nhận dict {bảng: (ids_upsert, ids_delete, reload)}:
+            ids_upsert: set id cần nạp lại (thêm / sửa)
+            ids_delete: set id đã xóa
+            reload: True nếu có sự kiện không rõ id (cần nạp lại cả bảng)
+    Args:
+        parent: QObject sở hữu (thường là widget nhận thay đổi)
+        tables: Các bảng quan tâm
+        handler: Hàm xử lý
+    """
+
+    def __init__(self, parent, tables, handler):
+        super().__init__(parent)
+        self._tables = frozenset(tables)
+        self._handler = handler
+        self._pending = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._flush)
+        ChangeRelay.instance().changed.connect(self._on_changed)
+
+    def _on_changed(self, event):
+        if event.table not in self._tables:
+            return
+        upserts, deletes, reload = self._pending.get(event.table, (set(), set(), False))
+        if event.ids is None:
+            reload = True
+        elif event.op == OP_DELETE:
+            deletes.update(event.ids)
+            upserts.difference_update(event.ids)
+        else:
+            upserts.update(event.ids)
+            deletes.difference_update(event.ids)
+        self._pending[event.table] = (upserts, deletes, reload)
+        self._timer.start()
+
+    def _flush(self):
+        changes, self._pending = self._pending, {}
+        if changes:
+            self._handler(changes)
@@ -0,0 +1,344 @@
+# columnar_table_model.py
+# Model bảng dạng cột (dict các list) cho QTableView: nạp dần (fetchMore),
+# sắp xếp và lọc ngay trong model, không tạo QTableWidgetItem cho từng ô
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+class ColumnarTableModel(QAbstractTableModel):
+    """
+    Mô tả:
+        Model chỉ đọc hiển thị dữ liệu dạng cột {tên cột: list giá trị}.
+        - Giá trị được định dạng khi view cần vẽ ô (chỉ các dòng đang hiển thị).
+        - Dòng được đưa vào view theo từng lô FETCH_BATCH (canFetchMore / fetchMore).
+        - Sắp xếp / lọc chỉ đổi thứ tự chỉ số dòng (self._order), dữ liệu gốc giữ nguyên.
+    Args:
+        columns: List (tiêu đề, tên cột dữ liệu) theo thứ tự hiển thị
+        formatters: Dict {tên cột: hàm(value) -> str} (optional)
+        search_keys: Tên các cột dùng khi lọc theo chuỗi (optional)
+        sort_keys: Dict {tên cột: hàm(value) -> khóa sắp xếp} (optional, mặc định giá trị gốc)
+    """
+
+    # Số dòng đưa thêm vào view mỗi lần cuộn tới cuối
+    FETCH_BATCH = 200
+
+    def __init__(self, columns, formatters=None, search_keys=None, sort_keys=None, parent=None):
+        super().__init__(parent)
+        self._titles = [title for title, _ in columns]
+        self._keys = [key for _, key in columns]
+        self._formatters = dict(formatters or {})
+        self._search_keys = list(search_keys or [])
+        self._sort_keys = dict(sort_keys or {})
+        self._alignments = {}
+        self._data = {}
+        self._size = 0
+        self._order = []
+        self._loaded = 0
+        self._search_cache = {}
+        self._row_index = {}
+        self._filter = ("", (), (), ())
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+
+    # ------------------------------------------------------------------
+    # Cấu hình
+    # ------------------------------------------------------------------
+    def set_formatter(self, key, formatter):
+        """Đặt hàm định dạng hiển thị cho một cột dữ liệu"""
+        self._formatters[key] = formatter
+        self._search_cache.pop(key, None)
+        if self._loaded:
+            self.dataChanged.emit(
+                self.index(0, 0), self.index(self._loaded - 1, len(self._keys) - 1)
+            )
+
+    def set_alignment(self, key, alignment):
+        """Đặt căn lề cho một cột dữ liệu"""
+        self._alignments[key] = alignment
+
+    # ------------------------------------------------------------------
+    # Dữ liệu
+    # ------------------------------------------------------------------
+    def set_columns(self, data):
+        """
+        Mô tả:
+            Thay toàn bộ dữ liệu. Bộ lọc và cột sắp xếp hiện tại được áp dụng lại.
+        Args:
+            data: Dict {tên cột: list giá trị}, các list cùng độ dài
+        """
+        self._data = data or {}
+        self._size = len(next(iter(self._data.values()), []))
+        self._search_cache = {}
+        self._row_index = {}
+        self._reset_order()
+
+    def upsert_rows(self, key, data):
+        """
+        Mô tả:
+            Thêm mới / thay thế các dòng theo cột khóa key (không nạp lại toàn bộ).
+            Nếu thứ tự hiển thị không đổi chỉ các dòng bị sửa được vẽ lại, dòng mới
+            nằm cuối được chèn thêm; chỉ khi bộ lọc / sắp xếp làm đổi thứ tự mới
+            tính lại cả view.
+        Args:
+            key: Cột định danh dòng (vd "id")
+            data: Dict {tên cột: list giá trị} chứa các dòng mới / đã sửa
+        """
+        new_keys = data.get(key, [])
+        if not new_keys:
+            return
+        if not self._data:
+            self.set_columns({col: list(values) for col, values in data.items()})
+            return
+        positions = self._row_positions(key)
+        changed = set()
+        old_size = self._size
+        for j, row_key in enumerate(new_keys):
+            pos = positions.get(row_key)
+            if pos is None:
+                for col, values in self._data.items():
+                    values.append(data[col][j] if col in data else None)
+                pos = positions[row_key] = self._size
+                self._size += 1
+            else:
+                for col, values in self._data.items():
+                    if col in data:
+                        values[pos] = data[col][j]
+            changed.add(pos)
+        self._row_index = {key: positions}
+        self._patch_search_cache(changed, old_size)
+        self._apply_row_changes(changed)
+
+    def remove_rows(self, key, row_keys):
+        """
+        Mô tả:
+            Xóa các dòng có giá trị cột key nằm trong row_keys.
+            Chỉ các dòng bị xóa được gỡ khỏi view, thứ tự các dòng còn lại giữ nguyên.
+        Args:
+            key: Cột định danh dòng
+            row_keys: Các giá trị khóa cần xóa
+        """
+        positions = self._row_positions(key)
+        removed = {positions[k] for k in set(row_keys) if k in positions}
+        if not removed:
+            return
+
+        # Gỡ khỏi view trước khi dồn dữ liệu (view vẫn đọc được dòng cũ trong lúc gỡ)
+        for row in range(len(self._order) - 1, -1, -1):
+            if self._order[row] not in removed:
+                continue
+            if row < self._loaded:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._order[row]
+                self._loaded -= 1
+                self.endRemoveRows()
+            else:
+                del self._order[row]
+
+        keep = [i for i in range(self._size) if i not in removed]
+        remap = {old: new for new, old in enumerate(keep)}
+        self._data = {col: [values[i] for i in keep] for col, values in self._data.items()}
+        self._search_cache = {
+            col: [texts[i] for i in keep] for col, texts in self._search_cache.items()
+        }
+        self._size = len(keep)
+        self._order = [remap[i] for i in self._order]
+        self._row_index = {}
+
+    def _patch_search_cache(self, positions, old_size):
+        """Cập nhật chuỗi tìm kiếm đã cache cho các dòng vừa sửa / thêm"""
+        for col, texts in self._search_cache.items():
+            if len(texts) < self._size:
+                texts.extend([""] * (self._size - len(texts)))
+            values = self._data.get(col, [])
+            formatter = self._formatters.get(col)
+            for pos in positions:
+                v = values[pos] if pos < len(values) else None
+                texts[pos] = "" if v is None else (formatter(v) if formatter else str(v)).lower()
+
+    def _apply_row_changes(self, positions):
+        """Báo view về các dòng gốc vừa sửa / thêm, giữ nguyên vị trí cuộn nếu được"""
+        old_order = self._order
+        self._order = self._filtered_rows()
+        self._apply_sort()
+        new_order, self._order = self._order, old_order
+
+        if new_order == old_order:
+            self._order = new_order
+            rows = [r for r in range(self._loaded) if new_order[r] in positions]
+            if rows:
+                last_column = len(self._keys) - 1
+                self.dataChanged.emit(self.index(rows[0], 0), self.index(rows[-1], last_column))
+            return
+
+        if len(new_order) > len(old_order) and new_order[: len(old_order)] == old_order:
+            # Chỉ thêm dòng ở cuối: chèn vào view nếu view đang hiện tới cuối danh sách
+            self._order = new_order
+            rows = [r for r in range(self._loaded) if new_order[r] in positions]
+            if rows:
+                last_column = len(self._keys) - 1
+                self.dataChanged.emit(self.index(rows[0], 0), self.index(rows[-1], last_column))
+            if self._loaded == len(old_order):
+                count = min(self.FETCH_BATCH, len(new_order) - self._loaded)
+                self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+                self._loaded += count
+                self.endInsertRows()
+            return
+
+        # Thứ tự thay đổi: tính lại view nhưng giữ số dòng đã nạp (không nhảy về đầu)
+        loaded = self._loaded
+        self.beginResetModel()
+        self._order = new_order
+        self._loaded = min(max(loaded, self.FETCH_BATCH), len(new_order))
+        self.endResetModel()
+
+    def set_filter(self, text="", keys=None, equals=None, one_of=None):
+        """
+        Mô tả:
+            Lọc dòng: chuỗi text (không phân biệt hoa thường) xuất hiện trong một
+            trong các cột keys, mọi cột trong equals bằng đúng giá trị yêu cầu,
+            và mọi cột trong one_of có giá trị thuộc tập cho trước (vd kết quả
+            từ một chỉ mục tìm kiếm bên ngoài).
+        Args:
+            text: Chuỗi cần tìm; rỗng = không lọc theo chuỗi
+            keys: Các cột tìm chuỗi (optional, mặc định search_keys)
+            equals: Dict {tên cột: giá trị} (optional)
+            one_of: Dict {tên cột: tập giá trị} (optional)
+        """
+        text = (text or "").strip().lower()
+        keys = tuple(keys if keys is not None else self._search_keys) if text else ()
+        equals = tuple(sorted((equals or {}).items()))
+        one_of = tuple((key, frozenset(values)) for key, values in (one_of or {}).items())
+        new_filter = (text, keys, equals, one_of)
+        if new_filter == self._filter:
+            return
+        self._filter = new_filter
+        self._reset_order()
+
+    def value(self, row, key):
+        """Giá trị gốc (chưa định dạng) của cột key tại dòng row của view"""
+        if 0 <= row < len(self._order) and key in self._data:
+            return self._data[key][self._order[row]]
+        return None
+
+    def find_keys(self, key, column, values):
+        """Giá trị cột key của mọi dòng gốc có cột column thuộc tập values"""
+        values = set(values)
+        column_values = self._data.get(column, [])
+        keys = self._data.get(key, [])
+        return [keys[i] for i, v in enumerate(column_values) if v in values]
+
+    def total_count(self):
+        """Số dòng sau khi lọc (kể cả dòng chưa nạp vào view)"""
+        return len(self._order)
+
+    def _reset_order(self):
+        """Tính lại thứ tự dòng theo bộ lọc + sắp xếp hiện tại và báo view vẽ lại"""
+        self.beginResetModel()
+        self._order = self._filtered_rows()
+        self._apply_sort()
+        self._loaded = min(self.FETCH_BATCH, len(self._order))
+        self.endResetModel()
+
+    def _row_positions(self, key):
+        """Dict {giá trị cột key: vị trí dòng gốc}, tính một lần cho mỗi lần nạp dữ liệu"""
+        positions = self._row_index.get(key)
+        if positions is None:
+            positions = {v: i for i, v in enumerate(self._data.get(key, []))}
+            self._row_index[key] = positions
+        return positions
+
+    def _filtered_rows(self):
+        text, keys, equals, one_of = self._filter
+        rows = range(self._size)
+        for key, accepted in one_of:
+            positions = self._row_positions(key)
+            if len(positions) < self._size:
+                # Cột có giá trị trùng (vd department_id): duyệt cả cột
+                values = self._data.get(key, [None] * self._size)
+                rows = [i for i in rows if values[i] in accepted]
+                continue
+            selected = {positions[v] for v in accepted if v in positions}
+            rows = sorted(selected) if isinstance(rows, range) else [i for i in rows if i in selected]
+        for key, expected in equals:
+            values = self._data.get(key, [None] * self._size)
+            rows = [i for i in rows if values[i] == expected]
+        if text and keys:
+            haystacks = [self._search_texts(key) for key in keys]
+            rows = [i for i in rows if any(text in h[i] for h in haystacks)]
+        return list(rows)
+
+    def _search_texts(self, key):
+        """Chuỗi hiển thị (lowercase) của cột key, tính một lần cho mỗi lần nạp dữ liệu"""
+        texts = self._search_cache.get(key)
+        if texts is None:
+            values = self._data.get(key, [None] * self._size)
+            formatter = self._formatters.get(key)
+            texts = [
+                "" if v is None else (formatter(v) if formatter else str(v)).lower()
+                for v in values
+            ]
+            self._search_cache[key] = texts
+        return texts
+
+    def _apply_sort(self):
+        if not (0 <= self._sort_column < len(self._keys)):
+            return
+        key = self._keys[self._sort_column]
+        values = self._data.get(key)
+        if values is None:
+            return
+        sort_key = self._sort_keys.get(key)
+        if sort_key is not None:
+            values = [None if v is None else sort_key(v) for v in values]
+        # None luôn xếp cuối khi tăng dần
+        self._order.sort(
+            key=lambda i: (values[i] is None, values[i] if values[i] is not None else 0),
+            reverse=self._sort_order == Qt.DescendingOrder,
+        )
+
+    # ------------------------------------------------------------------
+    # QAbstractTableModel
+    # ------------------------------------------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._keys)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._order)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.FETCH_BATCH, len(self._order) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        key = self._keys[index.column()]
+        if role == Qt.DisplayRole:
+            value = self.value(index.row(), key)
+            if value is None:
+                return ""
+            formatter = self._formatters.get(key)
+            return formatter(value) if formatter else str(value)
+        if role == Qt.TextAlignmentRole:
+            return self._alignments.get(key)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            if 0 <= section < len(self._titles):
+                return self._titles[section]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self._reset_order()
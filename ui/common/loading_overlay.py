@@ -0,0 +1,62 @@
+# Lớp phủ "Đang tải..." dùng chung
+# Tất cả comment, docstring đều bằng tiếng Việt
+from PySide6.QtWidgets import QLabel, QVBoxLayout, QWidget
+from PySide6.QtCore import QEvent, Qt, QTimer
+from core.resource import FONT_WEIGHT_SEMIBOLD
+
+
+class LoadingOverlay(QWidget):
+    """
+    Mô tả:
+        Lớp phủ mờ che một widget (thường là bảng) trong lúc job nạp dữ liệu chạy nền.
+        Chỉ hiện nếu job chạy lâu hơn SHOW_DELAY_MS để tránh nháy khi truy vấn nhanh.
+    Args:
+        target: Widget cần che
+        runner: LoadJobRunner cung cấp tín hiệu busy_changed (optional)
+        text: Nội dung hiển thị
+    """
+
+    SHOW_DELAY_MS = 150
+
+    def __init__(self, target, runner=None, text="Đang tải dữ liệu..."):
+        super().__init__(target)
+        self.setAttribute(Qt.WA_StyledBackground, True)
+        self.setStyleSheet("background: rgba(255, 255, 255, 170);")
+
+        layout = QVBoxLayout(self)
+        label = QLabel(text)
+        label.setAlignment(Qt.AlignCenter)
+        label.setStyleSheet(
+            f"background: transparent; font-size: 14px; font-weight: {FONT_WEIGHT_SEMIBOLD}; color: #555;"
+        )
+        layout.addWidget(label)
+
+        self._show_timer = QTimer(self)
+        self._show_timer.setSingleShot(True)
+        self._show_timer.timeout.connect(self._show_now)
+
+        target.installEventFilter(self)
+        self.hide()
+
+        if runner is not None:
+            runner.busy_changed.connect(self.set_busy)
+
+    def set_busy(self, busy):
+        """Bật / tắt lớp phủ theo trạng thái đang tải"""
+        if busy:
+            if not self.isVisible() and not self._show_timer.isActive():
+                self._show_timer.start(self.SHOW_DELAY_MS)
+        else:
+            self._show_timer.stop()
+            self.hide()
+
+    def _show_now(self):
+        self.setGeometry(self.parentWidget().rect())
+        self.raise_()
+        self.show()
+
+    def eventFilter(self, obj, event):
+        # Luôn phủ kín widget đích khi nó đổi kích thước
+        if obj is self.parentWidget() and event.type() == QEvent.Resize:
+            self.setGeometry(obj.rect())
+        return super().eventFilter(obj, event)
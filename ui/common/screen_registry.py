@@ -0,0 +1,141 @@
+# Bộ đăng ký màn hình nội dung chính (giữ widget đã dựng, nạp lại khi dữ liệu đổi)
+# Tất cả comment, docstring đều bằng tiếng Việt
+from PySide6.QtCore import QObject, QTimer
+
+
+def log_to_debug(message):
+    try:
+        with open("log/debug.log", "a", encoding="utf-8") as f:
+            from datetime import datetime
+
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"[{now}] {message}\n")
+    except Exception as e:
+        print(f"[LogError] {e}")
+
+
+from core.table_versions import TableVersions
+
+
+class ScreenRegistry(QObject):
+    """
+    Mô tả:
+        Quản lý các màn hình hiển thị ở vùng nội dung chính của main_window.
+        Mỗi màn hình được dựng MỘT lần rồi giữ lại; lần chuyển sau chỉ đổi widget đang
+        hiện. Khi quay lại, màn hình chỉ nạp lại nếu các bảng nó hiển thị đã thay đổi
+        (so phiên bản TableVersions) kể từ lúc rời đi.
+    Args:
+        main_window: MainWindow có set_main_content / add_main_content
+    """
+
+    # Chờ cửa sổ chính hiện xong rồi mới dựng ngầm, mỗi màn hình cách nhau một nhịp
+    PREWARM_DELAY_MS = 800
+    PREWARM_GAP_MS = 200
+
+    def __init__(self, main_window):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self._specs = {}
+        self._widgets = {}
+        self._versions = {}
+        self._current = None
+        self._prewarm_queue = []
+
+    def register(self, key, factory, tables=(), refresh=None):
+        """
+        Mô tả:
+            Khai báo một màn hình.
+        Args:
+            key: Tên màn hình
+            factory: Hàm factory(main_window) -> QWidget
+            tables: Các bảng mà màn hình hiển thị
+            refresh: Hàm refresh(widget, changed_tables) nạp lại dữ liệu (optional)
+        Returns:
+            None
+        """
+        self._specs[key] = (factory, tuple(tables), refresh)
+
+    def show(self, key):
+        """
+        Mô tả:
+            Hiển thị màn hình key: dựng nếu chưa có, nạp lại nếu dữ liệu đã thay đổi.
+        Args:
+            key: Tên màn hình đã register
+        Returns:
+            QWidget: Widget của màn hình
+        """
+        if key == self._current and key in self._widgets:
+            return self._widgets[key]
+
+        # Màn hình đang rời đi đã tự cập nhật những gì nó ghi, chụp phiên bản tại đây
+        if self._current in self._widgets:
+            self._versions[self._current] = TableVersions.snapshot(self._specs[self._current][1])
+
+        widget = self._widgets.get(key)
+        if widget is None:
+            widget = self._build(key)
+        else:
+            self._refresh_if_stale(key, widget)
+
+        self._current = key
+        self.main_window.set_main_content(widget, keep_alive=True)
+        return widget
+
+    def prewarm(self, keys, delay_ms=None):
+        """
+        Mô tả:
+            Dựng ngầm các màn hình hay dùng sau khi ứng dụng khởi động.
+            Mỗi nhịp event loop chỉ dựng một màn hình để giao diện không bị khựng;
+            dữ liệu của màn hình nạp bằng job nền như khi mở bình thường.
+        Args:
+            keys: Danh sách tên màn hình theo thứ tự ưu tiên
+            delay_ms: Độ trễ trước màn hình đầu tiên (mặc định PREWARM_DELAY_MS)
+        Returns:
+            None
+        """
+        self._prewarm_queue = [k for k in keys if k in self._specs]
+        QTimer.singleShot(
+            self.PREWARM_DELAY_MS if delay_ms is None else delay_ms, self._prewarm_next
+        )
+
+    def _prewarm_next(self):
+        while self._prewarm_queue:
+            key = self._prewarm_queue.pop(0)
+            if key in self._widgets:
+                continue
+            try:
+                self.main_window.add_main_content(self._build(key))
+                log_to_debug(f"ScreenRegistry: prewarmed '{key}'")
+            except Exception as e:
+                log_to_debug(f"ScreenRegistry: prewarm '{key}' error: {e}")
+            break
+        if self._prewarm_queue:
+            QTimer.singleShot(self.PREWARM_GAP_MS, self._prewarm_next)
+
+    def _build(self, key):
+        factory, tables, _refresh = self._specs[key]
+        # Chụp trước khi dựng: mọi thay đổi xảy ra trong lúc widget đang nạp đều bị bắt
+        self._versions[key] = TableVersions.snapshot(tables)
+        widget = factory(self.main_window)
+        self._widgets[key] = widget
+        return widget
+
+    def _refresh_if_stale(self, key, widget):
+        _factory, tables, refresh = self._specs[key]
+        current = TableVersions.snapshot(tables)
+        seen = self._versions.get(key)
+        if current == seen:
+            return
+        self._versions[key] = current
+
+        if refresh is None:
+            return
+        if seen is None or seen[0] != current[0]:
+            changed = set(tables)
+        else:
+            changed = {t for t, old, new in zip(tables, seen[1:], current[1:]) if old != new}
+        log_to_debug(f"ScreenRegistry: refresh '{key}' changed={sorted(changed)}")
+        try:
+            refresh(widget, changed)
+        except Exception as e:
+            log_to_debug(f"ScreenRegistry: refresh '{key}' error: {e}")
@@ -42,21 +42,17 @@ class ControllersEmployee:
 
         dialog = DialogEmployeeAdd(self.widget)
         if dialog.exec():
-            # Reload data và cập nhật tổng số
-            self.widget._load_data()
+            # Dòng mới được widget tự nạp khi nhận sự kiện thay đổi (ChangeBus)
             log_to_debug("ControllersEmployee: Đã thêm nhân viên thành công")
 
     def on_edit(self):
         """Xử lý sửa nhân viên"""
         log_to_debug("ControllersEmployee: Edit button clicked")
 
-        # Lấy hàng đang chọn từ bảng frozen hoặc scrollable
-        selected_rows_frozen = self.widget.table_frozen.selectionModel().selectedRows()
-        selected_rows_scrollable = (
-            self.widget.table_scrollable.selectionModel().selectedRows()
-        )
+        # Hai bảng dùng chung selection model
+        selected_rows = self.widget.table_frozen.selectionModel().selectedRows()
 
-        if not selected_rows_frozen and not selected_rows_scrollable:
+        if not selected_rows:
             from PySide6.QtWidgets import QMessageBox
 
             QMessageBox.warning(
@@ -64,25 +60,15 @@ class ControllersEmployee:
             )
             return
 
-        # Lấy row index
-        row = (
-            selected_rows_frozen[0].row()
-            if selected_rows_frozen
-            else selected_rows_scrollable[0].row()
-        )
-
-        # Lấy employee_id từ cột ẩn (cột 16 của bảng scrollable)
-        emp_id_item = self.widget.table_scrollable.item(row, 16)
-        if not emp_id_item:
+        # Lấy employee_id từ model
+        emp_id = self.widget.employee_model.value(selected_rows[0].row(), "id")
+        if emp_id is None:
             log_to_debug("ControllersEmployee: Không tìm thấy ID nhân viên")
             return
 
-        emp_id = int(emp_id_item.text())
-
         # Lấy thông tin đầy đủ từ service
         try:
-            employees = self.widget.employee_service.get_all_employees()
-            employee_data = next((e for e in employees if e["id"] == emp_id), None)
+            employee_data = self.widget.employee_service.get_employee_by_id(emp_id)
 
             if not employee_data:
                 from PySide6.QtWidgets import QMessageBox
@@ -96,8 +82,7 @@ class ControllersEmployee:
 
             dialog = DialogEmployeeEdit(self.widget, employee_data=employee_data)
             if dialog.exec():
-                # Reload data
-                self.widget._load_data()
+                # Dòng vừa sửa được widget tự nạp lại khi nhận sự kiện thay đổi
                 log_to_debug("ControllersEmployee: Đã cập nhật nhân viên thành công")
 
         except Exception as e:
@@ -112,13 +97,10 @@ class ControllersEmployee:
         """Xử lý xóa nhân viên"""
         log_to_debug("ControllersEmployee: Delete button clicked")
 
-        # Lấy hàng đang chọn
-        selected_rows_frozen = self.widget.table_frozen.selectionModel().selectedRows()
-        selected_rows_scrollable = (
-            self.widget.table_scrollable.selectionModel().selectedRows()
-        )
+        # Lấy hàng đang chọn (hai bảng dùng chung selection model)
+        selected_rows = self.widget.table_frozen.selectionModel().selectedRows()
 
-        if not selected_rows_frozen and not selected_rows_scrollable:
+        if not selected_rows:
             from PySide6.QtWidgets import QMessageBox
 
             QMessageBox.warning(
@@ -126,24 +108,15 @@ class ControllersEmployee:
             )
             return
 
-        # Lấy row index
-        row = (
-            selected_rows_frozen[0].row()
-            if selected_rows_frozen
-            else selected_rows_scrollable[0].row()
-        )
-
-        # Lấy ID và tên từ bảng
-        emp_id_item = self.widget.table_scrollable.item(row, 16)
-        emp_name_item = self.widget.table_frozen.item(row, 1)
+        # Lấy ID và tên từ model
+        row = selected_rows[0].row()
+        emp_id = self.widget.employee_model.value(row, "id")
+        emp_name = self.widget.employee_model.value(row, "name")
 
-        if not emp_id_item or not emp_name_item:
+        if emp_id is None or emp_name is None:
             log_to_debug("ControllersEmployee: Không tìm thấy thông tin nhân viên")
             return
 
-        emp_id = int(emp_id_item.text())
-        emp_name = emp_name_item.text()
-
         # Hiển thị dialog xác nhận xóa
         try:
             from ui.dialog.dialog_employee import DialogEmployeeDelete
@@ -152,8 +125,7 @@ class ControllersEmployee:
                 self.widget, employee_data={"id": emp_id, "name": emp_name}
             )
             if dialog.exec():
-                # Reload data và cập nhật tổng số
-                self.widget._load_data()
+                # Dòng đã xóa được widget tự gỡ khi nhận sự kiện thay đổi
                 log_to_debug("ControllersEmployee: Đã xóa nhân viên thành công")
 
         except Exception as e:
@@ -164,77 +136,39 @@ class ControllersEmployee:
 
             QMessageBox.critical(self.widget, "Lỗi", f"Không thể xóa nhân viên:\n{e}")
 
+    # Trường của chỉ mục tìm kiếm ứng với từng lựa chọn của combo lọc
+    SEARCH_KEYS = {
+        "Tất cả": [
+            "employee_code",
+            "name",
+            "department_name",
+            "job_title_name",
+            "attendance_code",
+        ],
+        "Mã NV": ["employee_code"],
+        "Tên NV": ["name"],
+        "Phòng ban": ["department_name"],
+        "Chức vụ": ["job_title_name"],
+    }
+
     def on_search(self, text):
-        """Xử lý tìm kiếm nhân viên theo filter được chọn"""
-        search_text = text.lower().strip()
+        """
+        Xử lý tìm kiếm nhân viên theo filter được chọn: tra chỉ mục không dấu
+        (gõ "nguyen" khớp "Nguyễn") rồi lọc model theo tập id tìm được
+        """
         search_filter = self.widget.search_filter.currentText()
 
         log_to_debug(
             f"ControllersEmployee: Searching for '{text}' with filter '{search_filter}'"
         )
 
-        if not search_text:
-            # Hiển thị lại tất cả hàng
-            for row in range(self.widget.table_frozen.rowCount()):
-                self.widget.table_frozen.setRowHidden(row, False)
-                self.widget.table_scrollable.setRowHidden(row, False)
-            return
-
-        # Lọc theo filter được chọn
-        for row in range(self.widget.table_frozen.rowCount()):
-            match = False
-
-            if search_filter == "Tất cả":
-                # Tìm trong tất cả các trường
-                # Mã NV (cột 0 frozen)
-                emp_code_item = self.widget.table_frozen.item(row, 0)
-                emp_code = emp_code_item.text().lower() if emp_code_item else ""
-
-                # Tên NV (cột 1 frozen)
-                emp_name_item = self.widget.table_frozen.item(row, 1)
-                emp_name = emp_name_item.text().lower() if emp_name_item else ""
-
-                # Phòng ban (cột 0 scrollable)
-                dept_item = self.widget.table_scrollable.item(row, 0)
-                dept = dept_item.text().lower() if dept_item else ""
-
-                # Chức vụ (cột 1 scrollable)
-                job_item = self.widget.table_scrollable.item(row, 1)
-                job = job_item.text().lower() if job_item else ""
-
-                match = (
-                    search_text in emp_code
-                    or search_text in emp_name
-                    or search_text in dept
-                    or search_text in job
-                )
-
-            elif search_filter == "Mã NV":
-                # Chỉ tìm trong Mã NV
-                emp_code_item = self.widget.table_frozen.item(row, 0)
-                emp_code = emp_code_item.text().lower() if emp_code_item else ""
-                match = search_text in emp_code
-
-            elif search_filter == "Tên NV":
-                # Chỉ tìm trong Tên NV
-                emp_name_item = self.widget.table_frozen.item(row, 1)
-                emp_name = emp_name_item.text().lower() if emp_name_item else ""
-                match = search_text in emp_name
-
-            elif search_filter == "Phòng ban":
-                # Chỉ tìm trong Phòng ban
-                dept_item = self.widget.table_scrollable.item(row, 0)
-                dept = dept_item.text().lower() if dept_item else ""
-                match = search_text in dept
-
-            elif search_filter == "Chức vụ":
-                # Chỉ tìm trong Chức vụ
-                job_item = self.widget.table_scrollable.item(row, 1)
-                job = job_item.text().lower() if job_item else ""
-                match = search_text in job
-
-            self.widget.table_frozen.setRowHidden(row, not match)
-            self.widget.table_scrollable.setRowHidden(row, not match)
+        ids = self.widget.employee_index.search(
+            text, self.SEARCH_KEYS.get(search_filter, [])
+        )
+        if ids is None:
+            self.widget.employee_model.set_filter()
+        else:
+            self.widget.employee_model.set_filter(one_of={"id": ids})
 
     def on_department_clicked(self, item, column):
         """Xử lý khi click vào phòng ban - lọc nhân viên theo phòng ban"""
@@ -246,18 +180,14 @@ class ControllersEmployee:
             log_to_debug("ControllersEmployee: No department ID found")
             return
 
-        log_to_debug(f"ControllersEmployee: Filtering by department_id={dept_id}")
+        # Phòng ban được chọn và mọi phòng ban con cháu (cây phòng ban đã cache)
+        dept_ids = self.widget.department_tree.subtree_ids(dept_id)
+        log_to_debug(
+            f"ControllersEmployee: Filtering by department_id={dept_id} ({len(dept_ids)} phòng ban)"
+        )
 
-        # Lọc bảng theo department_id
-        for row in range(self.widget.table_frozen.rowCount()):
-            # Lấy department_id từ cột ẩn (cột 17 của bảng scrollable)
-            dept_id_item = self.widget.table_scrollable.item(row, 17)
-            if dept_id_item:
-                row_dept_id = dept_id_item.text()
-                # So sánh với department_id được chọn
-                match = str(row_dept_id) == str(dept_id)
-                self.widget.table_frozen.setRowHidden(row, not match)
-                self.widget.table_scrollable.setRowHidden(row, not match)
+        # Lọc model theo nhánh phòng ban
+        self.widget.employee_model.set_filter(one_of={"department_id": dept_ids})
 
     def on_refresh(self):
         """Xử lý làm mới - bỏ chọn phòng ban và hiển thị lại toàn bộ"""
@@ -270,8 +200,6 @@ class ControllersEmployee:
         self.widget.search_input.clear()
 
         # Hiển thị lại tất cả hàng
-        for row in range(self.widget.table_frozen.rowCount()):
-            self.widget.table_frozen.setRowHidden(row, False)
-            self.widget.table_scrollable.setRowHidden(row, False)
+        self.widget.employee_model.set_filter()
 
         log_to_debug("ControllersEmployee: Refreshed - showing all employees")
@@ -53,9 +53,33 @@ Returns:
 """
 
 from PySide6.QtCore import QObject
+from ui.common.screen_registry import ScreenRegistry
+
+
+def _build_shift_widget(main_window):
+    """Dựng widget tải nhân viên lên máy kèm controller"""
+    from ui.widgets.widgets_shift import WidgetsShift
+    from ui.controllers.controllers_shift import ControllerWidgetsShift
+
+    widget = WidgetsShift(main_window)
+    # Khởi tạo controller cho widget
+    controller = ControllerWidgetsShift(widget)
+    widget.set_controller(controller)
+    return widget
+
+
+def _refresh_download_attendence(widget, changed):
+    """Nạp lại màn hình tải dữ liệu chấm công theo các bảng đã thay đổi"""
+    if "device" in changed:
+        widget.controller._load_devices()
+    if changed & {"attendance_raw", "attendance_daily", "employee"}:
+        widget.controller._load_attendance_data()
 
 
 class HeaderController(QObject):
+    # Màn hình hay dùng nhất, dựng ngầm sau khi ứng dụng khởi động
+    PREWARM_SCREENS = ("employee", "download_attendence")
+
     def __init__(self, widgets_header1, widgets_header2, main_window):
         super().__init__()
         self.header1 = widgets_header1
@@ -63,9 +87,61 @@ class HeaderController(QObject):
         self.main_window = (
             main_window  # Tham chiếu main_window để thao tác nội dung chính
         )
+        # Màn hình đã dựng được giữ lại, chuyển qua lại không phải dựng / truy vấn lại
+        self.screens = ScreenRegistry(main_window)
+        self._register_screens()
         self._connect_signals()
         self.active_btn = None
         self.show_group("khai_bao")
+        # Kết nối click Thông tin công ty để mở dialog (một lần)
+        self.header2.btn_thongtin_cty.clicked.connect(self.show_company_dialog)
+        self.screens.prewarm(self.PREWARM_SCREENS)
+
+    def _register_screens(self):
+        """Khai báo các màn hình nội dung chính: cách dựng, bảng hiển thị, cách nạp lại"""
+        from ui.widgets.widgets_job_title import WidgetsJobTitle
+        from ui.widgets.widgets_department import WidgetsDepartment
+        from ui.widgets.widgets_employee import WidgetsEmployee
+        from ui.widgets.widgets_holiday import WidgetsHoliday
+        from ui.widgets.widgets_declare_work_shift import WidgetsDeclareWorkShift
+        from ui.widgets.widgets_device import WidgetsDevice
+        from ui.widgets.widgets_download_attendence import WidgetsDownloadAttendence
+
+        self.screens.register(
+            "job_title",
+            WidgetsJobTitle,
+            ("job_title",),
+            lambda w, changed: w.main._refresh_job_titles(),
+        )
+        # Phòng ban / nhân viên / tải nhân viên lên máy tự vá theo ChangeBus khi còn sống,
+        # không cần nạp lại khi hiện lại
+        self.screens.register("department", WidgetsDepartment)
+        self.screens.register("employee", WidgetsEmployee)
+        self.screens.register(
+            "holiday",
+            WidgetsHoliday,
+            ("holiday",),
+            lambda w, changed: w.main._refresh_holidays(),
+        )
+        self.screens.register(
+            "declare_work_shift",
+            WidgetsDeclareWorkShift,
+            ("declare_work_shift",),
+            lambda w, changed: w.controller.refresh_data(),
+        )
+        self.screens.register(
+            "device",
+            WidgetsDevice,
+            ("device",),
+            lambda w, changed: w.controller._load_devices(),
+        )
+        self.screens.register(
+            "download_attendence",
+            WidgetsDownloadAttendence,
+            ("device", "attendance_raw", "attendance_daily", "employee"),
+            _refresh_download_attendence,
+        )
+        self.screens.register("shift", _build_shift_widget)
 
     def _connect_signals(self):
         self.header1.btn_khaibao.clicked.connect(lambda: self.show_group("khai_bao"))
@@ -178,9 +254,6 @@ class HeaderController(QObject):
         self.header2.repaint()
         self.header2.show()
 
-        # Kết nối click Thông tin công ty để mở dialog
-        self.header2.btn_thongtin_cty.clicked.connect(self.show_company_dialog)
-
     def show_company_dialog(self):
         """
         Hiển thị dialog thông tin công ty ở giữa cửa sổ chính
@@ -202,46 +275,29 @@ class HeaderController(QObject):
         """
         Mô tả:
             Hiển thị widget khai báo chức danh vào vùng nội dung chính của main_window.
-        Args:
-            None
-        Returns:
-            None
         """
-        from ui.widgets.widgets_job_title import WidgetsJobTitle
-
-        # Xóa widget cũ nếu có
-        if hasattr(self.main_window, "set_main_content"):
-            self.main_window.set_main_content(WidgetsJobTitle(self.main_window))
+        self.screens.show("job_title")
 
     def show_department_widget(self):
         """
         Mô tả:
             Hiển thị widget khai báo phòng ban vào vùng nội dung chính của main_window.
         """
-        from ui.widgets.widgets_department import WidgetsDepartment
-
-        if hasattr(self.main_window, "set_main_content"):
-            self.main_window.set_main_content(WidgetsDepartment(self.main_window))
+        self.screens.show("department")
 
     def show_employee_widget(self):
         """
         Mô tả:
             Hiển thị widget thông tin nhân viên vào vùng nội dung chính của main_window.
         """
-        from ui.widgets.widgets_employee import WidgetsEmployee
-
-        if hasattr(self.main_window, "set_main_content"):
-            self.main_window.set_main_content(WidgetsEmployee(self.main_window))
+        self.screens.show("employee")
 
     def show_holiday_widget(self):
         """
         Mô tả:
             Hiển thị widget khai báo ngày lễ vào vùng nội dung chính của main_window.
         """
-        from ui.widgets.widgets_holiday import WidgetsHoliday
-
-        if hasattr(self.main_window, "set_main_content"):
-            self.main_window.set_main_content(WidgetsHoliday(self.main_window))
+        self.screens.show("holiday")
 
     def show_attendance_symbol_dialog(self):
         """
@@ -338,42 +394,25 @@ class HeaderController(QObject):
         Mô tả:
             Hiển thị widget khai báo ca làm việc vào vùng nội dung chính của main_window.
         """
-        from ui.widgets.widgets_declare_work_shift import WidgetsDeclareWorkShift
-
-        if hasattr(self.main_window, "set_main_content"):
-            self.main_window.set_main_content(WidgetsDeclareWorkShift(self.main_window))
+        self.screens.show("declare_work_shift")
 
     def show_device_widget(self):
         """
         Mô tả:
             Hiển thị widget quản lý thiết bị chấm công vào vùng nội dung chính của main_window.
         """
-        from ui.widgets.widgets_device import WidgetsDevice
-
-        if hasattr(self.main_window, "set_main_content"):
-            self.main_window.set_main_content(WidgetsDevice(self.main_window))
+        self.screens.show("device")
 
     def show_download_attendence_widget(self):
         """
         Mô tả:
             Hiển thị widget tải dữ liệu chấm công vào vùng nội dung chính của main_window.
         """
-        from ui.widgets.widgets_download_attendence import WidgetsDownloadAttendence
-
-        if hasattr(self.main_window, "set_main_content"):
-            self.main_window.set_main_content(WidgetsDownloadAttendence(self.main_window))
+        self.screens.show("download_attendence")
 
     def show_shift_widget(self):
         """
         Mô tả:
             Hiển thị widget tải nhân viên lên máy chấm công vào vùng nội dung chính của main_window.
         """
-        from ui.widgets.widgets_shift import WidgetsShift
-        from ui.controllers.controllers_shift import ControllerWidgetsShift
-
-        if hasattr(self.main_window, "set_main_content"):
-            widget = WidgetsShift(self.main_window)
-            # Khởi tạo controller cho widget
-            controller = ControllerWidgetsShift(widget)
-            widget.set_controller(controller)
-            self.main_window.set_main_content(widget)
+        self.screens.show("shift")
@@ -1,8 +1,9 @@
 # controllers_shift.py
 # Controller cho widgets_shift.py
 
+import threading
 import traceback
-from PySide6.QtWidgets import QMessageBox, QTableWidgetItem, QProgressDialog, QInputDialog, QCheckBox
+from PySide6.QtWidgets import QMessageBox, QTableWidgetItem, QProgressDialog, QInputDialog
 from PySide6.QtCore import Qt, QThread, Signal
 from datetime import datetime
 
@@ -16,6 +17,12 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
+from core.database import Database
+from core.threads import LoadJobRunner
+from ui.common.change_relay import ChangeBatcher
+from ui.common.loading_overlay import LoadingOverlay
+
+
 class UploadThread(QThread):
     """Thread để tải nhân viên lên máy trong background"""
     progress = Signal(int, str)  # progress value, status message
@@ -25,6 +32,11 @@ class UploadThread(QThread):
         super().__init__()
         self.device_id = device_id
         self.employee_ids = employee_ids
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Yêu cầu dừng sau thao tác đang ghi; thread tự kết thúc"""
+        self.cancel_event.set()
     
     def run(self):
         try:
@@ -40,7 +52,8 @@ class UploadThread(QThread):
             success, message, count = service.upload_employees_to_device(
                 self.device_id, 
                 self.employee_ids,
-                progress_callback
+                progress_callback,
+                cancel_event=self.cancel_event,
             )
             
             self.progress.emit(100, "Hoàn tất!")
@@ -49,6 +62,9 @@ class UploadThread(QThread):
         except Exception as e:
             log_to_debug(f"UploadThread error: {e}\n{traceback.format_exc()}")
             self.finished_signal.emit(False, f"Lỗi: {str(e)}", 0)
+        finally:
+            # Thread sắp kết thúc: đóng cursor DuckDB của thread
+            Database.release_cursor()
 
 
 class DeleteThread(QThread):
@@ -92,6 +108,88 @@ class DeleteThread(QThread):
         except Exception as e:
             log_to_debug(f"DeleteThread error: {e}\n{traceback.format_exc()}")
             self.finished_signal.emit(False, f"Lỗi: {str(e)}", 0)
+        finally:
+            # Thread sắp kết thúc: đóng cursor DuckDB của thread
+            Database.release_cursor()
+
+
+class VaultThread(QThread):
+    """Thread sao lưu / khôi phục kho vân tay trong background"""
+    progress = Signal(int, str)
+    finished_signal = Signal(bool, str, int)
+
+    def __init__(self, device_id, action, user_ids=None, source_device_id=None):
+        super().__init__()
+        self.device_id = device_id
+        self.action = action  # "backup" hoặc "restore"
+        self.user_ids = user_ids
+        self.source_device_id = source_device_id  # máy nguồn của bản sao lưu (restore)
+
+    def run(self):
+        try:
+            from services.fingerprint_vault_services import FingerprintVaultService
+
+            self.progress.emit(0, "Đang chuẩn bị...")
+
+            service = FingerprintVaultService()
+
+            def progress_callback(progress_value, message):
+                self.progress.emit(progress_value, message)
+
+            if self.action == "restore":
+                success, message, count = service.restore_to_device(
+                    self.device_id, self.source_device_id, self.user_ids, progress_callback
+                )
+            else:
+                success, message, count = service.backup_device(self.device_id, progress_callback)
+
+            self.progress.emit(100, "Hoàn tất!")
+            self.finished_signal.emit(success, message, count)
+
+        except Exception as e:
+            log_to_debug(f"VaultThread error: {e}\n{traceback.format_exc()}")
+            self.finished_signal.emit(False, f"Lỗi: {str(e)}", 0)
+        finally:
+            # Thread sắp kết thúc: đóng cursor DuckDB của thread
+            Database.release_cursor()
+
+
+class ReplicateThread(QThread):
+    """Thread nhân bản user + vân tay từ một máy sang các máy khác trong background"""
+    progress = Signal(int, str)
+    finished_signal = Signal(bool, str, int)
+
+    def __init__(self, source_device_id, target_device_ids, user_ids=None):
+        super().__init__()
+        self.source_device_id = source_device_id
+        self.target_device_ids = target_device_ids
+        self.user_ids = user_ids
+
+    def run(self):
+        try:
+            from services.device_replication_services import DeviceReplicationService
+
+            self.progress.emit(0, "Đang chuẩn bị...")
+
+            def progress_callback(progress_value, message):
+                self.progress.emit(progress_value, message)
+
+            success, message, count = DeviceReplicationService().replicate(
+                self.source_device_id,
+                self.target_device_ids,
+                self.user_ids,
+                progress_callback,
+            )
+
+            self.progress.emit(100, "Hoàn tất!")
+            self.finished_signal.emit(success, message, count)
+
+        except Exception as e:
+            log_to_debug(f"ReplicateThread error: {e}\n{traceback.format_exc()}")
+            self.finished_signal.emit(False, f"Lỗi: {str(e)}", 0)
+        finally:
+            # Thread sắp kết thúc: đóng cursor DuckDB của thread
+            Database.release_cursor()
 
 
 class ControllerWidgetsShift:
@@ -109,6 +207,12 @@ class ControllerWidgetsShift:
         self.shift_service = ShiftUploadService()
         self.employee_service = EmployeeService()
         self.device_service = DeviceService()
+
+        # Nạp dữ liệu chạy nền, lớp phủ "Đang tải" che bảng trong lúc chờ
+        self.load_jobs = LoadJobRunner(widget)
+        self.loading_overlay = LoadingOverlay(widget.table_employees, self.load_jobs)
+        # Nhân viên thêm / sửa / xóa ở màn hình khác được vá theo dòng
+        self.change_batcher = ChangeBatcher(widget, ("employee",), self._on_employees_changed)
         
         # Connect signals
         self._connect_signals()
@@ -130,70 +234,38 @@ class ControllerWidgetsShift:
             self.widget.btn_select_upload.clicked.connect(self._select_device_and_upload)
             self.widget.btn_select_delete.clicked.connect(self._select_device_and_delete)
             self.widget.btn_select_delete_fp.clicked.connect(self._select_device_and_delete_fingerprint)
+            self.widget.btn_backup_fp.clicked.connect(self._select_device_and_backup_fingerprint)
+            self.widget.btn_restore_fp.clicked.connect(self._select_device_and_restore_fingerprint)
+            self.widget.btn_replicate_fp.clicked.connect(self._select_device_and_replicate)
             
             log_to_debug("ControllerWidgetsShift: Signals connected")
         except Exception as e:
             log_to_debug(f"ControllerWidgetsShift: _connect_signals() error: {e}")
 
     def _load_employees(self):
-        """Tải danh sách nhân viên"""
+        """Tải danh sách nhân viên (truy vấn chạy nền)"""
+        log_to_debug("ControllerWidgetsShift: _load_employees() called")
+        self.load_jobs.submit(
+            "employees",
+            self.employee_service.get_all_employees,
+            self._apply_employees,
+            on_error=self._on_load_employees_error,
+        )
+
+    def _on_load_employees_error(self, e):
+        log_to_debug(f"ControllerWidgetsShift: _load_employees() error: {e}")
+        QMessageBox.critical(self.widget, "Lỗi", f"Không thể tải danh sách nhân viên: {str(e)}")
+
+    def _apply_employees(self, employees):
+        """Hiển thị danh sách nhân viên (GUI thread)"""
         try:
-            log_to_debug("ControllerWidgetsShift: _load_employees() called")
-            
-            employees = self.employee_service.get_all_employees()
-            
             self.widget.table_employees.setRowCount(0)
             self.widget.table_employees.setSortingEnabled(False)
             
             for emp in employees:
                 row = self.widget.table_employees.rowCount()
                 self.widget.table_employees.insertRow(row)
-                
-                # Column 0: Checkbox
-                checkbox = QCheckBox()
-                checkbox.setStyleSheet("margin-left: 10px;")
-                self.widget.table_employees.setCellWidget(row, 0, checkbox)
-                
-                # Store employee_id in checkbox
-                checkbox.setProperty("employee_id", emp["id"])
-                
-                # Column 1: Mã nhân viên
-                item = QTableWidgetItem(emp.get("employee_code", ""))
-                item.setTextAlignment(Qt.AlignCenter)
-                self.widget.table_employees.setItem(row, 1, item)
-                
-                # Column 2: Tên nhân viên
-                item = QTableWidgetItem(emp.get("name", ""))
-                self.widget.table_employees.setItem(row, 2, item)
-                
-                # Column 3: Mã chấm công
-                item = QTableWidgetItem(emp.get("attendance_code", ""))
-                item.setTextAlignment(Qt.AlignCenter)
-                self.widget.table_employees.setItem(row, 3, item)
-                
-                # Column 4: Tên chấm công
-                item = QTableWidgetItem(emp.get("attendance_name", ""))
-                self.widget.table_employees.setItem(row, 4, item)
-                
-                # Column 5: Mã số thẻ (placeholder)
-                item = QTableWidgetItem("")
-                item.setTextAlignment(Qt.AlignCenter)
-                self.widget.table_employees.setItem(row, 5, item)
-                
-                # Column 6: Mật mã (placeholder)
-                item = QTableWidgetItem("")
-                item.setTextAlignment(Qt.AlignCenter)
-                self.widget.table_employees.setItem(row, 6, item)
-                
-                # Column 7: Loại (0=User)
-                item = QTableWidgetItem("0")
-                item.setTextAlignment(Qt.AlignCenter)
-                self.widget.table_employees.setItem(row, 7, item)
-                
-                # Column 8: Cho phép
-                item = QTableWidgetItem("✅")
-                item.setTextAlignment(Qt.AlignCenter)
-                self.widget.table_employees.setItem(row, 8, item)
+                self._fill_employee_row(row, emp)
             
             self.widget.table_employees.setSortingEnabled(True)
             self.widget.lbl_total_employees.setText(f"Tổng số: {len(employees)}")
@@ -201,9 +273,116 @@ class ControllerWidgetsShift:
             log_to_debug(f"ControllerWidgetsShift: Loaded {len(employees)} employees")
             
         except Exception as e:
-            log_to_debug(f"ControllerWidgetsShift: _load_employees() error: {e}\n{traceback.format_exc()}")
+            log_to_debug(f"ControllerWidgetsShift: _apply_employees() error: {e}\n{traceback.format_exc()}")
             QMessageBox.critical(self.widget, "Lỗi", f"Không thể tải danh sách nhân viên: {str(e)}")
 
+    def _fill_employee_row(self, row, emp):
+        """Ghi thông tin một nhân viên vào dòng row của bảng nhân viên"""
+        table = self.widget.table_employees
+        checked = table.item(row, 0).checkState() if table.item(row, 0) else Qt.Unchecked
+
+        # Column 0: Checkbox (item checkable, không tạo widget con cho từng dòng)
+        checkbox = QTableWidgetItem()
+        checkbox.setFlags(Qt.ItemIsUserCheckable | Qt.ItemIsEnabled)
+        checkbox.setCheckState(checked)
+        
+        # Store employee_id in checkbox
+        checkbox.setData(Qt.UserRole, emp["id"])
+        table.setItem(row, 0, checkbox)
+        
+        # Column 1: Mã nhân viên
+        item = QTableWidgetItem(emp.get("employee_code") or "")
+        item.setTextAlignment(Qt.AlignCenter)
+        table.setItem(row, 1, item)
+        
+        # Column 2: Tên nhân viên
+        item = QTableWidgetItem(emp.get("name") or "")
+        table.setItem(row, 2, item)
+        
+        # Column 3: Mã chấm công
+        item = QTableWidgetItem(emp.get("attendance_code") or "")
+        item.setTextAlignment(Qt.AlignCenter)
+        table.setItem(row, 3, item)
+        
+        # Column 4: Tên chấm công
+        item = QTableWidgetItem(emp.get("attendance_name") or "")
+        table.setItem(row, 4, item)
+        
+        # Column 5: Mã số thẻ (placeholder)
+        item = QTableWidgetItem("")
+        item.setTextAlignment(Qt.AlignCenter)
+        table.setItem(row, 5, item)
+        
+        # Column 6: Mật mã (placeholder)
+        item = QTableWidgetItem("")
+        item.setTextAlignment(Qt.AlignCenter)
+        table.setItem(row, 6, item)
+        
+        # Column 7: Loại (0=User)
+        item = QTableWidgetItem("0")
+        item.setTextAlignment(Qt.AlignCenter)
+        table.setItem(row, 7, item)
+        
+        # Column 8: Cho phép
+        item = QTableWidgetItem("✅")
+        item.setTextAlignment(Qt.AlignCenter)
+        table.setItem(row, 8, item)
+
+    def _on_employees_changed(self, changes):
+        """Vá bảng nhân viên theo sự kiện thay đổi thay vì nạp lại cả danh sách"""
+        upserts, deletes, reload = changes["employee"]
+        if reload:
+            self._load_employees()
+            return
+        if deletes:
+            self._remove_employee_rows(deletes)
+        if upserts:
+            self.load_jobs.submit(
+                "employee_rows",
+                self.employee_service.get_employee_columns,
+                self._apply_employee_rows,
+                list(upserts),
+            )
+
+    def _employee_rows(self):
+        """Dict {employee_id: dòng} của bảng nhân viên"""
+        table = self.widget.table_employees
+        rows = {}
+        for row in range(table.rowCount()):
+            item = table.item(row, 0)
+            if item is not None:
+                rows[item.data(Qt.UserRole)] = row
+        return rows
+
+    def _apply_employee_rows(self, columns):
+        """Cập nhật / thêm các dòng nhân viên vừa thay đổi (GUI thread)"""
+        try:
+            table = self.widget.table_employees
+            sorting = table.isSortingEnabled()
+            table.setSortingEnabled(False)
+            rows = self._employee_rows()
+            keys = list(columns)
+            for values in zip(*columns.values()):
+                emp = dict(zip(keys, values))
+                row = rows.get(emp["id"])
+                if row is None:
+                    row = table.rowCount()
+                    table.insertRow(row)
+                self._fill_employee_row(row, emp)
+            table.setSortingEnabled(sorting)
+            self.widget.lbl_total_employees.setText(f"Tổng số: {table.rowCount()}")
+            self._on_search_employee(self.widget.txt_search_employee.text())
+        except Exception as e:
+            log_to_debug(f"ControllerWidgetsShift: _apply_employee_rows() error: {e}\n{traceback.format_exc()}")
+
+    def _remove_employee_rows(self, emp_ids):
+        """Gỡ các nhân viên đã xóa khỏi bảng"""
+        table = self.widget.table_employees
+        rows = self._employee_rows()
+        for row in sorted((rows[i] for i in emp_ids if i in rows), reverse=True):
+            table.removeRow(row)
+        self.widget.lbl_total_employees.setText(f"Tổng số: {table.rowCount()}")
+
     def _on_search_employee(self, text):
         """Tìm kiếm nhân viên"""
         try:
@@ -242,9 +421,9 @@ class ControllerWidgetsShift:
             selected_employees = []
             
             for row in range(self.widget.table_employees.rowCount()):
-                checkbox = self.widget.table_employees.cellWidget(row, 0)
-                if checkbox and checkbox.isChecked():
-                    employee_id = checkbox.property("employee_id")
+                checkbox = self.widget.table_employees.item(row, 0)
+                if checkbox and checkbox.checkState() == Qt.Checked:
+                    employee_id = checkbox.data(Qt.UserRole)
                     
                     # Get employee data
                     emp_data = {
@@ -314,9 +493,9 @@ class ControllerWidgetsShift:
             
             # Uncheck all checkboxes
             for row in range(self.widget.table_employees.rowCount()):
-                checkbox = self.widget.table_employees.cellWidget(row, 0)
+                checkbox = self.widget.table_employees.item(row, 0)
                 if checkbox:
-                    checkbox.setChecked(False)
+                    checkbox.setCheckState(Qt.Unchecked)
             
             QMessageBox.information(
                 self.widget,
@@ -647,12 +826,22 @@ class ControllerWidgetsShift:
     def _on_upload_finished(self, success, message, count):
         """Xử lý khi upload hoàn tất"""
         try:
-            if hasattr(self, 'progress_dialog') and self.progress_dialog:
-                self.progress_dialog.close()
+            # Chỉ nút Hủy của người dùng mới tính là hủy: đọc cờ trước khi đóng dialog
+            # và ngắt canceled (close() cũng phát canceled)
+            cancelled = self.upload_thread.cancel_event.is_set()
+            dialog, self.progress_dialog = getattr(self, 'progress_dialog', None), None
+            if dialog is not None:
+                try:
+                    dialog.canceled.disconnect(self._on_upload_canceled)
+                except (RuntimeError, TypeError):
+                    pass
+                dialog.close()
             
             if success:
-                QMessageBox.information(self.widget, "Thành công", message)
-                # Clear upload list after successful upload
+                QMessageBox.information(self.widget, "Đã hủy" if cancelled else "Thành công", message)
+                # Clear upload list after successful upload (giữ danh sách nếu đã hủy giữa chừng)
+                if cancelled:
+                    return
                 self.widget.table_uploaded.setRowCount(0)
                 self.widget.lbl_total_uploaded.setText("Tổng số: 0")
             else:
@@ -664,11 +853,10 @@ class ControllerWidgetsShift:
     def _on_upload_canceled(self):
         """Xử lý khi hủy upload"""
         try:
+            # Hủy hợp tác: thread dừng sau thao tác đang ghi, mở lại máy và trả phiên
+            # kết nối bình thường; kết quả (số user đã ghi) báo trong _on_upload_finished
             if hasattr(self, 'upload_thread') and self.upload_thread:
-                self.upload_thread.terminate()
-                self.upload_thread.wait()
-            
-            QMessageBox.information(self.widget, "Đã hủy", "Đã hủy quá trình tải lên")
+                self.upload_thread.cancel()
             
         except Exception as e:
             log_to_debug(f"ControllerWidgetsShift: _on_upload_canceled() error: {e}")
@@ -831,3 +1019,135 @@ class ControllerWidgetsShift:
             
         except Exception as e:
             log_to_debug(f"ControllerWidgetsShift: _on_delete_finished() error: {e}")
+
+    def _ask_device(self, prompt):
+        """Hộp chọn máy chấm công; trả về device dict hoặc None"""
+        devices = self.device_service.get_all_devices()
+        if not devices:
+            QMessageBox.warning(self.widget, "Cảnh báo", "Không có thiết bị nào")
+            return None
+
+        device_names = [f"{d['device_number']} - {d['device_name']}" for d in devices]
+        device_name, ok = QInputDialog.getItem(
+            self.widget, "Chọn thiết bị", prompt, device_names, 0, False
+        )
+        if not ok or not device_name:
+            return None
+        return devices[device_names.index(device_name)]
+
+    def _select_device_and_backup_fingerprint(self):
+        """Chọn máy và sao lưu toàn bộ user + vân tay của máy vào kho"""
+        try:
+            device = self._ask_device("Chọn máy chấm công để sao lưu vân tay:")
+            if device:
+                self._start_vault(device["id"], "backup")
+        except Exception as e:
+            log_to_debug(f"ControllerWidgetsShift: _select_device_and_backup_fingerprint() error: {e}\n{traceback.format_exc()}")
+            QMessageBox.critical(self.widget, "Lỗi", f"Lỗi: {str(e)}")
+
+    def _select_device_and_restore_fingerprint(self):
+        """Chọn máy nguồn, máy đích và khôi phục vân tay từ kho (nhân viên đang chọn, hoặc tất cả)"""
+        try:
+            rows = sorted(set(index.row() for index in self.widget.table_uploaded.selectedIndexes()))
+            user_ids = None
+            if rows:
+                user_ids = [
+                    self.widget.table_uploaded.item(row, 1).text()  # attendance_code
+                    for row in rows
+                    if self.widget.table_uploaded.item(row, 1)
+                ]
+
+            source = self._ask_device("Chọn máy đã sao lưu (nguồn của bản sao lưu):")
+            if not source:
+                return
+            device = self._ask_device("Chọn máy chấm công để khôi phục vân tay:")
+            if not device:
+                return
+
+            scope = f"{len(user_ids)} nhân viên đã chọn" if user_ids else "toàn bộ bản sao lưu"
+            reply = QMessageBox.question(
+                self.widget,
+                "Xác nhận khôi phục",
+                f"Khôi phục {scope} của máy {source['device_name']} lên máy {device['device_name']}?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No,
+            )
+            if reply == QMessageBox.Yes:
+                self._start_vault(device["id"], "restore", user_ids, source["id"])
+        except Exception as e:
+            log_to_debug(f"ControllerWidgetsShift: _select_device_and_restore_fingerprint() error: {e}\n{traceback.format_exc()}")
+            QMessageBox.critical(self.widget, "Lỗi", f"Lỗi: {str(e)}")
+
+    def _start_vault(self, device_id, action, user_ids=None, source_device_id=None):
+        """Bắt đầu sao lưu / khôi phục kho vân tay"""
+        try:
+            title = "Khôi phục vân tay" if action == "restore" else "Sao lưu vân tay"
+            self.progress_dialog = QProgressDialog(f"Đang {title.lower()}...", None, 0, 100, self.widget)
+            self.progress_dialog.setWindowTitle(title)
+            self.progress_dialog.setWindowModality(Qt.WindowModal)
+            self.progress_dialog.setMinimumDuration(0)
+            self.progress_dialog.setAutoClose(False)
+            self.progress_dialog.setAutoReset(False)
+
+            self.vault_thread = VaultThread(device_id, action, user_ids, source_device_id)
+            self.vault_thread.progress.connect(self._on_delete_progress)
+            self.vault_thread.finished_signal.connect(self._on_delete_finished)
+            self.vault_thread.start()
+
+            self.progress_dialog.show()
+
+        except Exception as e:
+            log_to_debug(f"ControllerWidgetsShift: _start_vault() error: {e}\n{traceback.format_exc()}")
+            QMessageBox.critical(self.widget, "Lỗi", f"Lỗi: {str(e)}")
+
+    def _select_device_and_replicate(self):
+        """Chọn máy nguồn và nhân bản user + vân tay sang tất cả máy còn lại"""
+        try:
+            rows = sorted(set(index.row() for index in self.widget.table_uploaded.selectedIndexes()))
+            user_ids = None
+            if rows:
+                user_ids = [
+                    self.widget.table_uploaded.item(row, 1).text()  # attendance_code
+                    for row in rows
+                    if self.widget.table_uploaded.item(row, 1)
+                ]
+
+            source = self._ask_device("Chọn máy nguồn để nhân bản user và vân tay:")
+            if not source:
+                return
+            targets = [d for d in self.device_service.get_all_devices() if d["id"] != source["id"]]
+            if not targets:
+                QMessageBox.warning(self.widget, "Cảnh báo", "Không có máy đích nào khác máy nguồn")
+                return
+
+            scope = f"{len(user_ids)} nhân viên đã chọn" if user_ids else "toàn bộ user"
+            reply = QMessageBox.question(
+                self.widget,
+                "Xác nhận nhân bản",
+                f"Nhân bản {scope} từ máy {source['device_name']} sang {len(targets)} máy:\n"
+                + ", ".join(d["device_name"] for d in targets) + "?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No,
+            )
+            if reply != QMessageBox.Yes:
+                return
+
+            self.progress_dialog = QProgressDialog("Đang nhân bản...", None, 0, 100, self.widget)
+            self.progress_dialog.setWindowTitle("Nhân bản máy chấm công")
+            self.progress_dialog.setWindowModality(Qt.WindowModal)
+            self.progress_dialog.setMinimumDuration(0)
+            self.progress_dialog.setAutoClose(False)
+            self.progress_dialog.setAutoReset(False)
+
+            self.replicate_thread = ReplicateThread(
+                source["id"], [d["id"] for d in targets], user_ids
+            )
+            self.replicate_thread.progress.connect(self._on_delete_progress)
+            self.replicate_thread.finished_signal.connect(self._on_delete_finished)
+            self.replicate_thread.start()
+
+            self.progress_dialog.show()
+
+        except Exception as e:
+            log_to_debug(f"ControllerWidgetsShift: _select_device_and_replicate() error: {e}\n{traceback.format_exc()}")
+            QMessageBox.critical(self.widget, "Lỗi", f"Lỗi: {str(e)}")
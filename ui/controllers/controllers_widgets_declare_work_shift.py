@@ -18,6 +18,8 @@ def log_to_debug(message):
 
 
 from services.declare_work_shift_services import DeclareWorkShiftService
+from core.threads import LoadJobRunner
+from ui.common.loading_overlay import LoadingOverlay
 
 
 class ControllerWidgetsDeclareWorkShift:
@@ -28,6 +30,10 @@ class ControllerWidgetsDeclareWorkShift:
         self.service = DeclareWorkShiftService()
         self.current_id = None  # Lưu ID của ca làm việc đang chọn
 
+        # Nạp dữ liệu chạy nền, lớp phủ "Đang tải" che bảng trong lúc chờ
+        self.load_jobs = LoadJobRunner(widget)
+        self.loading_overlay = LoadingOverlay(widget.table, self.load_jobs)
+
         # Kết nối các sự kiện
         self._connect_events()
 
@@ -291,11 +297,16 @@ class ControllerWidgetsDeclareWorkShift:
         self._fill_form(work_shift)
 
     def refresh_data(self):
-        """Tải lại dữ liệu từ database và hiển thị vào bảng"""
+        """Tải lại dữ liệu từ database (truy vấn chạy nền) và hiển thị vào bảng"""
         log_to_debug("ControllerWidgetsDeclareWorkShift: refresh_data()")
 
         # Lấy tất cả ca làm việc
-        work_shifts = self.service.get_all_work_shifts()
+        self.load_jobs.submit(
+            "work_shifts", self.service.get_all_work_shifts, self._apply_work_shifts
+        )
+
+    def _apply_work_shifts(self, work_shifts):
+        """Hiển thị danh sách ca làm việc (GUI thread)"""
         log_to_debug(
             f"ControllerWidgetsDeclareWorkShift: Loaded {len(work_shifts)} work shifts"
         )
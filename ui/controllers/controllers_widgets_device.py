@@ -17,12 +17,37 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
+from core.threads import BaseWorker, LoadJobRunner
+from ui.common.loading_overlay import LoadingOverlay
+
+
+class ConnectionTestWorker(BaseWorker):
+    """Test kết nối thiết bị trên thread nền (không chặn GUI khi máy chậm / đang bận)"""
+
+    def __init__(self, ip_address, port, password, device_id, parent=None):
+        super().__init__(parent)
+        self.ip_address = ip_address
+        self.port = port
+        self.password = password
+        self.device_id = device_id
+
+    def do_work(self):
+        from services.device_services import DeviceService
+
+        return DeviceService().test_connection(
+            self.ip_address, self.port, self.password, self.device_id
+        )
+
+
 class ControllerWidgetsDevice:
     """Controller xử lý logic cho widgets_device.py"""
 
     def __init__(self, widget):
         self.widget = widget
         self.current_device_id = None  # ID của thiết bị đang được chọn
+        # Nạp dữ liệu chạy nền, lớp phủ "Đang tải" che bảng trong lúc chờ
+        self.load_jobs = LoadJobRunner(widget)
+        self.loading_overlay = LoadingOverlay(widget.table, self.load_jobs)
         self._connect_signals()
         self._load_devices()
 
@@ -45,14 +70,20 @@ class ControllerWidgetsDevice:
             )
 
     def _load_devices(self):
-        """Load danh sách thiết bị từ database và hiển thị lên bảng"""
-        try:
-            log_to_debug("ControllerWidgetsDevice: _load_devices() called")
-            from services.device_services import DeviceService
+        """Load danh sách thiết bị từ database (truy vấn chạy nền)"""
+        log_to_debug("ControllerWidgetsDevice: _load_devices() called")
+        self.load_jobs.submit("devices", self._fetch_devices, self._apply_devices)
 
-            service = DeviceService()
-            devices = service.get_all_devices()
+    @staticmethod
+    def _fetch_devices():
+        """Chạy trên thread nền: lấy danh sách thiết bị"""
+        from services.device_services import DeviceService
+
+        return DeviceService().get_all_devices()
 
+    def _apply_devices(self, devices):
+        """Hiển thị danh sách thiết bị lên bảng (GUI thread)"""
+        try:
             # Clear bảng
             self.widget.table.setRowCount(0)
 
@@ -78,7 +109,7 @@ class ControllerWidgetsDevice:
 
         except Exception as e:
             log_to_debug(
-                f"ControllerWidgetsDevice: _load_devices() error: {e}\n{traceback.format_exc()}"
+                f"ControllerWidgetsDevice: _apply_devices() error: {e}\n{traceback.format_exc()}"
             )
 
     def _on_selection_changed(self):
@@ -297,24 +328,50 @@ class ControllerWidgetsDevice:
                 )
                 return
 
-            # Test kết nối
-            from services.device_services import DeviceService
+            # Hiển thị thông báo đang kết nối, test kết nối trên thread nền
+            self._update_status_display("Đang kết nối...")
+            self.widget.btn_connect.setEnabled(False)
+            worker = ConnectionTestWorker(
+                ip_address, int(port), password, self.current_device_id, self.widget
+            )
+            worker.finished.connect(
+                lambda result, device_id=self.current_device_id: self._on_connection_tested(
+                    device_id, result
+                )
+            )
+            worker.error.connect(self._on_connection_test_error)
+            self.connection_worker = worker
+            worker.start()
 
+        except Exception as e:
+            log_to_debug(
+                f"ControllerWidgetsDevice: _on_connect_clicked() error: {e}\n{traceback.format_exc()}"
+            )
+            self.widget.btn_connect.setEnabled(True)
+            # Không hiển thị MessageBox, chỉ cập nhật trạng thái
+            self._update_status_display("Lỗi kết nối")
+
+    def _on_connection_tested(self, device_id, result):
+        """Test kết nối xong (GUI thread): hiển thị và lưu trạng thái thiết bị"""
+        try:
+            from services.device_services import DEVICE_BUSY_MESSAGE, DeviceService
+
+            self.widget.btn_connect.setEnabled(True)
+            success, message = result
             service = DeviceService()
-            
-            # Hiển thị thông báo đang kết nối
-            self._update_status_display("Đang kết nối...")
-            self.widget.lbl_status_value.repaint()
 
-            success, message = service.test_connection(ip_address, int(port), password)
+            if not success and message == DEVICE_BUSY_MESSAGE:
+                # Máy đang được tải / ghi: không đổi trạng thái đã lưu
+                self._update_status_display("Máy đang bận")
+                return
 
             if success:
                 # Không hiển thị MessageBox, chỉ cập nhật trạng thái
                 self._update_status_display("Đã kết nối")
                 
                 # Cập nhật trạng thái vào database nếu đã lưu
-                if self.current_device_id:
-                    service.update_device_status(self.current_device_id, "Đã kết nối")
+                if device_id:
+                    service.update_device_status(device_id, "Đã kết nối")
                     # Reload lại danh sách để cập nhật trạng thái
                     self._load_devices()
             else:
@@ -322,14 +379,20 @@ class ControllerWidgetsDevice:
                 self._update_status_display("Không thể kết nối")
                 
                 # Cập nhật trạng thái vào database nếu đã lưu
-                if self.current_device_id:
-                    service.update_device_status(self.current_device_id, "Không thể kết nối")
+                if device_id:
+                    service.update_device_status(device_id, "Không thể kết nối")
                     # Reload lại danh sách để cập nhật trạng thái
                     self._load_devices()
 
         except Exception as e:
             log_to_debug(
-                f"ControllerWidgetsDevice: _on_connect_clicked() error: {e}\n{traceback.format_exc()}"
+                f"ControllerWidgetsDevice: _on_connection_tested() error: {e}\n{traceback.format_exc()}"
             )
             # Không hiển thị MessageBox, chỉ cập nhật trạng thái
             self._update_status_display("Lỗi kết nối")
+
+    def _on_connection_test_error(self, error):
+        """Thread test kết nối lỗi ngoài dự kiến"""
+        self.widget.btn_connect.setEnabled(True)
+        log_to_debug(f"ControllerWidgetsDevice: connection test error: {error}")
+        self._update_status_display("Lỗi kết nối")
@@ -1,10 +1,12 @@
 # controllers_widgets_download_attendence.py
 # Controller cho widgets_download_attendence.py
 
+import threading
 import traceback
-from PySide6.QtWidgets import QMessageBox, QTableWidgetItem, QProgressDialog
-from PySide6.QtCore import Qt, QThread, Signal
-from datetime import datetime
+from PySide6.QtWidgets import QMessageBox, QProgressDialog
+from PySide6.QtCore import Qt, QThread, QTimer, Signal
+from datetime import datetime, timedelta
+from functools import partial
 
 
 def log_to_debug(message):
@@ -16,6 +18,10 @@ def log_to_debug(message):
         print(f"[LogError] {e}")
 
 
+from core.database import Database
+from core.threads import BaseWorker, raise_if_cancelled
+
+
 class DownloadThread(QThread):
     """Thread để tải dữ liệu chấm công trong background"""
     progress = Signal(int, str)  # progress value, status message
@@ -26,6 +32,11 @@ class DownloadThread(QThread):
         self.device_id = device_id
         self.from_date = from_date
         self.to_date = to_date
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Yêu cầu dừng: service dừng ở điểm kiểm tra kế tiếp, thread tự kết thúc"""
+        self.cancel_event.set()
     
     def run(self):
         try:
@@ -46,7 +57,8 @@ class DownloadThread(QThread):
                 self.device_id, 
                 self.from_date, 
                 self.to_date,
-                progress_callback
+                progress_callback,
+                cancel_event=self.cancel_event,
             )
             
             # Complete
@@ -56,13 +68,175 @@ class DownloadThread(QThread):
         except Exception as e:
             log_to_debug(f"DownloadThread error: {e}\n{traceback.format_exc()}")
             self.finished_signal.emit(False, f"Lỗi: {str(e)}", 0)
+        finally:
+            # Thread sắp kết thúc: đóng cursor DuckDB của thread
+            Database.release_cursor()
+
+
+class FleetDownloadThread(QThread):
+    """Thread tải dữ liệu chấm công song song từ tất cả thiết bị"""
+    device_progress = Signal(int, int, str)  # device_id, progress value, status message
+    finished_signal = Signal(bool, str, int)  # success, message, count
+
+    # Số thiết bị được tải đồng thời tối đa
+    MAX_WORKERS = 4
+
+    def __init__(self, from_date, to_date):
+        super().__init__()
+        self.from_date = from_date
+        self.to_date = to_date
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Yêu cầu dừng tất cả thiết bị; thread tự kết thúc khi các máy đã dừng"""
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            from services.attendance_raw_services import AttendanceRawService
+
+            service = AttendanceRawService()
+
+            def progress_callback(device_id, progress_value, message):
+                self.device_progress.emit(device_id, progress_value, message)
+
+            success, message, count, _results = service.download_from_devices(
+                None,
+                self.from_date,
+                self.to_date,
+                progress_callback,
+                max_workers=self.MAX_WORKERS,
+                cancel_event=self.cancel_event,
+            )
+            self.finished_signal.emit(success, message, count)
+
+        except Exception as e:
+            log_to_debug(f"FleetDownloadThread error: {e}\n{traceback.format_exc()}")
+            self.finished_signal.emit(False, f"Lỗi: {str(e)}", 0)
+        finally:
+            # Thread sắp kết thúc: đóng cursor DuckDB của thread
+            Database.release_cursor()
+
+
+class DeleteRecordsThread(BaseWorker):
+    """
+    Xóa chấm công trên thread nền riêng: không dùng chung LoadJobRunner của bảng, nên
+    việc nạp lại dữ liệu không hủy được thao tác xóa đang chạy.
+    """
+
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            # Thread sắp kết thúc: đóng cursor DuckDB của thread
+            Database.release_cursor()
+
+    def do_work(self):
+        return self.fn(*self.args)
+
+
+class AttendanceFilterState:
+    """
+    Mô tả:
+        Trạng thái bộ lọc (từ ngày, đến ngày, thiết bị) của màn hình tải chấm công
+        và tập dữ liệu ghép cặp đã nạp (superset) tương ứng.
+        - Khoảng ngày mới nằm trong superset: lọc trong bộ nhớ, không truy vấn.
+        - Khoảng ngày mới nới rộng / nối tiếp superset: chỉ truy vấn phần ngày còn thiếu.
+        - Đổi thiết bị, khoảng ngày rời hoặc superset quá lớn: truy vấn lại toàn bộ.
+    """
+
+    # Superset không giữ quá số ngày này (tránh phình bộ nhớ khi lướt nhiều tháng)
+    MAX_CACHED_DAYS = 93
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """Bỏ superset (sau khi dữ liệu chấm công thay đổi)"""
+        self.device_id = None
+        self.from_date = None
+        self.to_date = None
+        self.columns = None
+
+    def plan(self, from_date, to_date, device_id):
+        """
+        Mô tả:
+            Xác định các khoảng ngày cần truy vấn cho bộ lọc mới.
+        Returns:
+            tuple: (ranges, merge) - ranges: list (từ ngày, đến ngày) cần truy vấn;
+                   merge: True nếu kết quả được gộp vào superset hiện tại
+        """
+        if from_date > to_date:
+            from_date, to_date = to_date, from_date
+        if self.columns is None or device_id != self.device_id:
+            return [(from_date, to_date)], False
+
+        one_day = timedelta(days=1)
+        # Khoảng rời (có ngày trống ở giữa) hoặc superset sau khi gộp quá lớn
+        if from_date > self.to_date + one_day or to_date < self.from_date - one_day:
+            return [(from_date, to_date)], False
+        union_days = (max(to_date, self.to_date) - min(from_date, self.from_date)).days + 1
+        if union_days > self.MAX_CACHED_DAYS:
+            return [(from_date, to_date)], False
+
+        ranges = []
+        if from_date < self.from_date:
+            ranges.append((from_date, self.from_date - one_day))
+        if to_date > self.to_date:
+            ranges.append((self.to_date + one_day, to_date))
+        return ranges, True
+
+    def store(self, from_date, to_date, device_id, columns, merge):
+        """Lưu kết quả truy vấn vào superset (gộp hoặc thay thế)"""
+        if from_date > to_date:
+            from_date, to_date = to_date, from_date
+        if not merge or self.columns is None:
+            self.device_id = device_id
+            self.from_date, self.to_date = from_date, to_date
+            self.columns = columns
+            return
+
+        merged = {name: values + columns[name] for name, values in self.columns.items()}
+        # Giữ thứ tự (mã chấm công, ngày) như truy vấn gốc
+        user_ids, work_dates = merged["user_id"], merged["work_date"]
+        order = sorted(range(len(user_ids)), key=lambda i: (user_ids[i], work_dates[i]))
+        self.columns = {name: [values[i] for i in order] for name, values in merged.items()}
+        self.from_date = min(from_date, self.from_date)
+        self.to_date = max(to_date, self.to_date)
+
+    def slice(self, from_date, to_date):
+        """Các dòng của superset có ngày công trong [from_date, to_date]"""
+        if from_date > to_date:
+            from_date, to_date = to_date, from_date
+        if from_date <= self.from_date and to_date >= self.to_date:
+            return self.columns
+        work_dates = self.columns["work_date"]
+        keep = [i for i, d in enumerate(work_dates) if from_date <= d <= to_date]
+        return {name: [values[i] for i in keep] for name, values in self.columns.items()}
 
 
 class ControllerWidgetsDownloadAttendence:
     """Controller xử lý logic cho widgets_download_attendence.py"""
 
+    # Gộp các thay đổi bộ lọc liên tiếp trong khoảng này thành một lần nạp
+    FILTER_DEBOUNCE_MS = 250
+
     def __init__(self, widget):
         self.widget = widget
+        self.widget.table_model.set_formatter("punch", self._get_punch_text)
+        self.filter_state = AttendanceFilterState()
+        # Chuỗi tìm theo mã / tên NV đang lọc trong SQL ("" = hiển thị cả khoảng ngày)
+        self._search = ""
+        self._filter_timer = QTimer(widget)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(self.FILTER_DEBOUNCE_MS)
+        self._filter_timer.timeout.connect(self._reload_filtered)
+        self.delete_thread = None
         self._connect_signals()
         self._load_devices()
         self._load_attendance_data()
@@ -74,10 +248,10 @@ class ControllerWidgetsDownloadAttendence:
             self.widget.btn_download.clicked.connect(self._on_download_clicked)
             self.widget.btn_clear.clicked.connect(self._on_clear_clicked)
             
-            # Kết nối thay đổi ngày hoặc thiết bị để reload data
-            self.widget.date_from.dateChanged.connect(self._load_attendance_data)
-            self.widget.date_to.dateChanged.connect(self._load_attendance_data)
-            self.widget.combo_device.currentIndexChanged.connect(self._load_attendance_data)
+            # Kết nối thay đổi ngày hoặc thiết bị để reload data (gộp các thay đổi liên tiếp)
+            self.widget.date_from.dateChanged.connect(self._on_filter_changed)
+            self.widget.date_to.dateChanged.connect(self._on_filter_changed)
+            self.widget.combo_device.currentIndexChanged.connect(self._on_filter_changed)
             
             # Kết nối search box
             self.widget.txt_search.textChanged.connect(self._on_search_text_changed)
@@ -115,208 +289,188 @@ class ControllerWidgetsDownloadAttendence:
                 f"ControllerWidgetsDownloadAttendence: _load_devices() error: {e}\n{traceback.format_exc()}"
             )
 
+    def _on_filter_changed(self, *args):
+        """Bộ lọc thay đổi: hẹn giờ nạp lại, thay đổi mới đến trước hạn sẽ dời hạn"""
+        self._filter_timer.start()
+
     def _load_attendance_data(self):
-        """Load dữ liệu chấm công từ database và hiển thị lên bảng"""
+        """Nạp lại toàn bộ (dữ liệu chấm công vừa thay đổi: tải về / xóa)"""
+        self._filter_timer.stop()
+        self.filter_state.clear()
+        self._reload_filtered()
+
+    def _reload_filtered(self):
+        """Load dữ liệu chấm công đã ghép cặp theo ca theo bộ lọc hiện tại và hiển thị lên bảng"""
         try:
             log_to_debug("ControllerWidgetsDownloadAttendence: _load_attendance_data() called")
-            from services.attendance_raw_services import AttendanceRawService
-            from collections import defaultdict
-
-            service = AttendanceRawService()
 
             # Lấy thông tin filter
             from_date = self.widget.date_from.date().toPython()
             to_date = self.widget.date_to.date().toPython()
             device_id = self.widget.combo_device.currentData()
 
-            # Load dữ liệu
-            records = service.get_all_records(from_date, to_date, device_id)
-
-            # Log để debug
-            log_to_debug(f"Filter: from_date={from_date}, to_date={to_date}, device_id={device_id}")
-            log_to_debug(f"Total records loaded: {len(records)}")
-            
-            if len(records) > 0:
-                log_to_debug(f"Sample record: {records[0]}")
-            
-            # Nhóm dữ liệu theo user_id và ngày, lưu tất cả các bản ghi
-            grouped_data = defaultdict(lambda: {
-                "user_name": "",
-                "date": "",
-                "records": [],  # Lưu tất cả records để ghép cặp
-                "punch": "",
-                "uid": ""
-            })
-            
-            for record in records:
-                timestamp = record["timestamp"]
-                if isinstance(timestamp, str):
-                    from datetime import datetime
-                    timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                
-                user_id = str(record["user_id"])
-                date_str = timestamp.strftime("%d/%m/%Y")
-                time_str = timestamp.strftime("%H:%M")
-                status = record.get("status", 0)
-                
-                key = f"{user_id}_{date_str}"
-                
-                # Lưu thông tin cơ bản
-                grouped_data[key]["user_name"] = record.get("user_name", "")
-                grouped_data[key]["date"] = date_str
-                grouped_data[key]["punch"] = self._get_punch_text(record.get("punch", 0))
-                grouped_data[key]["uid"] = str(record.get("uid", ""))
-                
-                # Lưu tất cả bản ghi với timestamp, time_str và status
-                grouped_data[key]["records"].append({
-                    "timestamp": timestamp,
-                    "time_str": time_str,
-                    "status": status,
-                    "record_id": record.get("id")
-                })
-
-            # Clear bảng
-            self.widget.table.setSortingEnabled(False)  # Tắt sorting khi load data
-            self.widget.table.setRowCount(0)
-
-            # Thêm dữ liệu vào bảng
-            for key in sorted(grouped_data.keys()):
-                data = grouped_data[key]
-                user_id = key.split("_")[0]
-                
-                # Sắp xếp tất cả records theo thời gian
-                sorted_records = sorted(data["records"], key=lambda x: x["timestamp"])
-                
-                # Tách riêng giờ vào và giờ ra THEO THỜI GIAN (không dùng status vì máy không phân biệt)
-                in_times = []  # [(time_str, record_id)] - Giờ sáng (< 12:00)
-                out_times = []  # [(time_str, record_id)] - Giờ chiều (>= 12:00)
-                
-                for rec in sorted_records:
-                    # Phân loại theo thời gian: sáng = vào, chiều/tối = ra
-                    hour = rec["timestamp"].hour
-                    if hour < 12:  # Sáng (00:00 - 11:59) = Giờ vào
-                        in_times.append((rec["time_str"], rec["record_id"]))
-                    else:  # Chiều/Tối (12:00 - 23:59) = Giờ ra
-                        out_times.append((rec["time_str"], rec["record_id"]))
-                
-                # Lấy tối đa 3 giờ vào và 3 giờ ra (mới nhất)
-                in_times = in_times[-3:] if len(in_times) > 3 else in_times
-                out_times = out_times[-3:] if len(out_times) > 3 else out_times
-                
-                # Debug log
-                log_to_debug(f"User {user_id} on {data['date']}: in_times={len(in_times)}, out_times={len(out_times)}")
-                
-                # Tạo pairs để hiển thị (không cần ghép chặt chẽ)
-                pairs = []
-                max_len = max(len(in_times), len(out_times))
-                all_record_ids = []
-                
-                for i in range(max_len):
-                    in_time = in_times[i][0] if i < len(in_times) else ""
-                    in_id = in_times[i][1] if i < len(in_times) else None
-                    out_time = out_times[i][0] if i < len(out_times) else ""
-                    out_id = out_times[i][1] if i < len(out_times) else None
-                    
-                    pairs.append((in_time, out_time))
-                    if in_id:
-                        all_record_ids.append(in_id)
-                    if out_id:
-                        all_record_ids.append(out_id)
-                
-                row = self.widget.table.rowCount()
-                self.widget.table.insertRow(row)
-
-                # Cột 0: Mã NV (format 5 số)
-                formatted_user_id = user_id.zfill(5)  # Thêm số 0 đằng trước để đủ 5 số
-                item = QTableWidgetItem(formatted_user_id)
-                self.widget.table.setItem(row, 0, item)
-
-                # Cột 1: Tên NV
-                item = QTableWidgetItem(data["user_name"])
-                self.widget.table.setItem(row, 1, item)
-
-                # Cột 2: Ngày
-                item = QTableWidgetItem(data["date"])
-                self.widget.table.setItem(row, 2, item)
-
-                # Cặp 1: Giờ vào 1, Giờ ra 1
-                item = QTableWidgetItem(pairs[0][0] if len(pairs) > 0 else "")
-                self.widget.table.setItem(row, 3, item)
-                
-                item = QTableWidgetItem(pairs[0][1] if len(pairs) > 0 else "")
-                self.widget.table.setItem(row, 4, item)
-
-                # Cặp 2: Giờ vào 2, Giờ ra 2
-                item = QTableWidgetItem(pairs[1][0] if len(pairs) > 1 else "")
-                self.widget.table.setItem(row, 5, item)
-                
-                item = QTableWidgetItem(pairs[1][1] if len(pairs) > 1 else "")
-                self.widget.table.setItem(row, 6, item)
+            if self._search:
+                # Tìm nhân viên: lọc ngay trong truy vấn, chỉ đọc / ghép cặp dòng của
+                # nhân viên khớp; kết quả không gộp vào dữ liệu cả khoảng ngày đã nạp
+                self.widget.load_jobs.submit(
+                    "pairs",
+                    self._fetch_attendance_data,
+                    self._show_pairs,
+                    [(min(from_date, to_date), max(from_date, to_date))],
+                    device_id,
+                    self._search,
+                )
+                return
 
-                # Cặp 3: Giờ vào 3, Giờ ra 3
-                item = QTableWidgetItem(pairs[2][0] if len(pairs) > 2 else "")
-                self.widget.table.setItem(row, 7, item)
-                
-                item = QTableWidgetItem(pairs[2][1] if len(pairs) > 2 else "")
-                self.widget.table.setItem(row, 8, item)
+            ranges, merge = self.filter_state.plan(from_date, to_date, device_id)
+            log_to_debug(
+                f"Filter: from_date={from_date}, to_date={to_date}, device_id={device_id}, "
+                f"fetch={ranges}, merge={merge}"
+            )
 
-                # Cột 9: Vân tay
-                item = QTableWidgetItem(data["punch"])
-                self.widget.table.setItem(row, 9, item)
+            if not ranges:
+                # Nằm trong dữ liệu đã nạp: lọc trong bộ nhớ, bỏ request đang chờ (nếu có)
+                self.widget.load_jobs.cancel("pairs")
+                self._show_pairs(self.filter_state.slice(from_date, to_date))
+                return
 
-                # Cột 10: Mã chấm công (UID)
-                item = QTableWidgetItem(data["uid"])
-                self.widget.table.setItem(row, 10, item)
-                
-                # Lưu record_ids vào row để xóa sau này
-                if len(all_record_ids) > 0:
-                    first_item = self.widget.table.item(row, 0)
-                    if first_item:
-                        first_item.setData(Qt.UserRole, all_record_ids)
-                        log_to_debug(f"Saved {len(all_record_ids)} record_ids to row {row}")
-
-            log_to_debug(f"ControllerWidgetsDownloadAttendence: Loaded {len(grouped_data)} grouped records")
-            
-            # Bật lại sorting sau khi load xong
-            self.widget.table.setSortingEnabled(True)
+            # Đổi filter liên tục: chỉ kết quả của request mới nhất được hiển thị
+            self.widget.load_jobs.submit(
+                "pairs",
+                self._fetch_attendance_data,
+                partial(self._apply_attendance_data, from_date, to_date, device_id, merge),
+                ranges,
+                device_id,
+            )
 
         except Exception as e:
             log_to_debug(
                 f"ControllerWidgetsDownloadAttendence: _load_attendance_data() error: {e}\n{traceback.format_exc()}"
             )
 
+    @staticmethod
+    def _fetch_attendance_data(ranges, device_id, search=""):
+        """Chạy trên thread nền: ghép cặp giờ vào/ra theo ca cho các khoảng ngày cần nạp"""
+        from services.attendance_pairing_services import AttendancePairingService
+
+        service = AttendancePairingService()
+        pairs = None
+        for from_date, to_date in ranges:
+            raise_if_cancelled()
+            part = service.get_punch_pairs(from_date, to_date, device_id, search)
+            if pairs is None:
+                pairs = part
+            else:
+                for name, values in part.items():
+                    pairs[name].extend(values)
+        return pairs
+
+    def _apply_attendance_data(self, from_date, to_date, device_id, merge, pairs):
+        """Gộp kết quả vào dữ liệu đã nạp và hiển thị (GUI thread)"""
+        self.filter_state.store(from_date, to_date, device_id, pairs, merge)
+        self._show_pairs(self.filter_state.slice(from_date, to_date))
+
+    def _show_pairs(self, pairs):
+        # Model chỉ giữ tham chiếu tới các list; ô được định dạng khi hiển thị,
+        # bộ lọc tìm kiếm và cột đang sắp xếp được áp dụng lại trong model
+        self.widget.table_model.set_columns(pairs)
+
+        log_to_debug(
+            f"ControllerWidgetsDownloadAttendence: Loaded {len(pairs['user_id'])} paired rows"
+        )
+
+    def _submit_delete(self, fn, on_done, *args):
+        """Chạy thao tác xóa trên thread nền riêng; nút Xóa bị khóa tới khi xóa xong"""
+        if self.delete_thread is not None and self.delete_thread.isRunning():
+            return
+        self.widget.btn_clear.setEnabled(False)
+        try:
+            self.delete_thread = DeleteRecordsThread(fn, *args)
+            self.delete_thread.finished.connect(partial(self._on_delete_done, on_done))
+            self.delete_thread.error.connect(self._on_delete_error)
+            self.delete_thread.start()
+        except Exception:
+            self.widget.btn_clear.setEnabled(True)
+            raise
+
+    def _on_delete_done(self, on_done, result):
+        """Xóa xong (GUI thread): xử lý kết quả, luôn mở lại nút Xóa"""
+        try:
+            on_done(result)
+        except Exception as e:
+            log_to_debug(
+                f"ControllerWidgetsDownloadAttendence: _on_delete_done() error: {e}\n{traceback.format_exc()}"
+            )
+        finally:
+            self.widget.btn_clear.setEnabled(True)
+
+    @staticmethod
+    def _delete_records(record_ids):
+        """Chạy trên thread nền: xóa các bản ghi đã chọn trong một transaction"""
+        from services.attendance_raw_services import AttendanceRawService
+
+        return AttendanceRawService().delete_records_by_ids(record_ids)
+
+    @staticmethod
+    def _delete_all_records():
+        """Chạy trên thread nền: xóa toàn bộ dữ liệu chấm công"""
+        from services.attendance_raw_services import AttendanceRawService
+
+        return AttendanceRawService().delete_all_records()
+
+    def _on_records_deleted(self, row_count, result):
+        """Xóa các dòng đã chọn xong (GUI thread)"""
+        success, message, deleted_count = result
+        log_to_debug(f"Deleted {deleted_count} records from {row_count} rows")
+        if success:
+            QMessageBox.information(
+                self.widget,
+                "Thành công",
+                f"Đã xóa {deleted_count} bản ghi chấm công (từ {row_count} dòng được chọn)",
+            )
+            self._load_attendance_data()
+        else:
+            QMessageBox.warning(self.widget, "Lỗi", message)
+
+    def _on_all_records_deleted(self, result):
+        """Xóa toàn bộ xong (GUI thread)"""
+        success, message, deleted_count = result
+        log_to_debug(f"Deleted all records: {deleted_count}")
+        if success:
+            QMessageBox.information(self.widget, "Thành công", message)
+            self._load_attendance_data()
+        else:
+            QMessageBox.warning(self.widget, "Lỗi", message)
+
+    def _on_delete_error(self, error):
+        try:
+            log_to_debug(f"ControllerWidgetsDownloadAttendence: delete error: {error}")
+            QMessageBox.critical(self.widget, "Lỗi", f"Đã xảy ra lỗi: {str(error)}")
+        finally:
+            self.widget.btn_clear.setEnabled(True)
+
     def _on_search_text_changed(self, text):
-        """Xử lý khi text search thay đổi - Tìm theo mã NV, tên NV, và ngày"""
+        """
+        Xử lý khi text search thay đổi:
+        - Mã NV / tên NV: tìm trong SQL (gộp các lần gõ liên tiếp như bộ lọc ngày)
+        - Ngày (dd/mm/yyyy): lọc trong model trên dữ liệu đang hiển thị
+        """
         try:
             search_text = text.strip()
-            
-            # Nếu search text là số, format thành 5 số để tìm mã NV
-            search_formatted = search_text.zfill(5) if search_text.isdigit() else search_text
-            
-            # Chuyển thành lowercase để so sánh không phân biệt hoa thường
-            search_lower = search_formatted.lower()
-            
-            # Duyệt qua tất cả các rows và ẩn/hiện theo search
-            visible_count = 0
-            for row in range(self.widget.table.rowCount()):
-                # Lấy mã NV, tên NV, và ngày
-                ma_nv_item = self.widget.table.item(row, 0)
-                ten_nv_item = self.widget.table.item(row, 1)
-                ngay_item = self.widget.table.item(row, 2)
-                
-                ma_nv = ma_nv_item.text().lower() if ma_nv_item else ""
-                ten_nv = ten_nv_item.text().lower() if ten_nv_item else ""
-                ngay = ngay_item.text().lower() if ngay_item else ""
-                
-                # Hiện row nếu match với search text (tìm trong mã NV, tên NV, hoặc ngày)
-                if search_text == "" or search_lower in ma_nv or search_lower in ten_nv or search_lower in ngay:
-                    self.widget.table.setRowHidden(row, False)
-                    visible_count += 1
-                else:
-                    self.widget.table.setRowHidden(row, True)
-            
-            log_to_debug(f"Search '{search_text}': {visible_count} rows visible (mã NV/tên NV/ngày)")
-                    
+            model = self.widget.table_model
+
+            if "/" in search_text:
+                model.set_filter(search_text, keys=["work_date"])
+                search_text = ""
+            else:
+                model.set_filter()
+
+            if search_text != self._search:
+                self._search = search_text
+                self._filter_timer.start()
+
+            log_to_debug(f"Search '{text.strip()}': sql={self._search!r}, {model.total_count()} rows visible")
+
         except Exception as e:
             log_to_debug(f"_on_search_text_changed error: {e}")
 
@@ -349,15 +503,7 @@ class ControllerWidgetsDownloadAttendence:
         try:
             log_to_debug("ControllerWidgetsDownloadAttendence: Download button clicked")
 
-            # Kiểm tra đã chọn thiết bị chưa
             device_id = self.widget.combo_device.currentData()
-            if device_id is None:
-                QMessageBox.warning(
-                    self.widget,
-                    "Cảnh báo",
-                    "Vui lòng chọn một thiết bị cụ thể để tải dữ liệu"
-                )
-                return
 
             # Lấy khoảng ngày
             from_date = self.widget.date_from.date().toPython()
@@ -365,46 +511,18 @@ class ControllerWidgetsDownloadAttendence:
 
             # Disable button
             self.widget.btn_download.setEnabled(False)
+            self.download_cancelled = False
 
-            # Tạo progress dialog
-            self.progress_dialog = QProgressDialog(
-                "Đang chuẩn bị...", 
-                "Hủy", 
-                0, 
-                100, 
-                self.widget
-            )
-            self.progress_dialog.setWindowTitle("Tải dữ liệu chấm công")
-            self.progress_dialog.setWindowModality(Qt.WindowModal)
-            self.progress_dialog.setMinimumDuration(0)
-            self.progress_dialog.setAutoClose(True)
-            self.progress_dialog.setAutoReset(False)
-            self.progress_dialog.canceled.connect(self._on_download_canceled)
-            
-            # Style cho progress dialog
-            self.progress_dialog.setStyleSheet(
-                """
-                QProgressDialog {
-                    min-width: 400px;
-                    min-height: 120px;
-                }
-                QProgressBar {
-                    border: 2px solid #d0d0d0;
-                    border-radius: 5px;
-                    text-align: center;
-                    background: #f0f0f0;
-                }
-                QProgressBar::chunk {
-                    background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                        stop:0 #4CAF50, stop:1 #8BC34A);
-                    border-radius: 3px;
-                }
-                QPushButton {
-                    min-width: 80px;
-                    padding: 5px 15px;
-                }
-                """
-            )
+            self._create_progress_dialog()
+
+            # "Tất cả thiết bị": tải song song từ toàn bộ thiết bị
+            if device_id is None:
+                self.fleet_progress = {}
+                self.download_thread = FleetDownloadThread(from_date, to_date)
+                self.download_thread.device_progress.connect(self._on_device_progress)
+                self.download_thread.finished_signal.connect(self._on_download_finished)
+                self.download_thread.start()
+                return
 
             # Tạo và khởi động thread
             self.download_thread = DownloadThread(device_id, from_date, to_date)
@@ -419,6 +537,47 @@ class ControllerWidgetsDownloadAttendence:
             self.widget.btn_download.setEnabled(True)
             QMessageBox.critical(self.widget, "Lỗi", f"Đã xảy ra lỗi: {str(e)}")
 
+    def _create_progress_dialog(self):
+        """Tạo progress dialog cho quá trình tải dữ liệu"""
+        self.progress_dialog = QProgressDialog(
+            "Đang chuẩn bị...", 
+            "Hủy", 
+            0, 
+            100, 
+            self.widget
+        )
+        self.progress_dialog.setWindowTitle("Tải dữ liệu chấm công")
+        self.progress_dialog.setWindowModality(Qt.WindowModal)
+        self.progress_dialog.setMinimumDuration(0)
+        self.progress_dialog.setAutoClose(True)
+        self.progress_dialog.setAutoReset(False)
+        self.progress_dialog.canceled.connect(self._on_download_canceled)
+        
+        # Style cho progress dialog
+        self.progress_dialog.setStyleSheet(
+            """
+            QProgressDialog {
+                min-width: 400px;
+                min-height: 120px;
+            }
+            QProgressBar {
+                border: 2px solid #d0d0d0;
+                border-radius: 5px;
+                text-align: center;
+                background: #f0f0f0;
+            }
+            QProgressBar::chunk {
+                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+                    stop:0 #4CAF50, stop:1 #8BC34A);
+                border-radius: 3px;
+            }
+            QPushButton {
+                min-width: 80px;
+                padding: 5px 15px;
+            }
+            """
+        )
+
     def _on_download_progress(self, value, message):
         """Cập nhật progress dialog"""
         try:
@@ -428,17 +587,45 @@ class ControllerWidgetsDownloadAttendence:
         except Exception as e:
             log_to_debug(f"_on_download_progress error: {e}")
 
+    def _on_device_progress(self, device_id, value, message):
+        """Cập nhật progress dialog khi tải song song nhiều thiết bị"""
+        try:
+            self.fleet_progress[device_id] = (value, message)
+            if not (hasattr(self, 'progress_dialog') and self.progress_dialog):
+                return
+
+            # Tiến độ chung = trung bình tiến độ của các thiết bị
+            device_count = max(self.widget.combo_device.count() - 1, len(self.fleet_progress), 1)
+            total = sum(v for v, _ in self.fleet_progress.values())
+            self.progress_dialog.setValue(min(99, total // device_count))
+
+            lines = []
+            for index in range(1, self.widget.combo_device.count()):
+                item_id = self.widget.combo_device.itemData(index)
+                if item_id in self.fleet_progress:
+                    item_value, item_message = self.fleet_progress[item_id]
+                    name = self.widget.combo_device.itemText(index).split(" (")[0]
+                    lines.append(f"{name}: {item_value}% - {item_message}")
+            self.progress_dialog.setLabelText("\n".join(lines))
+        except Exception as e:
+            log_to_debug(f"_on_device_progress error: {e}")
+
     def _on_download_finished(self, success, message, count):
         """Xử lý khi download hoàn tất"""
         try:
-            # Đóng progress dialog
-            if hasattr(self, 'progress_dialog') and self.progress_dialog:
-                self.progress_dialog.close()
-                self.progress_dialog = None
+            # Đóng progress dialog (không tính là người dùng hủy)
+            self._close_progress_dialog()
 
             # Enable button
             self.widget.btn_download.setEnabled(True)
 
+            # Người dùng đã hủy: không báo lỗi, chỉ nạp lại phần dữ liệu đã lưu
+            if getattr(self, "download_cancelled", False):
+                self.download_cancelled = False
+                if count:
+                    self._load_attendance_data()
+                return
+
             # Hiển thị kết quả
             if success:
                 QMessageBox.information(self.widget, "Thành công", message)
@@ -446,18 +633,38 @@ class ControllerWidgetsDownloadAttendence:
                 self._load_attendance_data()
             else:
                 QMessageBox.warning(self.widget, "Lỗi", message)
+                # Tải nhiều thiết bị có thể lỗi một phần nhưng vẫn có dữ liệu mới
+                if count:
+                    self._load_attendance_data()
 
         except Exception as e:
             log_to_debug(f"_on_download_finished error: {e}\n{traceback.format_exc()}")
 
+    def _close_progress_dialog(self):
+        """
+        Đóng progress dialog sau khi tải xong. close() cũng phát canceled nên phải
+        ngắt kết nối trước, để chỉ nút Hủy của người dùng mới được tính là hủy.
+        """
+        dialog = getattr(self, "progress_dialog", None)
+        self.progress_dialog = None
+        if dialog is None:
+            return
+        try:
+            dialog.canceled.disconnect(self._on_download_canceled)
+        except (RuntimeError, TypeError):
+            pass
+        dialog.close()
+
     def _on_download_canceled(self):
-        """Xử lý khi người dùng hủy download"""
+        """
+        Xử lý khi người dùng hủy download: hủy hợp tác (không terminate thread), thread
+        thoát phiên kết nối và transaction bình thường rồi phát finished_signal;
+        nút Tải được bật lại trong _on_download_finished.
+        """
         try:
             if hasattr(self, 'download_thread') and self.download_thread:
-                self.download_thread.terminate()
-                self.download_thread.wait()
-            
-            self.widget.btn_download.setEnabled(True)
+                self.download_cancelled = True
+                self.download_thread.cancel()
             log_to_debug("Download canceled by user")
         except Exception as e:
             log_to_debug(f"_on_download_canceled error: {e}")
@@ -484,42 +691,23 @@ class ControllerWidgetsDownloadAttendence:
                 )
                 
                 if reply == QMessageBox.Yes:
-                    from services.attendance_raw_services import AttendanceRawService
-                    service = AttendanceRawService()
-                    
-                    deleted_count = 0
-                    total_record_ids = 0
-                    
+                    # Gom record_ids của mọi dòng được chọn, xóa một lần trên thread nền
+                    record_ids = []
                     for index in selected_rows:
-                        row = index.row()
-                        log_to_debug(f"Processing row {row}")
-                        
-                        # Lấy record_ids từ item
-                        first_item = self.widget.table.item(row, 0)
-                        if first_item:
-                            record_ids = first_item.data(Qt.UserRole)
-                            log_to_debug(f"Row {row} has record_ids: {record_ids}")
-                            
-                            if record_ids:
-                                # Xóa từng record
-                                for record_id in record_ids:
-                                    if record_id:  # Kiểm tra record_id không None
-                                        total_record_ids += 1
-                                        if service.delete_record_by_id(record_id):
-                                            deleted_count += 1
-                                            log_to_debug(f"Deleted record_id: {record_id}")
-                        else:
-                            log_to_debug(f"Row {row} has no item at column 0")
-                    
-                    log_to_debug(f"Total record_ids: {total_record_ids}, Deleted: {deleted_count}")
-                    
-                    QMessageBox.information(
-                        self.widget, 
-                        "Thành công", 
-                        f"Đã xóa {deleted_count} bản ghi chấm công (từ {len(selected_rows)} dòng được chọn)"
+                        record_ids.extend(
+                            record_id
+                            for record_id in (
+                                self.widget.table_model.value(index.row(), "record_ids") or ()
+                            )
+                            if record_id
+                        )
+                    log_to_debug(f"Total record_ids: {len(record_ids)}")
+
+                    self._submit_delete(
+                        self._delete_records,
+                        partial(self._on_records_deleted, len(selected_rows)),
+                        record_ids,
                     )
-                    # Reload dữ liệu
-                    self._load_attendance_data()
             else:
                 # Không có row nào được chọn -> xóa toàn bộ
                 reply = QMessageBox.question(
@@ -532,17 +720,7 @@ class ControllerWidgetsDownloadAttendence:
                 )
 
                 if reply == QMessageBox.Yes:
-                    from services.attendance_raw_services import AttendanceRawService
-
-                    service = AttendanceRawService()
-                    success, message = service.delete_all_records()
-
-                    if success:
-                        QMessageBox.information(self.widget, "Thành công", message)
-                        # Reload dữ liệu
-                        self._load_attendance_data()
-                    else:
-                        QMessageBox.warning(self.widget, "Lỗi", message)
+                    self._submit_delete(self._delete_all_records, self._on_all_records_deleted)
 
         except Exception as e:
             log_to_debug(
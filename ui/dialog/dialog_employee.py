@@ -454,6 +454,8 @@ class DialogEmployeeAdd(DialogEmployeeBase):
     def __init__(self, parent=None):
         super().__init__(parent, title="Thêm Nhân Viên Mới")
         log_to_debug("DialogEmployeeAdd: Khởi tạo")
+        # Id nhân viên vừa thêm (để bảng nhân viên cập nhật đúng một dòng)
+        self.employee_id = None
         self.btn_save.clicked.connect(self._on_save)
 
     def _on_save(self):
@@ -494,7 +496,7 @@ class DialogEmployeeAdd(DialogEmployeeBase):
             phone_number = self.edit_phone.text().strip() or None
             emergency_contact = self.edit_emergency.text().strip() or None
 
-            self.employee_service.add_employee(
+            self.employee_id = self.employee_service.add_employee(
                 name=name,
                 department_id=dept_id,
                 job_title_id=job_id,
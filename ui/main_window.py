@@ -77,22 +77,52 @@ class MainWindow(QMainWindow):
         self.footer = WidgetsFooter()
         main_layout.addWidget(self.footer)
 
-    def set_main_content(self, widget):
-        """Thay thế nội dung chính bằng widget mới"""
-        # Xóa widget cũ trong main_content (nếu có)
-        layout = self.main_content.layout()
-        if layout is not None:
-            while layout.count():
-                child = layout.takeAt(0)
-                if child.widget():
-                    child.widget().setParent(None)
-        else:
-            from PySide6.QtWidgets import QVBoxLayout
+    def set_main_content(self, widget, keep_alive=False):
+        """
+        Mô tả:
+            Hiển thị widget ở vùng nội dung chính.
+            Các widget nằm chung một QStackedWidget: chuyển màn hình chỉ đổi widget
+            đang hiện, widget keep_alive=True được giữ lại để lần sau hiện ngay.
+            Widget không giữ lại sẽ bị hủy khi chuyển sang màn hình khác.
+        Args:
+            widget: Widget cần hiển thị
+            keep_alive: Giữ widget trong vùng nội dung sau khi chuyển đi
+        """
+        stack = self._content_stack()
+        previous = stack.currentWidget()
+        if stack.indexOf(widget) < 0:
+            stack.addWidget(widget)
+        widget.setProperty("keep_alive", keep_alive)
+        stack.setCurrentWidget(widget)
+
+        if previous is not None and previous is not widget and not previous.property("keep_alive"):
+            stack.removeWidget(previous)
+            previous.deleteLater()
+
+    def add_main_content(self, widget):
+        """Đưa widget (dựng sẵn chạy ngầm) vào vùng nội dung chính mà không hiển thị"""
+        stack = self._content_stack()
+        if stack.indexOf(widget) < 0:
+            widget.setProperty("keep_alive", True)
+            stack.addWidget(widget)
+
+    def _content_stack(self):
+        """Trả về QStackedWidget chứa các màn hình, tạo lần đầu khi cần"""
+        stack = getattr(self, "_stack", None)
+        if stack is None:
+            from PySide6.QtWidgets import QStackedWidget
 
             layout = QVBoxLayout(self.main_content)
             layout.setContentsMargins(0, 0, 0, 0)
             layout.setSpacing(0)
-        layout.addWidget(widget)
+            stack = QStackedWidget(self.main_content)
+            # Trang trống đứng đầu: widget dựng ngầm không tự hiện ra khi chưa chọn màn hình
+            blank = QWidget(stack)
+            blank.setProperty("keep_alive", True)
+            stack.addWidget(blank)
+            layout.addWidget(stack)
+            self._stack = stack
+        return stack
 
     def connect_company_icon_signal(self, company_controller):
         """Được gọi từ DialogCompany để kết nối signal icon_changed vào MainWindow"""
@@ -32,6 +32,9 @@ from core.resource import (
     ACTIVE,
     HOVER_ROW,
 )
+from core.threads import LoadJobRunner
+from ui.common.change_relay import ChangeBatcher
+from ui.common.loading_overlay import LoadingOverlay
 
 # Cấu hình logging
 logging.basicConfig(
@@ -207,6 +210,10 @@ class WidgetsDepartment(QWidget):
         content_layout.addWidget(self.notes, 1)
         main_layout.addWidget(content, 1)
 
+        # Nạp dữ liệu chạy nền, lớp phủ "Đang tải" che cây trong lúc chờ
+        self.load_jobs = LoadJobRunner(self)
+        self.loading_overlay = LoadingOverlay(self.tree, self.load_jobs)
+
         # Kết nối sự kiện
         self._connect_actions()
         self._load_data()
@@ -221,6 +228,10 @@ class WidgetsDepartment(QWidget):
         from services.department_services import DepartmentService
 
         self.service = DepartmentService()
+        # Phòng ban thay đổi ở bất kỳ đâu (dialog, màn hình khác) thì dựng lại cây
+        self.change_batcher = ChangeBatcher(
+            self, ("department",), lambda changes: self._load_data()
+        )
 
         def on_add():
             # Lấy node đang chọn làm phòng ban cha mặc định
@@ -229,8 +240,8 @@ class WidgetsDepartment(QWidget):
             if cur:
                 default_parent_id = cur.data(0, Qt.UserRole)
             dlg = DialogDepartmentAdd(self, default_parent_id=default_parent_id)
-            if dlg.exec():
-                self._load_data()
+            # Cây được dựng lại khi nhận sự kiện thay đổi (change_batcher)
+            dlg.exec()
 
         def on_edit():
             item = self.tree.currentItem()
@@ -241,8 +252,7 @@ class WidgetsDepartment(QWidget):
             dlg = DialogDepartmentEdit(
                 self, dep_id=dep_id, suggested_parent_id=suggested_parent_id
             )
-            if dlg.exec():
-                self._load_data()
+            dlg.exec()
 
         def on_delete():
             item = self.tree.currentItem()
@@ -252,17 +262,24 @@ class WidgetsDepartment(QWidget):
             # Sử dụng tên thuần không có prefix ASCII
             dep_name = item.data(0, Qt.UserRole + 1) or item.text(0)
             dlg = DialogDepartmentDelete(self, dep_id=dep_id, dep_name=dep_name)
-            if dlg.exec():
-                self._load_data()
+            dlg.exec()
 
         self.btn_add.clicked.connect(on_add)
         self.btn_edit.clicked.connect(on_edit)
         self.btn_delete.clicked.connect(on_delete)
 
     def _load_data(self):
+        # Truy vấn chạy nền, cây được dựng lại khi có kết quả
+        self.load_jobs.submit("departments", self._fetch_data, self._apply_data, self.service)
+
+    @staticmethod
+    def _fetch_data(service):
+        return service.get_all_departments(), service.count()
+
+    def _apply_data(self, data):
         try:
+            flat, total = data
             self.tree.clear()
-            flat = self.service.get_all_departments()
             # Map cha->con
             by_parent = {}
             for n in flat:
@@ -295,7 +312,9 @@ class WidgetsDepartment(QWidget):
             # Hiển thị root cũng theo dạng nhánh
             build(None, None, "")
             self.tree.expandAll()
-            self.lbl_total.setText(f"Tổng: {self.service.count()}")
+            self.lbl_total.setText(f"Tổng: {total}")
+            if self.filter_input.text():
+                self._apply_filter(self.filter_input.text())
         except Exception:
             pass
 
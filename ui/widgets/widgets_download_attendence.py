@@ -7,9 +7,8 @@ from PySide6.QtWidgets import (
     QVBoxLayout,
     QHBoxLayout,
     QLabel,
-    QTableWidget,
+    QTableView,
     QHeaderView,
-    QTableWidgetItem,
     QAbstractItemView,
     QFrame,
     QPushButton,
@@ -35,6 +34,9 @@ from core.resource import (
     ODD_ROW_BG,
     EVEN_ROW_BG,
 )
+from core.threads import LoadJobRunner
+from ui.common.columnar_table_model import ColumnarTableModel
+from ui.common.loading_overlay import LoadingOverlay
 
 # Cấu hình logging
 logging.basicConfig(
@@ -65,6 +67,10 @@ class WidgetsDownloadAttendence(QWidget):
         self.main = self._create_main()
         main_layout.addWidget(self.main, 1)
 
+        # Nạp dữ liệu chạy nền, lớp phủ "Đang tải" che bảng trong lúc chờ
+        self.load_jobs = LoadJobRunner(self)
+        self.loading_overlay = LoadingOverlay(self.table, self.load_jobs)
+
         # Khởi tạo controller
         from ui.controllers.controllers_widgets_download_attendence import (
             ControllerWidgetsDownloadAttendence,
@@ -422,32 +428,49 @@ class WidgetsDownloadAttendence(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
 
+        # Model dạng cột: chỉ các dòng đang hiển thị mới được định dạng / vẽ
+        self.table_model = ColumnarTableModel(
+            [
+                ("Mã NV", "user_id"),
+                ("Tên NV", "user_name"),
+                ("Ngày", "work_date"),
+                ("Giờ vào 1", "in_1"),
+                ("Giờ ra 1", "out_1"),
+                ("Giờ vào 2", "in_2"),
+                ("Giờ ra 2", "out_2"),
+                ("Giờ vào 3", "in_3"),
+                ("Giờ ra 3", "out_3"),
+                ("Vân tay", "punch"),
+                ("Mã chấm công", "uid"),
+            ],
+            formatters={
+                "user_id": lambda v: str(v).zfill(5),
+                "work_date": lambda v: v.strftime("%d/%m/%Y"),
+                "in_1": self._format_time,
+                "out_1": self._format_time,
+                "in_2": self._format_time,
+                "out_2": self._format_time,
+                "in_3": self._format_time,
+                "out_3": self._format_time,
+            },
+            search_keys=["user_id", "user_name", "work_date"],
+            # Mã NV là chuỗi: sắp theo dạng 5 số như khi hiển thị
+            sort_keys={"user_id": lambda v: str(v).zfill(5)},
+            parent=self,
+        )
+
         # Tạo bảng với các cột
-        self.table = QTableWidget(0, 11)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)  # Cho phép chọn nhiều rows
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.setFocusPolicy(Qt.NoFocus)
         self.table.setMouseTracking(True)
         
-        # Bật sắp xếp
+        # Bật sắp xếp (model tự sắp xếp trên giá trị gốc)
         self.table.setSortingEnabled(True)
 
-        # Đặt tiêu đề cột
-        self.table.setHorizontalHeaderLabels([
-            "Mã NV",
-            "Tên NV", 
-            "Ngày",
-            "Giờ vào 1",
-            "Giờ ra 1",
-            "Giờ vào 2",
-            "Giờ ra 2",
-            "Giờ vào 3",
-            "Giờ ra 3",
-            "Vân tay",
-            "Mã chấm công"
-        ])
-        
         self.table.horizontalHeader().setStyleSheet(
             f"font-weight: {FONT_WEIGHT_BOLD}; font-size: 14px; background: #f8f9fa; padding: 8px;"
         )
@@ -477,21 +500,21 @@ class WidgetsDownloadAttendence(QWidget):
         # Style cho bảng
         self.table.setStyleSheet(
             f"""
-            QTableWidget {{
+            QTableView {{
                 font-size: 13px;
                 gridline-color: #e0e0e0;
                 background: {EVEN_ROW_BG};
                 alternate-background-color: {ODD_ROW_BG};
                 border: none;
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 8px;
                 border: none;
             }}
-            QTableWidget::item:hover {{
+            QTableView::item:hover {{
                 background: {HOVER_ROW};
             }}
-            QTableWidget::item:selected {{
+            QTableView::item:selected {{
                 background: {ACTIVE};
                 color: black;
             }}
@@ -502,4 +525,9 @@ class WidgetsDownloadAttendence(QWidget):
         layout.addWidget(self.table)
         return panel
 
+    @staticmethod
+    def _format_time(value):
+        """Định dạng giờ chấm công HH:MM"""
+        return value.strftime("%H:%M")
+
 
@@ -9,8 +9,8 @@ from PySide6.QtWidgets import (
     QTreeWidget,
     QTreeWidgetItem,
     QFrame,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
+    QAbstractItemView,
     QHeaderView,
     QSizePolicy,
 )
@@ -41,6 +41,12 @@ from core.resource import (
     ODD_ROW_BG,
     EVEN_ROW_BG,
 )
+from functools import partial
+
+from core.threads import LoadJobRunner, raise_if_cancelled
+from ui.common.change_relay import ChangeBatcher
+from ui.common.columnar_table_model import ColumnarTableModel
+from ui.common.loading_overlay import LoadingOverlay
 
 
 def log_to_debug(message):
@@ -256,13 +262,43 @@ class WidgetsEmployee(QWidget):
         table_container_layout.setContentsMargins(0, 0, 0, 0)
         table_container_layout.setSpacing(0)
 
+        # Một model dạng cột cho cả 2 bảng: bảng frozen chỉ hiện 2 cột đầu,
+        # bảng scrollable hiện các cột còn lại; hai bảng dùng chung selection model
+        self.employee_model = ColumnarTableModel(
+            [
+                ("Mã NV", "employee_code"),
+                ("Tên Nhân Viên", "name"),
+                ("Phòng Ban", "department_name"),
+                ("Chức Vụ", "job_title_name"),
+                ("Giới Tính", "gender"),
+                ("Ngày Vào", "hire_date"),
+                ("Mã Chấm Công", "attendance_code"),
+                ("Tên Chấm Công", "attendance_name"),
+                ("Ngày Sinh", "date_of_birth"),
+                ("Nơi Sinh", "birthplace"),
+                ("Nguyên Quán", "hometown"),
+                ("Số CMND/CCCD", "id_number"),
+                ("Nơi Cấp", "id_place_issued"),
+                ("Dân Tộc", "ethnicity"),
+                ("Quốc Tịch", "nationality"),
+                ("Địa Chỉ Hiện Tại", "current_address"),
+                ("Số ĐT", "phone_number"),
+                ("Người Liên Hệ", "emergency_contact"),
+                ("ID", "id"),
+                ("Dept ID", "department_id"),
+            ],
+            search_keys=["employee_code", "name", "department_name", "job_title_name"],
+            parent=self,
+        )
+        frozen_columns = 2
+        hidden_columns = (18, 19)  # ID, Dept ID
+
         # Bảng 1: 2 cột đầu (Mã NV, Tên Nhân Viên) - FROZEN
-        self.table_frozen = QTableWidget()
-        self.table_frozen.setColumnCount(2)
-        self.table_frozen.setHorizontalHeaderLabels(["Mã NV", "Tên Nhân Viên"])
+        self.table_frozen = QTableView()
+        self.table_frozen.setModel(self.employee_model)
         self.table_frozen.setStyleSheet(
             f"""
-            QTableWidget {{
+            QTableView {{
                 background: {EVEN_ROW_BG};
                 gridline-color: #d0d0d0;
                 alternate-background-color: {ODD_ROW_BG};
@@ -270,12 +306,12 @@ class WidgetsEmployee(QWidget):
                 margin: 0px;
                 padding: 0px;
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 4px;
                 border-bottom: 1px solid #d0d0d0;
                 margin: 0px;
             }}
-            QTableWidget::item:selected {{
+            QTableView::item:selected {{
                 background: {ACTIVE};
                 color: #000;
                 font-weight: {FONT_WEIGHT_SEMIBOLD};
@@ -291,53 +327,35 @@ class WidgetsEmployee(QWidget):
             }}
             """
         )
-        self.table_frozen.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table_frozen.setSelectionMode(QTableWidget.SingleSelection)
+        self.table_frozen.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_frozen.setSelectionMode(QAbstractItemView.SingleSelection)
         self.table_frozen.setAlternatingRowColors(True)
         self.table_frozen.setShowGrid(True)
         self.table_frozen.setFocusPolicy(Qt.NoFocus)
-        self.table_frozen.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table_frozen.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table_frozen.verticalHeader().setVisible(False)
+        for col in range(frozen_columns, self.employee_model.columnCount()):
+            self.table_frozen.setColumnHidden(col, True)
         self.table_frozen.setColumnWidth(0, 80)
         self.table_frozen.setColumnWidth(1, 150)
         self.table_frozen.horizontalHeader().setStretchLastSection(False)
         self.table_frozen.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.table_frozen.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.table_frozen.setContentsMargins(0, 0, 0, 0)
-        self.table_frozen.setFrameStyle(QTableWidget.NoFrame)
+        self.table_frozen.setFrameStyle(QFrame.NoFrame)
         # Giữ kích thước cố định khớp 2 cột để sát bảng bên cạnh
         self.table_frozen.setFixedWidth(230)
         self.table_frozen.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Expanding)
         table_container_layout.addWidget(self.table_frozen, 0)
 
         # Bảng 2: Các cột còn lại (scrollable)
-        self.table_scrollable = QTableWidget()
-        self.table_scrollable.setColumnCount(18)  # 20 - 2 frozen columns
-        self.table_scrollable.setHorizontalHeaderLabels(
-            [
-                "Phòng Ban",
-                "Chức Vụ",
-                "Giới Tính",
-                "Ngày Vào",
-                "Mã Chấm Công",
-                "Tên Chấm Công",
-                "Ngày Sinh",
-                "Nơi Sinh",
-                "Nguyên Quán",
-                "Số CMND/CCCD",
-                "Nơi Cấp",
-                "Dân Tộc",
-                "Quốc Tịch",
-                "Địa Chỉ Hiện Tại",
-                "Số ĐT",
-                "Người Liên Hệ",
-                "ID",
-                "Dept ID",
-            ]
-        )
+        self.table_scrollable = QTableView()
+        self.table_scrollable.setModel(self.employee_model)
+        # Dùng chung selection model: chọn dòng ở bảng này là chọn ở bảng kia
+        self.table_scrollable.setSelectionModel(self.table_frozen.selectionModel())
         self.table_scrollable.setStyleSheet(
             f"""
-            QTableWidget {{
+            QTableView {{
                 background: {EVEN_ROW_BG};
                 gridline-color: #d0d0d0;
                 alternate-background-color: {ODD_ROW_BG};
@@ -345,12 +363,12 @@ class WidgetsEmployee(QWidget):
                 margin: 0px;
                 padding: 0px;
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 4px;
                 border-bottom: 1px solid #d0d0d0;
                 margin: 0px;
             }}
-            QTableWidget::item:selected {{
+            QTableView::item:selected {{
                 background: {ACTIVE};
                 color: #000;
                 font-weight: {FONT_WEIGHT_SEMIBOLD};
@@ -366,38 +384,37 @@ class WidgetsEmployee(QWidget):
             }}
             """
         )
-        self.table_scrollable.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table_scrollable.setSelectionMode(QTableWidget.SingleSelection)
+        self.table_scrollable.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_scrollable.setSelectionMode(QAbstractItemView.SingleSelection)
         self.table_scrollable.setAlternatingRowColors(True)
         self.table_scrollable.setShowGrid(True)
         self.table_scrollable.setFocusPolicy(Qt.NoFocus)
-        self.table_scrollable.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table_scrollable.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table_scrollable.verticalHeader().setVisible(False)
         self.table_scrollable.setContentsMargins(0, 0, 0, 0)
-        self.table_scrollable.setFrameStyle(QTableWidget.NoFrame)
+        self.table_scrollable.setFrameStyle(QFrame.NoFrame)
         self.table_scrollable.setSizePolicy(
             QSizePolicy.Expanding, QSizePolicy.Expanding
         )
 
         # Set column widths (cố định) để khi cửa sổ hẹp sẽ xuất hiện thanh cuộn ngang, tránh dồn chữ
         col_widths_scrollable = {
-            0: 120,  # Phòng Ban
-            1: 100,  # Chức Vụ
-            2: 90,  # Giới Tính
-            3: 100,  # Ngày Vào
-            4: 100,  # Mã Chấm Công
-            5: 120,  # Tên Chấm Công
-            6: 100,  # Ngày Sinh
-            7: 100,  # Nơi Sinh
-            8: 100,  # Nguyên Quán
-            9: 110,  # Số CMND/CCCD
-            10: 100,  # Nơi Cấp
-            11: 80,  # Dân Tộc
-            12: 90,  # Quốc Tịch
-            13: 150,  # Địa Chỉ Hiện Tại
-            14: 100,  # Số ĐT
-            15: 120,  # Người Liên Hệ
-            16: 50,  # ID
+            2: 120,  # Phòng Ban
+            3: 100,  # Chức Vụ
+            4: 90,  # Giới Tính
+            5: 100,  # Ngày Vào
+            6: 100,  # Mã Chấm Công
+            7: 120,  # Tên Chấm Công
+            8: 100,  # Ngày Sinh
+            9: 100,  # Nơi Sinh
+            10: 100,  # Nguyên Quán
+            11: 110,  # Số CMND/CCCD
+            12: 100,  # Nơi Cấp
+            13: 80,  # Dân Tộc
+            14: 90,  # Quốc Tịch
+            15: 150,  # Địa Chỉ Hiện Tại
+            16: 100,  # Số ĐT
+            17: 120,  # Người Liên Hệ
         }
 
         header_scrollable = self.table_scrollable.horizontalHeader()
@@ -409,27 +426,14 @@ class WidgetsEmployee(QWidget):
             # Cho phép người dùng kéo giãn các cột (tránh ríu chữ, vẫn có scrollbar khi hẹp)
             header_scrollable.setSectionResizeMode(col, QHeaderView.Interactive)
 
-        # Ẩn cột ID
-        self.table_scrollable.setColumnHidden(16, True)  # Ẩn cột ID
-        self.table_scrollable.setColumnHidden(17, True)  # Ẩn cột Dept ID
-        header_scrollable.setSectionResizeMode(16, QHeaderView.Fixed)
+        # Ẩn 2 cột frozen và các cột ID
+        for col in (*range(frozen_columns), *hidden_columns):
+            self.table_scrollable.setColumnHidden(col, True)
 
         # Hiển thị thanh cuộn ngang khi thu nhỏ cửa sổ
         self.table_scrollable.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         table_container_layout.addWidget(self.table_scrollable, 1)
 
-        # Tạo 50 dòng trống ban đầu cho cả 2 bảng
-        self.table_frozen.setRowCount(50)
-        self.table_scrollable.setRowCount(50)
-        for i in range(50):
-            # Bảng frozen: 2 cột
-            self.table_frozen.setItem(i, 0, QTableWidgetItem(""))
-            self.table_frozen.setItem(i, 1, QTableWidgetItem(""))
-
-            # Bảng scrollable: 17 cột
-            for col in range(17):
-                self.table_scrollable.setItem(i, col, QTableWidgetItem(""))
-
         right_main_layout.addWidget(table_container, 1)
         right_layout.addWidget(right_main, 1)
 
@@ -440,35 +444,18 @@ class WidgetsEmployee(QWidget):
         self.table_scrollable.horizontalScrollBar().valueChanged.connect(
             self._on_horizontal_scroll
         )
-        # Đồng bộ selection giữa 2 bảng
-        self.table_frozen.selectionModel().selectionChanged.connect(
-            self._sync_selection_to_scrollable
-        )
-        self.table_scrollable.selectionModel().selectionChanged.connect(
-            self._sync_selection_to_frozen
-        )
         # Double-click để mở dialog sửa
-        self.table_frozen.cellDoubleClicked.connect(self._on_row_double_clicked)
-        self.table_scrollable.cellDoubleClicked.connect(self._on_row_double_clicked)
+        self.table_frozen.doubleClicked.connect(self._on_row_double_clicked)
+        self.table_scrollable.doubleClicked.connect(self._on_row_double_clicked)
+
+        # Nạp dữ liệu chạy nền, lớp phủ "Đang tải" che bảng trong lúc chờ
+        self.load_jobs = LoadJobRunner(self)
+        self.loading_overlay = LoadingOverlay(table_container, self.load_jobs)
 
         # Kết nối sự kiện
         self._connect_actions()
         self._load_data()
 
-    def _sync_selection_to_scrollable(self):
-        """Đồng bộ selection từ bảng frozen sang bảng scrollable"""
-        frozen_selection = self.table_frozen.selectionModel().selectedRows()
-        if frozen_selection:
-            row = frozen_selection[0].row()
-            self.table_scrollable.selectRow(row)
-
-    def _sync_selection_to_frozen(self):
-        """Đồng bộ selection từ bảng scrollable sang bảng frozen"""
-        scrollable_selection = self.table_scrollable.selectionModel().selectedRows()
-        if scrollable_selection:
-            row = scrollable_selection[0].row()
-            self.table_frozen.selectRow(row)
-
     def _sync_vertical_scroll(self, value):
         """Đồng bộ scroll ngang giữa 2 bảng"""
         self.table_frozen.verticalScrollBar().setValue(value)
@@ -476,18 +463,27 @@ class WidgetsEmployee(QWidget):
 
     def _connect_actions(self):
         """Kết nối các sự kiện nút bấm"""
-        from services.employee_services import EmployeeService
-        from services.department_services import DepartmentService
+        from services.employee_services import EmployeeService, EmployeeSearchIndex
+        from services.department_services import DepartmentService, DepartmentTree
         from services.job_title_services import JobTitleService
         from ui.controllers.controllers_employee import ControllersEmployee
 
         self.employee_service = EmployeeService()
         self.department_service = DepartmentService()
         self.job_title_service = JobTitleService()
+        # Chỉ mục tìm kiếm (không dấu) và cây phòng ban - thay mới mỗi lần nạp dữ liệu
+        self.employee_index = EmployeeSearchIndex()
+        self.department_tree = DepartmentTree([], [])
 
         # Khởi tạo controller
         self.controller = ControllersEmployee(self)
 
+        # Thêm / sửa / xóa ở bất kỳ đâu (dialog, màn hình khác) được vá theo dòng
+        self._dirty_employee_ids = set()
+        self.change_batcher = ChangeBatcher(
+            self, ("employee", "department", "job_title"), self._on_data_changed
+        )
+
         self.btn_add.clicked.connect(self.controller.on_add)
         self.btn_edit.clicked.connect(self.controller.on_edit)
         self.btn_delete.clicked.connect(self.controller.on_delete)
@@ -507,18 +503,51 @@ class WidgetsEmployee(QWidget):
         )
 
     def _load_data(self):
-        """Load dữ liệu phòng ban từ database"""
+        """Nạp cây phòng ban và bảng nhân viên (truy vấn chạy nền)"""
+        self.load_jobs.submit(
+            "employees",
+            self._fetch_data,
+            self._apply_data,
+            self.department_service,
+            self.employee_service,
+        )
+
+    @staticmethod
+    def _fetch_data(department_service, employee_service):
+        """Chạy trên thread nền: truy vấn và xây chỉ mục tìm kiếm, không động vào widget"""
+        from services.employee_services import EmployeeSearchIndex
+
+        tree = department_service.get_tree()
+        raise_if_cancelled()
+        columns = employee_service.get_employee_columns()
+        raise_if_cancelled()
+        return tree, columns, EmployeeSearchIndex.from_columns(columns)
+
+    def _apply_data(self, data):
+        """Hiển thị dữ liệu đã nạp (GUI thread)"""
         try:
-            self.tree_departments.clear()
-            self.table_frozen.setRowCount(0)
-            self.table_scrollable.setRowCount(0)
+            tree, columns, index = data
+            self._show_department_tree(tree)
 
-            # Load cây phòng ban
-            hierarchy = self.department_service.get_hierarchy()
+            # Bảng nhân viên (dạng cột, tên phòng ban / chức vụ đã join sẵn)
+            self.employee_index = index
+            self.employee_model.set_columns(columns)
+            self._reapply_search()
+
+            # Update total
+            self.lbl_total.setText(f"Tổng: {len(columns['id'])}")
+        except Exception as e:
+            log_to_debug(f"WidgetsEmployee: Error in _apply_data: {e}")
+
+    def _show_department_tree(self, tree):
+        """Vẽ cây phòng ban từ DepartmentTree (GUI thread)"""
+        try:
+            self.department_tree = tree
+            self.tree_departments.clear()
 
             def build(parent_item, parent_id, prefix=""):
-                children = [h for h in hierarchy if h.get("parent_id") == parent_id]
-                children_sorted = sorted(children, key=lambda x: x["name"].lower())
+                # Chỉ mục con của cây đã sắp theo tên, không duyệt lại toàn bộ danh sách
+                children_sorted = [tree.nodes[i] for i in tree.children.get(parent_id, [])]
 
                 last_index = len(children_sorted) - 1
                 for idx, node in enumerate(children_sorted):
@@ -542,129 +571,90 @@ class WidgetsEmployee(QWidget):
 
             build(None, None, "")
             self.tree_departments.expandAll()
+        except Exception as e:
+            log_to_debug(f"WidgetsEmployee: Error in _show_department_tree: {e}")
 
-            # Load bảng nhân viên
-            employees = self.employee_service.get_all_employees()
-
-            # Lấy thông tin phòng ban và chức vụ
-            departments_map = {h["id"]: h["name"] for h in hierarchy}
-            job_titles = self.job_title_service.get_all_job_titles()
-            job_titles_map = {jt["id"]: jt["name"] for jt in job_titles}
-
-            # Đảm bảo luôn có tối thiểu 50 dòng
-            row_count = max(50, len(employees))
-            self.table_frozen.setRowCount(row_count)
-            self.table_scrollable.setRowCount(row_count)
-
-            # Xóa toàn bộ dữ liệu cũ
-            for i in range(row_count):
-                self.table_frozen.setItem(i, 0, QTableWidgetItem(""))
-                self.table_frozen.setItem(i, 1, QTableWidgetItem(""))
-                for col in range(18):
-                    self.table_scrollable.setItem(i, col, QTableWidgetItem(""))
-
-            for row, emp in enumerate(employees):
-                # === BẢNG FROZEN (2 cột đầu) ===
-                # Mã NV
-                self.table_frozen.setItem(
-                    row, 0, QTableWidgetItem(emp.get("employee_code", "") or "")
-                )
-                # Tên Nhân Viên
-                self.table_frozen.setItem(row, 1, QTableWidgetItem(emp.get("name", "")))
-
-                # === BẢNG SCROLLABLE (17 cột còn lại) ===
-                # Phòng Ban
-                dept_name = departments_map.get(emp.get("department_id"), "")
-                self.table_scrollable.setItem(row, 0, QTableWidgetItem(dept_name or ""))
-                # Chức Vụ
-                job_title_name = job_titles_map.get(emp.get("job_title_id"), "")
-                self.table_scrollable.setItem(
-                    row, 1, QTableWidgetItem(job_title_name or "")
-                )
-                # Giới Tính
-                self.table_scrollable.setItem(
-                    row, 2, QTableWidgetItem(str(emp.get("gender", "") or ""))
-                )
-                # Ngày Vào
-                hire_date = emp.get("hire_date", "")
-                self.table_scrollable.setItem(
-                    row, 3, QTableWidgetItem(str(hire_date) if hire_date else "")
-                )
-                # Mã Chấm Công
-                self.table_scrollable.setItem(
-                    row, 4, QTableWidgetItem(str(emp.get("attendance_code", "") or ""))
-                )
-                # Tên Chấm Công
-                self.table_scrollable.setItem(
-                    row, 5, QTableWidgetItem(str(emp.get("attendance_name", "") or ""))
-                )
-                # Ngày Sinh
-                date_of_birth = emp.get("date_of_birth", "")
-                self.table_scrollable.setItem(
-                    row,
-                    6,
-                    QTableWidgetItem(str(date_of_birth) if date_of_birth else ""),
-                )
-                # Nơi Sinh
-                self.table_scrollable.setItem(
-                    row, 7, QTableWidgetItem(str(emp.get("birthplace", "") or ""))
-                )
-                # Nguyên Quán
-                self.table_scrollable.setItem(
-                    row, 8, QTableWidgetItem(str(emp.get("hometown", "") or ""))
-                )
-                # Số CMND/CCCD
-                self.table_scrollable.setItem(
-                    row, 9, QTableWidgetItem(str(emp.get("id_number", "") or ""))
-                )
-                # Nơi Cấp
-                self.table_scrollable.setItem(
-                    row, 10, QTableWidgetItem(str(emp.get("id_place_issued", "") or ""))
-                )
-                # Dân Tộc
-                self.table_scrollable.setItem(
-                    row, 11, QTableWidgetItem(str(emp.get("ethnicity", "") or ""))
-                )
-                # Quốc Tịch
-                self.table_scrollable.setItem(
-                    row, 12, QTableWidgetItem(str(emp.get("nationality", "") or ""))
-                )
-                # Địa Chỉ Hiện Tại
-                self.table_scrollable.setItem(
-                    row, 13, QTableWidgetItem(str(emp.get("current_address", "") or ""))
-                )
-                # Số ĐT
-                self.table_scrollable.setItem(
-                    row, 14, QTableWidgetItem(str(emp.get("phone_number", "") or ""))
-                )
-                # Người Liên Hệ
-                self.table_scrollable.setItem(
-                    row,
-                    15,
-                    QTableWidgetItem(str(emp.get("emergency_contact", "") or "")),
-                )
-                # ID (ẩn nhưng phải có data)
-                emp_id = emp.get("id", "")
-                self.table_scrollable.setItem(
-                    row, 16, QTableWidgetItem(str(emp_id) if emp_id else "")
-                )
-                # Department ID (ẩn - để lọc)
-                dept_id = emp.get("department_id", "")
-                self.table_scrollable.setItem(
-                    row, 17, QTableWidgetItem(str(dept_id) if dept_id else "")
-                )
+    def _reload_departments(self):
+        """Nạp lại riêng cây phòng ban (truy vấn chạy nền)"""
+        self.load_jobs.submit(
+            "departments", self.department_service.get_tree, self._show_department_tree
+        )
 
-            # Update total
-            total = self.employee_service.count()
-            self.lbl_total.setText(f"Tổng: {total}")
+    def _on_data_changed(self, changes):
+        """
+        Mô tả:
+            Nhận các thay đổi đã gom từ ChangeBatcher và vá đúng các dòng bị ảnh hưởng:
+            nhân viên thêm / sửa được nạp lại theo id, nhân viên xóa bị gỡ khỏi bảng,
+            phòng ban / chức vụ đổi tên thì nạp lại các nhân viên thuộc về chúng.
+        Args:
+            changes: Dict {bảng: (ids_upsert, ids_delete, reload)}
+        """
+        if any(reload for _, _, reload in changes.values()):
+            self._load_data()
+            return
+
+        if "employee" in changes:
+            upserts, deletes, _ = changes["employee"]
+            if deletes:
+                self._remove_employees(deletes)
+            if upserts:
+                self._reload_employees(upserts)
+
+        related = set()
+        for table, column in (("department", "department_id"), ("job_title", "job_title_id")):
+            if table in changes:
+                upserts, deletes, _ = changes[table]
+                related.update(self.employee_model.find_keys("id", column, upserts | deletes))
+        if "department" in changes:
+            self._reload_departments()
+        if related:
+            self._reload_employees(related)
+
+    def _reload_employees(self, emp_ids):
+        """Nạp lại riêng các nhân viên vừa thêm / sửa thay vì cả bảng (truy vấn chạy nền)"""
+        # Job mới thay job đang chạy nên phải nạp lại cả các id của job bị thay
+        self._dirty_employee_ids.update(emp_ids)
+        ids = list(self._dirty_employee_ids)
+        self.load_jobs.submit(
+            "employee_rows",
+            self.employee_service.get_employee_columns,
+            partial(self._apply_employee_rows, set(ids)),
+            ids,
+        )
+
+    def _apply_employee_rows(self, requested_ids, columns):
+        """Cập nhật dòng trong bảng và chỉ mục tìm kiếm (GUI thread)"""
+        try:
+            self._dirty_employee_ids.difference_update(requested_ids)
+            self.employee_model.upsert_rows("id", columns)
+            keys = list(columns)
+            for row in zip(*columns.values()):
+                record = dict(zip(keys, row))
+                self.employee_index.upsert(record["id"], record)
+            self._reapply_search()
+            self.lbl_total.setText(f"Tổng: {len(self.employee_index)}")
         except Exception as e:
-            log_to_debug(f"WidgetsEmployee: Error in _load_data: {e}")
+            log_to_debug(f"WidgetsEmployee: Error in _apply_employee_rows: {e}")
+
+    def _remove_employees(self, emp_ids):
+        """Bỏ các nhân viên đã xóa khỏi bảng và chỉ mục tìm kiếm"""
+        self._dirty_employee_ids.difference_update(emp_ids)
+        self.employee_model.remove_rows("id", emp_ids)
+        for emp_id in emp_ids:
+            self.employee_index.remove(emp_id)
+        self._reapply_search()
+        self.lbl_total.setText(f"Tổng: {len(self.employee_index)}")
+
+    def _reapply_search(self):
+        """Tìm lại theo chuỗi đang nhập sau khi dữ liệu / chỉ mục thay đổi"""
+        if self.search_input.text():
+            self.controller.on_search(self.search_input.text())
 
     def _apply_search(self, text: str):
         """Tìm kiếm nhân viên (đã được xử lý bởi controller)"""
         pass
 
-    def _on_row_double_clicked(self, row, col):
+    def _on_row_double_clicked(self, index):
         """Đúp chuột 2 lần vào hàng để mở dialog sửa"""
         if hasattr(self, "controller"):
             self.controller.on_edit()
@@ -38,6 +38,8 @@ from core.resource import (
     ODD_ROW_BG,
     EVEN_ROW_BG,
 )
+from core.threads import LoadJobRunner
+from ui.common.loading_overlay import LoadingOverlay
 
 
 logging.basicConfig(
@@ -206,6 +208,10 @@ class WidgetsHolidayMain(QWidget):
         layout.addWidget(self.part1)
         layout.addWidget(self.part2)
 
+        # Nạp dữ liệu chạy nền, lớp phủ "Đang tải" che bảng trong lúc chờ
+        self.load_jobs = LoadJobRunner(self)
+        self.loading_overlay = LoadingOverlay(self.table, self.load_jobs)
+
         # Tải dữ liệu ngày nghỉ khi khởi tạo
         self._refresh_holidays()
 
@@ -307,13 +313,22 @@ class WidgetsHolidayMain(QWidget):
             logging.error(f"WidgetsHoliday: Error in _on_btn_delete_clicked: {e}")
 
     def _refresh_holidays(self):
-        """Làm mới dữ liệu ngày nghỉ từ DB"""
-        try:
-            logging.info("WidgetsHoliday: Refreshing holidays")
-            from services.holiday_services import HolidayService
+        """Làm mới dữ liệu ngày nghỉ từ DB (truy vấn chạy nền)"""
+        logging.info("WidgetsHoliday: Refreshing holidays")
+        self.load_jobs.submit("holidays", self._fetch_holidays, self._apply_holidays)
+
+    @staticmethod
+    def _fetch_holidays():
+        """Chạy trên thread nền: lấy danh sách và tổng số"""
+        from services.holiday_services import HolidayService
 
-            service = HolidayService()
-            holidays = service.get_all_holidays()
+        service = HolidayService()
+        return service.get_all_holidays(), service.get_total_count()
+
+    def _apply_holidays(self, data):
+        """Hiển thị dữ liệu đã nạp (GUI thread)"""
+        try:
+            holidays, total_count = data
 
             # Đảm bảo luôn có tối thiểu 50 dòng
             row_count = max(50, len(holidays))
@@ -348,10 +363,9 @@ class WidgetsHolidayMain(QWidget):
                 date_item.setData(Qt.UserRole, holiday["id"])
 
             # Cập nhật label tổng
-            total_count = service.get_total_count()
             self.total_label.setText(f"Tổng: {total_count}")
             self.total_counter = total_count
 
             logging.info(f"WidgetsHoliday: Refreshed {len(holidays)} holidays")
         except Exception as e:
-            logging.error(f"WidgetsHoliday: Error in _refresh_holidays: {e}")
+            logging.error(f"WidgetsHoliday: Error in _apply_holidays: {e}")
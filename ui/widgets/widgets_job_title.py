@@ -38,6 +38,8 @@ from core.resource import (
     ODD_ROW_BG,
     EVEN_ROW_BG,
 )
+from core.threads import LoadJobRunner
+from ui.common.loading_overlay import LoadingOverlay
 
 
 logging.basicConfig(
@@ -205,6 +207,10 @@ class WidgetsJobTitleMain(QWidget):
         layout.addWidget(self.part1)
         layout.addWidget(self.part2)
 
+        # Nạp dữ liệu chạy nền, lớp phủ "Đang tải" che bảng trong lúc chờ
+        self.load_jobs = LoadJobRunner(self)
+        self.loading_overlay = LoadingOverlay(self.table, self.load_jobs)
+
         # Tải dữ liệu chức danh khi khởi tạo
         self._refresh_job_titles()
 
@@ -309,13 +315,22 @@ class WidgetsJobTitleMain(QWidget):
             logging.error(f"WidgetsJobTitle: Error in _on_btn_delete_clicked: {e}")
 
     def _refresh_job_titles(self):
-        """Làm mới dữ liệu chức danh từ DB"""
-        try:
-            logging.info("WidgetsJobTitle: Refreshing job titles")
-            from services.job_title_services import JobTitleService
+        """Làm mới dữ liệu chức danh từ DB (truy vấn chạy nền)"""
+        logging.info("WidgetsJobTitle: Refreshing job titles")
+        self.load_jobs.submit("job_titles", self._fetch_job_titles, self._apply_job_titles)
+
+    @staticmethod
+    def _fetch_job_titles():
+        """Chạy trên thread nền: lấy danh sách và tổng số"""
+        from services.job_title_services import JobTitleService
 
-            service = JobTitleService()
-            job_titles = service.get_all_job_titles()
+        service = JobTitleService()
+        return service.get_all_job_titles(), service.get_total_count()
+
+    def _apply_job_titles(self, data):
+        """Hiển thị dữ liệu đã nạp (GUI thread)"""
+        try:
+            job_titles, total_count = data
 
             # Đảm bảo luôn có tối thiểu 50 dòng
             row_count = max(50, len(job_titles))
@@ -338,10 +353,9 @@ class WidgetsJobTitleMain(QWidget):
                 self.table.setItem(row, 1, name_item)
 
             # Cập nhật label tổng
-            total_count = service.get_total_count()
             self.total_label.setText(f"Tổng: {total_count}")
             self.total_counter = total_count
 
             logging.info(f"WidgetsJobTitle: Refreshed {len(job_titles)} job titles")
         except Exception as e:
-            logging.error(f"WidgetsJobTitle: Error in _refresh_job_titles: {e}")
+            logging.error(f"WidgetsJobTitle: Error in _apply_job_titles: {e}")
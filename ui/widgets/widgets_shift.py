@@ -354,6 +354,64 @@ class WidgetsShift(QWidget):
         self.btn_select_delete_fp.setCursor(Qt.PointingHandCursor)
         action_layout.addWidget(self.btn_select_delete_fp)
 
+        # Backup / restore fingerprint vault buttons
+        self.btn_backup_fp = QPushButton("💾 Sao lưu vân tay")
+        self.btn_backup_fp.setFixedHeight(32)
+        self.btn_backup_fp.setStyleSheet("""
+            QPushButton {
+                background: #6f42c1;
+                color: white;
+                border: none;
+                border-radius: 4px;
+                padding: 0 16px;
+                font-size: 13px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background: #59339d;
+            }
+        """)
+        self.btn_backup_fp.setCursor(Qt.PointingHandCursor)
+        action_layout.addWidget(self.btn_backup_fp)
+
+        self.btn_restore_fp = QPushButton("♻️ Khôi phục vân tay")
+        self.btn_restore_fp.setFixedHeight(32)
+        self.btn_restore_fp.setStyleSheet("""
+            QPushButton {
+                background: #20c997;
+                color: white;
+                border: none;
+                border-radius: 4px;
+                padding: 0 16px;
+                font-size: 13px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background: #199d76;
+            }
+        """)
+        self.btn_restore_fp.setCursor(Qt.PointingHandCursor)
+        action_layout.addWidget(self.btn_restore_fp)
+
+        self.btn_replicate_fp = QPushButton("🔁 Nhân bản sang máy khác")
+        self.btn_replicate_fp.setFixedHeight(32)
+        self.btn_replicate_fp.setStyleSheet("""
+            QPushButton {
+                background: #fd7e14;
+                color: white;
+                border: none;
+                border-radius: 4px;
+                padding: 0 16px;
+                font-size: 13px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background: #d9690f;
+            }
+        """)
+        self.btn_replicate_fp.setCursor(Qt.PointingHandCursor)
+        action_layout.addWidget(self.btn_replicate_fp)
+
         layout.addLayout(action_layout)
 
         # Table